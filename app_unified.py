@@ -3,11 +3,24 @@
 環境設定に基づく自動切り替え対応
 """
 
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
-from bom_manager import BOMManager
+from flask import (Flask, Response, render_template, request, redirect, url_for, flash, jsonify,
+                   stream_with_context)
+from bom_manager import (BOMManager, SEARCH_EQUALITY_FIELDS, SEARCH_RANGE_FIELDS,
+                         apply_sqlite_pragmas, read_sqlite_pragmas)
+from sync_jobs import SyncJobRunner, run_oracle_sync
+from bom_closure import enable_closure
+from attribute_columns import sync_attribute_columns
+from migrations import apply_migrations
+from bom_effectivity import resolve_as_of
+from change_stream import ChangeBroadcaster
+from profiler import finish_profile, instrument_class, render_panel, server_timing, start_profile
+from mrp import aggregate_orders
+from uom import MASS_UNIT, UNITS
+from snapshots import read_snapshot_info, run_snapshot_job, start_periodic_snapshots
 import sqlite3
 import os
 import sys
+from collections import deque
 from datetime import datetime
 from config import get_config, create_deployment_info
 
@@ -22,41 +35,78 @@ def create_app(environment=None):
     # 設定の初期化
     config_class.init_app(app)
     
+    # データベース初期化（BOMManagerが空のDBファイルを作成する前に実行）
+    init_database(app)
+    
     # BOMマネージャーの初期化
-    bom_manager = BOMManager(app.config['DATABASE_PATH'])
+    bom_manager = BOMManager(app.config['DATABASE_PATH'], pragmas=app.config.get('SQLITE_PRAGMAS'))
     
-    # データベース初期化
-    init_database(app)
+    # バックグラウンド同期ジョブランナー
+    sync_runner = SyncJobRunner()
+    
+    # スナップショット作成（同期ジョブとは別に single-flight）
+    snapshot_runner = SyncJobRunner(max_history=10)
+    if app.config.get('SNAPSHOT_PATH') and app.config.get('SNAPSHOT_REFRESH_SECONDS'):
+        start_periodic_snapshots(snapshot_runner, app.config['DATABASE_PATH'],
+                                 app.config['SNAPSHOT_PATH'], app.config['SNAPSHOT_REFRESH_SECONDS'])
+    
+    # 変更のプッシュ配信（監視スレッドは最初の購読者の接続時に開始）
+    change_broadcaster = ChangeBroadcaster(bom_manager.connect,
+                                           poll_seconds=app.config['CHANGE_STREAM_POLL_SECONDS'])
     
     # ルートの登録
     register_routes(app, bom_manager)
+    register_sync_routes(app, sync_runner)
+    register_snapshot_routes(app, bom_manager, snapshot_runner)
+    register_change_stream_routes(app, change_broadcaster)
+    if app.config.get('ENABLE_PROFILER'):
+        register_profiler_routes(app)
     
     return app
 
 
 def init_database(app):
-    """データベースの初期化"""
-    if not os.path.exists(app.config['DATABASE_PATH']) or app.config['ENVIRONMENT'] == 'TESTING':
-        print(f"{app.config['ENVIRONMENT']}用データベースを初期化しています...")
-        
-        # スキーマ作成
-        with open(app.config['SCHEMA_FILE'], 'r', encoding='utf-8') as f:
-            schema_sql = f.read()
-        
-        conn = sqlite3.connect(app.config['DATABASE_PATH'])
-        conn.executescript(schema_sql)
+    """データベースの初期化（新規作成または未適用マイグレーションの適用）"""
+    db_path = app.config['DATABASE_PATH']
+    schema_file = app.config['SCHEMA_FILE']
+    if not os.path.isabs(schema_file):
+        schema_file = os.path.join(app.root_path, schema_file)
+    
+    conn = sqlite3.connect(db_path)
+    try:
+        apply_sqlite_pragmas(conn, app.config.get('SQLITE_PRAGMAS', {}), include_persistent=True)
+        result = apply_migrations(conn, schema_file=schema_file)
+        columns = sync_attribute_columns(conn, app.config.get('JSON_ATTRIBUTE_COLUMNS', {}))
+    finally:
         conn.close()
+    
+    if result['created']:
+        print(f"{app.config['ENVIRONMENT']}用データベースを初期化しました (スキーマバージョン {result['to_version']})")
         
         # サンプルデータの生成（開発・ステージング環境のみ）
         if app.config.get('ENABLE_SAMPLE_DATA'):
             create_sample_data_for_app(app)
+    for version, description, elapsed in result['applied']:
+        print(f"マイグレーション v{version}: {description} ({elapsed:.2f}秒)")
+    if columns['added'] or columns['removed']:
+        print(f"追加属性の生成カラム: 追加 {columns['added']} / 削除 {columns['removed']}")
+    
+    # BOM閉包テーブル（有効化済みのDBでは何もしない）
+    if app.config.get('BOM_CLOSURE_ENABLED'):
+        conn = sqlite3.connect(app.config['DATABASE_PATH'])
+        try:
+            apply_sqlite_pragmas(conn, app.config.get('SQLITE_PRAGMAS', {}))
+            if enable_closure(conn):
+                print("BOM閉包テーブルを構築しました")
+        finally:
+            conn.close()
 
 
 def create_sample_data_for_app(app):
     """環境に応じたサンプルデータの作成"""
     try:
         # BOMManagerを直接使用してサンプルデータ作成
-        bom = BOMManager(app.config['DATABASE_PATH'])
+        bom = BOMManager(app.config['DATABASE_PATH'], pragmas=app.config.get('SQLITE_PRAGMAS'))
         
         # サンプルアイテムの作成
         sample_items = [
@@ -256,11 +306,17 @@ def register_routes(app, bom_manager):
             flash(f'アイテム "{item_id}" が見つかりませんでした。', 'error')
             return redirect(url_for('index'))
         
-        bom_structure = bom_manager.get_multi_level_bom(item_id)
+        try:
+            as_of = resolve_as_of(request.args.get('as_of'))
+        except ValueError as e:
+            flash(str(e), 'error')
+            as_of = resolve_as_of(None)
+        bom_structure = bom_manager.get_multi_level_bom(item_id, as_of=as_of)
         
         template_vars = {
             'item': item,
             'bom_structure': bom_structure,
+            'as_of': as_of,
             'environment': app.config['ENVIRONMENT'],
         }
         
@@ -325,6 +381,8 @@ def register_routes(app, bom_manager):
             component_item_id = request.form.get('component_item_id', '').strip()
             quantity = request.form.get('quantity', '').strip()
             usage_type = request.form.get('usage_type', '')
+            effective_from = request.form.get('effective_from', '').strip() or None
+            effective_to = request.form.get('effective_to', '').strip() or None
             
             if not all([parent_item_id, component_item_id, quantity, usage_type]):
                 flash('すべてのフィールドを入力してください。', 'error')
@@ -347,7 +405,9 @@ def register_routes(app, bom_manager):
                             parent_item_id=parent_item_id,
                             component_item_id=component_item_id,
                             quantity=quantity_float,
-                            usage_type=usage_type
+                            usage_type=usage_type,
+                            effective_from=effective_from,
+                            effective_to=effective_to
                         )
                         
                         if success:
@@ -375,16 +435,202 @@ def register_routes(app, bom_manager):
     
     @app.route('/api/items')
     def api_items():
-        """アイテム一覧API"""
+        """アイテム一覧API（?max_age=秒 でスナップショットからの読み取りを許可）"""
         item_type = request.args.get('type', 'all')
-        items = get_items_by_type(bom_manager, item_type)
-        return jsonify(items)
+        reader, headers = select_bom_reader(app, bom_manager)
+        items = get_items_by_type(reader, item_type)
+        return jsonify(items), 200, headers
+    
+    
+    @app.route('/api/items/search')
+    def api_items_search():
+        """
+        属性検索API（該当アイテムとファセット件数）
+        
+        例: /api/items/search?item_type=PS糸&denier_min=100&denier_max=200&twist_type=S
+            knit_type=X8,X4（いずれか）、attr.coating=シリコン（追加属性）、
+            facets=item_type,knit_type（集計するカラム）、limit=100&offset=0、max_age=秒
+        """
+        try:
+            filters, attributes, options = parse_search_args(request.args)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        
+        reader, headers = select_bom_reader(app, bom_manager)
+        try:
+            result = reader.search_items(filters, attributes=attributes, **options)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        return jsonify(result), 200, headers
+    
+    
+    @app.route('/api/items/<item_id>/descendants')
+    def api_item_descendants(item_id):
+        """全子孫（全階層の構成部品）API（?as_of=YYYY-MM-DD でその日の構成）"""
+        try:
+            as_of = resolve_as_of(request.args.get('as_of'))
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        reader, headers = select_bom_reader(app, bom_manager)
+        if not reader.get_item(item_id):
+            return jsonify({'success': False, 'message': f'アイテム "{item_id}" が見つかりません'}), 404
+        return jsonify(reader.get_all_descendants(item_id, as_of=as_of)), 200, headers
+    
+    
+    @app.route('/api/items/<item_id>/where_used')
+    def api_item_where_used(item_id):
+        """逆展開API（?type=完成品 で上位アイテムのタイプを絞り込み、?as_of=YYYY-MM-DD でその日の構成）"""
+        try:
+            as_of = resolve_as_of(request.args.get('as_of'))
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        reader, headers = select_bom_reader(app, bom_manager)
+        if not reader.get_item(item_id):
+            return jsonify({'success': False, 'message': f'アイテム "{item_id}" が見つかりません'}), 404
+        return jsonify(reader.get_where_used(item_id, item_type=request.args.get('type'),
+                                             as_of=as_of)), 200, headers
+    
+    
+    @app.route('/api/mrp', methods=['POST'])
+    def api_mrp():
+        """
+        所要量展開API
+        
+        リクエスト: {"orders": [{"item_id": "PRODUCT_001", "quantity": 100}, ...]}
+                    または {"demand": {"PRODUCT_001": 100}}、在庫は {"on_hand": {"RAW_001": 20}}
+                    {"unit": "KG"} で換算値（converted_*）を追加
+                    {"as_of": "2024-04-01"} でその日に有効だったBOM構成で展開（製造ロットの使用量の再現）
+        """
+        try:
+            demand, on_hand, unit, as_of = parse_demand(request.get_json(silent=True) or {})
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({'success': False, 'message': f'需要の指定が不正です: {e}'}), 400
+        
+        reader, headers = select_bom_reader(app, bom_manager)
+        try:
+            requirements = reader.calculate_requirements(demand, on_hand, unit=unit, as_of=as_of)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        return jsonify({'success': True, 'requirements': requirements}), 200, headers
+    
+    
+    @app.route('/api/mrp/materials', methods=['POST'])
+    def api_mrp_materials():
+        """
+        原材料集計API（最下位の原材料の正味所要量を単位換算して合計。リクエストは /api/mrp と同じ、unit の既定はKG）
+        """
+        try:
+            demand, on_hand, unit, as_of = parse_demand(request.get_json(silent=True) or {})
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({'success': False, 'message': f'需要の指定が不正です: {e}'}), 400
+        
+        reader, headers = select_bom_reader(app, bom_manager)
+        try:
+            summary = reader.get_material_summary(demand, on_hand, unit=unit or MASS_UNIT, as_of=as_of)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        return jsonify({'success': True, **summary}), 200, headers
+    
+    
+    @app.route('/api/what_if', methods=['POST'])
+    def api_what_if():
+        """
+        代替品シミュレーションAPI（bom_components には書き込まない）
+        
+        リクエスト: {"substitutions": [{"from": "RAW_001", "to": "RAW_002", "ratio": 1.05,
+                                         "parents": ["PS_001"]}],
+                     "demand": {"PRODUCT_001": 100}}（需要・在庫・unit・as_of は /api/mrp と同じ。需要は省略可）
+        """
+        params = request.get_json(silent=True) or {}
+        try:
+            demand, on_hand, unit, as_of = parse_demand(params, required=False)
+            substitutions = [dict(substitution) for substitution in params.get('substitutions') or []]
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({'success': False, 'message': f'指定が不正です: {e}'}), 400
+        
+        reader, headers = select_bom_reader(app, bom_manager)
+        try:
+            result = reader.simulate_substitutions(substitutions, demand, on_hand, unit=unit, as_of=as_of)
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        return jsonify({'success': True, **result}), 200, headers
+    
+    
+    @app.route('/api/costs')
+    def api_costs():
+        """全アイテムの単価・標準原価API（原価表の出力用）"""
+        reader, headers = select_bom_reader(app, bom_manager)
+        return jsonify(reader.get_all_costs()), 200, headers
+    
+    
+    @app.route('/api/costs/rollup', methods=['POST'])
+    def api_costs_rollup():
+        """全アイテムの標準原価の積み上げ直しAPI"""
+        return jsonify({'success': True, 'updated': bom_manager.rollup_costs()})
+    
+    
+    @app.route('/api/items/<item_id>/cost')
+    def api_item_cost(item_id):
+        """アイテムの標準原価と直下構成部品ごとの内訳API（?as_of=YYYY-MM-DD でその日の構成で再計算）"""
+        try:
+            as_of = request.args.get('as_of') and resolve_as_of(request.args['as_of'])
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        reader, headers = select_bom_reader(app, bom_manager)
+        cost = reader.get_item_cost(item_id, as_of=as_of)
+        if cost is None:
+            return jsonify({'success': False, 'message': f'アイテム "{item_id}" が見つかりません'}), 404
+        return jsonify(cost), 200, headers
+    
+    
+    @app.route('/api/items/<item_id>/cost', methods=['PUT'])
+    def api_item_cost_update(item_id):
+        """
+        単価の更新API（そのアイテムと全祖先の標準原価を再計算）
+    
+        リクエスト: {"unit_cost": 850.0}
+        """
+        params = request.get_json(silent=True) or {}
+        try:
+            unit_cost = float(params['unit_cost'])
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'unit_cost を数値で指定してください'}), 400
+        if not bom_manager.get_item(item_id):
+            return jsonify({'success': False, 'message': f'アイテム "{item_id}" が見つかりません'}), 404
+    
+        recalculated = bom_manager.set_unit_cost(item_id, unit_cost)
+        return jsonify({
+            'success': True,
+            'recalculated': recalculated,
+            'cost': bom_manager.get_item_cost(item_id),
+        })
+    
+    
+    @app.route('/api/changes')
+    def api_changes():
+        """
+        変更履歴API（items・bom_components の追加・更新・削除を通し番号順に。常にライブDBから読む）
+        
+        例: /api/changes?since=1200&limit=500&table=bom_components
+            レスポンスの next_seq を次回の since に指定。reset_required が true の場合は全件を読み直す
+        """
+        try:
+            since = int(request.args.get('since', 0))
+            limit = int(request.args.get('limit', 1000))
+        except ValueError:
+            return jsonify({'success': False, 'message': 'since・limit は整数で指定してください'}), 400
+        table = request.args.get('table')
+        try:
+            result = bom_manager.get_changes_since(since, limit, [table] if table else None)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        return jsonify({'success': True, **result})
     
     
     @app.route('/api/status')
     def api_status():
         """システム状況API"""
-        conn = sqlite3.connect(app.config['DATABASE_PATH'])
+        conn = bom_manager.connect()
         cursor = conn.cursor()
         
         cursor.execute("SELECT COUNT(*) FROM items")
@@ -396,6 +642,7 @@ def register_routes(app, bom_manager):
         cursor.execute("SELECT COUNT(DISTINCT item_type) FROM items")
         item_type_count = cursor.fetchone()[0]
         
+        sqlite_pragmas = read_sqlite_pragmas(conn)
         conn.close()
         
         status_info = {
@@ -405,6 +652,7 @@ def register_routes(app, bom_manager):
             'total_items': total_items,
             'total_bom_components': total_bom_components,
             'item_type_count': item_type_count,
+            'sqlite_pragmas': sqlite_pragmas,
             'last_updated': datetime.now().isoformat()
         }
         
@@ -432,6 +680,289 @@ def register_routes(app, bom_manager):
             return redirect(url_for('index'))
 
 
+def register_sync_routes(app, sync_runner):
+    """Oracle同期ジョブ関連ルートの登録"""
+    
+    @app.route('/api/oracle_sync', methods=['POST'])
+    def api_oracle_sync():
+        """Oracle同期ジョブの開始（即時に202を返し、同期はバックグラウンドで実行）"""
+        params = request.get_json(silent=True) or request.form
+        sync_type = params.get('sync_type', 'products')
+        update_existing = str(params.get('update_existing', 'false')).lower() in ('1', 'true', 'on')
+        
+        if sync_type not in ('products', 'materials', 'full'):
+            return jsonify({'success': False, 'message': f'無効な同期種別: {sync_type}'}), 400
+        
+        try:
+            connector = create_oracle_connector(app)
+        except Exception as e:
+            return jsonify({'success': False, 'message': f'Oracle接続設定エラー: {str(e)}'}), 503
+        
+        job, started = sync_runner.submit(
+            'oracle_sync', run_oracle_sync,
+            connector=connector,
+            sync_type=sync_type,
+            update_existing=update_existing,
+            batch_size=app.config['SYNC_BATCH_SIZE']
+        )
+        
+        response = {
+            'success': started,
+            'message': 'Oracle同期を開始しました' if started else 'Oracle同期は既に実行中です',
+            'job_id': job.job_id,
+            'status_url': url_for('api_oracle_sync_job', job_id=job.job_id),
+        }
+        return jsonify(response), 202 if started else 409
+    
+    
+    @app.route('/api/oracle_sync/jobs')
+    def api_oracle_sync_jobs():
+        """Oracle同期ジョブ一覧"""
+        return jsonify([job.to_dict() for job in sync_runner.list_jobs()])
+    
+    
+    @app.route('/api/oracle_sync/jobs/<job_id>')
+    def api_oracle_sync_job(job_id):
+        """Oracle同期ジョブの進捗"""
+        job = sync_runner.get(job_id)
+        if not job:
+            return jsonify({'success': False, 'message': f'ジョブ "{job_id}" が見つかりません'}), 404
+        return jsonify(job.to_dict())
+    
+    
+    @app.route('/api/oracle_sync/jobs/<job_id>/cancel', methods=['POST'])
+    def api_oracle_sync_cancel(job_id):
+        """Oracle同期ジョブのキャンセル"""
+        job = sync_runner.get(job_id)
+        if not job:
+            return jsonify({'success': False, 'message': f'ジョブ "{job_id}" が見つかりません'}), 404
+        
+        if not sync_runner.cancel(job_id):
+            return jsonify({'success': False, 'message': 'ジョブは既に終了しています',
+                            'job': job.to_dict()}), 409
+        
+        return jsonify({'success': True, 'message': 'キャンセルを要求しました', 'job': job.to_dict()}), 202
+
+
+def register_snapshot_routes(app, bom_manager, snapshot_runner):
+    """読み取り専用スナップショット関連ルートの登録"""
+    
+    @app.route('/api/snapshot')
+    def api_snapshot():
+        """スナップショットの作成日時・経過秒数・データバージョン（ライブDBとの一致）"""
+        if not app.config.get('SNAPSHOT_PATH'):
+            return jsonify({'success': False, 'message': 'スナップショットは無効です'}), 404
+        
+        info = read_snapshot_info(app.config['SNAPSHOT_PATH'])
+        live_version = bom_manager.get_data_version()
+        active = snapshot_runner.active_job()
+        return jsonify({
+            'snapshot': info,
+            'live_data_version': live_version,
+            'is_current': bool(info) and info['data_version'] == live_version,
+            'refresh_seconds': app.config.get('SNAPSHOT_REFRESH_SECONDS'),
+            'refresh_job': active.to_dict() if active else None,
+        })
+    
+    
+    @app.route('/api/snapshot', methods=['POST'])
+    def api_snapshot_create():
+        """スナップショットの作成（即時に202を返し、作成はバックグラウンドで実行）"""
+        if not app.config.get('SNAPSHOT_PATH'):
+            return jsonify({'success': False, 'message': 'スナップショットは無効です'}), 404
+        
+        job, started = snapshot_runner.submit(
+            'snapshot', run_snapshot_job,
+            source_path=app.config['DATABASE_PATH'],
+            snapshot_path=app.config['SNAPSHOT_PATH']
+        )
+        return jsonify({
+            'success': started,
+            'message': 'スナップショットの作成を開始しました' if started else 'スナップショットは作成中です',
+            'job': job.to_dict(),
+        }), 202 if started else 409
+
+
+def register_change_stream_routes(app, change_broadcaster):
+    """変更のプッシュ配信（Server-Sent Events）ルートの登録"""
+    
+    @app.route('/api/changes/stream')
+    def api_changes_stream():
+        """
+        items・bom_components の変更と最新の件数を、変更があったときだけ送るSSE
+        
+        例: new EventSource('/api/changes/stream')（?since=N でその通し番号より後の変更から）
+            イベント: counts（件数）、changes（変更。id は通し番号）、reset（全件を読み直す）
+            再接続時は Last-Event-ID ヘッダーの通し番号から再開
+        """
+        since = request.headers.get('Last-Event-ID') or request.args.get('since')
+        if since is not None and not since.isdigit():
+            return jsonify({'success': False, 'message': 'since は0以上の整数で指定してください'}), 400
+        
+        events = change_broadcaster.events(
+            int(since) if since is not None else None,
+            heartbeat_seconds=app.config['CHANGE_STREAM_HEARTBEAT_SECONDS'],
+            max_seconds=app.config['CHANGE_STREAM_MAX_SECONDS']
+        )
+        return Response(stream_with_context(events), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def register_profiler_routes(app):
+    """
+    リクエスト単位のプロファイラ（ENABLE_PROFILER）
+    
+    全リクエストの処理時間・SQLの数と時間・読み出した行数・接続数・BOMManagerのメソッドごとの呼び出しを記録し、
+    Server-Timing ヘッダーとHTMLページ下部のデバッグパネル、GET /api/profiler（直近のリクエスト）で返します
+    """
+    instrument_class(BOMManager)
+    history = deque(maxlen=app.config.get('PROFILER_HISTORY', 50))
+    
+    @app.before_request
+    def start_request_profile():
+        # 起動後に app.config['ENABLE_PROFILER'] を False にすると計測を停止（ベンチマーク等）
+        if app.config['ENABLE_PROFILER'] and request.endpoint not in ('static', 'api_profiler'):
+            request.environ['bom.profiler_token'] = start_profile(request.method, request.full_path.rstrip('?'))
+    
+    @app.after_request
+    def add_request_profile(response):
+        token = request.environ.pop('bom.profiler_token', None)
+        if token is None:
+            return response
+        profile = finish_profile(token)
+        profile.finish(response.status_code)
+        result = profile.to_dict()
+        history.append(result)
+        response.headers['Server-Timing'] = server_timing(result)
+        
+        # HTMLページにはデバッグパネルを挿入（ストリーミングのレスポンスは対象外）
+        if response.mimetype == 'text/html' and not response.is_streamed and not response.direct_passthrough:
+            body = response.get_data(as_text=True)
+            if '</body>' in body:
+                response.set_data(body.replace('</body>', render_panel(result) + '</body>', 1))
+        return response
+    
+    @app.teardown_request
+    def discard_request_profile(error=None):
+        # 例外で after_request が呼ばれなかった場合
+        token = request.environ.pop('bom.profiler_token', None)
+        if token is not None:
+            finish_profile(token)
+    
+    @app.route('/api/profiler')
+    def api_profiler():
+        """
+        直近のリクエストの計測値（新しい順）
+        
+        例: /api/profiler?limit=10&min_sql=50（SQLを50件以上実行したリクエストのみ）
+        """
+        limit = request.args.get('limit', type=int) or len(history)
+        min_sql = request.args.get('min_sql', 0, type=int)
+        profiles = [profile for profile in reversed(history) if profile['sql_count'] >= min_sql]
+        return jsonify({'success': True, 'profiles': profiles[:limit]})
+
+
+def select_bom_reader(app, bom_manager):
+    """
+    リクエストの ?max_age=秒 に応じて読み取り元を選択
+    
+    スナップショットがmax_age秒以内に作成されていればスナップショット（読み取り専用）、
+    それ以外（指定なし・スナップショット無効・古い）はライブDBから読み取ります。
+    
+    Returns:
+        (BOMManager, レスポンスヘッダー)
+    """
+    max_age = request.args.get('max_age', type=float)
+    if max_age is not None and app.config.get('SNAPSHOT_PATH'):
+        info = read_snapshot_info(app.config['SNAPSHOT_PATH'])
+        if info and info['age_seconds'] <= max_age:
+            reader = BOMManager(app.config['SNAPSHOT_PATH'], pragmas=app.config.get('SQLITE_PRAGMAS'),
+                                read_only=True)
+            return reader, {
+                'X-Data-Source': 'snapshot',
+                'X-Snapshot-Age': str(info['age_seconds']),
+                'X-Data-Version': info['data_version'],
+            }
+    return bom_manager, {'X-Data-Source': 'live'}
+
+
+def parse_demand(params, required=True):
+    """
+    所要量展開APIのリクエスト本文を (需要, 在庫, 換算先の単位, BOM構成の基準日) に変換
+    
+    Args:
+        required: False の場合、需要の指定がなければ需要を None とする
+    
+    Raises:
+        KeyError / TypeError / ValueError: 指定が不正な場合
+    """
+    demand = aggregate_orders(
+        (order['item_id'], order['quantity']) for order in params.get('orders', [])
+    )
+    for item_id, quantity in (params.get('demand') or {}).items():
+        demand[item_id] = demand.get(item_id, 0.0) + float(quantity)
+    if not demand:
+        if required:
+            raise ValueError('需要を指定してください')
+        demand = None
+    on_hand = {item_id: float(quantity) for item_id, quantity in (params.get('on_hand') or {}).items()}
+    unit = params.get('unit')
+    if unit is not None and unit not in UNITS:
+        raise ValueError(f'単位は {", ".join(UNITS)} のいずれかを指定してください')
+    return demand, on_hand, unit, resolve_as_of(params.get('as_of'))
+
+
+def parse_search_args(args):
+    """
+    属性検索APIのクエリ文字列を search_items の引数に変換
+    
+    Returns:
+        (filters, attributes, {'facets', 'limit', 'offset'})
+    """
+    filters = {}
+    for field in SEARCH_EQUALITY_FIELDS:
+        value = args.get(field)
+        if value:
+            values = [v.strip() for v in value.split(',') if v.strip()]
+            filters[field] = values[0] if len(values) == 1 else values
+    for field in SEARCH_RANGE_FIELDS:
+        bounds = {}
+        for bound in ('min', 'max'):
+            value = args.get(f'{field}_{bound}')
+            if value:
+                try:
+                    bounds[bound] = float(value)
+                except ValueError:
+                    raise ValueError(f"{field}_{bound} は数値で指定してください: {value}")
+        if bounds:
+            filters[field] = bounds
+    
+    attributes = {key[len('attr.'):]: value for key, value in args.items() if key.startswith('attr.')}
+    
+    options = {
+        'limit': args.get('limit', 100, type=int),
+        'offset': args.get('offset', 0, type=int),
+    }
+    if 'facets' in args:
+        options['facets'] = tuple(f for f in args['facets'].split(',') if f)
+    return filters, attributes, options
+
+
+def create_oracle_connector(app):
+    """環境設定に応じたOracleConnectorの生成（MOCK_ORACLE_DATAの場合はスタンドイン）"""
+    from tools.oracle_connector import OracleConnector
+    
+    if app.config.get('MOCK_ORACLE_DATA'):
+        from tools.oracle_standin import OracleStandin
+        return OracleConnector(sqlite_path=app.config['DATABASE_PATH'],
+                               driver=OracleStandin(app.config['ORACLE_STANDIN_PATH']))
+    
+    if not app.config.get('ORACLE_ENABLED'):
+        raise RuntimeError(f"{app.config['ENVIRONMENT']}環境ではOracle連携が無効です")
+    
+    return OracleConnector(sqlite_path=app.config['DATABASE_PATH'])
+
+
 def get_items_by_type(bom_manager, item_type):
     """アイテムタイプ別の取得（安全版）"""
     try:
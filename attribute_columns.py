@@ -0,0 +1,132 @@
+"""
+釣り糸製造BOM管理システム 追加属性の生成カラム
+
+items.additional_attributes（JSON）のうち頻繁に絞り込むキーを、
+json_extract による仮想生成カラム attr_<キー> と索引に昇格させます。
+
+- 仮想生成カラムは ALTER TABLE ADD COLUMN で追加でき、既存行の書き換えは発生しません
+  （値は読み取り時に計算され、索引にのみ実体が保存されます）
+- add_item などの書き込み側は変更不要で、JSONに入れた値がそのまま索引検索の対象になります
+- 対象キーは config.py の JSON_ATTRIBUTE_COLUMNS で宣言し、起動時に sync_attribute_columns() で
+  追加・型変更・削除を反映します（attr_ で始まるカラム以外は変更しません）
+
+使い方:
+    JSON_ATTRIBUTE_COLUMNS = {'strength_lb': 'REAL', 'coating': 'TEXT'}
+    → items.attr_strength_lb / items.attr_coating と idx_items_attr_strength_lb / idx_items_attr_coating
+"""
+
+import re
+import sqlite3
+from typing import Dict, List
+
+ATTRIBUTE_COLUMN_PREFIX = 'attr_'
+ATTRIBUTE_COLUMN_TYPES = ('TEXT', 'INTEGER', 'REAL', 'NUMERIC')
+
+_KEY_PATTERN = re.compile(r'^[a-z][a-z0-9_]*$')
+
+
+def attribute_column_name(key: str) -> str:
+    return f"{ATTRIBUTE_COLUMN_PREFIX}{key}"
+
+
+def _validate_key(key: str):
+    if not _KEY_PATTERN.match(key):
+        raise ValueError(f"追加属性のキーは英小文字・数字・_ のみ使用できます: {key}")
+
+
+def get_attribute_columns(conn: sqlite3.Connection) -> Dict[str, str]:
+    """現在の生成カラム {キー: 型} を取得"""
+    columns = {}
+    # 生成カラムは table_info に現れないため table_xinfo を使用（hidden: 2=VIRTUAL, 3=STORED）
+    for _, name, column_type, _, _, _, hidden in conn.execute("PRAGMA table_xinfo(items)"):
+        if hidden in (2, 3) and name.startswith(ATTRIBUTE_COLUMN_PREFIX):
+            columns[name[len(ATTRIBUTE_COLUMN_PREFIX):]] = column_type.upper()
+    return columns
+
+
+def _index_covers(conn: sqlite3.Connection, index_name: str, column: str) -> bool:
+    """索引が items の column 1列だけを対象にしているか（索引がなければ False）"""
+    row = conn.execute("SELECT tbl_name FROM sqlite_master WHERE type = 'index' AND name = ?",
+                       (index_name,)).fetchone()
+    if row is None or row[0] != 'items':
+        return False
+    return [info[2] for info in conn.execute(f"PRAGMA index_info({index_name})")] == [column]
+
+
+def sync_attribute_columns(conn: sqlite3.Connection,
+                           declared: Dict[str, str]) -> Dict[str, List[str]]:
+    """
+    宣言に合わせて生成カラムと索引を追加・削除（1つのセーブポイント内で行い、失敗時はすべて元に戻す）
+
+    同名の索引が別のカラムを対象にしている場合は作り直します。
+
+    Args:
+        conn: SQLite接続
+        declared: {JSONのキー: SQLの型（TEXT/INTEGER/REAL/NUMERIC）}
+
+    Returns:
+        {'added': [キー], 'removed': [キー]}（型の変更は削除と追加の両方に含まれる）
+
+    Raises:
+        ValueError: キー・型が不正な場合、または attr_<キー> が生成カラム以外の既存カラムと重なる場合
+    """
+    declared = {key: column_type.upper() for key, column_type in (declared or {}).items()}
+    for key, column_type in declared.items():
+        _validate_key(key)
+        if column_type not in ATTRIBUTE_COLUMN_TYPES:
+            raise ValueError(f"追加属性 {key} の型が不正です: {column_type}")
+
+    # 通常のカラムとの名前の衝突は変更を始める前に拒否
+    plain_columns = {row[1] for row in conn.execute("PRAGMA table_xinfo(items)") if row[6] not in (2, 3)}
+    conflicts = sorted(attribute_column_name(key) for key in declared
+                       if attribute_column_name(key) in plain_columns)
+    if conflicts:
+        raise ValueError(f"生成カラム以外の既存カラムと名前が重なります: {', '.join(conflicts)}")
+
+    current = get_attribute_columns(conn)
+    removed = sorted(key for key, column_type in current.items() if declared.get(key) != column_type)
+    added = sorted(key for key, column_type in declared.items() if current.get(key) != column_type)
+    # 追加しないキーも索引の対象カラムを確認（同名の索引が別カラムを指していれば作り直す）
+    reindexed = sorted(key for key in declared if key not in added
+                       and not _index_covers(conn, f"idx_items_{attribute_column_name(key)}",
+                                             attribute_column_name(key)))
+    if not added and not removed and not reindexed:
+        return {'added': [], 'removed': []}
+
+    # DDLは with conn: のトランザクションに含まれず個別に確定するため、セーブポイントで囲む
+    conn.execute("SAVEPOINT sync_attribute_columns")
+    try:
+        for key in removed:
+            column = attribute_column_name(key)
+            conn.execute(f"DROP INDEX IF EXISTS idx_items_{column}")
+            conn.execute(f"ALTER TABLE items DROP COLUMN {column}")
+        for key in added:
+            column = attribute_column_name(key)
+            conn.execute(f"""
+                ALTER TABLE items ADD COLUMN {column} {declared[key]}
+                GENERATED ALWAYS AS (json_extract(additional_attributes, '$.{key}')) VIRTUAL
+            """)
+        for key in added + reindexed:
+            column = attribute_column_name(key)
+            conn.execute(f"DROP INDEX IF EXISTS idx_items_{column}")
+            conn.execute(f"CREATE INDEX idx_items_{column} ON items({column})")
+    except BaseException:
+        conn.execute("ROLLBACK TO sync_attribute_columns")
+        conn.execute("RELEASE sync_attribute_columns")
+        raise
+    # 外側のトランザクションがなければ RELEASE でコミットされる
+    conn.execute("RELEASE sync_attribute_columns")
+
+    return {'added': added, 'removed': removed}
+
+
+def attribute_expression(conn: sqlite3.Connection, key: str) -> str:
+    """
+    追加属性を参照するSQL式
+
+    生成カラムがあればカラム名（索引検索）、なければ json_extract 式（SQL内で評価）を返します。
+    """
+    _validate_key(key)
+    if key in get_attribute_columns(conn):
+        return attribute_column_name(key)
+    return f"json_extract(additional_attributes, '$.{key}')"
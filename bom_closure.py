@@ -0,0 +1,264 @@
+"""
+釣り糸製造BOM管理システム BOM閉包テーブル
+
+全祖先・子孫の組み合わせを bom_closure に保持し、「Xの全子孫」「Yを使う全完成品」を
+再帰クエリなしの索引検索1回で取得できるようにします（オプション機能）。
+
+bom_closure の1行は「ancestor から descendant への深さ depth の経路の集計」です。
+    path_qty   : 同じ深さの全経路について数量の積を合計したもの（親1単位あたりの所要量）
+    path_count : 同じ深さの経路数（差分削除の判定用）
+深さ0（自分自身）の行は保持しません。
+
+bom_components の追加・削除・数量変更はトリガーで差分反映されます。
+新しい辺 p→c(q) に対する差分は「pの祖先（p自身を含む）× q × cの子孫（c自身を含む）」で、
+BOMが非巡回である限り既存の閉包だけから計算できます（循環する辺の追加・付け替えは拒否します）。
+
+使い方:
+    python bom_closure.py bom_database_dev.db --enable    # テーブル・トリガー作成と初回構築
+    python bom_closure.py bom_database_dev.db --rebuild   # 全件再構築
+    python bom_closure.py bom_database_dev.db --stats     # 行数・サイズの確認
+    python bom_closure.py bom_database_dev.db --disable   # トリガーとテーブルを削除
+"""
+
+import argparse
+import sqlite3
+import time
+from typing import Any, Dict
+
+# 再構築時の最大深さ（これを超える場合は循環参照とみなす）
+MAX_CLOSURE_DEPTH = 50
+
+CLOSURE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS bom_closure (
+    ancestor TEXT NOT NULL,
+    descendant TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    path_qty REAL NOT NULL,
+    path_count INTEGER NOT NULL,
+    PRIMARY KEY (ancestor, descendant, depth)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_bom_closure_descendant ON bom_closure(descendant, ancestor);
+"""
+
+CLOSURE_TRIGGER_NAMES = (
+    'bom_closure_check_cycle',
+    'bom_closure_check_cycle_update',
+    'bom_closure_after_insert',
+    'bom_closure_after_delete',
+    'bom_closure_after_update',
+)
+
+
+def _edge_delta_sql(row: str, sign: str) -> str:
+    """
+    辺 row.parent_item_id → row.component_item_id の追加（sign='+'）または
+    削除（sign='-'）を閉包へ反映するUPSERT文を生成
+    """
+    return f"""
+        INSERT INTO bom_closure (ancestor, descendant, depth, path_qty, path_count)
+        SELECT a.ancestor, d.descendant, a.depth + 1 + d.depth,
+               {sign}SUM(a.path_qty * {row}.quantity * d.path_qty),
+               {sign}SUM(a.path_count * d.path_count)
+        FROM (
+            SELECT {row}.parent_item_id AS ancestor, 0 AS depth, 1.0 AS path_qty, 1 AS path_count
+            UNION ALL
+            SELECT ancestor, depth, path_qty, path_count
+            FROM bom_closure WHERE descendant = {row}.parent_item_id
+        ) AS a, (
+            SELECT {row}.component_item_id AS descendant, 0 AS depth, 1.0 AS path_qty, 1 AS path_count
+            UNION ALL
+            SELECT descendant, depth, path_qty, path_count
+            FROM bom_closure WHERE ancestor = {row}.component_item_id
+        ) AS d
+        WHERE true
+        GROUP BY a.ancestor, d.descendant, a.depth + 1 + d.depth
+        ON CONFLICT (ancestor, descendant, depth) DO UPDATE SET
+            path_qty = path_qty + excluded.path_qty,
+            path_count = path_count + excluded.path_count;
+    """
+
+
+CLOSURE_TRIGGERS_SQL = f"""
+CREATE TRIGGER IF NOT EXISTS bom_closure_check_cycle
+    BEFORE INSERT ON bom_components
+    WHEN NEW.parent_item_id = NEW.component_item_id
+      OR EXISTS (SELECT 1 FROM bom_closure
+                 WHERE ancestor = NEW.component_item_id AND descendant = NEW.parent_item_id)
+    BEGIN
+        SELECT RAISE(ABORT, 'BOM循環参照: 構成部品が親アイテムの上位に存在します');
+    END;
+
+-- 親・構成部品の付け替え（変更前の辺を経由する経路も循環とみなすため、辺の向きの反転などは安全側で拒否）
+CREATE TRIGGER IF NOT EXISTS bom_closure_check_cycle_update
+    BEFORE UPDATE OF parent_item_id, component_item_id ON bom_components
+    WHEN (NEW.parent_item_id IS NOT OLD.parent_item_id OR NEW.component_item_id IS NOT OLD.component_item_id)
+     AND (NEW.parent_item_id = NEW.component_item_id
+          OR EXISTS (SELECT 1 FROM bom_closure
+                     WHERE ancestor = NEW.component_item_id AND descendant = NEW.parent_item_id))
+    BEGIN
+        SELECT RAISE(ABORT, 'BOM循環参照: 構成部品が親アイテムの上位に存在します');
+    END;
+
+CREATE TRIGGER IF NOT EXISTS bom_closure_after_insert
+    AFTER INSERT ON bom_components
+    BEGIN
+        {_edge_delta_sql('NEW', '+')}
+    END;
+
+CREATE TRIGGER IF NOT EXISTS bom_closure_after_delete
+    AFTER DELETE ON bom_components
+    BEGIN
+        {_edge_delta_sql('OLD', '-')}
+        DELETE FROM bom_closure WHERE path_count <= 0;
+    END;
+
+CREATE TRIGGER IF NOT EXISTS bom_closure_after_update
+    AFTER UPDATE OF parent_item_id, component_item_id, quantity ON bom_components
+    BEGIN
+        {_edge_delta_sql('OLD', '-')}
+        DELETE FROM bom_closure WHERE path_count <= 0;
+        {_edge_delta_sql('NEW', '+')}
+    END;
+"""
+
+
+def is_closure_enabled(conn: sqlite3.Connection) -> bool:
+    """閉包テーブルが有効（テーブルとトリガーが存在）か判定"""
+    count = conn.execute("""
+        SELECT COUNT(*) FROM sqlite_master
+        WHERE (type = 'table' AND name = 'bom_closure')
+           OR (type = 'trigger' AND name = 'bom_closure_after_insert')
+    """).fetchone()[0]
+    return count == 2
+
+
+def enable_closure(conn: sqlite3.Connection) -> bool:
+    """
+    閉包テーブルとトリガーを作成し、未構築なら初回構築を行う
+
+    Returns:
+        bool: 今回新たに有効化した場合True
+    """
+    if is_closure_enabled(conn):
+        # 有効化済みのDBにも後から追加したトリガーを作成
+        conn.executescript(CLOSURE_TRIGGERS_SQL)
+        return False
+
+    conn.executescript(CLOSURE_TABLE_SQL)
+    conn.executescript(CLOSURE_TRIGGERS_SQL)
+    rebuild_closure(conn)
+    return True
+
+
+def disable_closure(conn: sqlite3.Connection):
+    """トリガーと閉包テーブルを削除（以降は再帰クエリにフォールバック）"""
+    for trigger_name in CLOSURE_TRIGGER_NAMES:
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger_name}")
+    conn.execute("DROP TABLE IF EXISTS bom_closure")
+    conn.commit()
+
+
+def rebuild_closure(conn: sqlite3.Connection, max_depth: int = MAX_CLOSURE_DEPTH) -> int:
+    """
+    bom_components から閉包テーブルを全件再構築
+
+    経路を1本ずつ列挙せず、深さごとに (祖先, 子孫) 単位で集計しながら1段ずつ伸ばすため、
+    共有部品の多いBOMでも行数は閉包の大きさに比例します。
+
+    Returns:
+        int: 構築した行数
+    """
+    with conn:
+        return rebuild_closure_rows(conn, max_depth)
+
+
+def rebuild_closure_rows(conn: sqlite3.Connection, max_depth: int = MAX_CLOSURE_DEPTH) -> int:
+    """rebuild_closure の本体（コミットしない。呼び出し側のトランザクション内で使用）"""
+    conn.execute("DELETE FROM bom_closure")
+    conn.execute("""
+        INSERT INTO bom_closure (ancestor, descendant, depth, path_qty, path_count)
+        SELECT parent_item_id, component_item_id, 1, SUM(quantity), COUNT(*)
+        FROM bom_components
+        GROUP BY parent_item_id, component_item_id
+    """)
+
+    depth = 1
+    while True:
+        cursor = conn.execute("""
+            INSERT INTO bom_closure (ancestor, descendant, depth, path_qty, path_count)
+            SELECT c.ancestor, e.component_item_id, c.depth + 1,
+                   SUM(c.path_qty * e.quantity), SUM(c.path_count)
+            FROM bom_closure c
+            JOIN bom_components e ON e.parent_item_id = c.descendant
+            WHERE c.depth = ?
+            GROUP BY c.ancestor, e.component_item_id
+        """, (depth,))
+        if cursor.rowcount <= 0:
+            break
+        depth += 1
+        if depth > max_depth:
+            raise ValueError(f"BOMの深さが{max_depth}を超えました（循環参照の可能性があります）")
+
+    return conn.execute("SELECT COUNT(*) FROM bom_closure").fetchone()[0]
+
+
+def closure_stats(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """閉包テーブルの行数・最大深さ・概算サイズを取得"""
+    stats = {
+        'enabled': is_closure_enabled(conn),
+        'bom_components': conn.execute("SELECT COUNT(*) FROM bom_components").fetchone()[0],
+    }
+    if not stats['enabled']:
+        return stats
+
+    rows, max_depth = conn.execute("SELECT COUNT(*), MAX(depth) FROM bom_closure").fetchone()
+    stats.update({'closure_rows': rows, 'max_depth': max_depth or 0})
+
+    # dbstat が使えるビルドではテーブル・索引の実サイズも取得
+    try:
+        stats['closure_bytes'] = conn.execute("""
+            SELECT SUM(pgsize) FROM dbstat
+            WHERE name IN ('bom_closure', 'idx_bom_closure_descendant')
+        """).fetchone()[0]
+    except sqlite3.OperationalError:
+        pass
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BOM閉包テーブル管理ツール')
+    parser.add_argument('db_path', help='BOMデータベースのパス')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--enable', action='store_true', help='閉包テーブルを有効化して構築')
+    group.add_argument('--rebuild', action='store_true', help='閉包テーブルを全件再構築')
+    group.add_argument('--disable', action='store_true', help='閉包テーブルとトリガーを削除')
+    group.add_argument('--stats', action='store_true', help='行数・サイズを表示（既定）')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db_path)
+    try:
+        started = time.perf_counter()
+        if args.enable:
+            if enable_closure(conn):
+                print(f"閉包テーブルを有効化しました ({time.perf_counter() - started:.2f}秒)")
+            else:
+                print("閉包テーブルは既に有効です")
+        elif args.rebuild:
+            if not is_closure_enabled(conn):
+                parser.error("閉包テーブルが有効ではありません（--enable を使用してください）")
+            rows = rebuild_closure(conn)
+            print(f"閉包テーブルを再構築しました: {rows}行 ({time.perf_counter() - started:.2f}秒)")
+        elif args.disable:
+            disable_closure(conn)
+            print("閉包テーブルを削除しました")
+
+        for key, value in closure_stats(conn).items():
+            print(f"  {key}: {value}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
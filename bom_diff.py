@@ -0,0 +1,262 @@
+"""
+釣り糸製造BOM管理システム BOM構成の差分
+
+2つのBOM（2つの .db ファイル、同じDBのスナップショット同士、または同じDB内の2つのアイテム）の
+構成を比較し、追加・削除・変更されたBOM構成行と、完成品ごとの積み上げ所要量の差を報告します。
+
+各アイテムに「直下の構成行（構成部品・用途・数量・ロス率）と構成部品のハッシュ」から作るハッシュ
+（Merkle木）を下位から計算し、上位から比較します。ハッシュが一致するアイテムは配下の構成全体が
+同一のため、展開せずに読み飛ばします。積み上げ所要量もハッシュ単位でキャッシュするため、
+両方のBOMに共通する部分木は1回しか展開しません。
+
+比較するのは基準日（省略時は当日）に有効な構成行です（bom_effectivity.py）。
+同じDBを2つの基準日で比較すると、有効期間による構成の切り替わりを確認できます。
+
+使い方:
+    python bom_diff.py bom_database_staging.db bom_database_dev.db
+    python bom_diff.py bom_database_dev.db bom_database_dev.db --item PRODUCT_001 --other-item PRODUCT_002
+    python bom_diff.py old.db new.db --json > diff.json
+    python bom_diff.py bom_database_dev.db bom_database_dev.db --as-of 2024-04-01 --right-as-of 2025-04-01
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from bom_effectivity import effective_condition, has_effectivity_columns, resolve_as_of
+from bom_graph import orphan_lines_error
+from bom_levels import compute_low_level_codes
+
+# 数量の比較・ハッシュの有効桁数
+QUANTITY_DIGITS = 9
+
+LineKey = Tuple[str, str]  # (構成部品アイテムID, 用途)
+
+
+def _format_quantity(value: Optional[float]) -> str:
+    return f"{value or 0:.{QUANTITY_DIGITS}g}"
+
+
+class BomStructure:
+    """比較用に読み込んだBOM構成（アイテムごとの直下構成行と部分木のハッシュ）"""
+
+    def __init__(self, conn: sqlite3.Connection, label: str = '', as_of: Optional[str] = None):
+        self.label = label
+        self.as_of = resolve_as_of(as_of)
+        self.items = {item_id: (item_name, item_type) for item_id, item_name, item_type in
+                      conn.execute("SELECT item_id, item_name, item_type FROM items")}
+        self.lines: Dict[str, Dict[LineKey, Tuple[float, float]]] = {}
+        has_parent = set()
+        orphans = []
+        # 有効期間の導入前のDB（デプロイ先の移行前のDBなど）は全ての行を比較
+        effective = effective_condition() if has_effectivity_columns(conn) else "1"
+        for parent, component, usage_type, quantity, loss_ratio in conn.execute(f"""
+            SELECT parent_item_id, component_item_id, usage_type, quantity, COALESCE(loss_ratio, 0)
+            FROM bom_components
+            WHERE {effective}
+        """, {'as_of': self.as_of}):
+            if parent not in self.items or component not in self.items:
+                orphans.append((parent, component))
+                continue
+            self.lines.setdefault(parent, {})[(component, usage_type)] = (quantity, loss_ratio)
+            has_parent.add(component)
+        if orphans:
+            raise orphan_lines_error(orphans)
+        self.roots = sorted(item_id for item_id in self.lines if item_id not in has_parent)
+
+        # 下位（LLCの大きい順）から計算すると構成部品のハッシュは計算済み
+        levels = compute_low_level_codes(conn)
+        self.hashes: Dict[str, str] = {}
+        for item_id in sorted(self.items, key=lambda i: -levels.get(i, 0)):
+            self.hashes[item_id] = self._subtree_hash(item_id)
+
+    def _subtree_hash(self, item_id: str) -> str:
+        digest = hashlib.sha1()
+        for (component, usage_type), (quantity, loss_ratio) in sorted(self.lines.get(item_id, {}).items()):
+            digest.update(f"{component}\t{usage_type}\t{_format_quantity(quantity)}\t"
+                          f"{_format_quantity(loss_ratio)}\t{self.hashes[component]}\n".encode('utf-8'))
+        return digest.hexdigest()
+
+    @classmethod
+    def from_path(cls, db_path: str, as_of: Optional[str] = None) -> 'BomStructure':
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"データベースが見つかりません: {db_path}")
+        conn = sqlite3.connect(db_path)
+        try:
+            return cls(conn, label=f"{db_path}@{as_of}" if as_of else db_path, as_of=as_of)
+        finally:
+            conn.close()
+
+
+def _rolled_quantities(structure: BomStructure, item_id: str,
+                       cache: Dict[str, Dict[str, float]]) -> Dict[str, float]:
+    """アイテム1単位あたりの全階層の所要量（ロス率込み）。同じハッシュの部分木は共通のキャッシュを使う"""
+    key = structure.hashes[item_id]
+    if key not in cache:
+        rolled = {}
+        for (component, _), (quantity, loss_ratio) in structure.lines.get(item_id, {}).items():
+            per_unit = quantity * (1 + loss_ratio)
+            rolled[component] = rolled.get(component, 0.0) + per_unit
+            for descendant, descendant_quantity in _rolled_quantities(structure, component, cache).items():
+                rolled[descendant] = rolled.get(descendant, 0.0) + per_unit * descendant_quantity
+        cache[key] = rolled
+    return cache[key]
+
+
+def diff_structures(left: BomStructure, right: BomStructure,
+                    roots: Optional[List[Tuple[str, str]]] = None) -> Dict[str, Any]:
+    """
+    2つのBOM構成を比較
+
+    Args:
+        left / right: 比較元・比較先
+        roots: 比較する最上位アイテムの組 [(比較元のID, 比較先のID)]
+               （省略時は両方の最上位アイテム。同じIDどうしを比較）
+
+    Returns:
+        {'summary', 'lines': {'added', 'removed', 'changed'}, 'products': 完成品ごとの積み上げ所要量の差}
+    """
+    if roots is None:
+        roots = [(item_id, item_id) for item_id in sorted(set(left.roots) | set(right.roots))]
+    for left_id, right_id in roots:
+        if left_id not in left.items and right_id not in right.items:
+            raise ValueError(f"アイテムが見つかりません: {left_id} / {right_id}")
+
+    added, removed, changed = [], [], []
+    visited = set()
+    skipped = 0
+    stack = list(reversed(roots))
+    while stack:
+        left_id, right_id = stack.pop()
+        if (left_id, right_id) in visited:
+            continue
+        visited.add((left_id, right_id))
+        if left.hashes.get(left_id, '') == right.hashes.get(right_id, '') \
+                and left_id in left.items and right_id in right.items:
+            skipped += 1  # 配下の構成が同一
+            continue
+
+        parent = {'parent_item_id': right_id if right_id in right.items else left_id}
+        if left_id != right_id:
+            parent['left_parent_item_id'] = left_id
+        left_lines = left.lines.get(left_id, {})
+        right_lines = right.lines.get(right_id, {})
+        for key in sorted(set(left_lines) | set(right_lines)):
+            component, usage_type = key
+            line = {**parent, 'component_item_id': component, 'usage_type': usage_type}
+            if key not in left_lines:
+                quantity, loss_ratio = right_lines[key]
+                added.append({**line, 'quantity': quantity, 'loss_ratio': loss_ratio})
+            elif key not in right_lines:
+                quantity, loss_ratio = left_lines[key]
+                removed.append({**line, 'quantity': quantity, 'loss_ratio': loss_ratio})
+            elif [_format_quantity(v) for v in left_lines[key]] != [_format_quantity(v) for v in right_lines[key]]:
+                changed.append({**line,
+                                'quantity_before': left_lines[key][0], 'quantity_after': right_lines[key][0],
+                                'loss_ratio_before': left_lines[key][1], 'loss_ratio_after': right_lines[key][1]})
+        for component in sorted({component for component, _ in set(left_lines) | set(right_lines)}, reverse=True):
+            stack.append((component, component))
+
+    # 完成品（比較の最上位アイテム）ごとの積み上げ所要量の差
+    cache: Dict[str, Dict[str, float]] = {}
+    products = []
+    for left_id, right_id in roots:
+        if left.hashes.get(left_id) == right.hashes.get(right_id) and left_id in left.items and right_id in right.items:
+            continue
+        before = _rolled_quantities(left, left_id, cache) if left_id in left.items else {}
+        after = _rolled_quantities(right, right_id, cache) if right_id in right.items else {}
+        deltas = []
+        for item_id in sorted(set(before) | set(after)):
+            quantity_before, quantity_after = before.get(item_id, 0.0), after.get(item_id, 0.0)
+            if _format_quantity(quantity_before) != _format_quantity(quantity_after):
+                deltas.append({'item_id': item_id, 'before': quantity_before, 'after': quantity_after,
+                               'delta': quantity_after - quantity_before})
+        product = {'item_id': right_id if right_id in right.items else left_id,
+                   'status': 'added' if left_id not in left.items else
+                             'removed' if right_id not in right.items else 'changed',
+                   'deltas': deltas}
+        if left_id != right_id:
+            product['left_item_id'] = left_id
+        products.append(product)
+
+    return {
+        'left': left.label,
+        'right': right.label,
+        'summary': {
+            'items_compared': len(visited),
+            'identical_subtrees_skipped': skipped,
+            'lines_added': len(added),
+            'lines_removed': len(removed),
+            'lines_changed': len(changed),
+            'products_changed': len(products),
+        },
+        'lines': {'added': added, 'removed': removed, 'changed': changed},
+        'products': products,
+    }
+
+
+def diff_databases(left_path: str, right_path: str,
+                   roots: Optional[List[Tuple[str, str]]] = None,
+                   left_as_of: Optional[str] = None, right_as_of: Optional[str] = None) -> Dict[str, Any]:
+    """
+    2つのDBファイル（スナップショットを含む）のBOM構成を比較
+
+    Args:
+        left_as_of / right_as_of: それぞれの構成の基準日（省略時は当日）
+    """
+    left = BomStructure.from_path(left_path, left_as_of)
+    if right_path == left_path and resolve_as_of(right_as_of) == left.as_of:
+        right = left
+    else:
+        right = BomStructure.from_path(right_path, right_as_of)
+    return diff_structures(left, right, roots)
+
+
+def format_summary(diff: Dict[str, Any]) -> str:
+    """差分の概要（1行）"""
+    summary = diff['summary']
+    return (f"BOM構成の差分: 追加 {summary['lines_added']}行 / 削除 {summary['lines_removed']}行 / "
+            f"変更 {summary['lines_changed']}行、影響する完成品 {summary['products_changed']}件"
+            f"（同一の部分木 {summary['identical_subtrees_skipped']}件は展開せず）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BOM構成の差分')
+    parser.add_argument('left', help='比較元のDB（スナップショット可）')
+    parser.add_argument('right', help='比較先のDB')
+    parser.add_argument('--item', help='比較するアイテム（省略時は全ての最上位アイテム）')
+    parser.add_argument('--other-item', help='比較先のアイテム（省略時は --item と同じ）')
+    parser.add_argument('--as-of', help='比較元の構成の基準日（YYYY-MM-DD。省略時は当日）')
+    parser.add_argument('--right-as-of', help='比較先の構成の基準日（省略時は --as-of と同じ）')
+    parser.add_argument('--json', action='store_true', help='JSONで出力')
+    args = parser.parse_args()
+
+    roots = [(args.item, args.other_item or args.item)] if args.item else None
+    started = time.perf_counter()
+    diff = diff_databases(args.left, args.right, roots, args.as_of, args.right_as_of or args.as_of)
+    elapsed = time.perf_counter() - started
+
+    if args.json:
+        print(json.dumps(diff, indent=2, ensure_ascii=False))
+        return
+
+    for kind, mark in (('added', '+'), ('removed', '-')):
+        for line in diff['lines'][kind]:
+            print(f"  {mark} {line['parent_item_id']} → {line['component_item_id']} "
+                  f"({line['usage_type']}) {line['quantity']:g}")
+    for line in diff['lines']['changed']:
+        print(f"  ~ {line['parent_item_id']} → {line['component_item_id']} ({line['usage_type']}) "
+              f"{line['quantity_before']:g} → {line['quantity_after']:g}")
+    for product in diff['products']:
+        print(f"  [{product['status']}] {product['item_id']}: 所要量の変化 {len(product['deltas'])}件")
+        for delta in product['deltas'][:20]:
+            print(f"      {delta['item_id']:<20} {delta['before']:>12,.4f} → {delta['after']:>12,.4f}")
+    print(f"{format_summary(diff)} ({elapsed:.3f}秒)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+釣り糸製造BOM管理システム BOM構成の有効期間
+
+BOM構成行に有効期間（effective_from / effective_to）を持たせ、任意の日付（基準日）時点の構成で
+展開・逆展開・所要量・原価を求められるようにします。過去の製造ロットが実際に使った構成を、
+その製造日を基準日にして再現できます。
+
+    基準日に有効な行: (effective_from IS NULL OR effective_from <= 基準日)
+                  AND (effective_to IS NULL OR effective_to > 基準日)
+
+- 日付は 'YYYY-MM-DD' の文字列。effective_to の当日は含みません（改訂日で旧行を締め、新行を始める）
+- NULL は期間の制限なし（既存の構成行は全て NULL = 常に有効）
+- 基準日を省略した場合は当日
+- 同じ親・構成部品・用途の行は有効期間が重ならないこと（check_overlap）
+- 閉包テーブル（bom_closure）と低位レベルコードは全期間の構成行で計算します。
+  基準日に無効な行が1件もなければ閉包テーブルをそのまま使い、あれば再帰クエリで展開します
+  （all_lines_effective）。LLCは構成行の部分集合でも「子 > 親」を満たすため、どの基準日でも使えます
+
+使い方:
+    python bom_effectivity.py bom_database_dev.db --as-of 2024-04-01 PRODUCT_001
+    python bom_effectivity.py bom_database_dev.db --revise BRAID_001 PS_001 "Main Braid Thread" 6 2025-01-01
+"""
+
+import argparse
+import sqlite3
+from datetime import date, datetime
+from typing import Any, Optional
+
+EFFECTIVITY_COLUMNS = ('effective_from', 'effective_to')
+
+
+def resolve_as_of(as_of: Any = None) -> str:
+    """
+    基準日を 'YYYY-MM-DD' に正規化（省略時は当日）
+
+    Raises:
+        ValueError: 日付として解釈できない場合
+    """
+    if as_of is None or as_of == '':
+        return date.today().isoformat()
+    if isinstance(as_of, datetime):
+        return as_of.date().isoformat()
+    if isinstance(as_of, date):
+        return as_of.isoformat()
+    try:
+        return date.fromisoformat(str(as_of)).isoformat()
+    except ValueError:
+        raise ValueError(f"日付は YYYY-MM-DD 形式で指定してください: {as_of}") from None
+
+
+def _optional_date(value: Any) -> Optional[str]:
+    return None if value is None or value == '' else resolve_as_of(value)
+
+
+def effective_condition(alias: str = '', param: str = 'as_of') -> str:
+    """基準日（名前付きパラメータ :param）に有効な構成行の条件式"""
+    prefix = f"{alias}." if alias else ''
+    return (f"({prefix}effective_from IS NULL OR {prefix}effective_from <= :{param}) "
+            f"AND ({prefix}effective_to IS NULL OR {prefix}effective_to > :{param})")
+
+
+def has_effectivity_columns(conn: sqlite3.Connection) -> bool:
+    """bom_components に有効期間のカラムがあるか（移行前のDB・スナップショットの読み込み用）"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(bom_components)")}
+    return set(EFFECTIVITY_COLUMNS) <= columns
+
+
+def all_lines_effective(conn: sqlite3.Connection, as_of: str) -> bool:
+    """
+    全ての構成行が基準日に有効か（閉包テーブルを基準日の展開にそのまま使えるか）
+
+    有効期間を持つ行だけの部分索引（idx_bom_effectivity）を使うため、期間指定のない行数には依存しません。
+    """
+    return not conn.execute(f"""
+        SELECT EXISTS (
+            SELECT 1 FROM bom_components
+            WHERE (effective_from IS NOT NULL OR effective_to IS NOT NULL)
+              AND NOT ({effective_condition()})
+        )
+    """, {'as_of': as_of}).fetchone()[0]
+
+
+def check_overlap(conn: sqlite3.Connection, parent_item_id: str, component_item_id: str,
+                  usage_type: str, effective_from: Optional[str], effective_to: Optional[str],
+                  exclude_id: Optional[int] = None):
+    """
+    同じ親・構成部品・用途の行と有効期間が重ならないことを確認
+
+    Raises:
+        ValueError: 期間が空（effective_to <= effective_from）または既存の行と重なる場合
+    """
+    if effective_from and effective_to and effective_to <= effective_from:
+        raise ValueError(f"有効期間の終了日は開始日より後にしてください: {effective_from} 〜 {effective_to}")
+    row = conn.execute("""
+        SELECT effective_from, effective_to FROM bom_components
+        WHERE parent_item_id = :parent AND component_item_id = :component AND usage_type = :usage_type
+          AND (effective_to IS NULL OR :effective_from IS NULL OR effective_to > :effective_from)
+          AND (effective_from IS NULL OR :effective_to IS NULL OR effective_from < :effective_to)
+          AND bom_component_id IS NOT :exclude_id
+        LIMIT 1
+    """, {'parent': parent_item_id, 'component': component_item_id, 'usage_type': usage_type,
+          'effective_from': effective_from, 'effective_to': effective_to,
+          'exclude_id': exclude_id}).fetchone()
+    if row:
+        raise ValueError(
+            f"有効期間が既存の構成と重なります: {parent_item_id} → {component_item_id} ({usage_type}) "
+            f"{row[0] or '…'} 〜 {row[1] or '…'}"
+        )
+
+
+def insert_bom_line(conn: sqlite3.Connection, parent_item_id: str, component_item_id: str,
+                    quantity: float, usage_type: str, effective_from: Any = None,
+                    effective_to: Any = None) -> int:
+    """
+    有効期間を確認して構成行を追加（コミットしない）
+
+    Returns:
+        int: 追加した bom_component_id
+    """
+    effective_from, effective_to = _optional_date(effective_from), _optional_date(effective_to)
+    check_overlap(conn, parent_item_id, component_item_id, usage_type, effective_from, effective_to)
+    return conn.execute("""
+        INSERT INTO bom_components
+            (parent_item_id, component_item_id, quantity, usage_type, effective_from, effective_to)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (parent_item_id, component_item_id, quantity, usage_type,
+          effective_from, effective_to)).lastrowid
+
+
+def revise_bom_line(conn: sqlite3.Connection, parent_item_id: str, component_item_id: str,
+                    usage_type: str, quantity: Optional[float], effective_from: Any = None) -> Optional[int]:
+    """
+    構成行を改訂日から変更（コミットしない）
+
+    改訂日に有効な行を改訂日で締め（effective_to = 改訂日）、改訂日から新しい数量の行を追加します。
+    新しい行はロス率・工程順序・備考を引き継ぎ、終了日は旧行の終了日（旧行がなければ次の版の開始日）です。
+    旧行が改訂日に始まる場合は旧行を書き換えます。
+    構成部品以下の低位レベルコードと、親以上の標準原価も更新します。
+
+    Args:
+        quantity: 改訂後の数量（None の場合は改訂日以降この構成部品を使わない）
+        effective_from: 改訂日（省略時は当日）
+
+    Returns:
+        Optional[int]: 改訂後の行の bom_component_id（quantity が None の場合は None）
+
+    Raises:
+        ValueError: 改訂日以降に有効な行がなく、使用中止を指定した場合
+    """
+    effective_from = resolve_as_of(effective_from)
+    key = {'parent': parent_item_id, 'component': component_item_id, 'usage_type': usage_type,
+           'as_of': effective_from}
+    current = conn.execute(f"""
+        SELECT bom_component_id, effective_from, effective_to FROM bom_components
+        WHERE parent_item_id = :parent AND component_item_id = :component AND usage_type = :usage_type
+          AND {effective_condition()}
+    """, key).fetchone()
+
+    if current is None:
+        if quantity is None:
+            raise ValueError(f"{effective_from} に有効な構成がありません: "
+                             f"{parent_item_id} → {component_item_id} ({usage_type})")
+        next_start = conn.execute("""
+            SELECT MIN(effective_from) FROM bom_components
+            WHERE parent_item_id = :parent AND component_item_id = :component AND usage_type = :usage_type
+              AND effective_from > :as_of
+        """, key).fetchone()[0]
+        revised_id = insert_bom_line(conn, parent_item_id, component_item_id, quantity, usage_type,
+                                     effective_from, next_start)
+        return _after_revision(conn, parent_item_id, component_item_id, revised_id)
+
+    line_id, current_from, current_to = current
+    if current_from == effective_from:
+        if quantity is None:
+            conn.execute("DELETE FROM bom_components WHERE bom_component_id = ?", (line_id,))
+            revised_id = None
+        else:
+            conn.execute("""
+                UPDATE bom_components SET quantity = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE bom_component_id = ?
+            """, (quantity, line_id))
+            revised_id = line_id
+    else:
+        conn.execute("""
+            UPDATE bom_components SET effective_to = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE bom_component_id = ?
+        """, (effective_from, line_id))
+        revised_id = None if quantity is None else conn.execute("""
+            INSERT INTO bom_components
+                (parent_item_id, component_item_id, quantity, usage_type,
+                 process_step, loss_ratio, remarks, effective_from, effective_to)
+            SELECT parent_item_id, component_item_id, ?, usage_type,
+                   process_step, loss_ratio, remarks, ?, ?
+            FROM bom_components WHERE bom_component_id = ?
+        """, (quantity, effective_from, current_to, line_id)).lastrowid
+    return _after_revision(conn, parent_item_id, component_item_id, revised_id)
+
+
+def _after_revision(conn: sqlite3.Connection, parent_item_id: str, component_item_id: str,
+                    revised_id: Optional[int]) -> Optional[int]:
+    """改訂後の低位レベルコード（構成部品以下）と標準原価（親以上）の更新"""
+    # bom_levels・cost_rollup は本モジュールの有効期間の条件を使うため、循環インポートを避けてここで読み込む
+    from bom_levels import propagate_low_level_code
+    from cost_rollup import rollup_costs_for
+
+    if revised_id is not None:
+        propagate_low_level_code(conn, parent_item_id, component_item_id)
+    rollup_costs_for(conn, [parent_item_id])
+    return revised_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BOM構成の有効期間')
+    parser.add_argument('db_path', help='BOMデータベースのパス')
+    parser.add_argument('item_id', nargs='?', help='構成を表示するアイテムID')
+    parser.add_argument('--as-of', help='基準日（YYYY-MM-DD。省略時は当日）')
+    parser.add_argument('--revise', nargs=5, metavar=('PARENT', 'COMPONENT', 'USAGE', 'QUANTITY', 'DATE'),
+                        help='構成を改訂日から変更（QUANTITY に - を指定すると使用中止）')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db_path)
+    try:
+        if args.revise:
+            parent, component, usage_type, quantity, revised_on = args.revise
+            with conn:
+                revise_bom_line(conn, parent, component, usage_type,
+                                None if quantity == '-' else float(quantity), revised_on)
+            print(f"改訂しました: {parent} → {component} ({usage_type}) {revised_on} 〜")
+        if args.item_id:
+            as_of = resolve_as_of(args.as_of)
+            print(f"{args.item_id} の構成（{as_of} 時点）")
+            for component, usage_type, quantity, effective_from, effective_to in conn.execute(f"""
+                SELECT component_item_id, usage_type, quantity, effective_from, effective_to
+                FROM bom_components
+                WHERE parent_item_id = :item_id AND {effective_condition()}
+                ORDER BY usage_type, component_item_id
+            """, {'item_id': args.item_id, 'as_of': as_of}):
+                print(f"  {component:<20} {usage_type:<20} {quantity:>12,.4f} "
+                      f"({effective_from or '…'} 〜 {effective_to or '…'})")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+釣り糸製造BOM管理システム BOMグラフ（配列表現）
+
+bom_components を numpy 配列（辺リスト＝疎行列のCOO形式）として読み込み、
+低位レベルコード（items.low_level_code）の階層ごとに辺を並べ替えて保持します。
+所要量展開（mrp.py）・原価積み上げは、アイテム1件ずつの再帰ではなく
+「1階層分の辺をまとめた疎行列×ベクトル積」を階層数だけ繰り返して計算します。
+
+    BOM構成 p→c（数量 q、ロス率 r）の1単位あたり所要量: q × (1 + r)
+    LLCは全ての辺で「子 > 親」を満たすため、LLCの昇順に処理すると
+    あるアイテムを処理する時点でその親は全て処理済みになります。
+    BOMManager を通さずに書き込まれた構成行で保存済みのLLCがこれを満たさない場合は、
+    読み込んだ辺からLLCを計算し直して使います（保存済みの値は変更しません。循環時は ValueError）。
+
+読み込むのは基準日（省略時は当日）に有効な構成行のみです（bom_effectivity.py）。
+items にないアイテムを参照する構成行（外部キーを無効にした直接のSQLで作られた行）がある場合は、
+その行を示す ValueError とします（所要量・原価を欠けた構成で計算しないため）。
+"""
+
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from bom_effectivity import effective_condition, has_effectivity_columns, resolve_as_of
+
+
+def compute_levels(item_ids: List[str], parents: np.ndarray, children: np.ndarray) -> np.ndarray:
+    """
+    辺の配列からLLC（各アイテムに至る最長の経路の段数）を計算
+
+    親が全て確定したアイテムを1段ずつまとめて確定させるトポロジカル順の走査
+    （段数 × 辺の数に比例）
+
+    Args:
+        item_ids: アイテムID（配列の添字順。循環時のメッセージに使用）
+
+    Raises:
+        ValueError: 辺が循環している場合
+    """
+    item_count = len(item_ids)
+    levels = np.zeros(item_count, dtype=np.int64)
+    indegree = np.bincount(children, minlength=item_count)
+    resolved = np.zeros(item_count, dtype=bool)
+    pending = np.ones(len(parents), dtype=bool)
+    frontier = indegree == 0
+    level = 0
+    while frontier.any():
+        levels[frontier] = level
+        resolved |= frontier
+        edges = pending & frontier[parents]
+        pending &= ~edges
+        indegree -= np.bincount(children[edges], minlength=item_count)
+        frontier = (indegree == 0) & ~resolved
+        level += 1
+    if not resolved.all():
+        cyclic = sorted(item_ids[i] for i in np.nonzero(~resolved)[0].tolist())
+        raise ValueError(f"BOM循環参照のためLLCを計算できません: {', '.join(cyclic[:10])}")
+    return levels
+
+
+def orphan_lines_error(orphans: List[Tuple[str, str]]) -> ValueError:
+    """items にないアイテムを参照する構成行 [(親, 構成部品)] を示す ValueError"""
+    shown = ', '.join(f"{parent}→{component}" for parent, component in orphans[:10])
+    return ValueError(f"items に存在しないアイテムを参照するBOM構成行があります（{len(orphans)}行）: {shown}")
+
+
+class BomGraph:
+    """BOM構成の配列表現"""
+
+    def __init__(self, item_ids: List[str], levels: np.ndarray, parents: np.ndarray,
+                 children: np.ndarray, quantities: np.ndarray):
+        """
+        Args:
+            item_ids: アイテムID（配列の添字順）
+            levels: 各アイテムの低位レベルコード（辺と矛盾する場合は計算し直す）
+            parents / children: 各辺の親・子の添字
+            quantities: 各辺の親1単位あたり所要量（ロス率込み）
+        """
+        self.item_ids = item_ids
+        self.index = {item_id: i for i, item_id in enumerate(item_ids)}
+        # 保存済みのLLCが古い（子 <= 親 の辺がある）場合は辺から計算し直す
+        if len(parents) and not (levels[children] > levels[parents]).all():
+            levels = compute_levels(item_ids, parents, children)
+        self.levels = levels
+
+        # 親のLLC順に辺を並べ、階層ごとの範囲を求める
+        order = np.argsort(levels[parents], kind='stable')
+        self.parents = parents[order]
+        self.children = children[order]
+        self.quantities = quantities[order]
+        self.max_level = int(levels.max()) if len(levels) else 0
+        self.level_bounds = np.searchsorted(levels[self.parents], np.arange(self.max_level + 2))
+
+    @property
+    def item_count(self) -> int:
+        return len(self.item_ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.parents)
+
+    def level_edges(self, level: int) -> slice:
+        """親のLLCが level の辺の範囲"""
+        return slice(self.level_bounds[level], self.level_bounds[level + 1])
+
+    def to_vector(self, values: Dict[str, float]) -> np.ndarray:
+        """{アイテムID: 値} をアイテム添字順のベクトルに変換"""
+        vector = np.zeros(self.item_count)
+        unknown = [item_id for item_id in values if item_id not in self.index]
+        if unknown:
+            raise ValueError(f"アイテムが見つかりません: {', '.join(map(str, unknown[:10]))}")
+        for item_id, value in values.items():
+            vector[self.index[item_id]] += value
+        return vector
+
+    def nonzero_items(self, vector: np.ndarray) -> Iterable[int]:
+        """値が0でないアイテムの添字（LLC・アイテムID順）"""
+        indexes = np.nonzero(vector)[0]
+        return sorted(indexes.tolist(), key=lambda i: (self.levels[i], self.item_ids[i]))
+
+
+def load_bom_graph(conn: sqlite3.Connection, as_of: Optional[str] = None) -> BomGraph:
+    """
+    DBからBOMグラフを読み込む
+
+    Args:
+        as_of: 基準日（YYYY-MM-DD。省略時は当日）。その日に有効な構成行のみを辺にする
+
+    Raises:
+        ValueError: items にないアイテムを参照する構成行がある場合
+    """
+    item_ids = []
+    levels = []
+    for item_id, level in conn.execute("SELECT item_id, low_level_code FROM items ORDER BY item_id"):
+        item_ids.append(item_id)
+        levels.append(level)
+    index = {item_id: i for i, item_id in enumerate(item_ids)}
+
+    parents = []
+    children = []
+    quantities = []
+    orphans = []
+    effective = effective_condition() if has_effectivity_columns(conn) else "1"
+    for parent_item_id, component_item_id, quantity in conn.execute(f"""
+        SELECT parent_item_id, component_item_id, quantity * (1 + COALESCE(loss_ratio, 0))
+        FROM bom_components
+        WHERE {effective}
+    """, {'as_of': resolve_as_of(as_of)}):
+        if parent_item_id not in index or component_item_id not in index:
+            orphans.append((parent_item_id, component_item_id))
+            continue
+        parents.append(index[parent_item_id])
+        children.append(index[component_item_id])
+        quantities.append(quantity)
+    if orphans:
+        raise orphan_lines_error(orphans)
+
+    return BomGraph(item_ids, np.array(levels, dtype=np.int64),
+                    np.array(parents, dtype=np.int64), np.array(children, dtype=np.int64),
+                    np.array(quantities, dtype=np.float64))
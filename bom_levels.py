@@ -0,0 +1,158 @@
+"""
+釣り糸製造BOM管理システム 低位レベルコード（LLC）
+
+items.low_level_code に各アイテムが全BOMの中で現れる最も深い階層を保持します。
+完成品など親を持たないアイテムは0、構成部品は「全ての親のLLC + 1」の最大値です。
+所要量展開・原価積み上げはLLCの昇順（または降順）に1段ずつ処理すれば、
+あるアイテムを処理する時点でその親（または子）が全て処理済みになります。
+
+- 全件計算: bom_components を1回読み込み、入次数0のアイテムから1段ずつ確定させるトポロジカル順の走査
+            （bom_graph.compute_levels。段数 × BOM構成行数に比例し、1段分をnumpyでまとめて処理）
+- 差分更新: BOM構成 p→c の追加時に c 以下のLLCが増える部分だけを更新
+            （LLCは「全ての辺で 子 > 親」を満たすため、増加が親 p 自身まで届いた場合は循環参照）
+
+BOM構成の削除ではLLCを下げません（処理順としては正しいまま、最小値より深くなるだけです）。
+最小値に揃える場合は rebuild_low_level_codes() を実行してください。
+
+使い方:
+    python bom_levels.py bom_database_dev.db --rebuild   # 全件再計算
+    python bom_levels.py bom_database_dev.db --stats     # 階層ごとのアイテム数と整合性の確認
+"""
+
+import argparse
+import sqlite3
+from collections import deque
+from typing import Any, Dict
+
+import numpy as np
+
+from bom_graph import compute_levels
+
+# 差分更新でこの深さを超えた場合に、アイテム数を上限として循環を判定
+INITIAL_LEVEL_LIMIT = 64
+
+
+def compute_low_level_codes(conn: sqlite3.Connection) -> Dict[str, int]:
+    """
+    bom_components から全アイテムのLLCを計算（書き込みはしない）
+
+    Raises:
+        ValueError: BOMが循環している場合
+    """
+    index = {item_id: i for i, (item_id,) in enumerate(conn.execute("SELECT item_id FROM items"))}
+    parents = []
+    children = []
+    for parent_item_id, component_item_id in conn.execute(
+            "SELECT DISTINCT parent_item_id, component_item_id FROM bom_components"):
+        parents.append(index.setdefault(parent_item_id, len(index)))
+        children.append(index.setdefault(component_item_id, len(index)))
+
+    item_ids = list(index)
+    levels = compute_levels(item_ids, np.array(parents, dtype=np.int64), np.array(children, dtype=np.int64))
+    return dict(zip(item_ids, levels.tolist()))
+
+
+def rebuild_low_level_codes(conn: sqlite3.Connection) -> int:
+    """
+    全アイテムのLLCを再計算して保存
+
+    Returns:
+        int: LLCが変わったアイテム数
+    """
+    with conn:
+        return rebuild_low_level_code_rows(conn)
+
+
+def rebuild_low_level_code_rows(conn: sqlite3.Connection) -> int:
+    """rebuild_low_level_codes の本体（コミットしない。呼び出し側のトランザクション内で使用）"""
+    levels = compute_low_level_codes(conn)
+    current = dict(conn.execute("SELECT item_id, low_level_code FROM items"))
+    changed = [(level, item_id) for item_id, level in levels.items()
+               if item_id in current and current[item_id] != level]
+    conn.executemany("UPDATE items SET low_level_code = ? WHERE item_id = ?", changed)
+    return len(changed)
+
+
+def propagate_low_level_code(conn: sqlite3.Connection, parent_item_id: str,
+                             component_item_id: str) -> int:
+    """
+    BOM構成 parent→component の追加をLLCへ反映（コミットしない）
+
+    BOM構成の追加と同じトランザクション内で呼び出してください。
+    LLCが増えるアイテムだけを幅優先で辿るため、既に十分深いアイテムの下は読みません。
+
+    Returns:
+        int: LLCを更新したアイテム数
+
+    Raises:
+        ValueError: 追加した構成によりBOMが循環する場合、構成部品以下が既に循環している場合
+                    （呼び出し側でロールバックすること）
+    """
+    row = conn.execute("SELECT low_level_code FROM items WHERE item_id = ?",
+                       (parent_item_id,)).fetchone()
+    queue = deque([(component_item_id, (row[0] if row else 0) + 1)])
+    updated = {}
+    # 非巡回ならLLCはアイテム数未満。構成部品の下に既に循環がある場合（直接のSQLで作られた循環）は
+    # 親まで届かずにLLCが増え続けるため、上限を超えた時点で打ち切る（件数はこの深さを超えた場合のみ確認）
+    level_limit = INITIAL_LEVEL_LIMIT
+    while queue:
+        item_id, level = queue.popleft()
+        if item_id == parent_item_id:
+            raise ValueError(f"BOM循環参照: {component_item_id} は {parent_item_id} の上位に存在します")
+        if level > level_limit:
+            level_limit = max(level_limit, conn.execute("SELECT COUNT(*) FROM items").fetchone()[0])
+            if level > level_limit:
+                raise ValueError(f"BOM循環参照: {component_item_id} 以下に循環する構成が存在します")
+        current = updated.get(item_id)
+        if current is None:
+            row = conn.execute("SELECT low_level_code FROM items WHERE item_id = ?",
+                               (item_id,)).fetchone()
+            current = row[0] if row else 0
+        if current >= level:
+            continue
+        updated[item_id] = level
+        for (child_item_id,) in conn.execute(
+                "SELECT DISTINCT component_item_id FROM bom_components WHERE parent_item_id = ?",
+                (item_id,)):
+            queue.append((child_item_id, level + 1))
+
+    conn.executemany("UPDATE items SET low_level_code = ? WHERE item_id = ?",
+                     [(level, item_id) for item_id, level in updated.items()])
+    return len(updated)
+
+
+def low_level_code_stats(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """階層ごとのアイテム数と、保存値が再計算結果と一致しない（最小でない）アイテム数"""
+    levels = compute_low_level_codes(conn)
+    current = dict(conn.execute("SELECT item_id, low_level_code FROM items"))
+    return {
+        'items_by_level': dict(conn.execute("""
+            SELECT low_level_code, COUNT(*) FROM items GROUP BY low_level_code ORDER BY low_level_code
+        """)),
+        'stale_items': sum(1 for item_id, level in levels.items()
+                           if item_id in current and current[item_id] != level),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BOM低位レベルコード管理ツール')
+    parser.add_argument('db_path', help='BOMデータベースのパス')
+    parser.add_argument('--rebuild', action='store_true', help='全件再計算')
+    parser.add_argument('--stats', action='store_true', help='階層ごとの件数を表示')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db_path)
+    try:
+        if args.rebuild:
+            print(f"LLCを再計算しました（更新 {rebuild_low_level_codes(conn):,}件）")
+        if args.stats or not args.rebuild:
+            stats = low_level_code_stats(conn)
+            for level, count in stats['items_by_level'].items():
+                print(f"  LLC {level}: {count:,}件")
+            print(f"再計算と異なるアイテム: {stats['stale_items']:,}件")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
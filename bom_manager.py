@@ -6,40 +6,133 @@
 
 import sqlite3
 import json
-import os
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 
+from attribute_columns import attribute_expression
+from bom_closure import MAX_CLOSURE_DEPTH, is_closure_enabled
+from bom_effectivity import (all_lines_effective, effective_condition, insert_bom_line,
+                             resolve_as_of, revise_bom_line)
+from bom_levels import propagate_low_level_code
+from change_log import get_changes_since
+from cost_rollup import rollup_all_costs, rollup_costs_for, set_unit_cost, standard_costs_as_of
+from migrations import SCHEMA_FILE, apply_migrations
+from mrp import calculate_requirements, summarize_materials
+from profiler import connect as connect_sqlite
+from snapshots import compute_data_version, connect_read_only
+from uom import MASS_UNIT, set_unit_conversion
+from what_if import simulate_substitutions
+
+# 環境別に設定できるPRAGMA（config.py の SQLITE_PRAGMAS）
+SQLITE_PRAGMA_NAMES = ('busy_timeout', 'journal_mode', 'synchronous',
+                       'cache_size', 'mmap_size', 'temp_store')
+# DBファイルに保存されるPRAGMA（初期化時のみ設定し、接続ごとには再設定しない）
+PERSISTENT_PRAGMAS = ('journal_mode',)
+
+# add_item で items のカラムに保存する属性（それ以外は additional_attributes のJSON）
+ITEM_ATTRIBUTE_COLUMNS = ('material_type', 'denier', 'ps_ratio', 'twist_type',
+                          'yarn_composition', 'series_name', 'length_m', 'color', 'knit_type',
+                          'yarn_type', 'raw_num', 'production_num', 'core_yarn_type', 'spool_type',
+                          'braid_structure', 'has_core')
+
+# search_items の条件に使えるカラム（一致・複数値は IN）
+SEARCH_EQUALITY_FIELDS = ('item_type', 'unit_of_measure', 'material_type', 'twist_type',
+                          'yarn_composition', 'series_name', 'color', 'knit_type', 'yarn_type',
+                          'core_yarn_type', 'spool_type', 'oracle_sync_status', 'low_level_code')
+# search_items の条件に使えるカラム（範囲 {'min': 下限, 'max': 上限}、両端を含む）
+SEARCH_RANGE_FIELDS = ('denier', 'ps_ratio', 'length_m', 'raw_num', 'production_num',
+                       'low_level_code')
+# search_items が既定で返すファセット（該当アイテムの値ごとの件数）
+SEARCH_FACET_FIELDS = ('item_type', 'material_type', 'knit_type', 'series_name', 'twist_type')
+
+
+def apply_sqlite_pragmas(conn: sqlite3.Connection, pragmas: Dict[str, Any],
+                         include_persistent: bool = False):
+    """
+    接続にPRAGMA設定を適用します
+    
+    Args:
+        conn: SQLite接続
+        pragmas: PRAGMA名と値の辞書
+        include_persistent: journal_mode などDBファイルに保存される設定も適用するか
+    """
+    # ロック待ちが他の設定に影響しないよう busy_timeout を先に適用
+    for name in sorted(pragmas, key=lambda n: n != 'busy_timeout'):
+        if name not in SQLITE_PRAGMA_NAMES:
+            raise ValueError(f"未対応のPRAGMA: {name}")
+        if name in PERSISTENT_PRAGMAS and not include_persistent:
+            continue
+        value = str(pragmas[name])
+        if not value.lstrip('-').replace('_', '').isalnum():
+            raise ValueError(f"不正なPRAGMA値: {name} = {value}")
+        conn.execute(f"PRAGMA {name} = {value}").fetchall()
+
+
+def read_sqlite_pragmas(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """接続で有効なPRAGMA値を取得します"""
+    return {name: conn.execute(f"PRAGMA {name}").fetchone()[0] for name in SQLITE_PRAGMA_NAMES}
+
 
 class BOMManager:
     """BOM管理システムのメインクラス"""
     
-    def __init__(self, db_path: str = "bom_database.db"):
+    def __init__(self, db_path: str = "bom_database.db",
+                 pragmas: Optional[Dict[str, Any]] = None,
+                 schema_file: str = SCHEMA_FILE, read_only: bool = False):
         """
         BOMManagerを初期化します
         
         Args:
             db_path: SQLiteデータベースファイルのパス
+            pragmas: 接続ごとに適用するPRAGMA設定（config.py の SQLITE_PRAGMAS）
+            schema_file: 新規DBの作成・マイグレーション後に適用するスキーマファイル
+            read_only: スナップショット（snapshots.py）を読み取り専用で開く場合True
+                       （スキーマの作成・移行は行わず、書き込み系のメソッドは失敗する）
         """
         self.db_path = db_path
-        self.init_database()
+        self.pragmas = dict(pragmas or {})
+        self.schema_file = schema_file
+        self.read_only = read_only
+        if not read_only:
+            self.init_database()
+    
+    def connect(self) -> sqlite3.Connection:
+        """
+        PRAGMA設定を適用したSQLite接続を取得します（読み取り専用の場合は読み取り専用の接続）
+
+        呼び出し側で close() してください。
+        """
+        if self.read_only:
+            conn = connect_read_only(self.db_path)
+        else:
+            conn = connect_sqlite(self.db_path)
+        apply_sqlite_pragmas(conn, self.pragmas)
+        return conn
+    
+    def get_sqlite_pragmas(self) -> Dict[str, Any]:
+        """現在の接続で有効なPRAGMA値を取得します"""
+        conn = self.connect()
+        try:
+            return read_sqlite_pragmas(conn)
+        finally:
+            conn.close()
+    
+    def get_data_version(self) -> str:
+        """データバージョン（スナップショットとの比較用）を取得します"""
+        conn = self.connect()
+        try:
+            return compute_data_version(conn)
+        finally:
+            conn.close()
     
     def init_database(self):
         """データベースを初期化し、スキーマを作成します"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
+            apply_sqlite_pragmas(conn, self.pragmas, include_persistent=True)
             conn.execute("PRAGMA foreign_keys = ON")  # 外部キー制約を有効化
             
-            # スキーマファイルが存在する場合は読み込み
-            if os.path.exists("schema.sql"):
-                try:
-                    with open("schema.sql", "r", encoding="utf-8") as f:
-                        schema = f.read()
-                        # 複数のSQL文を実行
-                        conn.executescript(schema)
-                except sqlite3.OperationalError as e:
-                    # テーブルやインデックスが既に存在する場合は無視
-                    if "already exists" not in str(e):
-                        raise e
+            # スキーマの作成・未適用マイグレーションの適用
+            apply_migrations(conn, schema_file=self.schema_file)
     
     def add_item(self, item_id: str, item_name: str, item_type: str, 
                  unit_of_measure: str, **attributes) -> bool:
@@ -57,35 +150,22 @@ class BOMManager:
             bool: 追加に成功した場合True
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.connect() as conn:
                 conn.execute("PRAGMA foreign_keys = ON")
                 
-                # 標準属性を取得
-                material_type = attributes.get('material_type')
-                denier = attributes.get('denier')
-                ps_ratio = attributes.get('ps_ratio')
-                braid_structure = attributes.get('braid_structure')
-                has_core = attributes.get('has_core')
-                color = attributes.get('color')
-                length_m = attributes.get('length_m')
-                twist_type = attributes.get('twist_type')
-                
-                # 追加属性をJSONで保存
+                # 標準属性はカラムに、それ以外は追加属性としてJSONで保存
+                columns = [name for name in ITEM_ATTRIBUTE_COLUMNS if attributes.get(name) is not None]
                 additional_attrs = {k: v for k, v in attributes.items() 
-                                  if k not in ['material_type', 'denier', 'ps_ratio', 
-                                             'braid_structure', 'has_core', 'color', 
-                                             'length_m', 'twist_type']}
+                                  if k not in ITEM_ATTRIBUTE_COLUMNS}
                 additional_json = json.dumps(additional_attrs, ensure_ascii=False) if additional_attrs else None
                 
-                conn.execute("""
-                    INSERT INTO items (
-                        item_id, item_name, item_type, unit_of_measure,
-                        material_type, denier, ps_ratio, braid_structure,
-                        has_core, color, length_m, twist_type, additional_attributes
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (item_id, item_name, item_type, unit_of_measure,
-                      material_type, denier, ps_ratio, braid_structure,
-                      has_core, color, length_m, twist_type, additional_json))
+                column_list = ', '.join(['item_id', 'item_name', 'item_type', 'unit_of_measure']
+                                        + columns + ['additional_attributes'])
+                placeholders = ', '.join('?' * (len(columns) + 5))
+                conn.execute(f"""
+                    INSERT INTO items ({column_list}) VALUES ({placeholders})
+                """, [item_id, item_name, item_type, unit_of_measure]
+                     + [attributes[name] for name in columns] + [additional_json])
                 
                 return True
         except sqlite3.IntegrityError as e:
@@ -93,7 +173,9 @@ class BOMManager:
             return False
     
     def add_bom_component(self, parent_item_id: str, component_item_id: str, 
-                         quantity: float, usage_type: str) -> bool:
+                         quantity: float, usage_type: str,
+                         effective_from: Optional[str] = None,
+                         effective_to: Optional[str] = None) -> bool:
         """
         BOM構成を追加します
         
@@ -102,24 +184,54 @@ class BOMManager:
             component_item_id: 構成部品アイテムID
             quantity: 数量
             usage_type: 用途タイプ
+            effective_from: 有効期間の開始日（YYYY-MM-DD。省略時は制限なし）
+            effective_to: 有効期間の終了日（この日は含まない。省略時は制限なし）
         
         Returns:
-            bool: 追加に成功した場合True
+            bool: 追加に成功した場合True（循環する構成・有効期間が既存の行と重なる構成は追加しない）
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.connect() as conn:
                 conn.execute("PRAGMA foreign_keys = ON")
                 
-                conn.execute("""
-                    INSERT INTO bom_components (parent_item_id, component_item_id, quantity, usage_type)
-                    VALUES (?, ?, ?, ?)
-                """, (parent_item_id, component_item_id, quantity, usage_type))
+                insert_bom_line(conn, parent_item_id, component_item_id, quantity, usage_type,
+                                effective_from, effective_to)
+                
+                # 構成部品以下の低位レベルコードを更新（循環時は ValueError でロールバック）
+                propagate_low_level_code(conn, parent_item_id, component_item_id)
+                # 親以上の標準原価を再計算
+                rollup_costs_for(conn, [parent_item_id])
                 
                 return True
-        except sqlite3.IntegrityError as e:
+        except (sqlite3.IntegrityError, ValueError) as e:
             print(f"BOM構成追加エラー: {e}")
             return False
     
+    def revise_bom_component(self, parent_item_id: str, component_item_id: str, usage_type: str,
+                             quantity: Optional[float], effective_from: Optional[str] = None) -> bool:
+        """
+        BOM構成を改訂日から変更します（改訂日より前の構成は履歴として残します）
+        
+        Args:
+            quantity: 改訂後の数量（None の場合は改訂日以降この構成部品を使わない）
+            effective_from: 改訂日（YYYY-MM-DD。省略時は当日）
+        
+        Returns:
+            bool: 改訂に成功した場合True
+        """
+        try:
+            with self.connect() as conn:
+                conn.execute("PRAGMA foreign_keys = ON")
+                
+                # 低位レベルコード・標準原価も更新（循環時は ValueError でロールバック）
+                revise_bom_line(conn, parent_item_id, component_item_id, usage_type,
+                                quantity, effective_from)
+                
+                return True
+        except (sqlite3.IntegrityError, ValueError) as e:
+            print(f"BOM構成改訂エラー: {e}")
+            return False
+    
     def get_item(self, item_id: str) -> Optional[Dict[str, Any]]:
         """
         指定されたアイテムの情報を取得します
@@ -130,7 +242,7 @@ class BOMManager:
         Returns:
             Dict: アイテム情報、存在しない場合はNone
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             conn.row_factory = sqlite3.Row
             cursor = conn.execute("SELECT * FROM items WHERE item_id = ?", (item_id,))
             row = cursor.fetchone()
@@ -143,28 +255,32 @@ class BOMManager:
                 return item
             return None
     
-    def get_direct_components(self, parent_item_id: str) -> List[Dict[str, Any]]:
+    def get_direct_components(self, parent_item_id: str,
+                              as_of: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         指定されたアイテムの直下の構成部品一覧を取得します
         
         Args:
             parent_item_id: 親アイテムID
+            as_of: 基準日（YYYY-MM-DD。省略時は当日）
         
         Returns:
-            List[Dict]: 構成部品情報のリスト
+            List[Dict]: 構成部品情報のリスト（基準日に有効な構成のみ）
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             conn.row_factory = sqlite3.Row
-            cursor = conn.execute("""
+            cursor = conn.execute(f"""
                 SELECT 
                     bc.quantity,
                     bc.usage_type,
+                    bc.effective_from,
+                    bc.effective_to,
                     i.*
                 FROM bom_components bc
                 JOIN items i ON bc.component_item_id = i.item_id
-                WHERE bc.parent_item_id = ?
+                WHERE bc.parent_item_id = :parent_item_id AND {effective_condition('bc')}
                 ORDER BY bc.usage_type, i.item_name
-            """, (parent_item_id,))
+            """, {'parent_item_id': parent_item_id, 'as_of': resolve_as_of(as_of)})
             
             components = []
             for row in cursor.fetchall():
@@ -176,17 +292,21 @@ class BOMManager:
             
             return components
     
-    def get_multi_level_bom(self, parent_item_id: str, max_depth: int = 10) -> Dict[str, Any]:
+    def get_multi_level_bom(self, parent_item_id: str, max_depth: int = 10,
+                            as_of: Optional[str] = None) -> Dict[str, Any]:
         """
         多段階BOMを展開して取得します
         
         Args:
             parent_item_id: 親アイテムID
             max_depth: 最大展開深度
+            as_of: 基準日（YYYY-MM-DD。省略時は当日。過去の製造日を指定すると当時の構成）
         
         Returns:
             Dict: 多段階BOM構造
         """
+        as_of = resolve_as_of(as_of)
+        
         def expand_bom(item_id: str, current_depth: int = 0) -> Dict[str, Any]:
             if current_depth >= max_depth:
                 return {"item": self.get_item(item_id), "components": []}
@@ -196,7 +316,7 @@ class BOMManager:
                 return None
             
             components = []
-            direct_components = self.get_direct_components(item_id)
+            direct_components = self.get_direct_components(item_id, as_of)
             
             for component in direct_components:
                 component_bom = expand_bom(component['item_id'], current_depth + 1)
@@ -216,6 +336,103 @@ class BOMManager:
         
         return expand_bom(parent_item_id)
     
+    def get_all_descendants(self, item_id: str, max_depth: int = MAX_CLOSURE_DEPTH,
+                            as_of: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        指定されたアイテムの全子孫（全階層の構成部品）を取得します
+        
+        閉包テーブル（bom_closure）が有効な場合は索引検索1回、
+        無効な場合は再帰クエリで同じ結果を求めます。
+        閉包テーブルは全期間の構成を保持するため、基準日に無効な構成行がある場合は再帰クエリを使います。
+        
+        Args:
+            item_id: 親アイテムID
+            max_depth: 最大展開深度
+            as_of: 基準日（YYYY-MM-DD。省略時は当日）
+        
+        Returns:
+            List[Dict]: 子孫アイテム情報（min_depth, max_depth, total_quantity, path_count付き）
+        """
+        return self._query_closure(item_id, max_depth, direction='descendants', as_of=as_of)
+    
+    def get_where_used(self, item_id: str, item_type: Optional[str] = None,
+                       max_depth: int = MAX_CLOSURE_DEPTH,
+                       as_of: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        指定されたアイテムを使用している全上位アイテム（逆展開）を取得します
+        
+        Args:
+            item_id: 構成部品アイテムID
+            item_type: 上位アイテムのタイプで絞り込み（例: '完成品'）
+            max_depth: 最大展開深度
+            as_of: 基準日（YYYY-MM-DD。省略時は当日）
+        
+        Returns:
+            List[Dict]: 上位アイテム情報（total_quantity は上位1単位あたりの所要量）
+        """
+        return self._query_closure(item_id, max_depth, direction='ancestors', item_type=item_type,
+                                   as_of=as_of)
+    
+    def _query_closure(self, item_id: str, max_depth: int, direction: str,
+                       item_type: Optional[str] = None,
+                       as_of: Optional[str] = None) -> List[Dict[str, Any]]:
+        """閉包テーブルまたは再帰クエリで祖先・子孫を集計（基準日に有効な構成のみ）"""
+        as_of = resolve_as_of(as_of)
+        if direction == 'descendants':
+            key_column, related_column = 'ancestor', 'descendant'
+            edge_from, edge_to = 'parent_item_id', 'component_item_id'
+        else:
+            key_column, related_column = 'descendant', 'ancestor'
+            edge_from, edge_to = 'component_item_id', 'parent_item_id'
+        
+        with self.connect() as conn:
+            conn.row_factory = sqlite3.Row
+            
+            if is_closure_enabled(conn) and all_lines_effective(conn, as_of):
+                paths_sql = f"""
+                    SELECT {related_column} AS related_id, depth, path_qty, path_count
+                    FROM bom_closure
+                    WHERE {key_column} = :item_id AND depth <= :max_depth
+                """
+            else:
+                paths_sql = f"""
+                    WITH RECURSIVE walk(related_id, depth, path_qty) AS (
+                        SELECT {edge_to}, 1, quantity
+                        FROM bom_components WHERE {edge_from} = :item_id AND {effective_condition()}
+                        UNION ALL
+                        SELECT bc.{edge_to}, w.depth + 1, w.path_qty * bc.quantity
+                        FROM walk w
+                        JOIN bom_components bc ON bc.{edge_from} = w.related_id
+                        WHERE w.depth < :max_depth AND {effective_condition('bc')}
+                    )
+                    SELECT related_id, depth, path_qty, 1 AS path_count FROM walk
+                """
+            
+            type_filter = "WHERE i.item_type = :item_type" if item_type else ""
+            cursor = conn.execute(f"""
+                WITH paths AS ({paths_sql})
+                SELECT 
+                    i.*,
+                    MIN(p.depth) AS min_depth,
+                    MAX(p.depth) AS max_depth,
+                    SUM(p.path_qty) AS total_quantity,
+                    SUM(p.path_count) AS path_count
+                FROM paths p
+                JOIN items i ON i.item_id = p.related_id
+                {type_filter}
+                GROUP BY i.item_id
+                ORDER BY min_depth, i.item_type, i.item_name
+            """, {'item_id': item_id, 'max_depth': max_depth, 'item_type': item_type, 'as_of': as_of})
+            
+            results = []
+            for row in cursor.fetchall():
+                result = dict(row)
+                if result['additional_attributes']:
+                    result['additional_attributes'] = json.loads(result['additional_attributes'])
+                results.append(result)
+            
+            return results
+    
     def get_all_items(self) -> List[Dict[str, Any]]:
         """
         すべてのアイテム一覧を取得します
@@ -223,7 +440,7 @@ class BOMManager:
         Returns:
             List[Dict]: アイテム情報のリスト
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             conn.row_factory = sqlite3.Row
             cursor = conn.execute("SELECT * FROM items ORDER BY item_type, item_name")
             
@@ -246,7 +463,7 @@ class BOMManager:
         Returns:
             List[Dict]: アイテム情報のリスト
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connect() as conn:
             conn.row_factory = sqlite3.Row
             cursor = conn.execute(
                 "SELECT * FROM items WHERE item_type = ? ORDER BY item_name", 
@@ -262,6 +479,326 @@ class BOMManager:
             
             return items
     
+    def search_items(self, filters: Optional[Dict[str, Any]] = None,
+                     attributes: Optional[Dict[str, Any]] = None,
+                     facets: Tuple[str, ...] = SEARCH_FACET_FIELDS,
+                     limit: Optional[int] = None, offset: int = 0) -> Dict[str, Any]:
+        """
+        属性条件でアイテムを検索し、該当アイテムのファセット件数を返します
+        
+        条件はすべてパラメータ化したSQLの WHERE 句に変換され、
+        種別・材質・編み方・シリーズなどの索引で絞り込みます。
+        
+        Args:
+            filters: {カラム: 値} 一致、{カラム: [値, ...]} いずれか、
+                     {カラム: {'min': 下限, 'max': 上限}} 範囲（SEARCH_RANGE_FIELDS のみ）
+            attributes: 追加属性（additional_attributes のキー）の一致条件
+            facets: 件数を集計するカラム（SEARCH_EQUALITY_FIELDS から選択）
+            limit: 返すアイテムの最大件数（Noneの場合は全件）
+            offset: 読み飛ばす件数
+        
+        Returns:
+            {'total': 該当件数, 'items': [アイテム], 'facets': {カラム: {値: 件数}}}
+        
+        Raises:
+            ValueError: 未対応のカラム・条件の場合
+        
+        使用例:
+            manager.search_items({'item_type': 'PS糸', 'denier': {'min': 100, 'max': 200},
+                                  'twist_type': 'S'})
+        """
+        conditions = []
+        params = []
+        for field, value in (filters or {}).items():
+            if isinstance(value, dict):
+                if field not in SEARCH_RANGE_FIELDS:
+                    raise ValueError(f"範囲条件に対応していないカラム: {field}")
+                unknown = set(value) - {'min', 'max'}
+                if unknown:
+                    raise ValueError(f"範囲条件は min / max で指定してください: {field} {sorted(unknown)}")
+                if value.get('min') is not None:
+                    conditions.append(f"{field} >= ?")
+                    params.append(value['min'])
+                if value.get('max') is not None:
+                    conditions.append(f"{field} <= ?")
+                    params.append(value['max'])
+            elif field not in SEARCH_EQUALITY_FIELDS:
+                raise ValueError(f"検索条件に対応していないカラム: {field}")
+            elif isinstance(value, (list, tuple, set)):
+                values = list(value)
+                conditions.append(f"{field} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+            else:
+                conditions.append(f"{field} = ?")
+                params.append(value)
+        
+        for field in facets:
+            if field not in SEARCH_EQUALITY_FIELDS:
+                raise ValueError(f"ファセットに対応していないカラム: {field}")
+        
+        with self.connect() as conn:
+            conn.row_factory = sqlite3.Row
+            for key, value in (attributes or {}).items():
+                conditions.append(f"{attribute_expression(conn, key)} = ?")
+                params.append(value)
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            
+            total = conn.execute(f"SELECT COUNT(*) FROM items {where}", params).fetchone()[0]
+            
+            page = ""
+            page_params = []
+            if limit is not None:
+                page = "LIMIT ? OFFSET ?"
+                page_params = [limit, offset]
+            cursor = conn.execute(
+                f"SELECT * FROM items {where} ORDER BY item_type, item_name {page}",
+                params + page_params
+            )
+            
+            items = []
+            for row in cursor.fetchall():
+                item = dict(row)
+                if item['additional_attributes']:
+                    item['additional_attributes'] = json.loads(item['additional_attributes'])
+                items.append(item)
+            
+            facet_counts = {}
+            for field in facets:
+                facet_counts[field] = {
+                    value: count for value, count in conn.execute(f"""
+                        SELECT {field}, COUNT(*) FROM items {where}
+                        GROUP BY {field} ORDER BY COUNT(*) DESC, {field}
+                    """, params) if value is not None
+                }
+            
+            return {'total': total, 'items': items, 'facets': facet_counts}
+    
+    def calculate_requirements(self, demand: Dict[str, float],
+                               on_hand: Optional[Dict[str, float]] = None,
+                               unit: Optional[str] = None,
+                               as_of: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        需要（完成品ごとの数量）を全階層に展開し、アイテムごとの所要量を取得します
+        
+        Args:
+            demand: {アイテムID: 需要数量}（複数受注は mrp.aggregate_orders で合計）
+            on_hand: {アイテムID: 在庫数量}（引当後の正味所要量を下位へ展開）
+            unit: 換算先の単位（例: 'KG'。converted_* に換算値を追加）
+            as_of: BOM構成の基準日（YYYY-MM-DD。製造ロットの製造日を指定すると当時の使用量）
+        
+        Returns:
+            List[Dict]: 所要量のあるアイテム（LLC順、gross_requirement / allocated / net_requirement）
+        """
+        conn = self.connect()
+        try:
+            return calculate_requirements(conn, demand, on_hand, unit=unit, as_of=as_of)
+        finally:
+            conn.close()
+    
+    def get_material_summary(self, demand: Dict[str, float],
+                             on_hand: Optional[Dict[str, float]] = None,
+                             unit: str = MASS_UNIT,
+                             as_of: Optional[str] = None) -> Dict[str, Any]:
+        """
+        需要に対する最下位の原材料の正味所要量を、指定単位（既定: KG）に換算して集計します
+        （as_of: BOM構成の基準日）
+        
+        Returns:
+            Dict: unit / total / materials / unconvertible（換算できなかったアイテムID）
+        """
+        conn = self.connect()
+        try:
+            return summarize_materials(conn, demand, on_hand, unit=unit, as_of=as_of)
+        finally:
+            conn.close()
+    
+    def simulate_substitutions(self, substitutions: List[Dict[str, Any]],
+                               demand: Optional[Dict[str, float]] = None,
+                               on_hand: Optional[Dict[str, float]] = None,
+                               unit: Optional[str] = None,
+                               as_of: Optional[str] = None) -> Dict[str, Any]:
+        """
+        代替品（構成部品 X → Y）を適用した場合の所要量・標準原価・逆展開の変化を取得します
+        （bom_components には書き込みません）
+        
+        Args:
+            substitutions: [{'from': X, 'to': Y, 'ratio': 数量倍率, 'parents': [対象の親]}]
+            demand: {アイテムID: 需要数量}（省略時は影響を受ける最上位アイテムを1単位ずつ）
+            on_hand: {アイテムID: 在庫数量}
+            unit: 所要量の換算先の単位（例: 'KG'）
+            as_of: BOM構成の基準日（YYYY-MM-DD。省略時は当日）
+        
+        Returns:
+            Dict: requirements / costs（変化したアイテムの before / after / delta）、
+                  affected_items、where_used（置き換え前後の上位アイテム）
+        """
+        conn = self.connect()
+        try:
+            return simulate_substitutions(conn, substitutions, demand, on_hand, unit=unit, as_of=as_of)
+        finally:
+            conn.close()
+    
+    def set_unit_conversion(self, item_id: str, to_unit: str, factor: float) -> bool:
+        """
+        アイテム別の単位換算係数を登録します（item_id の1単位 = factor to_unit）
+        
+        Returns:
+            bool: 登録に成功した場合True
+        """
+        conn = self.connect()
+        try:
+            conn.execute("PRAGMA foreign_keys = ON")
+            set_unit_conversion(conn, item_id, to_unit, factor)
+            return True
+        except (sqlite3.IntegrityError, ValueError) as e:
+            print(f"単位換算係数の登録エラー: {e}")
+            return False
+        finally:
+            conn.close()
+    
+    def set_unit_cost(self, item_id: str, unit_cost: float) -> List[str]:
+        """
+        アイテムの単価を設定し、そのアイテムと全祖先の標準原価を再計算します
+        
+        Args:
+            item_id: アイテムID
+            unit_cost: 単価（原材料は購入単価、中間品・完成品は自工程の加工費）
+        
+        Returns:
+            List[str]: 標準原価を再計算したアイテムID
+        """
+        conn = self.connect()
+        try:
+            conn.execute("PRAGMA foreign_keys = ON")
+            return set_unit_cost(conn, item_id, unit_cost)
+        finally:
+            conn.close()
+    
+    def rollup_costs(self) -> int:
+        """
+        全アイテムの標準原価を積み上げ直します
+        
+        Returns:
+            int: 標準原価が変わったアイテム数
+        """
+        conn = self.connect()
+        try:
+            return rollup_all_costs(conn)
+        finally:
+            conn.close()
+    
+    def get_item_cost(self, item_id: str, as_of: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        アイテムの単価・標準原価と、直下構成部品ごとの原価内訳を取得します
+        
+        Args:
+            as_of: BOM構成の基準日（省略時は保存済みの標準原価と当日の構成。
+                   指定時はその日の構成で標準原価を計算し直す。単価は現在の値）
+        
+        Returns:
+            Optional[Dict]: unit_cost / standard_cost / components（アイテムが無い場合None）
+        """
+        conn = self.connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            recomputed = standard_costs_as_of(conn, as_of) if as_of else None
+            row = conn.execute("""
+                SELECT i.item_id, i.item_name, i.unit_of_measure,
+                       COALESCE(c.unit_cost, 0) AS unit_cost,
+                       COALESCE(c.standard_cost, c.unit_cost, 0) AS standard_cost,
+                       c.updated_at, c.rolled_at
+                FROM items i LEFT JOIN item_costs c ON c.item_id = i.item_id
+                WHERE i.item_id = ?
+            """, (item_id,)).fetchone()
+            if row is None:
+                return None
+            cost = dict(row)
+            cost['components'] = [dict(component) for component in conn.execute(f"""
+                SELECT bc.component_item_id, bc.usage_type,
+                       bc.quantity * (1 + COALESCE(bc.loss_ratio, 0)) AS quantity,
+                       COALESCE(c.standard_cost, c.unit_cost, 0) AS standard_cost,
+                       bc.quantity * (1 + COALESCE(bc.loss_ratio, 0))
+                           * COALESCE(c.standard_cost, c.unit_cost, 0) AS extended_cost
+                FROM bom_components bc
+                LEFT JOIN item_costs c ON c.item_id = bc.component_item_id
+                WHERE bc.parent_item_id = :item_id AND {effective_condition('bc')}
+                ORDER BY bc.usage_type, bc.component_item_id
+            """, {'item_id': item_id, 'as_of': resolve_as_of(as_of)})]
+            if recomputed is not None:
+                cost['as_of'] = resolve_as_of(as_of)
+                cost['standard_cost'] = recomputed[item_id]
+                for component in cost['components']:
+                    component['standard_cost'] = recomputed[component['component_item_id']]
+                    component['extended_cost'] = component['quantity'] * component['standard_cost']
+            return cost
+        finally:
+            conn.close()
+    
+    def get_all_costs(self) -> List[Dict[str, Any]]:
+        """全アイテムの単価・標準原価（種別・名称順）"""
+        conn = self.connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            return [dict(row) for row in conn.execute("""
+                SELECT i.item_id, i.item_name, i.item_type, i.unit_of_measure,
+                       COALESCE(c.unit_cost, 0) AS unit_cost,
+                       COALESCE(c.standard_cost, c.unit_cost, 0) AS standard_cost
+                FROM items i LEFT JOIN item_costs c ON c.item_id = i.item_id
+                ORDER BY i.item_type, i.item_name
+            """)]
+        finally:
+            conn.close()
+    
+    def get_changes_since(self, since_seq: int = 0, limit: int = 1000,
+                          tables: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        items・bom_components の変更履歴を通し番号順に取得します（change_log.py）
+        
+        Args:
+            since_seq: 前回読み終えた通し番号（初回は0）
+            limit: 最大件数
+            tables: 対象テーブル（省略時は全て）
+        
+        Returns:
+            Dict: changes / next_seq / latest_seq / has_more / reset_required
+        """
+        conn = self.connect()
+        try:
+            return get_changes_since(conn, since_seq, limit, tables)
+        finally:
+            conn.close()
+    
+    def get_items_by_attribute(self, key: str, value: Any) -> List[Dict[str, Any]]:
+        """
+        追加属性（additional_attributes のキー）が一致するアイテム一覧を取得します
+        
+        JSON_ATTRIBUTE_COLUMNS で生成カラムに昇格したキーは索引検索、
+        それ以外は json_extract によるSQL内での評価になります。
+        
+        Args:
+            key: 追加属性のキー
+            value: 値
+        
+        Returns:
+            List[Dict]: アイテム情報のリスト
+        """
+        with self.connect() as conn:
+            conn.row_factory = sqlite3.Row
+            expression = attribute_expression(conn, key)
+            cursor = conn.execute(
+                f"SELECT * FROM items WHERE {expression} = ? ORDER BY item_type, item_name",
+                (value,)
+            )
+            
+            items = []
+            for row in cursor.fetchall():
+                item = dict(row)
+                if item['additional_attributes']:
+                    item['additional_attributes'] = json.loads(item['additional_attributes'])
+                items.append(item)
+            
+            return items
+    
     def print_bom_tree(self, parent_item_id: str, max_depth: int = 10):
         """
         BOM構造をツリー形式で表示します
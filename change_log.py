@@ -0,0 +1,176 @@
+"""
+釣り糸製造BOM管理システム 変更履歴（変更データキャプチャ）
+
+items・bom_components の追加・更新・削除をトリガー（schema_enhanced.sql）で change_log に追記し、
+通し番号 seq 以降の変更を読み出せるようにします。キャッシュ・スナップショット・外部システムへの同期は
+全件を読み直さず、前回読んだ seq 以降の変更だけを反映できます。
+
+- 1行 = 1行分の変更（table_name, row_key, item_id, operation, changed_columns）
+- item_id は影響するアイテム（items はそのアイテム、BOM構成行は親アイテム）。
+  アイテムIDの変更・構成行の親の変更は、旧アイテムの DELETE と新アイテムの INSERT として記録します
+- 更新日時・低位レベルコード・Oracle同期日時のみの更新（自動計算・同期の記録）は記録しません
+- 読み出し側は latest_seq まで読み終えたら、その値を次回の since に使います
+- 一括投入で変更を記録しなかった場合は invalidate_change_log で全件の読み直しを求めます
+- 古い変更は prune_change_log で削除できます。削除済みの範囲を要求された場合
+  （または別のDBに置き換わり since が最新より大きい場合）は reset_required を返すため、全件を読み直してください
+
+使い方:
+    python change_log.py bom_database_dev.db --since 0 --limit 100
+    python change_log.py bom_database_dev.db --prune-days 90
+"""
+
+import argparse
+import json
+import sqlite3
+from typing import Any, Dict, Iterable, Optional
+
+# 変更を記録するテーブル
+CHANGE_LOG_TABLES = ('items', 'bom_components')
+
+# 1回に読み出す最大件数
+MAX_CHANGE_BATCH = 5000
+
+# 変更を記録するトリガー（schema_enhanced.sql で定義）
+CHANGE_LOG_TRIGGER_NAMES = (
+    'change_log_items_insert',
+    'change_log_items_update',
+    'change_log_items_delete',
+    'change_log_bom_insert',
+    'change_log_bom_update',
+    'change_log_bom_delete',
+)
+
+
+def latest_change_seq(conn: sqlite3.Connection) -> int:
+    """最後に記録した変更の通し番号（削除済みの範囲を含む。変更がなければ0）"""
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+    return row[0] if row else 0
+
+
+def invalidate_change_log(conn: sqlite3.Connection):
+    """
+    記録しなかった変更（トリガーを停止した一括投入など）の後、読み出し側に全件の読み直しを求める（コミットしない）
+
+    変更履歴を全て削除して通し番号を1つ進めるため、以降の get_changes_since は
+    最新の通し番号より前からの読み出しに reset_required を返します。
+    """
+    conn.execute("DELETE FROM change_log")
+    if conn.execute("UPDATE sqlite_sequence SET seq = seq + 1 WHERE name = 'change_log'").rowcount == 0:
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('change_log', 1)")
+
+
+def get_changes_since(conn: sqlite3.Connection, since_seq: int = 0, limit: int = 1000,
+                      tables: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    since_seq より後の変更を通し番号順に取得
+
+    Args:
+        since_seq: 前回読み終えた通し番号（初回は0）
+        limit: 最大件数（1〜MAX_CHANGE_BATCH）
+        tables: 対象テーブル（省略時は全て）
+
+    Returns:
+        {'changes': [{'seq', 'table_name', 'row_key', 'item_id', 'operation', 'changed_columns', 'changed_at'}],
+         'next_seq': 次回の since_seq, 'latest_seq', 'has_more', 'reset_required'}
+
+    Raises:
+        ValueError: 引数が不正な場合
+    """
+    if since_seq < 0:
+        raise ValueError(f"since は0以上で指定してください: {since_seq}")
+    if not 1 <= limit <= MAX_CHANGE_BATCH:
+        raise ValueError(f"limit は1〜{MAX_CHANGE_BATCH}で指定してください: {limit}")
+    tables = list(tables or CHANGE_LOG_TABLES)
+    unknown = [table for table in tables if table not in CHANGE_LOG_TABLES]
+    if unknown:
+        raise ValueError(f"変更履歴の対象外のテーブルです: {', '.join(unknown)}")
+
+    latest = latest_change_seq(conn)
+    oldest = conn.execute("SELECT MIN(seq) FROM change_log").fetchone()[0]
+    reset_required = since_seq > latest or (oldest is not None and since_seq < oldest - 1) \
+        or (oldest is None and since_seq < latest)
+
+    # 1件多く読んで続きの有無を判定（テーブルの絞り込みは通し番号の主キー順の走査で行う）
+    rows = conn.execute(f"""
+        SELECT seq, table_name, row_key, item_id, operation, changed_columns, changed_at
+        FROM change_log
+        WHERE seq > ? AND table_name IN ({', '.join('?' * len(tables))})
+        ORDER BY seq
+        LIMIT ?
+    """, [since_seq, *tables, limit + 1]).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    changes = [{
+        'seq': seq,
+        'table_name': table_name,
+        'row_key': row_key,
+        'item_id': item_id,
+        'operation': operation,
+        'changed_columns': json.loads(changed_columns) if changed_columns else None,
+        'changed_at': changed_at,
+    } for seq, table_name, row_key, item_id, operation, changed_columns, changed_at in rows]
+    # 最後まで読んだ場合は、対象外のテーブルの変更も含めて最新まで進める
+    next_seq = changes[-1]['seq'] if has_more else max(since_seq, latest)
+    return {
+        'changes': changes,
+        'next_seq': next_seq,
+        'latest_seq': latest,
+        'has_more': has_more,
+        'reset_required': reset_required,
+    }
+
+
+def prune_change_log(conn: sqlite3.Connection, keep_days: Optional[float] = None,
+                     before_seq: Optional[int] = None) -> int:
+    """
+    古い変更を削除してコミット（通し番号は再利用されない）
+
+    Args:
+        keep_days: この日数より前に記録した変更を削除
+        before_seq: この通し番号より前の変更を削除
+
+    Returns:
+        int: 削除した件数
+    """
+    conditions, params = [], []
+    if keep_days is not None:
+        conditions.append("changed_at < datetime('now', ?)")
+        params.append(f"-{float(keep_days)} days")
+    if before_seq is not None:
+        conditions.append("seq < ?")
+        params.append(before_seq)
+    if not conditions:
+        raise ValueError("keep_days または before_seq を指定してください")
+    with conn:
+        return conn.execute(f"DELETE FROM change_log WHERE {' AND '.join(conditions)}", params).rowcount
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BOM変更履歴')
+    parser.add_argument('db_path', help='BOMデータベースのパス')
+    parser.add_argument('--since', type=int, default=0, help='この通し番号より後の変更を表示')
+    parser.add_argument('--limit', type=int, default=100, help='表示件数')
+    parser.add_argument('--table', choices=CHANGE_LOG_TABLES, help='対象テーブル')
+    parser.add_argument('--prune-days', type=float, help='この日数より前の変更を削除')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db_path)
+    try:
+        if args.prune_days is not None:
+            print(f"{prune_change_log(conn, keep_days=args.prune_days):,}件の変更履歴を削除しました")
+            return
+        result = get_changes_since(conn, args.since, args.limit, [args.table] if args.table else None)
+        for change in result['changes']:
+            columns = ', '.join(change['changed_columns'] or [])
+            print(f"  {change['seq']:>8} {change['changed_at']} {change['operation']:<6} "
+                  f"{change['table_name']}:{change['row_key']} ({change['item_id']}) {columns}")
+        print(f"次回の since: {result['next_seq']} / 最新: {result['latest_seq']}"
+              + ("（続きあり）" if result['has_more'] else "")
+              + ("（削除済みの範囲を含むため全件の再読み込みが必要）" if result['reset_required'] else ""))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+釣り糸製造BOM管理システム 変更のプッシュ配信（Server-Sent Events）
+
+ダッシュボードが /api/status・/api/items を数秒ごとにポーリングして件数の集計・一覧の再読み込みを
+繰り返す代わりに、データが変わったときだけ変更（change_log.py）と最新の件数を送ります。
+
+- 監視スレッドは1つ（購読者がいる間だけ動作）。POLL 秒ごとに最新の通し番号（sqlite_sequence の1行）だけを確認し、
+  変わったときだけ変更の読み出しと件数の集計を1回行って、全ての購読者に配ります
+- 直近の変更はメモリに保持し、購読者は保持範囲より前から再開する場合だけ自分でDBから読み出します
+- 送信するイベント:
+    counts   接続時と変更のたびに件数（/api/status と同じキー + アイテムタイプ別件数）
+    changes  変更（id: は最後の変更の通し番号。EventSource の再接続時に Last-Event-ID として戻る）
+    reset    再開位置の変更が削除済み・DBが置き換わった場合（全件を読み直す）
+  変更がない間は一定間隔でコメント行（keepalive）のみ送ります
+- 監視中のエラー（DBのロック・置き換えなど）はログに記録し、接続し直して POLL 秒後に再試行します
+"""
+
+import bisect
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from change_log import MAX_CHANGE_BATCH, get_changes_since, latest_change_seq
+
+# 1イベントに含める最大件数
+CHANGES_PER_EVENT = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def read_counts(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """ダッシュボード用の件数（総アイテム数・BOM構成数・アイテムタイプ別件数）"""
+    items_by_type = dict(conn.execute("SELECT item_type, COUNT(*) FROM items GROUP BY item_type"))
+    return {
+        'total_items': sum(items_by_type.values()),
+        'total_bom_components': conn.execute("SELECT COUNT(*) FROM bom_components").fetchone()[0],
+        'item_type_count': len(items_by_type),
+        'items_by_type': items_by_type,
+    }
+
+
+def format_event(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    """SSEのイベント1件"""
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+class ChangeBroadcaster:
+    """変更の監視（1スレッド）と購読者への配信"""
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], poll_seconds: float = 1.0,
+                 buffer_size: int = 10000):
+        """
+        Args:
+            connect: 監視・再開時の読み出しに使うSQLite接続を返す関数（BOMManager.connect）
+            poll_seconds: 最新の通し番号を確認する間隔
+            buffer_size: メモリに保持する直近の変更の件数
+        """
+        self._connect = connect
+        self.poll_seconds = poll_seconds
+        self.buffer_size = buffer_size
+        self._condition = threading.Condition()
+        self._subscribers = 0
+        self._thread: Optional[threading.Thread] = None
+        # 監視スレッドが確認した状態（購読者がいない間は None）
+        self._latest_seq: Optional[int] = None
+        self._counts: Optional[Dict[str, Any]] = None
+        self._recent: List[Dict[str, Any]] = []
+        self._recent_seqs: List[int] = []
+        self._generation = 0
+        # DBの置き換え・変更の削除で通し番号が連続しなくなった回数
+        self._epoch = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._condition:
+            return self._subscribers
+
+    def _watch(self):
+        conn = None
+        try:
+            while True:
+                with self._condition:
+                    while not self._subscribers:
+                        self._condition.wait()
+                try:
+                    conn = conn or self._connect()
+                    self._poll(conn)
+                except Exception:
+                    logger.exception(f"変更の監視に失敗しました（{self.poll_seconds}秒後に再試行）")
+                    if conn is not None:
+                        conn.close()
+                        conn = None
+                    time.sleep(self.poll_seconds)
+                    continue
+                # 購読者が全て離れた後に新しい購読者が来た場合は待たずに確認する
+                with self._condition:
+                    self._condition.wait_for(lambda: self._latest_seq is None, self.poll_seconds)
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _poll(self, conn: sqlite3.Connection):
+        """最新の通し番号が変わっていれば変更と件数を読み出して購読者に通知"""
+        latest = latest_change_seq(conn)
+        with self._condition:
+            known = self._latest_seq
+        if latest == known:
+            return
+
+        changes: Optional[List[Dict[str, Any]]] = None
+        if known is not None and known < latest:
+            changes, since = [], known
+            while True:
+                batch = get_changes_since(conn, since, MAX_CHANGE_BATCH)
+                if batch['reset_required']:
+                    changes = None
+                    break
+                changes.extend(batch['changes'])
+                since = batch['next_seq']
+                if not batch['has_more']:
+                    break
+        counts = read_counts(conn)
+
+        with self._condition:
+            if not self._subscribers:
+                return
+            if changes is None:
+                # 初回、または読み出せない範囲がある場合は保持している変更を破棄
+                self._recent, self._recent_seqs = [], []
+                if known is not None:
+                    self._epoch += 1
+            else:
+                self._recent.extend(changes)
+                self._recent_seqs.extend(change['seq'] for change in changes)
+                if len(self._recent) > 2 * self.buffer_size:
+                    del self._recent[:-self.buffer_size], self._recent_seqs[:-self.buffer_size]
+                latest = max(latest, since)
+            self._latest_seq = latest
+            self._counts = counts
+            self._generation += 1
+            self._condition.notify_all()
+
+    def _subscribe(self):
+        with self._condition:
+            self._subscribers += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._watch, name='change-stream', daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def _unsubscribe(self):
+        with self._condition:
+            self._subscribers -= 1
+            if not self._subscribers:
+                self._latest_seq, self._counts = None, None
+                self._recent, self._recent_seqs = [], []
+
+    def _recent_after(self, seq: int) -> Optional[List[Dict[str, Any]]]:
+        """保持している seq より後の変更（保持範囲より前から必要な場合は None）。ロック内で呼ぶ"""
+        if seq >= self._latest_seq:
+            return []
+        start = bisect.bisect_right(self._recent_seqs, seq)
+        if start == 0 and (not self._recent_seqs or self._recent_seqs[0] > seq + 1):
+            return None
+        return self._recent[start:]
+
+    def events(self, since: Optional[int] = None, heartbeat_seconds: float = 15,
+               max_seconds: Optional[float] = None) -> Iterator[str]:
+        """
+        購読者1件分のSSEイベント列
+
+        Args:
+            since: この通し番号より後の変更から送る（省略時は接続時点以降の変更のみ）
+            heartbeat_seconds: 変更がない間に keepalive を送る間隔
+            max_seconds: 接続を終了するまでの秒数（EventSource は Last-Event-ID を付けて再接続する）
+        """
+        deadline = time.monotonic() + max_seconds if max_seconds else None
+        self._subscribe()
+        conn = None
+        try:
+            # 監視スレッドの初回の確認を待つ（失敗が続く間は keepalive を送って待ち続ける）
+            while True:
+                timeout = heartbeat_seconds
+                if deadline is not None:
+                    timeout = min(timeout, deadline - time.monotonic())
+                    if timeout <= 0:
+                        return
+                with self._condition:
+                    ready = self._condition.wait_for(lambda: self._latest_seq is not None, timeout)
+                    if ready:
+                        seq, counts = self._latest_seq, self._counts
+                        generation, epoch = self._generation, self._epoch
+                if ready:
+                    break
+                yield ": keepalive\n\n"
+            yield f"retry: {int(max(self.poll_seconds, 1) * 1000)}\n\n"
+
+            if since is not None:
+                conn = self._connect()
+                seq, events = self._catch_up(conn, since, seq)
+                for event in events:
+                    yield event
+            yield format_event('counts', counts)
+
+            while True:
+                timeout = heartbeat_seconds
+                if deadline is not None:
+                    timeout = min(timeout, deadline - time.monotonic())
+                    if timeout <= 0:
+                        return
+                with self._condition:
+                    if not self._condition.wait_for(lambda: self._generation != generation, timeout):
+                        yield_keepalive = True
+                    else:
+                        yield_keepalive = False
+                        generation, latest, counts = self._generation, self._latest_seq, self._counts
+                        changes = self._recent_after(seq) if epoch == self._epoch else None
+                        epoch = self._epoch
+                if yield_keepalive:
+                    yield ": keepalive\n\n"
+                    continue
+
+                if changes is None:
+                    conn = conn or self._connect()
+                    seq, events = self._catch_up(conn, seq, latest)
+                else:
+                    seq, events = max(seq, latest), self._change_events(changes)
+                for event in events:
+                    yield event
+                yield format_event('counts', counts)
+        finally:
+            if conn is not None:
+                conn.close()
+            self._unsubscribe()
+
+    def _catch_up(self, conn: sqlite3.Connection, since: int, latest: int):
+        """
+        since より後の変更をDBから読み出したイベント
+
+        Returns:
+            (送信後の通し番号, イベント)。読み出せない範囲がある場合は reset のみ
+        """
+        reset = (latest, [format_event('reset', {'latest_seq': latest}, latest)])
+        if since > latest:
+            return reset
+        events, seq = [], since
+        while seq < latest:
+            batch = get_changes_since(conn, seq, MAX_CHANGE_BATCH)
+            if batch['reset_required']:
+                return reset
+            events.extend(self._change_events(batch['changes']))
+            seq = batch['next_seq']
+            if not batch['has_more']:
+                break
+        return seq, events
+
+    @staticmethod
+    def _change_events(changes: List[Dict[str, Any]]) -> List[str]:
+        chunks = [changes[start:start + CHANGES_PER_EVENT] for start in range(0, len(changes), CHANGES_PER_EVENT)]
+        return [format_event('changes', {'changes': chunk}, chunk[-1]['seq']) for chunk in chunks]
@@ -36,6 +36,43 @@ class Config:
     TWIST_TYPES = ['S', 'Z']
     KNIT_TYPES = ['X8', 'X4', 'X9', 'X5', 'X16', 'X6丸', 'その他']
     
+    # Oracle同期ジョブ設定
+    MOCK_ORACLE_DATA = False  # Trueの場合はOracleスタンドインを同期元にする
+    ORACLE_STANDIN_PATH = os.environ.get('ORACLE_STANDIN_PATH') or "oracle_standin.db"
+    SYNC_BATCH_SIZE = 5000    # 同期ジョブの1バッチあたりの件数
+    
+    # BOM閉包テーブル（全子孫・逆展開の高速化。bom_closure.py 参照）
+    BOM_CLOSURE_ENABLED = os.environ.get('BOM_CLOSURE_ENABLED', '').lower() in ('1', 'true', 'yes')
+    
+    # 追加属性（additional_attributes JSON）のうち生成カラム＋索引に昇格するキーと型（attribute_columns.py 参照）
+    # 例: {'strength_lb': 'REAL', 'coating': 'TEXT'} → items.attr_strength_lb / items.attr_coating
+    JSON_ATTRIBUTE_COLUMNS = {}
+    
+    # 読み取り専用スナップショット（snapshots.py 参照）
+    # SNAPSHOT_PATH が None の場合は無効。SNAPSHOT_REFRESH_SECONDS が0の場合は POST /api/snapshot でのみ作成
+    SNAPSHOT_PATH = None
+    SNAPSHOT_REFRESH_SECONDS = 0
+    
+    # 変更のプッシュ配信（GET /api/changes/stream。change_stream.py 参照）
+    CHANGE_STREAM_POLL_SECONDS = 1.0       # 最新の通し番号を確認する間隔（購読者の数によらず1スレッド）
+    CHANGE_STREAM_HEARTBEAT_SECONDS = 15   # 変更がない間の keepalive の間隔
+    CHANGE_STREAM_MAX_SECONDS = 300        # 1接続の最大秒数（EventSource は Last-Event-ID で再接続）
+    
+    # リクエスト単位のプロファイラ（profiler.py 参照。Server-Timing ヘッダー・デバッグパネル・GET /api/profiler）
+    ENABLE_PROFILER = False
+    PROFILER_HISTORY = 50                  # GET /api/profiler で返す直近のリクエストの件数
+    
+    # SQLite PRAGMA設定（BOMManager・init_database が接続ごとに適用）
+    # journal_mode はDBファイルに保存されるため初期化時のみ適用
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',     # 読み取りが書き込みを待たない
+        'synchronous': 'NORMAL',   # WALではコミットごとのfsyncを省略（チェックポイント時のみ）
+        'cache_size': -20000,      # ページキャッシュ約20MB（負値はKiB指定）
+        'mmap_size': 0,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,      # ロック待ち(ms)
+    }
+    
     @staticmethod
     def init_app(app):
         pass
@@ -55,6 +92,10 @@ class DevelopmentConfig(Config):
     ENABLE_PROFILER = True
     ENABLE_SAMPLE_DATA = True  # サンプルデータを有効化
     
+    # 開発用SQLite設定
+    SQLITE_PRAGMAS = dict(Config.SQLITE_PRAGMAS, mmap_size=64 * 1024 * 1024)
+    SNAPSHOT_PATH = "bom_database_dev_snapshot.db"
+    
     # Oracle接続（開発用）
     ORACLE_ENABLED = True
     ORACLE_CONNECTION_STRING = os.environ.get('ORACLE_DEV_CONNECTION')
@@ -74,6 +115,11 @@ class StagingConfig(Config):
     ENABLE_SAMPLE_DATA = True
     SHOW_ENVIRONMENT_BANNER = True
     
+    # 本番と同じ構成で検証（キャッシュのみ控えめ）
+    SQLITE_PRAGMAS = dict(Config.SQLITE_PRAGMAS, cache_size=-65536, mmap_size=256 * 1024 * 1024)
+    SNAPSHOT_PATH = "bom_database_staging_snapshot.db"
+    SNAPSHOT_REFRESH_SECONDS = 600
+    
     # Oracle接続（ステージング用）
     ORACLE_ENABLED = False  # サンプルデータを使用
     MOCK_ORACLE_DATA = True
@@ -93,6 +139,12 @@ class ProductionConfig(Config):
     ENABLE_SAMPLE_DATA = False
     SHOW_ENVIRONMENT_BANNER = False
     
+    # 本番用SQLite設定（キャッシュ約128MB・mmap 1GB、同期ジョブとの競合に備えてロック待ちを長めに）
+    SQLITE_PRAGMAS = dict(Config.SQLITE_PRAGMAS, cache_size=-131072,
+                          mmap_size=1024 * 1024 * 1024, busy_timeout=10000)
+    SNAPSHOT_PATH = os.environ.get('SNAPSHOT_PATH') or "bom_database_prod_snapshot.db"
+    SNAPSHOT_REFRESH_SECONDS = int(os.environ.get('SNAPSHOT_REFRESH_SECONDS', 300))
+    
     # Oracle接続（本番用）
     ORACLE_ENABLED = True
     ORACLE_CONNECTION_STRING = os.environ.get('ORACLE_PROD_CONNECTION')
@@ -134,6 +186,7 @@ class TestingConfig(Config):
     # テスト用設定
     WTF_CSRF_ENABLED = False
     ORACLE_ENABLED = False
+    SQLITE_PRAGMAS = {'synchronous': 'OFF', 'temp_store': 'MEMORY'}
 
 
 # 環境設定マッピング
@@ -0,0 +1,257 @@
+"""
+釣り糸製造BOM管理システム 標準原価積み上げ
+
+item_costs に各アイテムの単価（unit_cost: 原材料は購入単価、中間品・完成品は自工程の加工費）を保持し、
+標準原価（standard_cost）を下位から積み上げます。
+
+    標準原価 = 単価 + Σ 構成部品の標準原価 × 数量 × (1 + ロス率)
+
+- 全件積み上げ: 低位レベルコードの降順に1階層ずつ、その階層の辺をまとめて
+  np.bincount（疎行列×ベクトル積）で計算（bom_graph.py）
+- 差分積み上げ: 単価を変更したアイテムとその全祖先（逆展開）だけを、構成部品が先になる順に再計算
+  （祖先以外の構成部品は保存済みの標準原価をそのまま使う）
+
+原価はアイテムの数量単位（unit_of_measure）あたりです。
+保存する標準原価は積み上げた日に有効なBOM構成（bom_effectivity.py）によるものです。
+有効期間の切り替わった日以降は全件積み上げで更新してください。過去・将来の日付の原価は
+保存せずに都度計算します（BOMManager.get_item_cost の as_of）。
+
+使い方:
+    python cost_rollup.py bom_database_dev.db              # 全件積み上げ
+    python cost_rollup.py bom_database_dev.db RAW_001=850  # 単価を変更して影響範囲のみ再計算
+"""
+
+import argparse
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from bom_closure import MAX_CLOSURE_DEPTH, is_closure_enabled
+from bom_effectivity import all_lines_effective, effective_condition, resolve_as_of
+from bom_graph import BomGraph, load_bom_graph
+
+def _save_standard_costs(conn: sqlite3.Connection, costs: Dict[str, float]) -> int:
+    """標準原価を保存（変わったアイテムのみ書き込み）"""
+    current = {}
+    if len(costs) > 500:
+        current = dict(conn.execute("SELECT item_id, standard_cost FROM item_costs"))
+    else:
+        for item_id, standard_cost in conn.execute(
+                f"SELECT item_id, standard_cost FROM item_costs WHERE item_id IN ({', '.join('?' * len(costs))})",
+                list(costs)):
+            current[item_id] = standard_cost
+    changed = [(item_id, cost) for item_id, cost in costs.items()
+               if item_id not in current or current[item_id] is None
+               or abs(current[item_id] - cost) > 1e-9 * max(1.0, abs(cost))]
+    conn.executemany("""
+        INSERT INTO item_costs (item_id, standard_cost, rolled_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(item_id) DO UPDATE SET
+            standard_cost = excluded.standard_cost, rolled_at = excluded.rolled_at,
+            updated_at = CURRENT_TIMESTAMP
+    """, changed)
+    return len(changed)
+
+
+def compute_standard_costs(graph: BomGraph, unit_costs: np.ndarray) -> np.ndarray:
+    """
+    BOMグラフ全体の標準原価（書き込みはしない）
+
+    Args:
+        unit_costs: アイテム添字順の単価ベクトル
+
+    Returns:
+        アイテム添字順の標準原価ベクトル
+    """
+    standard = unit_costs.astype(np.float64, copy=True)
+    # 子のLLCは親より大きいため、LLCの降順に処理すると子の標準原価は確定済み
+    # （保存済みのLLCが古い場合は BomGraph が辺から計算し直している）
+    for level in range(graph.max_level, -1, -1):
+        edges = graph.level_edges(level)
+        if edges.start == edges.stop:
+            continue
+        standard += np.bincount(graph.parents[edges],
+                                weights=standard[graph.children[edges]] * graph.quantities[edges],
+                                minlength=graph.item_count)
+    return standard
+
+
+def load_unit_costs(conn: sqlite3.Connection, graph: BomGraph) -> np.ndarray:
+    """item_costs の単価をアイテム添字順のベクトルで取得（未登録は0）"""
+    return graph.to_vector({item_id: cost for item_id, cost in conn.execute(
+        "SELECT item_id, unit_cost FROM item_costs") if item_id in graph.index})
+
+
+def standard_costs_as_of(conn: sqlite3.Connection, as_of: Optional[str] = None) -> Dict[str, float]:
+    """基準日に有効なBOM構成による全アイテムの標準原価（保存しない。単価は現在の値）"""
+    graph = load_bom_graph(conn, as_of)
+    standard = compute_standard_costs(graph, load_unit_costs(conn, graph))
+    return {item_id: float(standard[i]) for i, item_id in enumerate(graph.item_ids)}
+
+
+def rollup_all_cost_rows(conn: sqlite3.Connection) -> int:
+    """
+    全アイテムの標準原価を積み上げて保存（コミットしない）
+
+    Returns:
+        int: 標準原価が変わったアイテム数
+    """
+    graph = load_bom_graph(conn)
+    costed = {item_id for (item_id,) in conn.execute("SELECT item_id FROM item_costs")}
+    standard = compute_standard_costs(graph, load_unit_costs(conn, graph))
+    costs = {item_id: float(standard[i]) for i, item_id in enumerate(graph.item_ids)
+             if item_id in costed or standard[i] != 0}
+    return _save_standard_costs(conn, costs)
+
+
+def rollup_all_costs(conn: sqlite3.Connection) -> int:
+    """全アイテムの標準原価を積み上げて保存し、コミット"""
+    with conn:
+        return rollup_all_cost_rows(conn)
+
+
+def _ancestor_ids(conn: sqlite3.Connection, item_ids: Iterable[str], as_of: str) -> List[str]:
+    """アイテムの全祖先（基準日に有効な構成での逆展開）"""
+    ancestors = set()
+    use_closure = is_closure_enabled(conn) and all_lines_effective(conn, as_of)
+    for item_id in item_ids:
+        if use_closure:
+            rows = conn.execute("SELECT DISTINCT ancestor FROM bom_closure WHERE descendant = ?",
+                                (item_id,))
+        else:
+            rows = conn.execute(f"""
+                WITH RECURSIVE up(item_id, depth) AS (
+                    SELECT parent_item_id, 1 FROM bom_components
+                    WHERE component_item_id = :item_id AND {effective_condition()}
+                    UNION
+                    SELECT bc.parent_item_id, up.depth + 1
+                    FROM up JOIN bom_components bc ON bc.component_item_id = up.item_id
+                    WHERE up.depth < :max_depth AND {effective_condition('bc')}
+                )
+                SELECT DISTINCT item_id FROM up
+            """, {'item_id': item_id, 'max_depth': MAX_CLOSURE_DEPTH, 'as_of': as_of})
+        ancestors.update(row[0] for row in rows)
+    return sorted(ancestors)
+
+
+def _children_first(targets: List[str], children: Dict[str, list]) -> List[str]:
+    """
+    対象アイテムを、対象内の構成部品が先になる順に並べる
+
+    保存済みのLLCは BOMManager を通さずに追加された構成行で古くなりうるため、読み込んだ構成行から決める
+
+    Raises:
+        ValueError: 構成が循環している場合
+    """
+    target_set = set(targets)
+    order, state = [], {}  # state: 1=処理中, 2=確定
+    for root in targets:
+        if root in state:
+            continue
+        state[root] = 1
+        stack = [(root, iter(children.get(root, [])))]
+        while stack:
+            item_id, components = stack[-1]
+            for component, _, _ in components:
+                if component not in target_set or state.get(component) == 2:
+                    continue
+                if state.get(component) == 1:
+                    raise ValueError(f"BOM循環参照のため標準原価を積み上げできません: {component}")
+                state[component] = 1
+                stack.append((component, iter(children.get(component, []))))
+                break
+            else:
+                stack.pop()
+                state[item_id] = 2
+                order.append(item_id)
+    return order
+
+
+def rollup_costs_for(conn: sqlite3.Connection, item_ids: Iterable[str]) -> List[str]:
+    """
+    指定アイテムとその全祖先の標準原価を再計算して保存（コミットしない）
+
+    単価の変更・BOM構成の追加の後に、変更したアイテム（構成の追加では親）を指定して呼び出します。
+    単価が1件も登録されていない場合は何もしません。
+
+    Returns:
+        再計算したアイテムID
+    """
+    item_ids = list(item_ids)
+    if not conn.execute("SELECT EXISTS (SELECT 1 FROM item_costs)").fetchone()[0]:
+        return []  # 単価が未登録のうちは積み上げない
+    as_of = resolve_as_of(None)
+    targets = sorted(set(item_ids) | set(_ancestor_ids(conn, item_ids, as_of)))
+    if not targets:
+        return []
+
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS rollup_targets (item_id TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM rollup_targets")
+    conn.executemany("INSERT INTO rollup_targets VALUES (?)", [(item_id,) for item_id in targets])
+
+    standard = {item_id: unit_cost for item_id, unit_cost in conn.execute("""
+        SELECT c.item_id, c.unit_cost FROM item_costs c JOIN rollup_targets t ON t.item_id = c.item_id
+    """)}
+    children = {}
+    for parent, component, quantity, component_cost in conn.execute(f"""
+        SELECT bc.parent_item_id, bc.component_item_id,
+               bc.quantity * (1 + COALESCE(bc.loss_ratio, 0)), COALESCE(c.standard_cost, c.unit_cost, 0)
+        FROM bom_components bc
+        JOIN rollup_targets t ON t.item_id = bc.parent_item_id
+        LEFT JOIN item_costs c ON c.item_id = bc.component_item_id
+        WHERE {effective_condition('bc')}
+    """, {'as_of': as_of}):
+        children.setdefault(parent, []).append((component, quantity, component_cost))
+
+    # 対象外の構成部品は保存済みの標準原価、対象の構成部品は今回の計算結果を使う
+    costs = {}
+    for item_id in _children_first(targets, children):
+        costs[item_id] = standard.get(item_id, 0.0) + sum(
+            quantity * costs.get(component, component_cost)
+            for component, quantity, component_cost in children.get(item_id, [])
+        )
+
+    _save_standard_costs(conn, costs)
+    return targets
+
+
+def set_unit_cost(conn: sqlite3.Connection, item_id: str, unit_cost: float) -> List[str]:
+    """
+    単価を設定し、そのアイテムと全祖先の標準原価を再計算
+
+    Returns:
+        再計算したアイテムID
+    """
+    with conn:
+        conn.execute("""
+            INSERT INTO item_costs (item_id, unit_cost) VALUES (?, ?)
+            ON CONFLICT(item_id) DO UPDATE SET
+                unit_cost = excluded.unit_cost, updated_at = CURRENT_TIMESTAMP
+        """, (item_id, unit_cost))
+        return rollup_costs_for(conn, [item_id])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='標準原価積み上げ')
+    parser.add_argument('db_path', help='BOMデータベースのパス')
+    parser.add_argument('unit_costs', nargs='*', help='単価の変更（アイテムID=単価）')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db_path)
+    try:
+        started = time.perf_counter()
+        if args.unit_costs:
+            for entry in args.unit_costs:
+                item_id, _, unit_cost = entry.partition('=')
+                targets = set_unit_cost(conn, item_id, float(unit_cost))
+                print(f"{item_id}: 単価 {float(unit_cost):,.2f} → {len(targets)}アイテムを再計算")
+        else:
+            print(f"標準原価を積み上げました（更新 {rollup_all_costs(conn):,}件）")
+        print(f"({time.perf_counter() - started:.3f}秒)")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+釣り糸製造BOM管理システム DBメンテナンス
+
+一括更新（デプロイ時の調整・プレフィックス変更など）の間、更新日時・同期ステータスの
+トリガーを停止して各行の書き込みを1回に抑えるためのユーティリティです。
+"""
+
+import sqlite3
+from contextlib import contextmanager
+from typing import Iterator
+
+from bom_closure import CLOSURE_TRIGGER_NAMES, is_closure_enabled, rebuild_closure_rows
+from bom_levels import rebuild_low_level_code_rows
+from change_log import CHANGE_LOG_TRIGGER_NAMES, invalidate_change_log
+from cost_rollup import rollup_all_cost_rows
+
+# 一括更新時に停止するトリガー（schema_enhanced.sql で定義）
+MAINTENANCE_TRIGGER_NAMES = (
+    'update_items_timestamp',
+    'update_bom_timestamp',
+    'update_materials_timestamp',
+    'update_oracle_sync_status',
+)
+
+# suspend_indexes で削除・再作成する索引のテーブル（主キー・UNIQUE制約の自動索引は対象外）
+BULK_INDEX_TABLES = ('items', 'bom_components')
+
+
+@contextmanager
+def bulk_maintenance(conn: sqlite3.Connection, suspend_closure: bool = False,
+                     suspend_change_log: bool = False,
+                     suspend_indexes: bool = False) -> Iterator[sqlite3.Connection]:
+    """
+    トリガーを停止した一括更新モード
+
+    トリガー定義を退避して削除し、ブロック終了時に同じ定義で再作成します。
+    削除から再作成までを1つのセーブポイント内で行うため、他の接続から
+    トリガーのない状態が見えることはなく、例外時はトリガーも含めて元に戻ります。
+    外側にトランザクションがない場合は終了時にコミットされ、ある場合はそのまま継続します。
+
+    ブロック内では updated_at が自動更新されないため、必要に応じて明示的に設定してください。
+    ブロック内で conn.commit() を呼ぶとトリガーのない状態が確定するため、呼ばないでください。
+
+    Args:
+        conn: SQLite接続（PRAGMA foreign_keys などトランザクション外の設定は事前に行う）
+        suspend_closure: BOM閉包テーブルのトリガーも停止し、終了時に閉包と
+                         低位レベルコード・標準原価を再構築するか（BOM構成のキー変更を大量に行う場合に使用）
+        suspend_change_log: 変更履歴（change_log.py）のトリガーも停止するか。停止した場合は終了時に
+                            変更履歴を破棄し、読み出し側に全件の読み直しを求める（大量の行を投入する場合に使用）
+        suspend_indexes: items・bom_components の索引も削除し、終了時（閉包などの再構築の前）に
+                         同じ定義で再作成するか（空に近いテーブルへ大量の行を投入する場合に使用。
+                         一意索引の重複は再作成時に IntegrityError となり、全体が元に戻る）
+
+    使用例:
+        with bulk_maintenance(conn):
+            conn.execute("UPDATE items SET updated_at = CURRENT_TIMESTAMP")
+    """
+    trigger_names = list(MAINTENANCE_TRIGGER_NAMES)
+    rebuild = suspend_closure and is_closure_enabled(conn)
+    if rebuild:
+        trigger_names.extend(CLOSURE_TRIGGER_NAMES)
+    if suspend_change_log:
+        trigger_names.extend(CHANGE_LOG_TRIGGER_NAMES)
+
+    placeholders = ', '.join('?' * len(trigger_names))
+    saved_triggers = conn.execute(f"""
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'trigger' AND name IN ({placeholders})
+    """, trigger_names).fetchall()
+    saved_indexes = []
+    if suspend_indexes:
+        saved_indexes = conn.execute(f"""
+            SELECT name, sql FROM sqlite_master
+            WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({', '.join('?' * len(BULK_INDEX_TABLES))})
+        """, BULK_INDEX_TABLES).fetchall()
+
+    conn.execute("SAVEPOINT bulk_maintenance")
+    try:
+        for name, _ in saved_triggers:
+            conn.execute(f"DROP TRIGGER {name}")
+        for name, _ in saved_indexes:
+            conn.execute(f"DROP INDEX {name}")
+
+        yield conn
+
+        for _, sql in saved_indexes:
+            conn.execute(sql)
+        if rebuild:
+            rebuild_closure_rows(conn)
+        if suspend_closure:
+            rebuild_low_level_code_rows(conn)
+            rollup_all_cost_rows(conn)
+        if suspend_change_log:
+            invalidate_change_log(conn)
+        for _, sql in saved_triggers:
+            conn.execute(sql)
+    except BaseException:
+        conn.execute("ROLLBACK TO bulk_maintenance")
+        conn.execute("RELEASE bulk_maintenance")
+        raise
+    # 外側のトランザクションがなければ RELEASE でコミットされる
+    conn.execute("RELEASE bulk_maintenance")
@@ -6,13 +6,32 @@
 
 import os
 import sys
-import shutil
 import sqlite3
 import subprocess
 import json
 from datetime import datetime
 from pathlib import Path
 
+from bom_diff import diff_databases, format_summary
+from db_maintenance import bulk_maintenance
+from migrations import apply_migrations
+
+
+def copy_database(source_path, target_path):
+    """
+    SQLiteのオンラインバックアップAPIでDBをコピー
+    
+    WALモードではコミット済みの内容が -wal ファイルに残っているため、
+    DBファイルの単純コピーではなくSQLite経由で一貫したコピーを作成する。
+    """
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
 
 class BOMDeploymentManager:
     """BOMシステムのデプロイメント管理クラス"""
@@ -27,6 +46,7 @@ class BOMDeploymentManager:
             'schema_enhanced.sql',
             'requirements.txt'
         ]
+        self.bom_diff = None
     
     def validate_environment(self, env):
         """環境名の検証"""
@@ -63,7 +83,7 @@ class BOMDeploymentManager:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         backup_path = f"backup_{source_env}_{timestamp}.db"
         
-        shutil.copy2(source_db, backup_path)
+        copy_database(source_db, backup_path)
         print(f"💾 データベースをバックアップしました: {backup_path}")
         
         return backup_path
@@ -85,11 +105,23 @@ class BOMDeploymentManager:
         # バックアップ作成
         backup_path = self.backup_database(source_env)
         
+        # 移行先の現在のBOM構成との差分（上書きされる内容の確認用）
+        self.bom_diff = self.diff_bom(target_db, source_db)
+        
         # データベースのコピー
         try:
-            shutil.copy2(source_db, target_db)
+            copy_database(source_db, target_db)
             print(f"📋 データベースを移行しました: {source_db} → {target_db}")
             
+            # スキーマを移行先のアプリケーションのバージョンに合わせる
+            conn = sqlite3.connect(target_db)
+            try:
+                result = apply_migrations(conn)
+            finally:
+                conn.close()
+            for version, description, elapsed in result['applied']:
+                print(f"🔄 マイグレーション v{version}: {description} ({elapsed:.2f}秒)")
+            
             # 環境固有の調整
             self.adjust_database_for_environment(target_db, target_env)
             
@@ -99,39 +131,66 @@ class BOMDeploymentManager:
             print(f"❌ データベース移行エラー: {e}")
             return False
     
+    def diff_bom(self, current_db, incoming_db):
+        """移行先の現在のDBと移行するDBのBOM構成の差分を表示（差分の取得に失敗しても移行は続行）"""
+        if not os.path.exists(current_db):
+            return None
+        try:
+            diff = diff_databases(current_db, incoming_db)
+        except Exception as e:
+            print(f"⚠️  BOM構成の差分を取得できませんでした: {e}")
+            return None
+        
+        print(f"🔍 {format_summary(diff)}")
+        for product in diff['products'][:20]:
+            print(f"   [{product['status']}] {product['item_id']}: 所要量の変化 {len(product['deltas'])}件")
+        return diff
+    
+    def preview_bom_diff(self, source_env, target_env):
+        """昇格前のBOM構成の差分確認（DBは変更しない）"""
+        from config import get_config
+        
+        self.validate_environment(source_env)
+        self.validate_environment(target_env)
+        diff = self.diff_bom(get_config(target_env).DATABASE_PATH, get_config(source_env).DATABASE_PATH)
+        if diff is None:
+            print(f"📂 {target_env}環境のデータベースがないため、差分はありません")
+        return diff
+    
     def adjust_database_for_environment(self, db_path, env):
         """環境固有のデータベース調整"""
         conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
         
         try:
-            if env == 'production':
-                # 本番環境用の調整
-                print("🔧 本番環境用にデータベースを調整しています...")
-                
-                # テストデータの削除
-                cursor.execute("DELETE FROM items WHERE item_id LIKE 'TEST_%' OR item_id LIKE 'SAMPLE_%'")
-                cursor.execute("DELETE FROM bom_components WHERE parent_item_id LIKE 'TEST_%' OR component_item_id LIKE 'TEST_%'")
-                
-                # 本番用メタデータの追加
-                cursor.execute("UPDATE items SET updated_at = CURRENT_TIMESTAMP")
-                
-                print("✅ 本番環境用調整完了")
-                
-            elif env == 'staging':
-                # ステージング環境用の調整
-                print("🔧 ステージング環境用にデータベースを調整しています...")
-                
-                # ステージング用メタデータの追加
-                cursor.execute("UPDATE items SET updated_at = CURRENT_TIMESTAMP")
-                
-                print("✅ ステージング環境用調整完了")
-            
-            conn.commit()
+            # 更新日時トリガーを停止して1トランザクションで調整（各行1回の書き込み）
+            with bulk_maintenance(conn):
+                if env == 'production':
+                    # 本番環境用の調整
+                    print("🔧 本番環境用にデータベースを調整しています...")
+                    
+                    # テストデータの削除
+                    conn.execute("DELETE FROM items WHERE item_id LIKE 'TEST_%' OR item_id LIKE 'SAMPLE_%'")
+                    conn.execute("DELETE FROM bom_components WHERE parent_item_id LIKE 'TEST_%' OR component_item_id LIKE 'TEST_%'")
+                    # item_id をキーにする原価・単位換算係数も削除（孤立行を残さない）
+                    for table in ('item_costs', 'uom_conversions'):
+                        conn.execute(f"DELETE FROM {table} WHERE item_id LIKE 'TEST_%' OR item_id LIKE 'SAMPLE_%'")
+                    
+                    # 本番用メタデータの追加
+                    conn.execute("UPDATE items SET updated_at = CURRENT_TIMESTAMP")
+                    
+                    print("✅ 本番環境用調整完了")
+                    
+                elif env == 'staging':
+                    # ステージング環境用の調整
+                    print("🔧 ステージング環境用にデータベースを調整しています...")
+                    
+                    # ステージング用メタデータの追加
+                    conn.execute("UPDATE items SET updated_at = CURRENT_TIMESTAMP")
+                    
+                    print("✅ ステージング環境用調整完了")
             
         except Exception as e:
             print(f"⚠️  データベース調整中にエラー: {e}")
-            conn.rollback()
         
         finally:
             conn.close()
@@ -175,6 +234,10 @@ python app_unified.py
             },
             'files_deployed': self.required_files,
             'database_migrated': True,
+            'bom_diff': {
+                **self.bom_diff['summary'],
+                'products': [product['item_id'] for product in self.bom_diff['products']],
+            } if self.bom_diff else None,
             'environment_config': {
                 'host': '0.0.0.0' if target_env != 'development' else '127.0.0.1',
                 'debug': target_env == 'development'
@@ -247,7 +310,7 @@ python app_unified.py
             return False
         
         try:
-            shutil.copy2(backup_path, target_db)
+            copy_database(backup_path, target_db)
             print(f"🔄 {env}環境をロールバックしました: {backup_path} → {target_db}")
             return True
         except Exception as e:
@@ -280,6 +343,7 @@ def main():
 使用方法:
   python deploy.py deploy <source_env> <target_env>    # 環境昇格
   python deploy.py rollback <env> <backup_path>        # ロールバック
+  python deploy.py diff <source_env> <target_env>      # 昇格前のBOM構成の差分確認
   python deploy.py list-backups                        # バックアップ一覧
   python deploy.py check                               # 前提条件確認
 
@@ -315,6 +379,16 @@ def main():
         backup_path = sys.argv[3]
         manager.rollback(env, backup_path)
     
+    elif command == 'diff':
+        if len(sys.argv) < 4:
+            print("❌ 使用方法: python deploy.py diff <source_env> <target_env>")
+            return
+        
+        try:
+            manager.preview_bom_diff(sys.argv[2], sys.argv[3])
+        except ValueError as e:
+            print(f"❌ {e}")
+    
     elif command == 'list-backups':
         manager.list_available_backups()
     
@@ -0,0 +1,411 @@
+"""
+釣り糸製造BOM管理システム スキーママイグレーション
+
+スキーマのバージョンを PRAGMA user_version に記録し、未適用のマイグレーションを順番に適用します。
+
+- 新規DB: schema_enhanced.sql をそのまま適用し、最新バージョンを記録
+- 既存DB: 未適用のマイグレーションを1件ずつトランザクション内で適用した後、
+          schema_enhanced.sql を再適用して索引・トリガーなどを最新化
+          （スキーマファイルは既存DBに再実行できるよう IF NOT EXISTS / DROP IF EXISTS で記述）
+
+マイグレーションにはスキーマファイルの再適用では表現できない変更
+（カラム追加・テーブル再構築・データ移行）のみを記述します。
+バージョン0は統合版の初期スキーマ（Oracle同期の差分検知導入前）です。
+
+大きなテーブルの再構築には rebuild_table_online() を使用してください。
+行のコピーを小さなバッチに分けてコミットし、コピー中の更新はトリガーで新テーブルへ反映するため、
+排他ロックを保持するのは最後の切り替えの間だけです。
+
+使い方:
+    python migrations.py bom_database_prod.db            # 未適用のマイグレーションを適用
+    python migrations.py bom_database_prod.db --status   # 現在のバージョンと未適用件数を表示
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from bom_levels import rebuild_low_level_code_rows
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema_enhanced.sql')
+
+# オンライン再構築の1バッチあたりの行数
+REBUILD_BATCH_SIZE = 5000
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Connection], None]
+    transactional: bool  # False の場合はマイグレーション自身がバッチごとにコミットする
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str, transactional: bool = True):
+    """マイグレーション関数を登録するデコレータ"""
+    def register(func):
+        if MIGRATIONS and version <= MIGRATIONS[-1].version:
+            raise ValueError(f"マイグレーションのバージョンは昇順で登録してください: {version}")
+        MIGRATIONS.append(Migration(version, description, func, transactional))
+        return func
+    return register
+
+
+def latest_version() -> int:
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _set_schema_version(conn: sqlite3.Connection, version: int):
+    conn.execute(f"PRAGMA user_version = {int(version)}")
+
+
+def _table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone() is not None
+
+
+def _column_names(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def add_column_if_missing(conn: sqlite3.Connection, table: str, column: str, definition: str):
+    """カラムが存在しない場合のみ追加（再実行しても安全）"""
+    if column not in _column_names(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def split_sql_script(script: str) -> List[str]:
+    """SQLスクリプトを文単位に分割（トリガー本体内の ; を考慮）"""
+    statements = []
+    buffer = ''
+    for line in script.splitlines(keepends=True):
+        if not buffer and (not line.strip() or line.lstrip().startswith('--')):
+            continue
+        buffer += line
+        if sqlite3.complete_statement(buffer):
+            statements.append(buffer.strip())
+            buffer = ''
+    if buffer.strip():
+        statements.append(buffer.strip())
+    return statements
+
+
+def apply_schema_objects(conn: sqlite3.Connection, schema_file: str = SCHEMA_FILE):
+    """
+    スキーマファイルを現在のトランザクション内で適用
+
+    executescript() は実行前にコミットしてしまうため、1文ずつ実行します。
+    """
+    with open(schema_file, 'r', encoding='utf-8') as f:
+        statements = split_sql_script(f.read())
+    for statement in statements:
+        conn.execute(statement)
+
+
+def apply_migrations(conn: sqlite3.Connection, schema_file: str = SCHEMA_FILE) -> Dict[str, object]:
+    """
+    未適用のマイグレーションを適用
+
+    Args:
+        conn: SQLite接続（トランザクション外で渡すこと）
+        schema_file: スキーマファイルのパス
+
+    Returns:
+        {'from_version', 'to_version', 'created', 'applied': [(version, 説明, 秒)]}
+    """
+    current = get_schema_version(conn)
+    result = {'from_version': current, 'to_version': current, 'created': False, 'applied': []}
+
+    if current > latest_version():
+        raise RuntimeError(
+            f"DBのスキーマバージョン({current})がこのアプリケーション({latest_version()})より新しいため起動できません"
+        )
+
+    if current == 0 and not _table_exists(conn, 'items'):
+        # 新規DB: スキーマファイルが最新の定義
+        with conn:
+            apply_schema_objects(conn, schema_file)
+            _set_schema_version(conn, latest_version())
+        result.update({'to_version': latest_version(), 'created': True})
+        return result
+
+    for step in MIGRATIONS:
+        if step.version <= current:
+            continue
+        started = time.perf_counter()
+        if step.transactional:
+            with conn:
+                step.apply(conn)
+                _set_schema_version(conn, step.version)
+        else:
+            step.apply(conn)
+            with conn:
+                _set_schema_version(conn, step.version)
+        result['applied'].append((step.version, step.description, time.perf_counter() - started))
+        result['to_version'] = step.version
+
+    if result['applied']:
+        # 索引・トリガー・新規テーブルをスキーマファイルの定義に合わせる
+        with conn:
+            apply_schema_objects(conn, schema_file)
+
+    return result
+
+
+def rebuild_table_online(conn: sqlite3.Connection, table: str, create_sql: str,
+                         columns: Sequence[str], batch_size: int = REBUILD_BATCH_SIZE,
+                         on_batch: Optional[Callable[[int], None]] = None) -> int:
+    """
+    テーブルを新しい定義で再構築（制約の変更など ALTER TABLE でできない変更用）
+
+    1. 新テーブル {table}__rebuild を作成し、旧テーブルへの追加・更新・削除を
+       新テーブルへ反映するトリガーを設定
+    2. rowid順にbatch_size件ずつコピーし、バッチごとにコミット（他の接続の書き込みをブロックしない）
+    3. 最後の短いトランザクションで旧テーブルを削除して新テーブルに置き換え、
+       旧テーブルの索引・トリガーを再作成
+
+    途中で中断した場合も旧テーブルはそのまま残り、再実行すると最初からやり直します。
+
+    Args:
+        conn: SQLite接続（トランザクション外で渡すこと）
+        table: 対象テーブル名
+        create_sql: 新テーブルの CREATE TABLE 文（テーブル名は {table} と記述）
+        columns: コピーするカラム（新旧共通。先頭はINTEGER PRIMARY KEYなどrowidの別名）
+        batch_size: 1バッチあたりの行数
+        on_batch: 各バッチのコミット後に呼ばれるコールバック（コピー済み件数を受け取る）
+
+    Returns:
+        int: コピーした行数
+    """
+    new_table = f"{table}__rebuild"
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f"NEW.{column}" for column in columns)
+    key = columns[0]
+    capture_triggers = [f"{new_table}_capture_{event}" for event in ('insert', 'update', 'delete')]
+
+    # 前回中断時の残骸を削除
+    with conn:
+        for trigger_name in capture_triggers:
+            conn.execute(f"DROP TRIGGER IF EXISTS {trigger_name}")
+        conn.execute(f"DROP TABLE IF EXISTS {new_table}")
+
+    saved_objects = conn.execute("""
+        SELECT type, sql FROM sqlite_master
+        WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL
+    """, (table,)).fetchall()
+
+    with conn:
+        conn.execute(create_sql.format(table=new_table))
+        conn.execute(f"""
+            CREATE TRIGGER {capture_triggers[0]} AFTER INSERT ON {table}
+            BEGIN
+                INSERT OR REPLACE INTO {new_table} ({column_list}) VALUES ({new_values});
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER {capture_triggers[1]} AFTER UPDATE ON {table}
+            BEGIN
+                DELETE FROM {new_table} WHERE {key} = OLD.{key};
+                INSERT OR REPLACE INTO {new_table} ({column_list}) VALUES ({new_values});
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER {capture_triggers[2]} AFTER DELETE ON {table}
+            BEGIN
+                DELETE FROM {new_table} WHERE {key} = OLD.{key};
+            END
+        """)
+
+    # トリガーで反映済みの行（コピー前に更新された行）は上書きしない
+    copied = 0
+    last_key = None
+    while True:
+        with conn:
+            where = "" if last_key is None else f"WHERE {key} > :last_key"
+            keys = [row[0] for row in conn.execute(f"""
+                SELECT {key} FROM {table} {where} ORDER BY {key} LIMIT :limit
+            """, {'last_key': last_key, 'limit': batch_size})]
+            if not keys:
+                break
+            conn.execute(f"""
+                INSERT INTO {new_table} ({column_list})
+                SELECT {column_list} FROM {table} AS source
+                WHERE source.{key} BETWEEN :first AND :last
+                  AND NOT EXISTS (SELECT 1 FROM {new_table} AS target WHERE target.{key} = source.{key})
+            """, {'first': keys[0], 'last': keys[-1]})
+        copied += len(keys)
+        last_key = keys[-1]
+        if on_batch:
+            on_batch(copied)
+
+    # 切り替え（この間だけ書き込みロックを保持）
+    with conn:
+        for trigger_name in capture_triggers:
+            conn.execute(f"DROP TRIGGER {trigger_name}")
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute(f"ALTER TABLE {new_table} RENAME TO {table}")
+        for object_type, sql in saved_objects:
+            if object_type == 'index':
+                sql = sql.replace('CREATE INDEX ', 'CREATE INDEX IF NOT EXISTS ', 1)
+                sql = sql.replace('CREATE UNIQUE INDEX ', 'CREATE UNIQUE INDEX IF NOT EXISTS ', 1)
+            conn.execute(sql)
+
+    return copied
+
+
+# ---------------------------------------------------------------------------
+# マイグレーション定義（追加のみ。適用済みのマイグレーションは変更しない）
+# ---------------------------------------------------------------------------
+
+@migration(1, "Oracle同期の差分検知用カラム（内容ハッシュ・スキップ件数）")
+def _add_sync_columns(conn: sqlite3.Connection):
+    add_column_if_missing(conn, 'items', 'oracle_content_hash', 'TEXT')
+    add_column_if_missing(conn, 'oracle_sync_log', 'records_skipped', 'INTEGER DEFAULT 0')
+
+
+@migration(2, "低位レベルコード（items.low_level_code）")
+def _add_low_level_code(conn: sqlite3.Connection):
+    add_column_if_missing(conn, 'items', 'low_level_code', 'INTEGER NOT NULL DEFAULT 0')
+    # 旧版の更新日時トリガーはLLCの書き込みでも updated_at を変えるため、外して計算
+    # （LLCを対象外にした定義はスキーマファイルの再適用で作成される）
+    saved = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'update_items_timestamp'"
+    ).fetchone()
+    conn.execute("DROP TRIGGER IF EXISTS update_items_timestamp")
+    rebuild_low_level_code_rows(conn)
+    if saved:
+        conn.execute(saved[0])
+
+
+@migration(3, "属性検索用索引（種別+デニール）")
+def _add_search_indexes(conn: sqlite3.Connection):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_items_type_denier ON items(item_type, denier)")
+
+
+@migration(4, "原価テーブル（item_costs）")
+def _add_item_costs(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS item_costs (
+            item_id TEXT PRIMARY KEY,
+            unit_cost REAL NOT NULL DEFAULT 0,
+            standard_cost REAL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            rolled_at TIMESTAMP,
+            FOREIGN KEY (item_id) REFERENCES items(item_id)
+        )
+    """)
+
+
+@migration(5, "単位換算係数テーブル（uom_conversions）")
+def _add_uom_conversions(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS uom_conversions (
+            item_id TEXT NOT NULL,
+            to_unit TEXT NOT NULL CHECK (to_unit IN ('KG', 'M', '個', '枚', 'セット', '本')),
+            factor REAL NOT NULL CHECK (factor > 0),
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (item_id, to_unit),
+            FOREIGN KEY (item_id) REFERENCES items(item_id)
+        )
+    """)
+
+
+
+@migration(6, "BOM構成の有効期間（effective_from / effective_to）", transactional=False)
+def _add_bom_effectivity(conn: sqlite3.Connection):
+    with conn:
+        add_column_if_missing(conn, 'bom_components', 'effective_from', 'DATE')
+        add_column_if_missing(conn, 'bom_components', 'effective_to', 'DATE')
+    # 表の UNIQUE(親, 構成部品, 用途) では有効期間の異なる版を登録できないため、制約を外して再構築
+    # （重複の禁止はスキーマファイルの一意索引 ux_bom_components_line に置き換え）
+    table_sql = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'bom_components'"
+    ).fetchone()[0]
+    if 'UNIQUE' in table_sql.upper():
+        rebuild_table_online(conn, 'bom_components', """
+            CREATE TABLE {table} (
+                bom_component_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                parent_item_id TEXT NOT NULL,
+                component_item_id TEXT NOT NULL,
+                quantity REAL NOT NULL,
+                usage_type TEXT NOT NULL CHECK (usage_type IN (
+                    'Main Material', 'Main Braid Thread', 'Core Thread',
+                    'Packaging', 'Container', 'Process Material'
+                )),
+                process_step INTEGER,
+                loss_ratio REAL DEFAULT 0.0,
+                remarks TEXT,
+                effective_from DATE,
+                effective_to DATE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (parent_item_id) REFERENCES items(item_id),
+                FOREIGN KEY (component_item_id) REFERENCES items(item_id)
+            )
+        """, _column_names(conn, 'bom_components'))
+    # 有効期間を含む定義の索引はスキーマファイルの再適用で作成
+    with conn:
+        conn.execute("DROP INDEX IF EXISTS idx_bom_parent_usage")
+        conn.execute("DROP INDEX IF EXISTS idx_bom_component")
+
+
+
+@migration(7, "変更履歴テーブル（change_log）")
+def _add_change_log(conn: sqlite3.Connection):
+    # 記録用のトリガーはスキーマファイルの再適用で作成（既存の行は記録しない）
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_key TEXT NOT NULL,
+            item_id TEXT,
+            operation TEXT NOT NULL CHECK (operation IN ('INSERT', 'UPDATE', 'DELETE')),
+            changed_columns TEXT,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+@migration(8, "Oracle同期ログの未反映件数（records_skipped_changed）")
+def _add_sync_skipped_changed(conn: sqlite3.Connection):
+    add_column_if_missing(conn, 'oracle_sync_log', 'records_skipped_changed', 'INTEGER DEFAULT 0')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BOMデータベース マイグレーションツール')
+    parser.add_argument('db_path', help='BOMデータベースのパス')
+    parser.add_argument('--status', action='store_true', help='バージョンの確認のみ')
+    parser.add_argument('--schema', default=SCHEMA_FILE, help='スキーマファイルのパス')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db_path)
+    try:
+        current = get_schema_version(conn)
+        pending = [step for step in MIGRATIONS if step.version > current]
+        if args.status:
+            print(f"スキーマバージョン: {current} (最新: {latest_version()})")
+            for step in pending:
+                print(f"  未適用: v{step.version} {step.description}")
+            return
+
+        result = apply_migrations(conn, schema_file=args.schema)
+        if result['created']:
+            print(f"新規DBを作成しました (バージョン {result['to_version']})")
+        for version, description, elapsed in result['applied']:
+            print(f"  v{version} {description} ({elapsed:.2f}秒)")
+        print(f"スキーマバージョン: {result['from_version']} → {result['to_version']}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+釣り糸製造BOM管理システム 所要量展開（MRP）
+
+完成品の需要（受注数量の合計）から、全アイテムの総所要量・正味所要量を計算します。
+
+- 複数の受注はアイテムごとに合計した1本の需要ベクトルとして一度に展開します
+- 低位レベルコードの昇順に1階層ずつ、その階層の辺をまとめて
+  「子の総所要量 += 親の正味所要量 × 所要量」（np.bincount による疎行列×ベクトル積）で伝播します
+- アイテムの総所要量が確定した時点（そのLLCの階層）で在庫を引き当てて正味所要量にします
+  （共有部品の在庫は全ての親の所要量を合計してから1回だけ引き当てます）
+- 単位を指定すると、展開結果のベクトル全体に換算係数（uom.py）を掛けて共通の単位でも返します
+- 基準日を指定すると、その日に有効だったBOM構成で展開します（過去の製造ロットの使用量の再現）
+
+使い方:
+    python mrp.py bom_database_dev.db PRODUCT_001=100 PRODUCT_002=50
+    python mrp.py bom_database_dev.db PRODUCT_001=100 --materials --unit KG   # 原材料の集計（KG換算）
+    python mrp.py bom_database_dev.db PRODUCT_001=100 --as-of 2024-04-01      # 2024-04-01 時点の構成
+"""
+
+import argparse
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from bom_graph import BomGraph, load_bom_graph
+from uom import MASS_UNIT, convert_quantities, unit_factors
+
+
+def aggregate_orders(orders: Iterable[Tuple[str, float]]) -> Dict[str, float]:
+    """受注明細 (アイテムID, 数量) をアイテムごとの需要に合計"""
+    demand = {}
+    for item_id, quantity in orders:
+        demand[item_id] = demand.get(item_id, 0.0) + float(quantity)
+    return demand
+
+
+def explode_requirements(graph: BomGraph, demand: Dict[str, float],
+                         on_hand: Optional[Dict[str, float]] = None) -> Dict[str, np.ndarray]:
+    """
+    需要を全階層に展開
+
+    Args:
+        graph: BOMグラフ
+        demand: {アイテムID: 需要数量}（完成品以外のアイテムへの独立需要も可）
+        on_hand: {アイテムID: 在庫数量}（省略時は在庫なし）
+
+    Returns:
+        アイテム添字順のベクトル {'gross': 総所要量, 'allocated': 在庫引当, 'net': 正味所要量}
+    """
+    gross = graph.to_vector(demand)
+    stock = graph.to_vector(on_hand or {})
+    net = np.zeros(graph.item_count)
+
+    for level in range(graph.max_level + 1):
+        # この階層のアイテムは全ての親が処理済みのため、総所要量が確定している
+        at_level = graph.levels == level
+        net[at_level] = np.maximum(gross[at_level] - stock[at_level], 0.0)
+
+        edges = graph.level_edges(level)
+        if edges.start == edges.stop:
+            continue
+        gross += np.bincount(graph.children[edges],
+                             weights=net[graph.parents[edges]] * graph.quantities[edges],
+                             minlength=graph.item_count)
+
+    return {'gross': gross, 'allocated': gross - net, 'net': net}
+
+
+def calculate_requirements(conn: sqlite3.Connection, demand: Dict[str, float],
+                           on_hand: Optional[Dict[str, float]] = None,
+                           unit: Optional[str] = None,
+                           as_of: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    DBのBOMで需要を展開し、所要量のあるアイテムをLLC順に返す
+
+    Args:
+        unit: 換算先の単位（指定時は converted_* に換算値。換算できないアイテムは None）
+        as_of: BOM構成の基準日（YYYY-MM-DD。省略時は当日）
+
+    Returns:
+        [{'item_id', 'item_name', 'item_type', 'unit_of_measure', 'low_level_code',
+          'gross_requirement', 'allocated', 'net_requirement'
+          (+ 'converted_unit', 'converted_gross_requirement', 'converted_net_requirement')}]
+    """
+    graph = load_bom_graph(conn, as_of)
+    result = explode_requirements(graph, demand, on_hand)
+    if unit:
+        factors = unit_factors(conn, graph.item_ids, unit)
+        converted_gross = convert_quantities(result['gross'], factors)
+        converted_net = convert_quantities(result['net'], factors)
+
+    names = {row[0]: row[1:] for row in conn.execute(
+        "SELECT item_id, item_name, item_type, unit_of_measure FROM items")}
+    requirements = []
+    for i in graph.nonzero_items(result['gross']):
+        item_id = graph.item_ids[i]
+        item_name, item_type, unit_of_measure = names[item_id]
+        row = {
+            'item_id': item_id,
+            'item_name': item_name,
+            'item_type': item_type,
+            'unit_of_measure': unit_of_measure,
+            'low_level_code': int(graph.levels[i]),
+            'gross_requirement': float(result['gross'][i]),
+            'allocated': float(result['allocated'][i]),
+            'net_requirement': float(result['net'][i]),
+        }
+        if unit:
+            row['converted_unit'] = unit
+            row['converted_gross_requirement'] = converted_gross[i]
+            row['converted_net_requirement'] = converted_net[i]
+        requirements.append(row)
+    return requirements
+
+
+def summarize_materials(conn: sqlite3.Connection, demand: Dict[str, float],
+                        on_hand: Optional[Dict[str, float]] = None,
+                        unit: str = MASS_UNIT,
+                        as_of: Optional[str] = None) -> Dict[str, Any]:
+    """
+    需要を展開し、最下位の原材料（構成部品を持たないアイテム）の正味所要量を単位換算して集計
+    （as_of: BOM構成の基準日。原材料の判定も基準日の構成で行う）
+
+    Returns:
+        {'unit', 'total': 換算できた原材料の合計, 'materials': [所要量の行（calculate_requirements と同じ形式）],
+         'unconvertible': 換算できなかったアイテムID}
+    """
+    graph = load_bom_graph(conn, as_of)
+    result = explode_requirements(graph, demand, on_hand)
+    factors = unit_factors(conn, graph.item_ids, unit)
+
+    is_material = np.bincount(graph.parents, minlength=graph.item_count) == 0
+    net = np.where(is_material, result['net'], 0.0)
+    converted = convert_quantities(net, factors)
+
+    names = {row[0]: row[1:] for row in conn.execute(
+        "SELECT item_id, item_name, item_type, unit_of_measure FROM items")}
+    materials = []
+    for i in graph.nonzero_items(net):
+        item_id = graph.item_ids[i]
+        item_name, item_type, unit_of_measure = names[item_id]
+        materials.append({
+            'item_id': item_id,
+            'item_name': item_name,
+            'item_type': item_type,
+            'unit_of_measure': unit_of_measure,
+            'net_requirement': float(net[i]),
+            'converted_net_requirement': converted[i],
+        })
+    return {
+        'unit': unit,
+        'total': float(np.nansum(net * factors)),
+        'materials': materials,
+        'unconvertible': [row['item_id'] for row in materials if row['converted_net_requirement'] is None],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BOM所要量展開')
+    parser.add_argument('db_path', help='BOMデータベースのパス')
+    parser.add_argument('demand', nargs='+', help='需要（アイテムID=数量）')
+    parser.add_argument('--unit', help='換算先の単位（例: KG）')
+    parser.add_argument('--materials', action='store_true', help='最下位の原材料のみ集計')
+    parser.add_argument('--as-of', help='BOM構成の基準日（YYYY-MM-DD。省略時は当日）')
+    args = parser.parse_args()
+
+    orders = []
+    for entry in args.demand:
+        item_id, _, quantity = entry.partition('=')
+        orders.append((item_id, float(quantity or 1)))
+
+    conn = sqlite3.connect(args.db_path)
+    try:
+        started = time.perf_counter()
+        if args.materials:
+            summary = summarize_materials(conn, aggregate_orders(orders), unit=args.unit or MASS_UNIT,
+                                          as_of=args.as_of)
+        else:
+            requirements = calculate_requirements(conn, aggregate_orders(orders), unit=args.unit,
+                                                  as_of=args.as_of)
+        elapsed = time.perf_counter() - started
+    finally:
+        conn.close()
+
+    if args.materials:
+        for row in summary['materials']:
+            converted = row['converted_net_requirement']
+            print(f"  {row['item_id']:<20} {row['item_name']:<30} "
+                  f"{row['net_requirement']:>14,.3f} {row['unit_of_measure']:<4} "
+                  + (f"{converted:>14,.3f} {summary['unit']}" if converted is not None else "換算不可"))
+        print(f"合計 {summary['total']:,.3f} {summary['unit']}"
+              f"（換算不可 {len(summary['unconvertible'])}件） ({elapsed:.3f}秒)")
+        return
+
+    for row in requirements:
+        line = (f"  LLC{row['low_level_code']} {row['item_id']:<20} {row['item_name']:<30} "
+                f"{row['net_requirement']:>14,.3f} {row['unit_of_measure']}")
+        if args.unit and row['converted_net_requirement'] is not None:
+            line += f" ({row['converted_net_requirement']:,.3f} {args.unit})"
+        print(line)
+    print(f"{len(requirements)}アイテム ({elapsed:.3f}秒)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+釣り糸製造BOM管理システム リクエスト単位のプロファイラ
+
+ENABLE_PROFILER が有効な環境（開発）で、1リクエストごとに次の値を記録します。
+
+- 処理時間（リクエスト全体）
+- SQL: 実行した文の数・合計時間（実行と読み出し）・読み出した行数・開いた接続の数
+- BOMManager: メソッドごとの呼び出し回数・時間・その中で実行したSQLの数（入れ子の呼び出しも含む）
+- 同じSQLの繰り返し（N_PLUS_ONE_THRESHOLD 回以上。1行ずつ読み出す N+1 の検出）
+
+記録は Server-Timing ヘッダー（ブラウザの開発者ツールの Timing に表示）、HTMLページ下部のデバッグパネル、
+直近のリクエストの一覧（GET /api/profiler）で確認できます。
+プロファイル中でないとき（無効な環境・バックグラウンドのスレッド）は接続・メソッドとも通常どおり動作します。
+"""
+
+import functools
+import html
+import inspect
+import re
+import sqlite3
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+# 1リクエストで同じSQLをこの回数以上実行した場合に繰り返し（N+1）として表示
+N_PLUS_ONE_THRESHOLD = 10
+# Server-Timing・パネルに表示するBOMManagerのメソッド・SQLの数
+TOP_METHODS = 5
+TOP_STATEMENTS = 10
+
+_current: ContextVar[Optional['RequestProfile']] = ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    """1リクエスト分の計測値"""
+
+    def __init__(self, method: str = '', path: str = ''):
+        self.method = method
+        self.path = path
+        self.status: Optional[int] = None
+        self.started = time.perf_counter()
+        self.wall_seconds: Optional[float] = None
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.rows = 0
+        self.connections = 0
+        # SQL（空白を詰めた文） → [回数, 秒]
+        self.statements: Dict[str, List[float]] = {}
+        # BOMManagerのメソッド名 → [回数, 秒, SQLの数]
+        self.calls: Dict[str, List[float]] = {}
+
+    def record_statement(self, sql: str, seconds: float):
+        self.sql_count += 1
+        self.sql_seconds += seconds
+        stats = self.statements.setdefault(re.sub(r'\s+', ' ', sql).strip(), [0, 0.0])
+        stats[0] += 1
+        stats[1] += seconds
+
+    def record_fetch(self, rows: int, seconds: float):
+        self.rows += rows
+        self.sql_seconds += seconds
+
+    def record_call(self, name: str, seconds: float, sql_count: int):
+        stats = self.calls.setdefault(name, [0, 0.0, 0])
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] += sql_count
+
+    def finish(self, status: Optional[int] = None):
+        self.status = status
+        self.wall_seconds = time.perf_counter() - self.started
+
+    def to_dict(self) -> Dict[str, Any]:
+        wall = self.wall_seconds if self.wall_seconds is not None else time.perf_counter() - self.started
+        statements = sorted(self.statements.items(), key=lambda item: (-item[1][0], -item[1][1]))
+        return {
+            'method': self.method,
+            'path': self.path,
+            'status': self.status,
+            'wall_ms': round(wall * 1000, 3),
+            'sql_count': self.sql_count,
+            'sql_ms': round(self.sql_seconds * 1000, 3),
+            'rows': self.rows,
+            'connections': self.connections,
+            'bom_calls': [
+                {'name': name, 'calls': calls, 'ms': round(seconds * 1000, 3), 'sql_count': sql_count}
+                for name, (calls, seconds, sql_count) in sorted(self.calls.items(), key=lambda item: -item[1][1])
+            ],
+            'statements': [
+                {'sql': sql, 'count': count, 'ms': round(seconds * 1000, 3)}
+                for sql, (count, seconds) in statements[:TOP_STATEMENTS]
+            ],
+            'repeated_statements': [
+                {'sql': sql, 'count': count, 'ms': round(seconds * 1000, 3)}
+                for sql, (count, seconds) in statements if count >= N_PLUS_ONE_THRESHOLD
+            ],
+        }
+
+
+def start_profile(method: str = '', path: str = ''):
+    """このスレッド（コンテキスト）でのプロファイルを開始し、finish_profile に渡すトークンを返す"""
+    return _current.set(RequestProfile(method, path))
+
+
+def finish_profile(token) -> Optional[RequestProfile]:
+    """プロファイルを終了（start_profile と対で呼ぶ）"""
+    profile = _current.get()
+    _current.reset(token)
+    return profile
+
+
+def current_profile() -> Optional[RequestProfile]:
+    return _current.get()
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """文の実行・行の読み出しを接続のプロファイルに記録するカーソル"""
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.connection.profile.record_statement(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self.connection.profile.record_statement(sql, time.perf_counter() - started)
+
+    def executescript(self, sql_script):
+        started = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            self.connection.profile.record_statement(sql_script, time.perf_counter() - started)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self.connection.profile.record_fetch(row is not None, time.perf_counter() - started)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self.connection.profile.record_fetch(len(rows), time.perf_counter() - started)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self.connection.profile.record_fetch(len(rows), time.perf_counter() - started)
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self.connection.profile.record_fetch(0, time.perf_counter() - started)
+            raise
+        self.connection.profile.record_fetch(1, time.perf_counter() - started)
+        return row
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """ProfiledCursor を使う接続（profile は connect が設定）"""
+
+    profile: RequestProfile
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or ProfiledCursor)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def connect(database: str, **kwargs) -> sqlite3.Connection:
+    """sqlite3.connect（プロファイル中は文の実行・行の読み出しを記録する接続）"""
+    profile = _current.get()
+    if profile is None:
+        return sqlite3.connect(database, **kwargs)
+    conn = sqlite3.connect(database, factory=ProfiledConnection, **kwargs)
+    conn.profile = profile
+    profile.connections += 1
+    return conn
+
+
+def instrument_class(cls) -> type:
+    """
+    クラスの公開メソッドの呼び出し回数・時間・SQLの数をプロファイルに記録する（BOMManager に適用）
+
+    プロファイル中でないときは元のメソッドをそのまま呼び出します。複数回適用しても1回のみ
+    """
+    if cls.__dict__.get('_profiler_instrumented'):
+        return cls
+    for name, method in list(vars(cls).items()):
+        if name.startswith('_') or not inspect.isfunction(method):
+            continue
+        setattr(cls, name, _profiled_method(f"{cls.__name__}.{name}", method))
+    cls._profiler_instrumented = True
+    return cls
+
+
+def _profiled_method(name: str, method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return method(*args, **kwargs)
+        sql_count = profile.sql_count
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            profile.record_call(name, time.perf_counter() - started, profile.sql_count - sql_count)
+    return wrapper
+
+
+def server_timing(profile: Dict[str, Any]) -> str:
+    """Server-Timing ヘッダーの値（to_dict の結果から）"""
+    metrics = [
+        f"total;dur={profile['wall_ms']}",
+        f'sql;dur={profile["sql_ms"]};desc="{profile["sql_count"]} statements / {profile["rows"]} rows"',
+        f'db-connect;desc="{profile["connections"]} connections"',
+    ]
+    for call in profile['bom_calls'][:TOP_METHODS]:
+        metrics.append(f'{call["name"]};dur={call["ms"]};desc="{call["calls"]} calls / {call["sql_count"]} sql"')
+    return ', '.join(metrics)
+
+
+def render_panel(profile: Dict[str, Any]) -> str:
+    """HTMLページの末尾に挿入するデバッグパネル（to_dict の結果から）"""
+    warning = ''
+    if profile['repeated_statements']:
+        warning = (f'<span style="color:#ffc107">⚠ 繰り返しSQL {len(profile["repeated_statements"])}種類'
+                   f'（{N_PLUS_ONE_THRESHOLD}回以上）</span>')
+    calls = ''.join(
+        f'<tr><td>{html.escape(call["name"])}</td><td>{call["calls"]}</td>'
+        f'<td>{call["ms"]:.1f}</td><td>{call["sql_count"]}</td></tr>'
+        for call in profile['bom_calls'])
+    statements = ''
+    for row in profile['statements']:
+        color = '#ffc107' if row['count'] >= N_PLUS_ONE_THRESHOLD else 'inherit'
+        statements += (f'<tr style="color:{color}"><td>{row["count"]}</td><td>{row["ms"]:.1f}</td>'
+                       f'<td><code style="color:inherit">{html.escape(row["sql"][:300])}</code></td></tr>')
+    return f'''
+<div id="bom-profiler" style="position:fixed;bottom:0;left:0;right:0;z-index:2000;max-height:50vh;overflow:auto;
+     background:#212529;color:#f8f9fa;font-size:12px;opacity:0.95">
+  <details>
+    <summary style="padding:4px 12px;cursor:pointer">
+      ⏱ {profile['wall_ms']:.1f} ms ／ SQL {profile['sql_count']}件 {profile['sql_ms']:.1f} ms ／
+      {profile['rows']}行 ／ 接続 {profile['connections']} {warning}
+    </summary>
+    <div style="padding:4px 12px">
+      <table class="table table-sm table-dark mb-2"><thead><tr>
+        <th>BOMManager</th><th>回数</th><th>ms</th><th>SQL</th></tr></thead><tbody>{calls}</tbody></table>
+      <table class="table table-sm table-dark mb-0"><thead><tr>
+        <th>回数</th><th>ms</th><th>SQL（回数の多い順）</th></tr></thead><tbody>{statements}</tbody></table>
+    </div>
+  </details>
+</div>
+'''
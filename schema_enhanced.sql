@@ -48,6 +48,10 @@ CREATE TABLE IF NOT EXISTS items (
     -- Oracle同期関連
     oracle_sync_status TEXT DEFAULT 'manual' CHECK (oracle_sync_status IN ('synced', 'manual', 'modified')),
     oracle_last_sync TIMESTAMP,
+    oracle_content_hash TEXT, -- 同期対象Oracle項目のハッシュ（変更検知用）
+    
+    -- 低位レベルコード（全BOM中で最も深い階層。bom_levels.py で維持）
+    low_level_code INTEGER NOT NULL DEFAULT 0,
     
     -- メタデータ
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -74,16 +78,19 @@ CREATE TABLE IF NOT EXISTS bom_components (
     loss_ratio REAL DEFAULT 0.0, -- ロス率
     remarks TEXT,             -- 備考
     
+    -- 有効期間（NULLは制限なし。effective_to の当日は含まない。bom_effectivity.py）
+    effective_from DATE,
+    effective_to DATE,
+    
     -- メタデータ
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     
     -- 外部キー制約
     FOREIGN KEY (parent_item_id) REFERENCES items(item_id),
-    FOREIGN KEY (component_item_id) REFERENCES items(item_id),
+    FOREIGN KEY (component_item_id) REFERENCES items(item_id)
     
-    -- ユニーク制約（同じ親に対して同じ構成部品が同じ用途で重複しないように）
-    UNIQUE(parent_item_id, component_item_id, usage_type)
+    -- 同じ親・構成部品・用途の重複は一意索引 ux_bom_components_line（有効期間の版ごとに1行）
 );
 
 -- Oracle製品マスタ同期履歴テーブル
@@ -94,6 +101,8 @@ CREATE TABLE IF NOT EXISTS oracle_sync_log (
     records_processed INTEGER DEFAULT 0,
     records_updated INTEGER DEFAULT 0,
     records_added INTEGER DEFAULT 0,
+    records_skipped INTEGER DEFAULT 0,  -- ハッシュ一致により書き込みを省略した件数
+    records_skipped_changed INTEGER DEFAULT 0,  -- 変更があったが既存データを更新しない設定のため書き込まなかった件数
     error_message TEXT,
     sync_started_at TIMESTAMP NOT NULL,
     sync_completed_at TIMESTAMP,
@@ -117,40 +126,229 @@ CREATE TABLE IF NOT EXISTS raw_materials (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- BOM構成候補テーブル（製造日報からの推定結果。レビュー・承認後に bom_components へ登録）
+CREATE TABLE IF NOT EXISTS bom_component_proposals (
+    proposal_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    parent_oracle_code TEXT NOT NULL,     -- 生産品目コード
+    component_oracle_code TEXT NOT NULL,  -- 投入品目コード
+    parent_item_id TEXT,                  -- 解決済みの親アイテムID
+    component_item_id TEXT,               -- 解決済みの構成部品アイテムID
+    usage_type TEXT NOT NULL DEFAULT 'Main Material',
+    quantity_per_unit REAL NOT NULL,      -- 生産1単位あたりの平均投入量
+    run_count INTEGER NOT NULL,           -- 投入品目が使われた作業数
+    parent_run_count INTEGER NOT NULL,    -- 親品目の作業数
+    support_ratio REAL,                   -- run_count / parent_run_count
+    quantity_cv REAL,                     -- 作業ごとの投入量の変動係数
+    total_input_quantity REAL,
+    total_output_quantity REAL,
+    period_from DATE,
+    period_to DATE,
+    status TEXT NOT NULL DEFAULT 'proposed' CHECK (status IN ('proposed', 'approved', 'rejected')),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    reviewed_at TIMESTAMP,
+    UNIQUE(parent_oracle_code, component_oracle_code)
+);
+
+-- 原価テーブル（単価と積み上げた標準原価。cost_rollup.py で維持）
+CREATE TABLE IF NOT EXISTS item_costs (
+    item_id TEXT PRIMARY KEY,
+    unit_cost REAL NOT NULL DEFAULT 0,    -- 単価（原材料は購入単価、中間品・完成品は自工程の加工費）
+    standard_cost REAL,                   -- 標準原価 = 単価 + Σ 構成部品の標準原価 × 数量 × (1 + ロス率)
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    rolled_at TIMESTAMP,                  -- 標準原価を最後に積み上げた日時
+    FOREIGN KEY (item_id) REFERENCES items(item_id)
+);
+
+-- アイテム別の単位換算係数（item_id の1単位 = factor to_unit。uom.py で使用）
+CREATE TABLE IF NOT EXISTS uom_conversions (
+    item_id TEXT NOT NULL,
+    to_unit TEXT NOT NULL CHECK (to_unit IN ('KG', 'M', '個', '枚', 'セット', '本')),
+    factor REAL NOT NULL CHECK (factor > 0),
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (item_id, to_unit),
+    FOREIGN KEY (item_id) REFERENCES items(item_id)
+);
+
+-- 変更履歴（items・bom_components の追加・更新・削除をトリガーで追記。change_log.py で読み出し）
+CREATE TABLE IF NOT EXISTS change_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,  -- 変更の通し番号（読み出し位置）
+    table_name TEXT NOT NULL,               -- 'items' / 'bom_components'
+    row_key TEXT NOT NULL,                  -- 主キー（item_id / bom_component_id）
+    item_id TEXT,                           -- 影響するアイテム（BOM構成行は親アイテム）
+    operation TEXT NOT NULL CHECK (operation IN ('INSERT', 'UPDATE', 'DELETE')),
+    changed_columns TEXT,                   -- 更新したカラム（JSON配列。追加・削除はNULL）
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- インデックス作成
-CREATE INDEX IF NOT EXISTS idx_items_type ON items(item_type);
+-- 種別での絞り込み・種別+名称順の一覧（get_all_items / get_all_items_by_type）
+DROP INDEX IF EXISTS idx_items_type;
+CREATE INDEX IF NOT EXISTS idx_items_type_name ON items(item_type, item_name);
 CREATE INDEX IF NOT EXISTS idx_items_material ON items(material_type);
+-- 種別+デニール範囲の属性検索（search_items）
+CREATE INDEX IF NOT EXISTS idx_items_type_denier ON items(item_type, denier);
 CREATE INDEX IF NOT EXISTS idx_items_oracle_code ON items(oracle_product_code);
 CREATE INDEX IF NOT EXISTS idx_items_knit_type ON items(knit_type);
 CREATE INDEX IF NOT EXISTS idx_items_series ON items(series_name);
-CREATE INDEX IF NOT EXISTS idx_bom_parent ON bom_components(parent_item_id);
-CREATE INDEX IF NOT EXISTS idx_bom_component ON bom_components(component_item_id);
+-- 所要量展開・原価積み上げの階層順処理
+CREATE INDEX IF NOT EXISTS idx_items_low_level_code ON items(low_level_code);
+-- 直下構成の取得（get_direct_components）: 親で絞り込み用途順に返し、構成部品ID・数量まで索引で完結
+DROP INDEX IF EXISTS idx_bom_parent;
+-- 有効期間の判定まで索引で完結させ、基準日を指定した展開でも表を読まない
+CREATE INDEX IF NOT EXISTS idx_bom_parent_usage ON bom_components(parent_item_id, usage_type, component_item_id, quantity, effective_from, effective_to);
+-- 逆展開（get_where_used・原価の祖先検索）: 構成部品で絞り込み親・数量・有効期間まで索引で完結
+CREATE INDEX IF NOT EXISTS idx_bom_component ON bom_components(component_item_id, parent_item_id, quantity, effective_from, effective_to);
+-- 同じ親・構成部品・用途の重複禁止（有効期間の開始日ごとに1行。期間の重なりは bom_effectivity.check_overlap）
+CREATE UNIQUE INDEX IF NOT EXISTS ux_bom_components_line ON bom_components(parent_item_id, component_item_id, usage_type, IFNULL(effective_from, ''));
+-- 有効期間を持つ行のみの部分索引（基準日に無効な行の有無 bom_effectivity.all_lines_effective）
+CREATE INDEX IF NOT EXISTS idx_bom_effectivity ON bom_components(effective_from, effective_to) WHERE effective_from IS NOT NULL OR effective_to IS NOT NULL;
 CREATE INDEX IF NOT EXISTS idx_raw_materials_oracle ON raw_materials(oracle_item_code);
 CREATE INDEX IF NOT EXISTS idx_sync_log_type ON oracle_sync_log(sync_type);
+CREATE INDEX IF NOT EXISTS idx_proposals_status ON bom_component_proposals(status);
 
 -- 更新日時の自動更新トリガー
+-- UPDATE文で updated_at を設定済みの行は再更新しない（各行の書き込みを1回に抑える）
+-- 低位レベルコードのみの更新（BOM構成の変更に伴う自動計算）は更新日時を変えない
+-- 一括更新では db_maintenance.bulk_maintenance() でトリガーを停止できる
+DROP TRIGGER IF EXISTS update_items_timestamp;
 CREATE TRIGGER update_items_timestamp 
     AFTER UPDATE ON items
+    WHEN NEW.updated_at IS OLD.updated_at
+     AND NEW.low_level_code IS OLD.low_level_code
+     AND NOT (NEW.oracle_product_code IS NOT NULL AND NEW.item_name IS NOT OLD.item_name
+              AND NEW.oracle_last_sync IS OLD.oracle_last_sync
+              AND NEW.oracle_content_hash IS OLD.oracle_content_hash)
     BEGIN
         UPDATE items SET updated_at = CURRENT_TIMESTAMP WHERE item_id = NEW.item_id;
     END;
 
+DROP TRIGGER IF EXISTS update_bom_timestamp;
 CREATE TRIGGER update_bom_timestamp 
     AFTER UPDATE ON bom_components
+    WHEN NEW.updated_at IS OLD.updated_at
     BEGIN
         UPDATE bom_components SET updated_at = CURRENT_TIMESTAMP WHERE bom_component_id = NEW.bom_component_id;
     END;
 
+DROP TRIGGER IF EXISTS update_materials_timestamp;
 CREATE TRIGGER update_materials_timestamp 
     AFTER UPDATE ON raw_materials
+    WHEN NEW.updated_at IS OLD.updated_at
     BEGIN
         UPDATE raw_materials SET updated_at = CURRENT_TIMESTAMP WHERE material_id = NEW.material_id;
     END;
 
--- Oracle同期ステータス更新トリガー
+-- Oracle同期ステータス更新トリガー（手動での品名変更を 'modified' にする）
+-- Oracle同期による書き込み（oracle_last_sync・ハッシュを更新）は対象外
+-- 更新日時もこのトリガーで同時に設定し、タイムスタンプトリガーとの二重書き込みを避ける
+DROP TRIGGER IF EXISTS update_oracle_sync_status;
 CREATE TRIGGER update_oracle_sync_status 
     AFTER UPDATE ON items
-    WHEN NEW.oracle_product_code IS NOT NULL AND OLD.item_name != NEW.item_name
+    WHEN NEW.oracle_product_code IS NOT NULL AND NEW.item_name IS NOT OLD.item_name
+     AND NEW.oracle_last_sync IS OLD.oracle_last_sync
+     AND NEW.oracle_content_hash IS OLD.oracle_content_hash
     BEGIN
-        UPDATE items SET oracle_sync_status = 'modified' WHERE item_id = NEW.item_id;
-    END; 
\ No newline at end of file
+        UPDATE items SET
+            oracle_sync_status = 'modified',
+            updated_at = CASE WHEN NEW.updated_at IS OLD.updated_at
+                              THEN CURRENT_TIMESTAMP ELSE NEW.updated_at END
+        WHERE item_id = NEW.item_id;
+    END; 
+
+-- 変更履歴トリガー（change_log.py）
+-- 更新日時・低位レベルコード・Oracle同期日時のみの更新（自動計算・同期の記録）は記録しない
+-- 影響するアイテム（items のキー・BOM構成行の親）の変更は、旧アイテムの削除と新アイテムの追加として記録
+-- 一括更新モード（db_maintenance.bulk_maintenance）では既定で停止しない。suspend_change_log=True の場合のみ停止し、
+-- 終了時に変更履歴を破棄して読み出し側に全件の読み直し（reset_required）を求める
+DROP TRIGGER IF EXISTS change_log_items_insert;
+CREATE TRIGGER change_log_items_insert
+    AFTER INSERT ON items
+    BEGIN
+        INSERT INTO change_log (table_name, row_key, item_id, operation)
+        VALUES ('items', NEW.item_id, NEW.item_id, 'INSERT');
+    END;
+
+DROP TRIGGER IF EXISTS change_log_items_update;
+CREATE TRIGGER change_log_items_update
+    AFTER UPDATE ON items
+    BEGIN
+        INSERT INTO change_log (table_name, row_key, item_id, operation)
+        SELECT 'items', OLD.item_id, OLD.item_id, 'DELETE'
+        WHERE NEW.item_id IS NOT OLD.item_id;
+        INSERT INTO change_log (table_name, row_key, item_id, operation, changed_columns)
+        SELECT 'items', NEW.item_id, NEW.item_id,
+               CASE WHEN NEW.item_id IS OLD.item_id THEN 'UPDATE' ELSE 'INSERT' END,
+               CASE WHEN NEW.item_id IS OLD.item_id THEN changed END
+        FROM (SELECT '[' || rtrim(
+                CASE WHEN NEW.oracle_product_code IS NOT OLD.oracle_product_code THEN '"oracle_product_code",' ELSE '' END ||
+                CASE WHEN NEW.item_name IS NOT OLD.item_name THEN '"item_name",' ELSE '' END ||
+                CASE WHEN NEW.item_type IS NOT OLD.item_type THEN '"item_type",' ELSE '' END ||
+                CASE WHEN NEW.unit_of_measure IS NOT OLD.unit_of_measure THEN '"unit_of_measure",' ELSE '' END ||
+                CASE WHEN NEW.material_type IS NOT OLD.material_type THEN '"material_type",' ELSE '' END ||
+                CASE WHEN NEW.denier IS NOT OLD.denier THEN '"denier",' ELSE '' END ||
+                CASE WHEN NEW.ps_ratio IS NOT OLD.ps_ratio THEN '"ps_ratio",' ELSE '' END ||
+                CASE WHEN NEW.twist_type IS NOT OLD.twist_type THEN '"twist_type",' ELSE '' END ||
+                CASE WHEN NEW.yarn_composition IS NOT OLD.yarn_composition THEN '"yarn_composition",' ELSE '' END ||
+                CASE WHEN NEW.series_name IS NOT OLD.series_name THEN '"series_name",' ELSE '' END ||
+                CASE WHEN NEW.length_m IS NOT OLD.length_m THEN '"length_m",' ELSE '' END ||
+                CASE WHEN NEW.color IS NOT OLD.color THEN '"color",' ELSE '' END ||
+                CASE WHEN NEW.knit_type IS NOT OLD.knit_type THEN '"knit_type",' ELSE '' END ||
+                CASE WHEN NEW.yarn_type IS NOT OLD.yarn_type THEN '"yarn_type",' ELSE '' END ||
+                CASE WHEN NEW.raw_num IS NOT OLD.raw_num THEN '"raw_num",' ELSE '' END ||
+                CASE WHEN NEW.production_num IS NOT OLD.production_num THEN '"production_num",' ELSE '' END ||
+                CASE WHEN NEW.core_yarn_type IS NOT OLD.core_yarn_type THEN '"core_yarn_type",' ELSE '' END ||
+                CASE WHEN NEW.spool_type IS NOT OLD.spool_type THEN '"spool_type",' ELSE '' END ||
+                CASE WHEN NEW.braid_structure IS NOT OLD.braid_structure THEN '"braid_structure",' ELSE '' END ||
+                CASE WHEN NEW.has_core IS NOT OLD.has_core THEN '"has_core",' ELSE '' END ||
+                CASE WHEN NEW.additional_attributes IS NOT OLD.additional_attributes THEN '"additional_attributes",' ELSE '' END ||
+                CASE WHEN NEW.oracle_sync_status IS NOT OLD.oracle_sync_status THEN '"oracle_sync_status",' ELSE '' END ||
+                CASE WHEN NEW.oracle_content_hash IS NOT OLD.oracle_content_hash THEN '"oracle_content_hash",' ELSE '' END, ',') || ']' AS changed)
+        WHERE changed <> '[]' OR NEW.item_id IS NOT OLD.item_id;
+    END;
+
+DROP TRIGGER IF EXISTS change_log_items_delete;
+CREATE TRIGGER change_log_items_delete
+    AFTER DELETE ON items
+    BEGIN
+        INSERT INTO change_log (table_name, row_key, item_id, operation)
+        VALUES ('items', OLD.item_id, OLD.item_id, 'DELETE');
+    END;
+
+DROP TRIGGER IF EXISTS change_log_bom_insert;
+CREATE TRIGGER change_log_bom_insert
+    AFTER INSERT ON bom_components
+    BEGIN
+        INSERT INTO change_log (table_name, row_key, item_id, operation)
+        VALUES ('bom_components', NEW.bom_component_id, NEW.parent_item_id, 'INSERT');
+    END;
+
+DROP TRIGGER IF EXISTS change_log_bom_update;
+CREATE TRIGGER change_log_bom_update
+    AFTER UPDATE ON bom_components
+    BEGIN
+        INSERT INTO change_log (table_name, row_key, item_id, operation)
+        SELECT 'bom_components', OLD.bom_component_id, OLD.parent_item_id, 'DELETE'
+        WHERE NEW.parent_item_id IS NOT OLD.parent_item_id;
+        INSERT INTO change_log (table_name, row_key, item_id, operation, changed_columns)
+        SELECT 'bom_components', NEW.bom_component_id, NEW.parent_item_id,
+               CASE WHEN NEW.parent_item_id IS OLD.parent_item_id THEN 'UPDATE' ELSE 'INSERT' END,
+               CASE WHEN NEW.parent_item_id IS OLD.parent_item_id THEN changed END
+        FROM (SELECT '[' || rtrim(
+                CASE WHEN NEW.component_item_id IS NOT OLD.component_item_id THEN '"component_item_id",' ELSE '' END ||
+                CASE WHEN NEW.quantity IS NOT OLD.quantity THEN '"quantity",' ELSE '' END ||
+                CASE WHEN NEW.usage_type IS NOT OLD.usage_type THEN '"usage_type",' ELSE '' END ||
+                CASE WHEN NEW.process_step IS NOT OLD.process_step THEN '"process_step",' ELSE '' END ||
+                CASE WHEN NEW.loss_ratio IS NOT OLD.loss_ratio THEN '"loss_ratio",' ELSE '' END ||
+                CASE WHEN NEW.remarks IS NOT OLD.remarks THEN '"remarks",' ELSE '' END ||
+                CASE WHEN NEW.effective_from IS NOT OLD.effective_from THEN '"effective_from",' ELSE '' END ||
+                CASE WHEN NEW.effective_to IS NOT OLD.effective_to THEN '"effective_to",' ELSE '' END, ',') || ']' AS changed)
+        WHERE changed <> '[]' OR NEW.parent_item_id IS NOT OLD.parent_item_id;
+    END;
+
+DROP TRIGGER IF EXISTS change_log_bom_delete;
+CREATE TRIGGER change_log_bom_delete
+    AFTER DELETE ON bom_components
+    BEGIN
+        INSERT INTO change_log (table_name, row_key, item_id, operation)
+        VALUES ('bom_components', OLD.bom_component_id, OLD.parent_item_id, 'DELETE');
+    END;
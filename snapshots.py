@@ -0,0 +1,194 @@
+"""
+釣り糸製造BOM管理システム 読み取り専用スナップショット
+
+全件エクスポート・一覧・積み上げ計算などの重い読み取りを、対話的な書き込みと同じDBファイルから
+切り離すため、SQLiteのオンラインバックアップAPIで一貫したコピー（スナップショット）を作成します。
+
+- 作成: 一時ファイルへバックアップ → 作成日時・データバージョンを snapshot_info に記録 →
+        os.replace で置き換え（読み取り中の接続は置き換え前のファイルを読み続ける）
+- 読み取り: BOMManager(snapshot_path, read_only=True)
+  （作成後は変更されないため immutable で開き、ロック・変更検知を省略）
+- データバージョン: 主要テーブルの件数と最終更新日時、変更履歴（change_log.py）の最新の通し番号から作る
+  フィンガープリント。ライブDBの値と比較すると、スナップショットが最新の内容かを判定できます
+
+使い方:
+    python snapshots.py bom_database_prod.db bom_database_prod_snapshot.db   # スナップショット作成
+    python snapshots.py bom_database_prod.db bom_database_prod_snapshot.db --info
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from profiler import connect as connect_sqlite
+
+# データバージョンの算出対象（件数と最終更新日時）
+DATA_VERSION_TABLES = ('items', 'bom_components', 'raw_materials', 'item_costs')
+
+SNAPSHOT_INFO_SQL = """
+CREATE TABLE snapshot_info (
+    created_at TEXT NOT NULL,
+    source_path TEXT NOT NULL,
+    data_version TEXT NOT NULL,
+    schema_version INTEGER NOT NULL,
+    copy_seconds REAL NOT NULL
+)
+"""
+
+
+def compute_data_version(conn: sqlite3.Connection) -> str:
+    """主要テーブルの件数と最終更新日時、変更履歴の最新の通し番号からデータバージョンを算出"""
+    digest = hashlib.sha1()
+    for table in DATA_VERSION_TABLES:
+        count, last_updated = conn.execute(
+            f"SELECT COUNT(*), MAX(updated_at) FROM {table}"
+        ).fetchone()
+        digest.update(f"{table}:{count}:{last_updated};".encode('utf-8'))
+    # 件数・更新日時が変わらない変更（削除と追加、更新日時を更新しない更新）も検知する
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone() \
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'").fetchone() else None
+    if row:
+        digest.update(f"change_log:{row[0]};".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def create_snapshot(source_path: str, snapshot_path: str) -> Dict[str, Any]:
+    """
+    ライブDBのスナップショットを作成（既存のスナップショットは置き換え）
+
+    バックアップは1回の読み取りトランザクションでコピーするため、WALモードでは
+    書き込みを妨げず、コピー開始時点の一貫した内容になります。
+
+    Returns:
+        スナップショット情報（read_snapshot_info と同じ形式）
+    """
+    temp_path = f"{snapshot_path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    started = time.perf_counter()
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(temp_path)
+    try:
+        source.backup(target)
+        copy_seconds = time.perf_counter() - started
+
+        # 読み取り専用で開けるよう -wal/-shm を使わないジャーナルモードにする
+        target.execute("PRAGMA journal_mode = DELETE")
+        with target:
+            target.execute("DROP TABLE IF EXISTS snapshot_info")
+            target.execute(SNAPSHOT_INFO_SQL)
+            target.execute("INSERT INTO snapshot_info VALUES (?, ?, ?, ?, ?)", (
+                datetime.now().isoformat(timespec='seconds'),
+                os.path.abspath(source_path),
+                compute_data_version(target),
+                target.execute("PRAGMA user_version").fetchone()[0],
+                round(copy_seconds, 3),
+            ))
+    finally:
+        target.close()
+        source.close()
+
+    os.replace(temp_path, snapshot_path)
+    return read_snapshot_info(snapshot_path)
+
+
+def connect_read_only(path: str) -> sqlite3.Connection:
+    """スナップショットを読み取り専用で開く"""
+    uri = f"file:{os.path.abspath(path)}?mode=ro&immutable=1"
+    return connect_sqlite(uri, uri=True)
+
+
+def read_snapshot_info(snapshot_path: str) -> Optional[Dict[str, Any]]:
+    """
+    スナップショットの作成日時・経過秒数・データバージョンを取得
+
+    Returns:
+        スナップショットがない場合None
+    """
+    if not os.path.exists(snapshot_path):
+        return None
+
+    conn = connect_read_only(snapshot_path)
+    try:
+        row = conn.execute("""
+            SELECT created_at, source_path, data_version, schema_version, copy_seconds
+            FROM snapshot_info
+        """).fetchone()
+    except sqlite3.DatabaseError:
+        return None
+    finally:
+        conn.close()
+    if not row:
+        return None
+
+    created_at, source_path, data_version, schema_version, copy_seconds = row
+    return {
+        'snapshot_path': snapshot_path,
+        'created_at': created_at,
+        'age_seconds': round((datetime.now() - datetime.fromisoformat(created_at)).total_seconds(), 1),
+        'source_path': source_path,
+        'data_version': data_version,
+        'schema_version': schema_version,
+        'copy_seconds': copy_seconds,
+        'size_bytes': os.path.getsize(snapshot_path),
+    }
+
+
+def run_snapshot_job(job, source_path: str, snapshot_path: str) -> Dict[str, Any]:
+    """スナップショット作成ジョブ（SyncJobRunner 用）"""
+    job.update_progress(message='スナップショットを作成中')
+    return create_snapshot(source_path, snapshot_path)
+
+
+def start_periodic_snapshots(runner, source_path: str, snapshot_path: str,
+                             interval_seconds: float) -> threading.Thread:
+    """
+    interval_seconds ごとにスナップショット作成ジョブを投入するデーモンスレッドを開始
+
+    作成中に次の周期が来た場合は runner の single-flight により重複して作成しません。
+    """
+    def loop():
+        while True:
+            runner.submit('snapshot', run_snapshot_job,
+                          source_path=source_path, snapshot_path=snapshot_path)
+            time.sleep(interval_seconds)
+
+    thread = threading.Thread(target=loop, name='snapshot-refresh', daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BOMデータベース スナップショット作成ツール')
+    parser.add_argument('db_path', help='ライブDBのパス')
+    parser.add_argument('snapshot_path', help='スナップショットのパス')
+    parser.add_argument('--info', action='store_true', help='作成せずに情報のみ表示')
+    args = parser.parse_args()
+
+    if args.info:
+        info = read_snapshot_info(args.snapshot_path)
+    else:
+        info = create_snapshot(args.db_path, args.snapshot_path)
+    if not info:
+        print("スナップショットがありません")
+        return
+
+    conn = sqlite3.connect(args.db_path)
+    try:
+        live_version = compute_data_version(conn)
+    finally:
+        conn.close()
+    print(f"作成日時: {info['created_at']}（{info['age_seconds']}秒前, コピー {info['copy_seconds']}秒）")
+    print(f"データバージョン: {info['data_version']}"
+          f"（ライブDB: {live_version}{', 最新' if live_version == info['data_version'] else ''}）")
+    print(f"サイズ: {info['size_bytes'] / 1024 / 1024:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
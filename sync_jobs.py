@@ -0,0 +1,294 @@
+"""
+釣り糸製造BOM管理システム バックグラウンド同期ジョブ
+
+Oracle同期などの長時間処理をWebワーカーから切り離し、プロセス内のスレッドで実行します。
+ジョブID・進捗・キャンセル・同時実行防止（single-flight）を提供します。
+"""
+
+import threading
+import traceback
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class JobCancelled(Exception):
+    """ジョブがキャンセルされたことを示す例外"""
+
+
+class SyncJob:
+    """バックグラウンドジョブの状態"""
+
+    ACTIVE_STATUSES = ('queued', 'running')
+
+    def __init__(self, job_type: str, params: Dict[str, Any]):
+        self.job_id = uuid.uuid4().hex
+        self.job_type = job_type
+        self.params = params
+        self.status = 'queued'
+        self.progress_done = 0
+        self.progress_total = 0
+        self.message = '待機中'
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in self.ACTIVE_STATUSES
+
+    def update_progress(self, done: int = None, total: int = None, message: str = None):
+        """進捗を更新します（ジョブ関数から呼び出し）"""
+        with self._lock:
+            if done is not None:
+                self.progress_done = done
+            if total is not None:
+                self.progress_total = total
+            if message is not None:
+                self.message = message
+
+    def check_cancelled(self):
+        """キャンセル要求があればJobCancelledを送出します（ジョブ関数から呼び出し）"""
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def request_cancel(self):
+        self._cancel_event.set()
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.progress_total
+            return {
+                'job_id': self.job_id,
+                'job_type': self.job_type,
+                'params': self.params,
+                'status': self.status,
+                'progress': {
+                    'done': self.progress_done,
+                    'total': total,
+                    'percent': round(self.progress_done * 100.0 / total, 1) if total else None,
+                    'message': self.message,
+                },
+                'cancel_requested': self._cancel_event.is_set(),
+                'result': self.result,
+                'error': self.error,
+                'created_at': self.created_at.isoformat(),
+                'started_at': self.started_at.isoformat() if self.started_at else None,
+                'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            }
+
+
+class SyncJobRunner:
+    """
+    プロセス内バックグラウンドジョブランナー
+
+    同時に実行できるジョブは1件のみ（single-flight）。実行中に投入された場合は
+    実行中のジョブを返します。
+    """
+
+    def __init__(self, max_history: int = 50):
+        """
+        Args:
+            max_history: 保持する完了済みジョブの最大件数
+        """
+        self.max_history = max_history
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, job_type: str, func: Callable[..., Any], **params) -> Tuple[SyncJob, bool]:
+        """
+        ジョブを投入します
+
+        Args:
+            job_type: ジョブ種別（表示用）
+            func: func(job, **params) 形式のジョブ関数
+            **params: ジョブ関数に渡すパラメータ
+
+        Returns:
+            (ジョブ, 新規に開始した場合True / 実行中ジョブを返した場合False)
+        """
+        with self._lock:
+            active = self._active_job()
+            if active:
+                return active, False
+
+            job = SyncJob(job_type, {k: v for k, v in params.items() if _is_plain(v)})
+            self._jobs[job.job_id] = job
+            self._trim_history()
+
+        thread = threading.Thread(target=self._run, args=(job, func, params),
+                                  name=f"sync-job-{job.job_id[:8]}", daemon=True)
+        thread.start()
+        return job, True
+
+    def get(self, job_id: str) -> Optional[SyncJob]:
+        """ジョブIDからジョブを取得します"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[SyncJob]:
+        """新しい順にジョブ一覧を取得します"""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def active_job(self) -> Optional[SyncJob]:
+        """実行中（または待機中）のジョブを取得します"""
+        with self._lock:
+            return self._active_job()
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        ジョブにキャンセルを要求します
+
+        Returns:
+            bool: 実行中のジョブにキャンセルを要求した場合True
+        """
+        job = self.get(job_id)
+        if not job or not job.is_active:
+            return False
+        job.request_cancel()
+        return True
+
+    def _active_job(self) -> Optional[SyncJob]:
+        for job in self._jobs.values():
+            if job.is_active:
+                return job
+        return None
+
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self._jobs.items() if not job.is_active]
+        for job_id in finished[:max(0, len(self._jobs) - self.max_history)]:
+            del self._jobs[job_id]
+
+    def _run(self, job: SyncJob, func: Callable[..., Any], params: Dict[str, Any]):
+        job.status = 'running'
+        job.started_at = datetime.now()
+        job.update_progress(message='実行中')
+        try:
+            job.check_cancelled()
+            job.result = func(job, **params)
+            job.status = 'succeeded'
+            job.update_progress(message='完了')
+        except JobCancelled:
+            job.status = 'cancelled'
+            job.update_progress(message='キャンセルされました')
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            job.update_progress(message='エラーが発生しました')
+            traceback.print_exc()
+        finally:
+            job.finished_at = datetime.now()
+
+
+def _is_plain(value) -> bool:
+    return value is None or isinstance(value, (str, int, float, bool))
+
+
+def run_oracle_sync(job: SyncJob, connector, sync_type: str = 'products',
+                    update_existing: bool = False, batch_size: int = 5000,
+                    limit: Optional[int] = None, series_filter: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Oracle同期ジョブ本体
+
+    取得したデータをbatch_size件ずつ同期し、バッチ間で進捗更新とキャンセル確認を行います。
+    キャンセル時は同期済みのバッチまでを 'partial' として同期ログに記録します。
+
+    Args:
+        job: 実行中のジョブ
+        connector: OracleConnector
+        sync_type: 'products', 'materials', 'full'
+        update_existing: 既存データの更新を行うか
+        batch_size: 1バッチあたりの件数
+        limit: 製品取得件数制限
+        series_filter: シリーズ名フィルター
+
+    Returns:
+        同期種別ごとの件数
+    """
+    if sync_type not in ('products', 'materials', 'full'):
+        raise ValueError(f"無効な同期種別: {sync_type}")
+
+    results = {}
+
+    if sync_type in ('products', 'full'):
+        # 既存製品のハッシュはジョブで1回だけ読み込み、バッチ間で共有する
+        product_hashes: Dict[str, str] = {}
+
+        def fetch_products():
+            products = connector.get_products_from_oracle(limit=limit, series_filter=series_filter)
+            product_hashes.update(connector.load_product_hashes())
+            return products
+
+        def sync_product_batch(batch):
+            added, updated, skipped = connector.sync_products_to_sqlite(
+                batch, update_existing=update_existing, existing_hashes=product_hashes
+            )
+            return {'added': added, 'updated': updated, 'skipped': skipped}
+
+        results['products'] = _sync_in_batches(job, connector, 'products', fetch_products,
+                                               sync_product_batch, batch_size, '製品マスタ')
+
+    if sync_type in ('materials', 'full'):
+        # 既存原材料の値も同様に1回だけ読み込む
+        material_values: Dict[str, tuple] = {}
+
+        def fetch_materials():
+            materials = connector.get_materials_from_oracle()
+            material_values.update(connector.load_material_values())
+            # 同じコードが別のバッチで2回数えられないよう、ジョブ全体で重複を除く
+            return connector.dedupe_materials(materials)
+
+        def sync_material_batch(batch):
+            added, updated, unchanged, skipped_changed = connector.sync_materials_to_sqlite(
+                batch, update_existing=update_existing, existing=material_values
+            )
+            return {'added': added, 'updated': updated, 'skipped': unchanged,
+                    'skipped_changed': skipped_changed}
+
+        results['materials'] = _sync_in_batches(job, connector, 'materials', fetch_materials,
+                                                sync_material_batch, batch_size, '原材料マスタ')
+
+    return results
+
+
+def _sync_in_batches(job: SyncJob, connector, log_type: str,
+                     fetch_records: Callable[[], List[Dict[str, Any]]],
+                     sync_batch: Callable[[List[Dict[str, Any]]], Dict[str, int]],
+                     batch_size: int, label: str) -> Dict[str, int]:
+    """Oracleからの取得とバッチ単位の同期を行い、結果を同期ログに記録（取得の失敗も記録）"""
+    totals = {'processed': 0, 'added': 0, 'updated': 0, 'skipped': 0, 'skipped_changed': 0}
+
+    try:
+        job.update_progress(done=0, total=0, message=f'Oracle{label}を取得中')
+        records = fetch_records()
+        job.update_progress(done=0, total=len(records), message=f'{label}を同期中')
+        for start in range(0, len(records), batch_size):
+            job.check_cancelled()
+            batch = records[start:start + batch_size]
+            for key, value in sync_batch(batch).items():
+                totals[key] += value
+            totals['processed'] += len(batch)
+            job.update_progress(done=totals['processed'])
+    except JobCancelled:
+        connector.log_sync_operation(log_type, 'partial', processed=totals['processed'],
+                                     updated=totals['updated'], added=totals['added'],
+                                     skipped=totals['skipped'], skipped_changed=totals['skipped_changed'],
+                                     error_message='ユーザーによりキャンセルされました')
+        raise
+    except Exception as e:
+        connector.log_sync_operation(log_type, 'failed', processed=totals['processed'],
+                                     updated=totals['updated'], added=totals['added'],
+                                     skipped=totals['skipped'], skipped_changed=totals['skipped_changed'],
+                                     error_message=str(e))
+        raise
+
+    connector.log_sync_operation(log_type, 'success', processed=totals['processed'],
+                                 updated=totals['updated'], added=totals['added'],
+                                 skipped=totals['skipped'], skipped_changed=totals['skipped_changed'])
+    return totals
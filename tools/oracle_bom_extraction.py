@@ -109,21 +109,25 @@ def extract_bom_structure():
         
         if パターンデータ:
             print("複数品目を使用する製造パターン:")
+            
+            # 対象見出しIDの投入内容を1クエリでまとめて取得（見出しIDごとの個別クエリを回避）
+            binds = {f"id{i}": row[0] for i, row in enumerate(パターンデータ)}
+            cursor.execute(f"""
+                SELECT 見出しID, 品目コード, SUM(投入数量) as 総量, COUNT(*) as 回数
+                FROM T_製紐_日報_明細_投入
+                WHERE 見出しID IN ({', '.join(':' + name for name in binds)})
+                AND 品目コード IS NOT NULL
+                GROUP BY 見出しID, 品目コード
+                ORDER BY 見出しID, 総量 DESC
+            """, binds)
+            
+            詳細データ = {}
+            for detail in cursor.fetchall():
+                詳細データ.setdefault(detail[0], []).append(detail[1:])
+            
             for row in パターンデータ:
                 print(f"  見出しID: {row[0]:<10} 使用品目種類数: {row[1]}")
-                
-                # 各見出しIDの詳細投入内容を取得
-                cursor.execute("""
-                    SELECT 品目コード, SUM(投入数量) as 総量, COUNT(*) as 回数
-                    FROM T_製紐_日報_明細_投入
-                    WHERE 見出しID = :見出しID
-                    AND 品目コード IS NOT NULL
-                    GROUP BY 品目コード
-                    ORDER BY 総量 DESC
-                """, {"見出しID": row[0]})
-                
-                詳細データ = cursor.fetchall()
-                for detail in 詳細データ:
+                for detail in 詳細データ.get(row[0], []):
                     print(f"    📦 {detail[0]:<15} 総量:{detail[1]:<10.2f} 使用回数:{detail[2]}")
                 print()
         
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+製造日報からのBOM構成推定パイプライン
+- T_製紐_日報_明細_投入 を生産品目（T_製紐_日報_明細_設定）と結合して期間分を一括取得
+- pandasのgroup-byで 親品目→投入品目 の関係と生産1単位あたりの平均投入量を算出
+- 結果を bom_component_proposals にレビュー待ちの候補として保存（bom_componentsへは承認時に反映）
+
+使用例:
+    python tools/oracle_bom_inference.py bom_database_dev.db                 # 直近1年分を推定
+    python tools/oracle_bom_inference.py bom_database_dev.db --standin oracle_standin.db
+    python tools/oracle_bom_inference.py bom_database_dev.db --approve 12 --component-item-id PS_001
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from oracle_connector import OracleConnector
+from bom_effectivity import check_overlap
+from bom_levels import propagate_low_level_code
+from cost_rollup import rollup_costs_for
+
+logger = logging.getLogger(__name__)
+
+# 1回の製紐作業（見出しID）の投入明細と、その作業で生産した品目・数量を一括取得
+INPUT_RECORDS_QUERY = """
+    SELECT
+        i.見出しID,
+        s.品目コード,
+        s.生産数量,
+        i.品目コード,
+        i.投入数量
+    FROM T_製紐_日報_明細_投入 i
+    JOIN T_製紐_日報_明細_設定 s ON s.見出しID = i.見出しID
+    WHERE i.作業日時 >= TO_DATE(:date_from, 'YYYY-MM-DD')
+    AND i.作業日時 < TO_DATE(:date_to, 'YYYY-MM-DD')
+    AND s.品目コード IS NOT NULL
+"""
+
+INPUT_RECORD_COLUMNS = ['header_id', 'parent_code', 'output_qty', 'component_code', 'input_qty']
+
+
+class BOMInferencePipeline:
+    """製造日報投入実績からBOM構成候補を推定するバッチパイプライン"""
+
+    def __init__(self, connector: OracleConnector, min_runs: int = 3,
+                 min_support: float = 0.5, fetch_size: int = 50000):
+        """
+        Args:
+            connector: Oracle連携（取得元Oracle・保存先SQLite）
+            min_runs: 候補とする最小出現作業数
+            min_support: 親品目の作業のうち投入品目が使われた割合の下限
+            fetch_size: Oracleからの一括取得サイズ（fetchmany）
+        """
+        self.connector = connector
+        self.min_runs = min_runs
+        self.min_support = min_support
+        self.fetch_size = fetch_size
+
+    def fetch_input_records(self, date_from: date, date_to: date) -> pd.DataFrame:
+        """期間内の投入明細を1クエリで取得（date_toは当日を含む）"""
+        oracle_conn = self.connector.get_oracle_connection()
+
+        try:
+            cursor = oracle_conn.cursor()
+            cursor.arraysize = self.fetch_size
+            cursor.execute(INPUT_RECORDS_QUERY, {
+                'date_from': date_from.isoformat(),
+                'date_to': (date_to + timedelta(days=1)).isoformat(),
+            })
+
+            rows = []
+            while True:
+                batch = cursor.fetchmany(self.fetch_size)
+                if not batch:
+                    break
+                rows.extend(batch)
+
+            logger.info(f"投入明細取得完了: {len(rows)}件 ({date_from} 〜 {date_to})")
+            return pd.DataFrame.from_records(rows, columns=INPUT_RECORD_COLUMNS)
+
+        finally:
+            oracle_conn.close()
+
+    def infer(self, records: pd.DataFrame) -> pd.DataFrame:
+        """
+        投入明細から 親品目→投入品目 の候補を算出
+
+        quantity_per_unit は投入品目を使った作業における 総投入量 / 総生産数量。
+        support_ratio は親品目の全作業のうち、その投入品目が使われた作業の割合。
+
+        Returns:
+            候補のDataFrame（親品目・投入品目ごとに1行）
+        """
+        records = records[records['output_qty'] > 0]
+
+        # 作業（見出しID）単位の生産数量と、親品目ごとの作業数
+        runs = records.drop_duplicates('header_id')[['header_id', 'parent_code', 'output_qty']]
+        parent_runs = runs.groupby('parent_code').agg(
+            parent_run_count=('header_id', 'size'),
+        )
+
+        # 作業 × 投入品目 単位に集約し、生産1単位あたりの投入量を算出
+        per_run = (
+            records.dropna(subset=['component_code'])
+            .groupby(['parent_code', 'component_code', 'header_id'], sort=False)
+            .agg(input_qty=('input_qty', 'sum'), output_qty=('output_qty', 'first'))
+            .reset_index()
+        )
+        per_run['ratio'] = per_run['input_qty'] / per_run['output_qty']
+
+        proposals = (
+            per_run.groupby(['parent_code', 'component_code'])
+            .agg(
+                run_count=('header_id', 'size'),
+                total_input_quantity=('input_qty', 'sum'),
+                total_output_quantity=('output_qty', 'sum'),
+                ratio_mean=('ratio', 'mean'),
+                ratio_std=('ratio', 'std'),
+            )
+            .join(parent_runs, on='parent_code')
+            .reset_index()
+        )
+
+        proposals['quantity_per_unit'] = (
+            proposals['total_input_quantity'] / proposals['total_output_quantity']
+        )
+        proposals['support_ratio'] = proposals['run_count'] / proposals['parent_run_count']
+        proposals['quantity_cv'] = (proposals['ratio_std'] / proposals['ratio_mean']).fillna(0.0)
+
+        mask = (proposals['run_count'] >= self.min_runs) & (proposals['support_ratio'] >= self.min_support)
+        return proposals[mask].drop(columns=['ratio_mean', 'ratio_std']).reset_index(drop=True)
+
+    def write_proposals(self, proposals: pd.DataFrame, date_from: date, date_to: date) -> int:
+        """
+        候補を bom_component_proposals に保存
+
+        同じ 親品目・投入品目 の候補はレビュー前（proposed）のものだけ最新の推定値で置き換え、
+        承認・却下済みの候補は変更しない。
+        """
+        rows = [
+            (
+                row.parent_code, row.component_code, row.parent_code, row.component_code,
+                row.component_code, float(row.quantity_per_unit), int(row.run_count),
+                int(row.parent_run_count), float(row.support_ratio), float(row.quantity_cv),
+                float(row.total_input_quantity), float(row.total_output_quantity),
+                date_from.isoformat(), date_to.isoformat()
+            )
+            for row in proposals.itertuples(index=False)
+        ]
+
+        sqlite_conn = self.connector.get_sqlite_connection()
+
+        try:
+            sqlite_conn.executemany("""
+                INSERT INTO bom_component_proposals (
+                    parent_oracle_code, component_oracle_code,
+                    parent_item_id, component_item_id, usage_type,
+                    quantity_per_unit, run_count, parent_run_count,
+                    support_ratio, quantity_cv,
+                    total_input_quantity, total_output_quantity,
+                    period_from, period_to
+                ) VALUES (
+                    ?, ?,
+                    (SELECT item_id FROM items WHERE oracle_product_code = ?),
+                    (SELECT item_id FROM items WHERE oracle_product_code = ?),
+                    CASE (SELECT material_category FROM raw_materials WHERE oracle_item_code = ?)
+                        WHEN '木管糸' THEN 'Main Braid Thread'
+                        ELSE 'Main Material'
+                    END,
+                    ?, ?, ?, ?, ?, ?, ?, ?, ?
+                )
+                ON CONFLICT(parent_oracle_code, component_oracle_code) DO UPDATE SET
+                    parent_item_id = excluded.parent_item_id,
+                    component_item_id = excluded.component_item_id,
+                    usage_type = excluded.usage_type,
+                    quantity_per_unit = excluded.quantity_per_unit,
+                    run_count = excluded.run_count,
+                    parent_run_count = excluded.parent_run_count,
+                    support_ratio = excluded.support_ratio,
+                    quantity_cv = excluded.quantity_cv,
+                    total_input_quantity = excluded.total_input_quantity,
+                    total_output_quantity = excluded.total_output_quantity,
+                    period_from = excluded.period_from,
+                    period_to = excluded.period_to,
+                    created_at = CURRENT_TIMESTAMP
+                WHERE bom_component_proposals.status = 'proposed'
+            """, rows)
+            sqlite_conn.commit()
+            return len(rows)
+
+        finally:
+            sqlite_conn.close()
+
+    def run(self, date_from: Optional[date] = None, date_to: Optional[date] = None) -> Dict[str, Any]:
+        """期間（既定: 直近1年）の投入明細から候補を推定して保存"""
+        date_to = date_to or date.today()
+        date_from = date_from or date_to - timedelta(days=365)
+
+        started = time.perf_counter()
+        records = self.fetch_input_records(date_from, date_to)
+        fetched_at = time.perf_counter()
+        proposals = self.infer(records)
+        inferred_at = time.perf_counter()
+        written = self.write_proposals(proposals, date_from, date_to)
+
+        summary = {
+            'period_from': date_from.isoformat(),
+            'period_to': date_to.isoformat(),
+            'input_records': len(records),
+            'production_runs': int(records['header_id'].nunique()),
+            'proposals': written,
+            'fetch_seconds': round(fetched_at - started, 3),
+            'infer_seconds': round(inferred_at - fetched_at, 3),
+            'write_seconds': round(time.perf_counter() - inferred_at, 3),
+        }
+        logger.info(f"BOM構成候補推定完了: {summary}")
+        return summary
+
+
+def approve_proposal(sqlite_path: str, proposal_id: int, component_item_id: Optional[str] = None,
+                     parent_item_id: Optional[str] = None, usage_type: Optional[str] = None) -> bool:
+    """
+    候補を承認し bom_components に登録
+
+    親・構成部品のアイテムIDが未解決の候補は、引数で明示的に指定する必要がある。
+
+    Returns:
+        bool: 登録に成功した場合True
+    """
+    sqlite_conn = sqlite3.connect(sqlite_path)
+    sqlite_conn.row_factory = sqlite3.Row
+
+    try:
+        proposal = sqlite_conn.execute(
+            "SELECT * FROM bom_component_proposals WHERE proposal_id = ? AND status = 'proposed'",
+            (proposal_id,)
+        ).fetchone()
+        if not proposal:
+            logger.error(f"レビュー待ちの候補が見つかりません: {proposal_id}")
+            return False
+
+        parent_item_id = parent_item_id or proposal['parent_item_id']
+        component_item_id = component_item_id or proposal['component_item_id']
+        if not parent_item_id or not component_item_id:
+            logger.error(f"アイテムIDが未解決です（親: {parent_item_id}, 構成部品: {component_item_id}）")
+            return False
+
+        sqlite_conn.execute("PRAGMA foreign_keys = ON")
+        check_overlap(sqlite_conn, parent_item_id, component_item_id,
+                      usage_type or proposal['usage_type'], None, None)
+        sqlite_conn.execute("""
+            INSERT INTO bom_components (parent_item_id, component_item_id, quantity, usage_type, remarks)
+            VALUES (?, ?, ?, ?, ?)
+        """, (parent_item_id, component_item_id, proposal['quantity_per_unit'],
+              usage_type or proposal['usage_type'],
+              f"製造日報より推定 ({proposal['period_from']}〜{proposal['period_to']}, "
+              f"{proposal['run_count']}作業)"))
+        propagate_low_level_code(sqlite_conn, parent_item_id, component_item_id)
+        rollup_costs_for(sqlite_conn, [parent_item_id])
+        sqlite_conn.execute("""
+            UPDATE bom_component_proposals
+            SET status = 'approved', parent_item_id = ?, component_item_id = ?,
+                reviewed_at = CURRENT_TIMESTAMP
+            WHERE proposal_id = ?
+        """, (parent_item_id, component_item_id, proposal_id))
+        sqlite_conn.commit()
+        return True
+
+    except Exception as e:
+        sqlite_conn.rollback()
+        logger.error(f"候補承認エラー: {e}")
+        return False
+
+    finally:
+        sqlite_conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='製造日報からのBOM構成推定')
+    parser.add_argument('sqlite_path', help='候補を保存するBOMデータベース')
+    parser.add_argument('--date-from', type=date.fromisoformat, help='対象期間開始日 (YYYY-MM-DD)')
+    parser.add_argument('--date-to', type=date.fromisoformat, help='対象期間終了日 (YYYY-MM-DD)')
+    parser.add_argument('--min-runs', type=int, default=3, help='最小出現作業数')
+    parser.add_argument('--min-support', type=float, default=0.5, help='最小使用率')
+    parser.add_argument('--standin', metavar='PATH', help='Oracleの代わりにスタンドインDBを使用')
+    parser.add_argument('--approve', type=int, metavar='PROPOSAL_ID', help='候補を承認してBOMに登録')
+    parser.add_argument('--parent-item-id', help='承認時の親アイテムID（未解決の場合）')
+    parser.add_argument('--component-item-id', help='承認時の構成部品アイテムID（未解決の場合）')
+    parser.add_argument('--usage-type', help='承認時の用途タイプ')
+    args = parser.parse_args()
+
+    if args.approve:
+        success = approve_proposal(args.sqlite_path, args.approve,
+                                   component_item_id=args.component_item_id,
+                                   parent_item_id=args.parent_item_id,
+                                   usage_type=args.usage_type)
+        print("✅ 候補を承認しました" if success else "❌ 候補の承認に失敗しました")
+        sys.exit(0 if success else 1)
+
+    driver = None
+    if args.standin:
+        from oracle_standin import OracleStandin
+        driver = OracleStandin(args.standin)
+
+    connector = OracleConnector(sqlite_path=args.sqlite_path, driver=driver)
+    pipeline = BOMInferencePipeline(connector, min_runs=args.min_runs, min_support=args.min_support)
+    summary = pipeline.run(args.date_from, args.date_to)
+
+    print("=" * 60)
+    print("BOM構成候補推定結果")
+    print("=" * 60)
+    for key, value in summary.items():
+        print(f"  {key:<18} {value}")
+
+
+if __name__ == "__main__":
+    main()
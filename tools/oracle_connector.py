@@ -4,19 +4,40 @@ Oracle Database 連携モジュール
 - リードオンリー接続でOracleから製品・原材料データを取得
 - SQLiteへの選択的同期機能
 - 同期ログ管理
+- driver 引数でスタンドイン（tools/oracle_standin.py）に接続先を切り替え可能
 """
 
-import cx_Oracle
 import sqlite3
 import json
+import hashlib
 import logging
 from datetime import datetime
 from typing import List, Dict, Any, Optional, Tuple
 
+try:
+    import cx_Oracle
+except ImportError:  # スタンドイン利用時はcx_Oracle不要
+    cx_Oracle = None
+
 # ログ設定
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 製品同期でSQLiteに書き込むOracle項目（内容ハッシュの対象）
+PRODUCT_SYNC_FIELDS = (
+    'item_name', 'yarn_composition', 'series_name', 'length_m', 'color',
+    'knit_type', 'yarn_type', 'raw_num', 'production_num',
+    'core_yarn_type', 'spool_type'
+)
+
+# 原材料同期で比較・書き込みする項目（raw_materials のカラム名）
+MATERIAL_SYNC_FIELDS = (
+    'material_name', 'material_category', 'yarn_type', 'ps_value',
+    'ps_yarn_value', 'twist_direction', 'winding_length'
+)
+MATERIAL_NUMERIC_FIELDS = ('ps_value', 'ps_yarn_value', 'winding_length')
+MATERIAL_WRITE_BATCH_SIZE = 1000
+
 class OracleConnector:
     """Oracle DB連携クラス（リードオンリー）"""
     
@@ -26,33 +47,42 @@ class OracleConnector:
                  oracle_service: str = "orcl",
                  oracle_user: str = "ygk_pcs",
                  oracle_password: str = "ygkpcs",
-                 sqlite_path: str = "bom_database.db"):
+                 sqlite_path: str = "bom_database.db",
+                 driver=None):
         """
         Oracle連携クラスを初期化
         
         Args:
             oracle_*: Oracle DB接続パラメータ
-            sqlite_path: SQLiteデータベースファイルパス
+            sqlite_path: SQLiteデータベースファイルパス（migrations.apply_migrations で最新のスキーマにしたDB）
+            driver: connect()/Error を持つDB-APIドライバ（省略時はcx_Oracle）
         """
         self.oracle_dsn = f"{oracle_host}:{oracle_port}/{oracle_service}"
         self.oracle_user = oracle_user
         self.oracle_password = oracle_password
         self.sqlite_path = sqlite_path
         
-        # Oracle Instant Client初期化
-        try:
-            cx_Oracle.init_oracle_client(lib_dir="/usr/local/lib")
-        except Exception as e:
-            if "has already been initialized" not in str(e):
-                logger.warning(f"Oracle Client初期化警告: {e}")
+        if driver is None:
+            if cx_Oracle is None:
+                raise ImportError("cx_Oracleが見つかりません。driverにスタンドインを指定してください")
+            driver = cx_Oracle
+            
+            # Oracle Instant Client初期化
+            try:
+                cx_Oracle.init_oracle_client(lib_dir="/usr/local/lib")
+            except Exception as e:
+                if "has already been initialized" not in str(e):
+                    logger.warning(f"Oracle Client初期化警告: {e}")
+        
+        self.driver = driver
     
-    def get_oracle_connection(self) -> cx_Oracle.Connection:
+    def get_oracle_connection(self):
         """Oracle DB接続を取得（リードオンリー）"""
         try:
-            connection = cx_Oracle.connect(self.oracle_user, self.oracle_password, self.oracle_dsn)
+            connection = self.driver.connect(self.oracle_user, self.oracle_password, self.oracle_dsn)
             logger.info("Oracle DB接続成功")
             return connection
-        except cx_Oracle.Error as e:
+        except self.driver.Error as e:
             logger.error(f"Oracle DB接続エラー: {e}")
             raise
     
@@ -227,64 +257,65 @@ class OracleConnector:
         finally:
             oracle_conn.close()
     
+    def load_product_hashes(self) -> Dict[str, str]:
+        """同期済み製品の {oracle_product_code: oracle_content_hash} を一括取得"""
+        sqlite_conn = self.get_sqlite_connection()
+        
+        try:
+            cursor = sqlite_conn.cursor()
+            cursor.execute("""
+                SELECT oracle_product_code, oracle_content_hash
+                FROM items
+                WHERE oracle_product_code IS NOT NULL
+            """)
+            return {row[0]: row[1] for row in cursor.fetchall()}
+            
+        finally:
+            sqlite_conn.close()
+    
     def sync_products_to_sqlite(self, products: List[Dict[str, Any]], 
-                               update_existing: bool = False) -> Tuple[int, int]:
+                               update_existing: bool = False,
+                               existing_hashes: Optional[Dict[str, str]] = None) -> Tuple[int, int, int]:
         """
         製品データをSQLiteに同期
         
+        既存レコードは同期対象項目のハッシュ（oracle_content_hash）と一括で照合し、
+        内容が変わった行のみを書き込む。
+        
         Args:
             products: 製品データリスト
             update_existing: 既存データの更新を行うか
+            existing_hashes: load_product_hashes の結果（バッチ単位で呼び出す場合に渡す。
+                             書き込んだ行のハッシュで更新される）。省略時はDBから読み込む
         
         Returns:
-            (追加件数, 更新件数)
+            (追加件数, 更新件数, ハッシュ一致によるスキップ件数)
         """
+        if existing_hashes is None:
+            existing_hashes = self.load_product_hashes()
+        
         sqlite_conn = self.get_sqlite_connection()
         
         try:
             cursor = sqlite_conn.cursor()
-            added_count = 0
-            updated_count = 0
+            
+            insert_rows = []
+            update_rows = []
+            skipped_count = 0
             
             for product in products:
                 oracle_code = product['oracle_product_code']
+                content_hash = self._product_content_hash(product)
                 
-                # 既存レコード確認
-                cursor.execute(
-                    "SELECT COUNT(*) FROM items WHERE oracle_product_code = ?",
-                    (oracle_code,)
-                )
-                exists = cursor.fetchone()[0] > 0
-                
-                if exists and not update_existing:
-                    continue
-                
-                # アイテムIDの生成
-                item_id = f"ORACLE_{oracle_code}"
-                
-                # アイテムタイプの推定
-                item_type = self._estimate_item_type(product)
-                
-                if exists:
-                    # 更新
-                    cursor.execute("""
-                        UPDATE items SET
-                            item_name = ?,
-                            yarn_composition = ?,
-                            series_name = ?,
-                            length_m = ?,
-                            color = ?,
-                            knit_type = ?,
-                            yarn_type = ?,
-                            raw_num = ?,
-                            production_num = ?,
-                            core_yarn_type = ?,
-                            spool_type = ?,
-                            oracle_sync_status = 'synced',
-                            oracle_last_sync = CURRENT_TIMESTAMP,
-                            updated_at = CURRENT_TIMESTAMP
-                        WHERE oracle_product_code = ?
-                    """, (
+                if oracle_code in existing_hashes:
+                    if not update_existing:
+                        continue
+                    if existing_hashes[oracle_code] == content_hash:
+                        skipped_count += 1
+                        continue
+                    
+                    existing_hashes[oracle_code] = content_hash
+                    update_rows.append((
                         product['item_name'],
                         product['yarn_composition'],
                         product['series_name'],
@@ -296,36 +327,15 @@ class OracleConnector:
                         product['production_num'],
                         product['core_yarn_type'],
                         product['spool_type'],
+                        content_hash,
                         oracle_code
                     ))
-                    updated_count += 1
                 else:
-                    # 新規追加
-                    cursor.execute("""
-                        INSERT INTO items (
-                            item_id,
-                            oracle_product_code,
-                            item_name,
-                            item_type,
-                            unit_of_measure,
-                            yarn_composition,
-                            series_name,
-                            length_m,
-                            color,
-                            knit_type,
-                            yarn_type,
-                            raw_num,
-                            production_num,
-                            core_yarn_type,
-                            spool_type,
-                            oracle_sync_status,
-                            oracle_last_sync
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'synced', CURRENT_TIMESTAMP)
-                    """, (
-                        item_id,
+                    insert_rows.append((
+                        f"ORACLE_{oracle_code}",  # アイテムIDの生成
                         oracle_code,
                         product['item_name'],
-                        item_type,
+                        self._estimate_item_type(product),
                         'M',  # デフォルト単位
                         product['yarn_composition'],
                         product['series_name'],
@@ -336,77 +346,240 @@ class OracleConnector:
                         product['raw_num'],
                         product['production_num'],
                         product['core_yarn_type'],
-                        product['spool_type']
+                        product['spool_type'],
+                        content_hash
                     ))
-                    added_count += 1
+                    # 同一バッチ内の重複コードは最初の1件のみ追加
+                    existing_hashes[oracle_code] = content_hash
+            
+            if update_rows:
+                cursor.executemany("""
+                    UPDATE items SET
+                        item_name = ?,
+                        yarn_composition = ?,
+                        series_name = ?,
+                        length_m = ?,
+                        color = ?,
+                        knit_type = ?,
+                        yarn_type = ?,
+                        raw_num = ?,
+                        production_num = ?,
+                        core_yarn_type = ?,
+                        spool_type = ?,
+                        oracle_content_hash = ?,
+                        oracle_sync_status = 'synced',
+                        oracle_last_sync = CURRENT_TIMESTAMP,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE oracle_product_code = ?
+                """, update_rows)
+            
+            if insert_rows:
+                cursor.executemany("""
+                    INSERT INTO items (
+                        item_id,
+                        oracle_product_code,
+                        item_name,
+                        item_type,
+                        unit_of_measure,
+                        yarn_composition,
+                        series_name,
+                        length_m,
+                        color,
+                        knit_type,
+                        yarn_type,
+                        raw_num,
+                        production_num,
+                        core_yarn_type,
+                        spool_type,
+                        oracle_content_hash,
+                        oracle_sync_status,
+                        oracle_last_sync
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'synced', CURRENT_TIMESTAMP)
+                """, insert_rows)
             
             sqlite_conn.commit()
-            logger.info(f"SQLite同期完了: 追加{added_count}件, 更新{updated_count}件")
-            return added_count, updated_count
+            added_count = len(insert_rows)
+            updated_count = len(update_rows)
+            logger.info(f"SQLite同期完了: 追加{added_count}件, 更新{updated_count}件, "
+                        f"変更なしスキップ{skipped_count}件")
+            return added_count, updated_count, skipped_count
             
         finally:
             sqlite_conn.close()
     
-    def sync_materials_to_sqlite(self, materials: List[Dict[str, Any]]) -> int:
+    def sync_products(self, limit: Optional[int] = None,
+                      series_filter: Optional[str] = None,
+                      update_existing: bool = False) -> Dict[str, Any]:
         """
-        原材料データをSQLiteに同期
+        製品マスタの取得・同期・ログ記録を一括で実行
+        
+        Args:
+            limit: 取得件数制限
+            series_filter: シリーズ名フィルター
+            update_existing: 既存データの更新を行うか
+        
+        Returns:
+            同期結果（処理件数・追加・更新・スキップ件数・スキップ率）
+        """
+        try:
+            products = self.get_products_from_oracle(limit=limit, series_filter=series_filter)
+            added, updated, skipped = self.sync_products_to_sqlite(
+                products, update_existing=update_existing
+            )
+        except Exception as e:
+            self.log_sync_operation('products', 'failed', error_message=str(e))
+            raise
+        
+        processed = len(products)
+        self.log_sync_operation('products', 'success', processed=processed,
+                                updated=updated, added=added, skipped=skipped)
+        
+        return {
+            'processed': processed,
+            'added': added,
+            'updated': updated,
+            'skipped': skipped,
+            'skip_rate': skipped / processed if processed else 0.0
+        }
+    
+    def load_material_values(self) -> Dict[str, tuple]:
+        """同期済み原材料の {oracle_item_code: 正規化した同期対象項目の値} を一括取得"""
+        sqlite_conn = self.get_sqlite_connection()
+        
+        try:
+            cursor = sqlite_conn.cursor()
+            cursor.execute(f"""
+                SELECT oracle_item_code, {', '.join(MATERIAL_SYNC_FIELDS)}
+                FROM raw_materials
+                WHERE oracle_item_code IS NOT NULL
+            """)
+            return {
+                row[0]: self._normalize_material_values(row[1:])
+                for row in cursor.fetchall()
+            }
+            
+        finally:
+            sqlite_conn.close()
+    
+    def dedupe_materials(self, materials: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """同じ oracle_item_code の重複を最後の値のみにする（最初に現れた位置の順）"""
+        return list({material['oracle_item_code']: material for material in materials}.values())
+    
+    def sync_materials_to_sqlite(self, materials: List[Dict[str, Any]],
+                                 update_existing: bool = False,
+                                 existing: Optional[Dict[str, tuple]] = None) -> Tuple[int, int, int, int]:
+        """
+        原材料データをSQLiteに同期（oracle_item_code をキーにした一括UPSERT）
+        
+        既存レコードを一括で読み込んで同期対象項目を比較し、
+        追加・変更のあった行だけをbatch単位のexecutemanyで書き込む。
+        同じ oracle_item_code が複数含まれる場合は最後の値のみを1件として数える。
         
         Args:
             materials: 原材料データリスト
+            update_existing: 既存データの更新を行うか
+            existing: load_material_values の結果（バッチ単位で呼び出す場合に渡す。
+                      書き込んだ行の値で更新される）。省略時はDBから読み込む
         
         Returns:
-            追加件数
+            (追加件数, 更新件数, 変更なし件数, 変更ありだが更新しなかった件数)
+            変更ありだが更新しなかった件数は update_existing=False の場合のみ
         """
+        if existing is None:
+            existing = self.load_material_values()
+        
         sqlite_conn = self.get_sqlite_connection()
         
         try:
             cursor = sqlite_conn.cursor()
+            
+            upsert_rows = []
             added_count = 0
+            updated_count = 0
+            unchanged_count = 0
+            skipped_changed_count = 0
             
-            for material in materials:
+            for material in self.dedupe_materials(materials):
                 oracle_code = material['oracle_item_code']
+                values = tuple(material.get(field) for field in MATERIAL_SYNC_FIELDS)
+                normalized = self._normalize_material_values(values)
                 
-                # 既存確認
-                cursor.execute(
-                    "SELECT COUNT(*) FROM raw_materials WHERE oracle_item_code = ?",
-                    (oracle_code,)
-                )
-                
-                if cursor.fetchone()[0] == 0:
-                    # 新規追加
-                    cursor.execute("""
-                        INSERT INTO raw_materials (
-                            oracle_item_code,
-                            material_name,
-                            material_category,
-                            yarn_type,
-                            ps_value,
-                            ps_yarn_value,
-                            twist_direction,
-                            winding_length
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        oracle_code,
-                        material.get('material_name'),
-                        material.get('material_category'),
-                        material.get('yarn_type'),
-                        material.get('ps_value'),
-                        material.get('ps_yarn_value'),
-                        material.get('twist_direction'),
-                        material.get('winding_length')
-                    ))
+                if oracle_code in existing:
+                    if existing[oracle_code] == normalized:
+                        unchanged_count += 1
+                        continue
+                    if not update_existing:
+                        skipped_changed_count += 1
+                        continue
+                    updated_count += 1
+                else:
                     added_count += 1
+                
+                existing[oracle_code] = normalized
+                upsert_rows.append((oracle_code,) + values)
+            
+            placeholders = ', '.join('?' * (len(MATERIAL_SYNC_FIELDS) + 1))
+            assignments = ',\n                    '.join(
+                f"{field} = excluded.{field}" for field in MATERIAL_SYNC_FIELDS
+            )
+            upsert_sql = f"""
+                INSERT INTO raw_materials (oracle_item_code, {', '.join(MATERIAL_SYNC_FIELDS)})
+                VALUES ({placeholders})
+                ON CONFLICT(oracle_item_code) DO UPDATE SET
+                    {assignments},
+                    oracle_sync_status = 'synced',
+                    oracle_last_sync = CURRENT_TIMESTAMP,
+                    updated_at = CURRENT_TIMESTAMP
+            """
+            for start in range(0, len(upsert_rows), MATERIAL_WRITE_BATCH_SIZE):
+                cursor.executemany(upsert_sql, upsert_rows[start:start + MATERIAL_WRITE_BATCH_SIZE])
             
             sqlite_conn.commit()
-            logger.info(f"原材料同期完了: 追加{added_count}件")
-            return added_count
+            logger.info(f"原材料同期完了: 追加{added_count}件, 更新{updated_count}件, "
+                        f"変更なし{unchanged_count}件, 変更あり未更新{skipped_changed_count}件")
+            return added_count, updated_count, unchanged_count, skipped_changed_count
             
         finally:
             sqlite_conn.close()
     
+    def sync_materials(self, category: str = 'all',
+                       update_existing: bool = False) -> Dict[str, Any]:
+        """
+        原材料マスタの取得・同期・ログ記録を一括で実行
+        
+        Args:
+            category: 'all', '原糸', 'PS糸', '木管糸'
+            update_existing: 既存データの更新を行うか
+        
+        Returns:
+            同期結果（処理件数・追加・更新・変更なし・変更ありだが更新しなかった件数）
+        """
+        try:
+            materials = self.get_materials_from_oracle(category=category)
+            added, updated, unchanged, skipped_changed = self.sync_materials_to_sqlite(
+                materials, update_existing=update_existing
+            )
+        except Exception as e:
+            self.log_sync_operation('materials', 'failed', error_message=str(e))
+            raise
+        
+        processed = len(materials)
+        self.log_sync_operation('materials', 'success', processed=processed,
+                                updated=updated, added=added, skipped=unchanged,
+                                skipped_changed=skipped_changed)
+        
+        return {
+            'processed': processed,
+            'added': added,
+            'updated': updated,
+            'skipped': unchanged,
+            'skipped_changed': skipped_changed
+        }
+    
     def log_sync_operation(self, sync_type: str, status: str, 
                           processed: int = 0, updated: int = 0, added: int = 0,
-                          error_message: str = None):
+                          skipped: int = 0, error_message: str = None,
+                          skipped_changed: int = 0):
         """同期操作をログに記録"""
         sqlite_conn = self.get_sqlite_connection()
         
@@ -415,16 +588,34 @@ class OracleConnector:
             cursor.execute("""
                 INSERT INTO oracle_sync_log (
                     sync_type, sync_status, records_processed, 
-                    records_updated, records_added, error_message,
-                    sync_started_at, sync_completed_at
-                ) VALUES (?, ?, ?, ?, ?, ?, datetime('now'), datetime('now'))
-            """, (sync_type, status, processed, updated, added, error_message))
+                    records_updated, records_added, records_skipped, records_skipped_changed,
+                    error_message, sync_started_at, sync_completed_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, datetime('now'), datetime('now'))
+            """, (sync_type, status, processed, updated, added, skipped, skipped_changed, error_message))
             
             sqlite_conn.commit()
             
         finally:
             sqlite_conn.close()
     
+    def _product_content_hash(self, product: Dict[str, Any]) -> str:
+        """同期対象項目の内容ハッシュを計算"""
+        values = [product.get(field) for field in PRODUCT_SYNC_FIELDS]
+        payload = json.dumps(values, ensure_ascii=False, default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+    
+    def _normalize_material_values(self, values) -> tuple:
+        """比較用に原材料の値を正規化（SQLiteの型変換による差分を無視）"""
+        normalized = []
+        for field, value in zip(MATERIAL_SYNC_FIELDS, values):
+            if value is not None and field in MATERIAL_NUMERIC_FIELDS:
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    value = str(value)
+            normalized.append(value)
+        return tuple(normalized)
+    
     def _parse_number(self, value) -> Optional[int]:
         """文字列を数値に変換（Mなどの単位を除去）"""
         if not value:
@@ -0,0 +1,503 @@
+#!/usr/bin/env python3
+"""
+Oracle DB スタンドイン（オフライン検証・ベンチマーク用）
+- cx_Oracle と同じDB-APIサーフェス（connect / cursor / execute / fetch*）をSQLiteで提供
+- PCS_PRODUCT_MST / M_品目_* / T_製紐_日報_明細_投入・設定 にリアルなダミーデータを生成
+- OracleConnector(driver=OracleStandin(path)) で実機なしに同期処理を実行可能
+
+使用例:
+    python tools/oracle_standin.py oracle_standin.db --scale 100000
+    python tools/oracle_standin.py oracle_standin.db --scale 100000 --benchmark bench_target.db
+"""
+
+import argparse
+import itertools
+import os
+import random
+import re
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+# Oracle方言 → SQLite方言の置換ルール（OracleConnector・分析ツールで使用する構文のみ）
+_SQL_REWRITES = [
+    # SELECT * FROM (...) WHERE ROWNUM <= :limit
+    (re.compile(r"\)\s*WHERE\s+ROWNUM\s*<=\s*(:\w+|\d+)\s*$", re.IGNORECASE), r") LIMIT \1"),
+    # FETCH FIRST n ROWS ONLY
+    (re.compile(r"FETCH\s+FIRST\s+(:\w+|\d+)\s+ROWS\s+ONLY", re.IGNORECASE), r"LIMIT \1"),
+    # ADD_MONTHS(SYSDATE, -12)
+    (re.compile(r"ADD_MONTHS\(\s*SYSDATE\s*,\s*(-?\d+)\s*\)", re.IGNORECASE), r"datetime('now', '\1 months')"),
+    (re.compile(r"\bSYSDATE\b", re.IGNORECASE), "datetime('now')"),
+    # TO_DATE(:date_from, 'YYYY-MM-DD') → 文字列のまま比較（作業日時はISO形式で保持）
+    (re.compile(r"TO_DATE\(\s*(:\w+|'[^']*')\s*,\s*'[^']+'\s*\)", re.IGNORECASE), r"\1"),
+    (re.compile(r"\s+FROM\s+DUAL\b", re.IGNORECASE), ""),
+]
+
+# ... AND ROWNUM <= n は条件から外して末尾の LIMIT に変換
+_ROWNUM_CONDITION = re.compile(r"\s+AND\s+ROWNUM\s*<=\s*(:\w+|\d+)", re.IGNORECASE)
+_TO_CHAR = re.compile(r"TO_CHAR\(\s*([^,()]+?)\s*,\s*'([^']+)'\s*\)", re.IGNORECASE)
+_DATE_FORMATS = [('YYYY', '%Y'), ('MM', '%m'), ('DD', '%d'), ('HH24', '%H'), ('MI', '%M'), ('SS', '%S')]
+
+
+def translate_oracle_sql(sql: str) -> str:
+    """Oracle SQLをスタンドイン（SQLite）で実行できる形に変換"""
+    limit = None
+    match = _ROWNUM_CONDITION.search(sql)
+    if match:
+        limit = match.group(1)
+        sql = _ROWNUM_CONDITION.sub("", sql)
+
+    def to_strftime(m):
+        fmt = m.group(2)
+        for oracle_fmt, sqlite_fmt in _DATE_FORMATS:
+            fmt = fmt.replace(oracle_fmt, sqlite_fmt)
+        return f"strftime('{fmt}', {m.group(1)})"
+
+    sql = _TO_CHAR.sub(to_strftime, sql)
+    for pattern, replacement in _SQL_REWRITES:
+        sql = pattern.sub(replacement, sql.rstrip())
+
+    if limit:
+        sql = f"{sql} LIMIT {limit}"
+    return sql
+
+
+class StandinCursor:
+    """cx_Oracle.Cursor 互換カーソル"""
+
+    def __init__(self, cursor: sqlite3.Cursor):
+        self._cursor = cursor
+        self.arraysize = 100
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+    def execute(self, sql: str, parameters: Optional[Any] = None, **kw_parameters):
+        if parameters is None:
+            parameters = kw_parameters or ()
+        self._cursor.execute(translate_oracle_sql(sql), parameters)
+        return self
+
+    def executemany(self, sql: str, seq_of_parameters: Iterable[Any]):
+        self._cursor.executemany(translate_oracle_sql(sql), seq_of_parameters)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size: Optional[int] = None) -> List[tuple]:
+        return self._cursor.fetchmany(size or self.arraysize)
+
+    def fetchall(self) -> List[tuple]:
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+class StandinConnection:
+    """cx_Oracle.Connection 互換接続（リードオンリー運用を想定）"""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path)
+
+    def cursor(self) -> StandinCursor:
+        return StandinCursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class OracleStandin:
+    """
+    cx_Oracle モジュールの代替ドライバ
+
+    OracleConnector の driver 引数に渡すと、接続先がSQLiteファイルに切り替わる。
+    """
+
+    Error = sqlite3.Error
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def connect(self, user: str = None, password: str = None, dsn: str = None) -> StandinConnection:
+        """cx_Oracle.connect と同じ引数を受け付ける（認証情報は無視）"""
+        if not os.path.exists(self.path):
+            raise self.Error(f"スタンドインDBが見つかりません: {self.path}")
+        return StandinConnection(self.path)
+
+
+STANDIN_SCHEMA = """
+CREATE TABLE IF NOT EXISTS PCS_PRODUCT_MST (
+    PRODUCT_CODE TEXT PRIMARY KEY,
+    PRODUCT_NAME TEXT,
+    YARN_COMPOSITION TEXT,
+    SERIES_NAME TEXT,
+    LENGTH_M TEXT,
+    COLOR TEXT,
+    YARN_TYPE TEXT,
+    RAW_NUM REAL,
+    PRODUCTION_NUM REAL,
+    KNIT TEXT,
+    CORE_YARN_TYPE TEXT,
+    SPOOL_TYPE TEXT,
+    ORDERS_NUM INTEGER,
+    ORDERS_POUND REAL,
+    ORDERS_MM REAL
+);
+
+CREATE TABLE IF NOT EXISTS M_品目_原糸_仮 (
+    品目コード TEXT PRIMARY KEY,
+    原糸種類 TEXT,
+    原糸 REAL
+);
+
+CREATE TABLE IF NOT EXISTS M_品目_PS糸_仮 (
+    品目コード TEXT PRIMARY KEY,
+    品目名 TEXT,
+    原糸種類 TEXT,
+    PS REAL,
+    PS糸 REAL,
+    SZ TEXT
+);
+
+CREATE TABLE IF NOT EXISTS M_品目_木管糸_仮 (
+    品目コード TEXT PRIMARY KEY,
+    品目名 TEXT,
+    原糸種類 TEXT,
+    PS REAL,
+    PS糸 REAL,
+    巻きM INTEGER,
+    SZ TEXT
+);
+
+CREATE TABLE IF NOT EXISTS T_製紐_日報_明細_投入 (
+    明細ID INTEGER PRIMARY KEY,
+    見出しID INTEGER NOT NULL,
+    作業日時 TEXT NOT NULL,
+    品目コード TEXT,
+    品目ID INTEGER,
+    投入数量 REAL,
+    巻きM INTEGER,
+    備考 TEXT
+);
+
+CREATE TABLE IF NOT EXISTS T_製紐_日報_明細_設定 (
+    見出しID INTEGER PRIMARY KEY,
+    作業日時 TEXT NOT NULL,
+    品目コード TEXT,
+    生産数量 REAL
+);
+
+CREATE INDEX IF NOT EXISTS IX_投入_見出し ON T_製紐_日報_明細_投入(見出しID);
+CREATE INDEX IF NOT EXISTS IX_投入_作業日時 ON T_製紐_日報_明細_投入(作業日時);
+"""
+
+# ダミーデータの語彙（実データの傾向に合わせた値）
+SERIES_NAMES = [
+    'X-BRAID FULLDRAG X8', 'X-BRAID UPGRADE X8', 'X-BRAID UPGRADE X4',
+    'X-BRAID FC ABSORBER', 'X-BRAID SUPER JIGMAN X8', 'ODDSPORT WXP1 X8',
+    'ROUNDFORT', 'WX PREMIUM X9', 'G-SOUL X8 UPGRADE', 'X-BRAID CORD X16'
+]
+KNIT_TYPES = ['X8', 'X8', 'X8', 'X4', 'X4', 'X9', 'X16', 'X5', 'X6丸']
+COLORS = ['5色マルチ', 'マルチ', 'グリーン', 'ホワイト', 'ブルー', 'オレンジ', 'ピンク', 'イエロー']
+LENGTHS = ['100m', '150m', '200m', '300m', '400m', '600m']
+YARN_COMPOSITIONS = ['PE', 'PE', 'PE', 'ナイロン', 'フロロカーボン', 'PE+ナイロン芯']
+YARN_TYPES = ['EN', 'SK', 'AL', 'PE']
+PRODUCTION_NUMS = [0.3, 0.4, 0.6, 0.8, 1.0, 1.2, 1.5, 2.0, 2.5, 3.0, 4.0, 5.0, 6.0, 8.0, 10.0]
+DENIERS = [50, 75, 100, 150, 200, 300, 400]
+WINDING_LENGTHS = [1000, 2000, 3000, 5000, 10000]
+CORE_YARN_TYPES = [None, None, None, 'ナイロン芯', 'PE芯']
+SPOOL_TYPES = ['100m用スプール', '150m用スプール', '200m用スプール', '連結スプール']
+
+# 日報の対象期間の既定の最終日（実行日によらず同じシードなら同じデータを生成するため固定）
+DEFAULT_END_DATE = datetime(2024, 12, 31)
+
+
+def standin_table_sizes(scale: int) -> Dict[str, int]:
+    """日報投入明細の行数（scale）から各テーブルの件数を決定"""
+    return {
+        'PCS_PRODUCT_MST': max(50, scale // 10),
+        'M_品目_原糸_仮': max(10, scale // 1000),
+        'M_品目_PS糸_仮': max(20, scale // 200),
+        'M_品目_木管糸_仮': max(20, scale // 200),
+        'T_製紐_日報_明細_投入': scale,
+    }
+
+
+def _insert_chunked(conn: sqlite3.Connection, sql: str, rows: Iterable[Sequence[Any]],
+                    chunk_size: int = 50000) -> int:
+    """行イテレータをチャンク単位で executemany"""
+    count = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            conn.executemany(sql, chunk)
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        conn.executemany(sql, chunk)
+        count += len(chunk)
+    return count
+
+
+def populate_standin(path: str, scale: int = 10000, seed: int = 42,
+                     days: int = 365, end_date: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    スタンドインDBを作成し、ダミーデータを投入
+
+    Args:
+        path: 作成するSQLiteファイルパス（既存ファイルは置き換え）
+        scale: T_製紐_日報_明細_投入 の行数（10,000〜1,000,000程度を想定）
+        seed: 乱数シード（同じ値なら同じデータを生成）
+        days: 日報の対象期間（日数）
+        end_date: 対象期間の終了日時（この日時は含まない。省略時は DEFAULT_END_DATE）
+
+    Returns:
+        テーブル別の投入件数
+    """
+    rng = random.Random(seed)
+    sizes = standin_table_sizes(scale)
+    end_date = end_date or DEFAULT_END_DATE
+    start_date = end_date - timedelta(days=days)
+
+    if os.path.exists(path):
+        os.remove(path)
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+
+    try:
+        conn.executescript(STANDIN_SCHEMA)
+        counts = {}
+
+        # 製品マスタ
+        def product_rows():
+            for n in range(1, sizes['PCS_PRODUCT_MST'] + 1):
+                series = rng.choice(SERIES_NAMES)
+                knit = series.split()[-1] if series.split()[-1] in KNIT_TYPES else rng.choice(KNIT_TYPES)
+                production_num = rng.choice(PRODUCTION_NUMS)
+                length = rng.choice(LENGTHS)
+                color = rng.choice(COLORS)
+                orders_num = rng.choice([0, 0, 10, 20, 50, 100, 200, 500])
+                yield (
+                    f"P{n:07d}",
+                    f"YGK {series} {production_num}号 {length} {color}",
+                    rng.choice(YARN_COMPOSITIONS),
+                    series,
+                    length,
+                    color,
+                    rng.choice(YARN_TYPES),
+                    round(production_num * rng.uniform(0.9, 1.1), 2),
+                    production_num,
+                    knit,
+                    rng.choice(CORE_YARN_TYPES),
+                    rng.choice(SPOOL_TYPES),
+                    orders_num,
+                    round(orders_num * rng.uniform(0.1, 0.5), 1),
+                    round(orders_num * rng.uniform(50, 300), 1),
+                )
+
+        counts['PCS_PRODUCT_MST'] = _insert_chunked(
+            conn, "INSERT INTO PCS_PRODUCT_MST VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            product_rows()
+        )
+
+        # 原糸マスタ
+        raw_codes = [f"RY{n:05d}" for n in range(1, sizes['M_品目_原糸_仮'] + 1)]
+        counts['M_品目_原糸_仮'] = _insert_chunked(
+            conn, "INSERT INTO M_品目_原糸_仮 VALUES (?, ?, ?)",
+            ((code, rng.choice(YARN_TYPES), float(rng.choice(DENIERS))) for code in raw_codes)
+        )
+
+        # PS糸マスタ・木管糸マスタ
+        ps_codes = [f"PS{n:05d}" for n in range(1, sizes['M_品目_PS糸_仮'] + 1)]
+        ps_deniers = {}
+
+        def ps_rows():
+            for code in ps_codes:
+                yarn_type = rng.choice(YARN_TYPES)
+                ps = rng.choice([2.0, 3.0, 3.5, 4.0, 4.5, 5.0, 6.0])
+                denier = rng.choice(DENIERS)
+                twist = rng.choice(['S', 'Z'])
+                ps_deniers[code] = denier
+                yield (code, f"{yarn_type}PS({ps}) {denier}d {twist}", yarn_type, ps, float(denier), twist)
+
+        counts['M_品目_PS糸_仮'] = _insert_chunked(
+            conn, "INSERT INTO M_品目_PS糸_仮 VALUES (?, ?, ?, ?, ?, ?)", ps_rows()
+        )
+
+        bobbin_codes = [f"BK{n:05d}" for n in range(1, sizes['M_品目_木管糸_仮'] + 1)]
+        bobbin_lengths = {}
+        bobbin_deniers = {}
+
+        def bobbin_rows():
+            for code in bobbin_codes:
+                yarn_type = rng.choice(YARN_TYPES)
+                ps = rng.choice([2.0, 3.0, 4.0, 5.0])
+                denier = rng.choice(DENIERS)
+                winding = rng.choice(WINDING_LENGTHS)
+                twist = rng.choice(['S', 'Z'])
+                bobbin_lengths[code] = winding
+                bobbin_deniers[code] = denier
+                yield (code, f"木管 {yarn_type}PS({ps}) {denier}d {winding}m", yarn_type, ps,
+                       float(denier), winding, twist)
+
+        counts['M_品目_木管糸_仮'] = _insert_chunked(
+            conn, "INSERT INTO M_品目_木管糸_仮 VALUES (?, ?, ?, ?, ?, ?, ?)", bobbin_rows()
+        )
+
+        # 製紐日報: 1見出し（1回の製紐作業）ごとに設定明細（生産品目・生産数量）と
+        # 編み本数分の木管糸 + 芯糸の投入明細を作成。製品ごとにレシピを固定し、
+        # 投入量は生産数量 × デニールから算出（±5%のばらつき）
+        total_seconds = int((end_date - start_date).total_seconds())
+        product_codes = [f"P{n:07d}" for n in range(1, sizes['PCS_PRODUCT_MST'] + 1)]
+        active_products = product_codes[:max(20, len(product_codes) // 20)]
+        popularity = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(active_products))))
+        recipes = {}
+        settings = []
+
+        def recipe_for(product_code):
+            if product_code not in recipes:
+                carriers = rng.choice([4, 8, 8, 8, 9, 16])
+                bobbins = rng.sample(bobbin_codes, min(rng.choice([1, 1, 2, 3]), len(bobbin_codes)))
+                core = rng.choice(ps_codes) if rng.random() < 0.3 else None
+                recipes[product_code] = ([bobbins[i % len(bobbins)] for i in range(carriers)], core)
+            return recipes[product_code]
+
+        def input_rows():
+            row_id = 0
+            header_id = 0
+            while row_id < scale:
+                header_id += 1
+                worked_at = (start_date + timedelta(seconds=rng.randrange(total_seconds))
+                             ).strftime('%Y-%m-%d %H:%M:%S')
+                product_code = rng.choices(active_products, cum_weights=popularity)[0]
+                produced_m = float(rng.choice([1000, 2000, 3000, 5000, 10000]))
+                settings.append((header_id, worked_at, product_code, produced_m))
+
+                carrier_codes, core = recipe_for(product_code)
+                lines = list(carrier_codes) + ([core] if core else [])
+
+                for line_no, item_code in enumerate(lines):
+                    if row_id >= scale:
+                        break
+                    row_id += 1
+                    denier = bobbin_deniers.get(item_code) or ps_deniers.get(item_code, 100)
+                    quantity = round(produced_m * denier / 9000 / 1000 * rng.uniform(0.95, 1.05), 4)
+                    yield (
+                        row_id,
+                        header_id,
+                        worked_at,
+                        item_code if rng.random() > 0.01 else None,  # 実データ同様に欠損を混ぜる
+                        line_no + 1,
+                        quantity,
+                        bobbin_lengths.get(item_code),
+                        None
+                    )
+
+        counts['T_製紐_日報_明細_投入'] = _insert_chunked(
+            conn, "INSERT INTO T_製紐_日報_明細_投入 VALUES (?, ?, ?, ?, ?, ?, ?, ?)", input_rows()
+        )
+        counts['T_製紐_日報_明細_設定'] = _insert_chunked(
+            conn, "INSERT INTO T_製紐_日報_明細_設定 VALUES (?, ?, ?, ?)", settings
+        )
+
+        conn.commit()
+        return counts
+
+    finally:
+        conn.close()
+
+
+def benchmark_sync(standin_path: str, sqlite_path: str, schema_path: str = None) -> Dict[str, float]:
+    """スタンドインを対象に製品・原材料同期を実行し、所要時間を計測（同期先は最新のスキーマに移行）"""
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, project_root)
+    from migrations import apply_migrations
+    from oracle_connector import OracleConnector
+
+    schema_path = schema_path or os.path.join(project_root, 'schema_enhanced.sql')
+    conn = sqlite3.connect(sqlite_path)
+    try:
+        apply_migrations(conn, schema_file=schema_path)
+    finally:
+        conn.close()
+
+    connector = OracleConnector(sqlite_path=sqlite_path, driver=OracleStandin(standin_path))
+    timings = {}
+
+    started = time.perf_counter()
+    products = connector.get_products_from_oracle()
+    timings['fetch_products'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    connector.sync_products_to_sqlite(products, update_existing=True)
+    timings['sync_products'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    connector.sync_products_to_sqlite(products, update_existing=True)
+    timings['resync_products_unchanged'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    materials = connector.get_materials_from_oracle()
+    connector.sync_materials_to_sqlite(materials, update_existing=True)
+    timings['sync_materials'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    connector.sync_materials_to_sqlite(materials, update_existing=True)
+    timings['resync_materials_unchanged'] = time.perf_counter() - started
+
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Oracleスタンドイン DB生成ツール')
+    parser.add_argument('path', help='作成するスタンドインDBのパス')
+    parser.add_argument('--scale', type=int, default=10000,
+                        help='T_製紐_日報_明細_投入 の行数（既定: 10000）')
+    parser.add_argument('--seed', type=int, default=42, help='乱数シード')
+    parser.add_argument('--days', type=int, default=365, help='日報の対象期間（日数）')
+    parser.add_argument('--benchmark', metavar='SQLITE_PATH',
+                        help='生成後、指定したSQLite DBへの同期時間を計測')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = populate_standin(args.path, scale=args.scale, seed=args.seed, days=args.days)
+    print(f"スタンドインDBを作成しました: {args.path} ({time.perf_counter() - started:.1f}秒)")
+    for table, count in counts.items():
+        print(f"  {table:<24} {count:>10,}件")
+
+    if args.benchmark:
+        print("\n同期ベンチマーク:")
+        for step, seconds in benchmark_sync(args.path, args.benchmark).items():
+            print(f"  {step:<28} {seconds:8.3f}秒")
+
+
+if __name__ == "__main__":
+    main()
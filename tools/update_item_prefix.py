@@ -4,9 +4,14 @@
 ORACLE_ → XBRAID_ に変更
 """
 
+import os
 import sqlite3
+import sys
 from datetime import datetime
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db_maintenance import bulk_maintenance
+
 def update_item_prefix():
     """アイテムIDのプレフィックスをORACLE_からXBRAID_に変更"""
     
@@ -46,47 +51,53 @@ def update_item_prefix():
         # 外部キー制約を一時的に無効化
         cursor.execute("PRAGMA foreign_keys = OFF")
         
-        # トランザクション開始
-        sqlite_conn.execute("BEGIN TRANSACTION")
-        
-        # 1. itemsテーブルのitem_id更新
-        for item in oracle_items:
-            old_id = item[0]
-            new_id = old_id.replace('ORACLE_', 'XBRAID_')
+        # 更新日時・閉包トリガーを停止して1トランザクションで更新（各行1回の書き込み）
+        # 終了時にトリガーを再作成してコミット、例外時はすべてロールバック
+        with bulk_maintenance(sqlite_conn, suspend_closure=True):
+            # 1. itemsテーブルのitem_id更新
+            for item in oracle_items:
+                old_id = item[0]
+                new_id = old_id.replace('ORACLE_', 'XBRAID_')
             
-            cursor.execute("""
-                UPDATE items 
-                SET item_id = ?, updated_at = datetime('now')
-                WHERE item_id = ?
-            """, (new_id, old_id))
-        
-        print(f"   ✓ itemsテーブル: {len(oracle_items)}件更新")
+                cursor.execute("""
+                    UPDATE items 
+                    SET item_id = ?, updated_at = datetime('now')
+                    WHERE item_id = ?
+                """, (new_id, old_id))
         
-        # 2. bom_componentsテーブルのparent_item_id更新
-        cursor.execute("""
-            UPDATE bom_components 
-            SET parent_item_id = REPLACE(parent_item_id, 'ORACLE_', 'XBRAID_'),
-                updated_at = datetime('now')
-            WHERE parent_item_id LIKE 'ORACLE_%'
-        """)
+            print(f"   ✓ itemsテーブル: {len(oracle_items)}件更新")
         
-        parent_updates = cursor.rowcount
-        print(f"   ✓ BOM親アイテム: {parent_updates}件更新")
-        
-        # 3. bom_componentsテーブルのcomponent_item_id更新
-        cursor.execute("""
-            UPDATE bom_components 
-            SET component_item_id = REPLACE(component_item_id, 'ORACLE_', 'XBRAID_'),
-                updated_at = datetime('now')
-            WHERE component_item_id LIKE 'ORACLE_%'
-        """)
-        
-        component_updates = cursor.rowcount
-        print(f"   ✓ BOM構成部品: {component_updates}件更新")
+            # 2. bom_componentsテーブルのparent_item_id更新
+            cursor.execute("""
+                UPDATE bom_components 
+                SET parent_item_id = REPLACE(parent_item_id, 'ORACLE_', 'XBRAID_'),
+                    updated_at = datetime('now')
+                WHERE parent_item_id LIKE 'ORACLE_%'
+            """)
         
-        # コミット
-        sqlite_conn.commit()
+            parent_updates = cursor.rowcount
+            print(f"   ✓ BOM親アイテム: {parent_updates}件更新")
         
+            # 3. bom_componentsテーブルのcomponent_item_id更新
+            cursor.execute("""
+                UPDATE bom_components 
+                SET component_item_id = REPLACE(component_item_id, 'ORACLE_', 'XBRAID_'),
+                    updated_at = datetime('now')
+                WHERE component_item_id LIKE 'ORACLE_%'
+            """)
+        
+            component_updates = cursor.rowcount
+            print(f"   ✓ BOM構成部品: {component_updates}件更新")
+
+            # 4. item_id をキーにする原価・単位換算係数も追随（終了時の原価再積み上げで単価を参照するため）
+            for table in ('item_costs', 'uom_conversions'):
+                cursor.execute(f"""
+                    UPDATE {table}
+                    SET item_id = REPLACE(item_id, 'ORACLE_', 'XBRAID_')
+                    WHERE item_id LIKE 'ORACLE_%'
+                """)
+                print(f"   ✓ {table}: {cursor.rowcount}件更新")
+
         # 外部キー制約を再有効化
         cursor.execute("PRAGMA foreign_keys = ON")
         
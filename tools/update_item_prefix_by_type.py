@@ -4,10 +4,15 @@
 各アイテムタイプに応じた意味のあるプレフィックスに変更
 """
 
+import os
 import sqlite3
+import sys
 import re
 from datetime import datetime
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db_maintenance import bulk_maintenance
+
 def update_item_prefix_by_type():
     """アイテムタイプに応じたプレフィックスに変更"""
     
@@ -55,9 +60,6 @@ def update_item_prefix_by_type():
         # 外部キー制約を一時的に無効化
         cursor.execute("PRAGMA foreign_keys = OFF")
         
-        # トランザクション開始
-        sqlite_conn.execute("BEGIN TRANSACTION")
-        
         updated_items = {}
         skipped_items = []
         
@@ -109,45 +111,58 @@ def update_item_prefix_by_type():
         print(f"⏭️  スキップ: {len(skipped_items)}件")
         print()
         
-        # 1. itemsテーブルのitem_id更新
-        for old_id, info in updated_items.items():
-            cursor.execute("""
-                UPDATE items 
-                SET item_id = ?, updated_at = datetime('now')
-                WHERE item_id = ?
-            """, (info['new_id'], old_id))
+        # 更新日時・閉包トリガーを停止して1トランザクションで更新（各行1回の書き込み）
+        # 終了時にトリガーを再作成してコミット、例外時はすべてロールバック
+        with bulk_maintenance(sqlite_conn, suspend_closure=True):
+            # 1. itemsテーブルのitem_id更新
+            for old_id, info in updated_items.items():
+                cursor.execute("""
+                    UPDATE items 
+                    SET item_id = ?, updated_at = datetime('now')
+                    WHERE item_id = ?
+                """, (info['new_id'], old_id))
             
-            print(f"  ✓ {old_id} → {info['new_id']} ({info['item_type']}: {info['item_name'][:30]}...)")
-        
-        print(f"\n   📦 itemsテーブル: {len(updated_items)}件更新")
-        
-        # 2. bom_componentsテーブルのparent_item_id更新
-        parent_updates = 0
-        for old_id, info in updated_items.items():
-            cursor.execute("""
-                UPDATE bom_components 
-                SET parent_item_id = ?, updated_at = datetime('now')
-                WHERE parent_item_id = ?
-            """, (info['new_id'], old_id))
-            parent_updates += cursor.rowcount
+                print(f"  ✓ {old_id} → {info['new_id']} ({info['item_type']}: {info['item_name'][:30]}...)")
         
-        print(f"   🔗 BOM親アイテム: {parent_updates}件更新")
+            print(f"\n   📦 itemsテーブル: {len(updated_items)}件更新")
         
-        # 3. bom_componentsテーブルのcomponent_item_id更新
-        component_updates = 0
-        for old_id, info in updated_items.items():
-            cursor.execute("""
-                UPDATE bom_components 
-                SET component_item_id = ?, updated_at = datetime('now')
-                WHERE component_item_id = ?
-            """, (info['new_id'], old_id))
-            component_updates += cursor.rowcount
+            # 2. bom_componentsテーブルのparent_item_id更新
+            parent_updates = 0
+            for old_id, info in updated_items.items():
+                cursor.execute("""
+                    UPDATE bom_components 
+                    SET parent_item_id = ?, updated_at = datetime('now')
+                    WHERE parent_item_id = ?
+                """, (info['new_id'], old_id))
+                parent_updates += cursor.rowcount
         
-        print(f"   🧩 BOM構成部品: {component_updates}件更新")
+            print(f"   🔗 BOM親アイテム: {parent_updates}件更新")
         
-        # コミット
-        sqlite_conn.commit()
+            # 3. bom_componentsテーブルのcomponent_item_id更新
+            component_updates = 0
+            for old_id, info in updated_items.items():
+                cursor.execute("""
+                    UPDATE bom_components 
+                    SET component_item_id = ?, updated_at = datetime('now')
+                    WHERE component_item_id = ?
+                """, (info['new_id'], old_id))
+                component_updates += cursor.rowcount
         
+            print(f"   🧩 BOM構成部品: {component_updates}件更新")
+
+            # 4. item_id をキーにする原価・単位換算係数も追随（終了時の原価再積み上げで単価を参照するため）
+            for table in ('item_costs', 'uom_conversions'):
+                table_updates = 0
+                for old_id, info in updated_items.items():
+                    cursor.execute(f"""
+                        UPDATE {table}
+                        SET item_id = ?
+                        WHERE item_id = ?
+                    """, (info['new_id'], old_id))
+                    table_updates += cursor.rowcount
+
+                print(f"   💴 {table}: {table_updates}件更新")
+
         # 外部キー制約を再有効化
         cursor.execute("PRAGMA foreign_keys = ON")
         
@@ -0,0 +1,129 @@
+"""
+釣り糸製造BOM管理システム 数量単位の換算
+
+原糸は KG、PS糸・製紐糸は M で管理しているため、構成部品の数量をそのまま合計すると単位が混在します。
+アイテムごとの換算係数（換算先単位あたりの数量 = 元の数量 × 係数）を配列で求め、
+展開結果のベクトル全体にまとめて掛けることで共通の単位に揃えます。
+
+係数の決め方（上から順に採用）:
+    1. アイテムの数量単位が換算先と同じ: 1
+    2. uom_conversions に登録したアイテム別の係数（例: スプール1個 = 0.012 KG）
+    3. デニールによる長さ⇔重量の換算（デニール = 9000mあたりのグラム数）
+           KG = M × デニール / 9000 / 1000
+       アイテム別の係数で M または KG に換算してからデニールで換算することもできます
+    4. 上記で換算できないアイテムは NaN（換算不可）
+
+使い方:
+    python uom.py bom_database_dev.db KG   # 換算先単位ごとの換算可否の確認
+"""
+
+import argparse
+import sqlite3
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# items.unit_of_measure で使用できる単位（schema_enhanced.sql）
+UNITS = ('KG', 'M', '個', '枚', 'セット', '本')
+LENGTH_UNIT = 'M'
+MASS_UNIT = 'KG'
+
+# デニールの基準長（9000mあたりのグラム数）
+DENIER_BASE_LENGTH_M = 9000.0
+
+
+def denier_kg_per_meter(denier: np.ndarray) -> np.ndarray:
+    """デニールから1mあたりの重量（KG）"""
+    return denier / DENIER_BASE_LENGTH_M / 1000.0
+
+
+def unit_factors(conn: sqlite3.Connection, item_ids: Sequence[str], target_unit: str) -> np.ndarray:
+    """
+    各アイテムの数量単位から target_unit への換算係数
+
+    Args:
+        item_ids: アイテムID（結果の並び順。bom_graph.BomGraph.item_ids など）
+        target_unit: 換算先の単位（'KG' など）
+
+    Returns:
+        item_ids 順の係数（換算できないアイテムは NaN）
+    """
+    index = {item_id: i for i, item_id in enumerate(item_ids)}
+    units = np.empty(len(item_ids), dtype=object)
+    deniers = np.full(len(item_ids), np.nan)
+    for item_id, unit, denier in conn.execute("SELECT item_id, unit_of_measure, denier FROM items"):
+        i = index.get(item_id)
+        if i is not None:
+            units[i] = unit
+            if denier:
+                deniers[i] = denier
+
+    # デニールでの換算の橋渡しとなる単位（換算先がKGならM、MならKG）
+    bridge_unit = {MASS_UNIT: LENGTH_UNIT, LENGTH_UNIT: MASS_UNIT}.get(target_unit)
+    to_target = np.full(len(item_ids), np.nan)
+    to_bridge = np.where(units == bridge_unit, 1.0, np.nan)
+    for item_id, to_unit, factor in conn.execute(
+            "SELECT item_id, to_unit, factor FROM uom_conversions WHERE to_unit IN (?, ?)",
+            (target_unit, bridge_unit or target_unit)):
+        i = index.get(item_id)
+        if i is None:
+            continue
+        if to_unit == target_unit:
+            to_target[i] = factor
+        elif np.isnan(to_bridge[i]):
+            to_bridge[i] = factor
+
+    factors = np.where(units == target_unit, 1.0, to_target)
+    if bridge_unit is not None:
+        kg_per_meter = denier_kg_per_meter(deniers)
+        bridge = kg_per_meter if target_unit == MASS_UNIT else 1.0 / kg_per_meter
+        factors = np.where(np.isnan(factors), to_bridge * bridge, factors)
+    return factors
+
+
+def convert_quantities(quantities: np.ndarray, factors: np.ndarray) -> List[Optional[float]]:
+    """数量ベクトルを換算（換算できない要素は None）"""
+    converted = quantities * factors
+    return [None if np.isnan(value) else float(value) for value in converted]
+
+
+def set_unit_conversion(conn: sqlite3.Connection, item_id: str, to_unit: str, factor: float):
+    """アイテム別の換算係数を登録（item_id の1単位 = factor to_unit）"""
+    if not factor or factor <= 0:
+        raise ValueError(f"換算係数は正の数で指定してください: {factor}")
+    with conn:
+        conn.execute("""
+            INSERT INTO uom_conversions (item_id, to_unit, factor) VALUES (?, ?, ?)
+            ON CONFLICT(item_id, to_unit) DO UPDATE SET
+                factor = excluded.factor, updated_at = CURRENT_TIMESTAMP
+        """, (item_id, to_unit, factor))
+
+
+def conversion_coverage(conn: sqlite3.Connection, target_unit: str) -> Dict[str, Dict[str, int]]:
+    """数量単位ごとの換算可能・不可のアイテム数"""
+    rows = conn.execute("SELECT item_id, unit_of_measure FROM items ORDER BY item_id").fetchall()
+    factors = unit_factors(conn, [item_id for item_id, _ in rows], target_unit)
+    coverage = {}
+    for (_, unit), factor in zip(rows, factors):
+        counts = coverage.setdefault(unit, {'convertible': 0, 'unconvertible': 0})
+        counts['unconvertible' if np.isnan(factor) else 'convertible'] += 1
+    return coverage
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数量単位の換算可否の確認')
+    parser.add_argument('db_path', help='BOMデータベースのパス')
+    parser.add_argument('unit', nargs='?', default=MASS_UNIT, help='換算先の単位（既定: KG）')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db_path)
+    try:
+        for unit, counts in conversion_coverage(conn, args.unit).items():
+            print(f"  {unit:<6} → {args.unit}: 換算可 {counts['convertible']:,}件 / "
+                  f"換算不可 {counts['unconvertible']:,}件")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+釣り糸製造BOM管理システム 代替品シミュレーション（What-if）
+
+原糸やスプールが不足したときに「構成部品 X を Y に置き換えたら」を評価します。
+bom_components には書き込まず、読み込んだBOMグラフ（bom_graph.py）の辺の配列を
+置き換えたコピー（オーバーレイ）を作り、所要量展開・標準原価・逆展開を置き換え前後で比較します。
+
+- 置き換え: 子が X の辺の子を Y に変更（数量は ratio 倍、parents 指定時はその親の辺のみ）
+- 低位レベルコード: 置き換えで Y が深い階層に現れる場合は「子 > 親」を満たすまで配列上で引き上げ
+  （置き換えで循環する場合は ValueError）
+- 影響範囲: 置き換えた辺の親とその全祖先（所要量・標準原価が変わりうるアイテム）
+
+使い方:
+    python what_if.py bom_database_dev.db RAW_001=RAW_002
+    python what_if.py bom_database_dev.db RAW_001=RAW_002:1.05 --demand PRODUCT_001=100
+"""
+
+import argparse
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from bom_graph import BomGraph, load_bom_graph
+from cost_rollup import compute_standard_costs, load_unit_costs
+from mrp import explode_requirements
+from uom import convert_quantities, unit_factors
+
+# 差分とみなす最小の変化量
+DIFF_TOLERANCE = 1e-9
+
+
+def recompute_levels(levels: np.ndarray, parents: np.ndarray, children: np.ndarray) -> np.ndarray:
+    """
+    全ての辺で「子のLLC > 親のLLC」となるまでLLCを引き上げる
+
+    Raises:
+        ValueError: 辺が循環している場合
+    """
+    levels = levels.copy()
+    for _ in range(len(levels) + 1):
+        violated = levels[children] <= levels[parents]
+        if not violated.any():
+            return levels
+        np.maximum.at(levels, children[violated], levels[parents[violated]] + 1)
+    raise ValueError("代替品の置き換えでBOMが循環します")
+
+
+def substitute_components(graph: BomGraph, substitutions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    代替品を適用したBOMグラフ（オーバーレイ）を作成
+
+    Args:
+        substitutions: [{'from': 置き換え元, 'to': 代替品, 'ratio': 数量倍率（省略時1）,
+                         'parents': 対象の親アイテムID（省略時は全ての親）}]
+
+    Returns:
+        {'graph': 置き換え後のBomGraph, 'changed_parents': 辺を置き換えた親の添字, 'edge_count': 置き換えた辺数}
+    """
+    children = graph.children.copy()
+    quantities = graph.quantities.copy()
+    changed = np.zeros(graph.edge_count, dtype=bool)
+
+    for substitution in substitutions:
+        source = substitution.get('from')
+        target = substitution.get('to')
+        unknown = [item_id for item_id in (source, target, *(substitution.get('parents') or []))
+                   if item_id not in graph.index]
+        if unknown:
+            raise ValueError(f"アイテムが見つかりません: {', '.join(map(str, unknown))}")
+        if source == target:
+            raise ValueError(f"置き換え元と代替品が同じです: {source}")
+        ratio = float(substitution.get('ratio', 1.0))
+        if ratio <= 0:
+            raise ValueError(f"数量倍率は正の数で指定してください: {ratio}")
+
+        # 置き換え元の判定は元のBOMで行う（X→Y, Y→Z を同時に指定しても X は Z にならない）
+        mask = (graph.children == graph.index[source]) & ~changed
+        if substitution.get('parents'):
+            mask &= np.isin(graph.parents, [graph.index[item_id] for item_id in substitution['parents']])
+        children[mask] = graph.index[target]
+        quantities[mask] *= ratio
+        changed |= mask
+
+    levels = recompute_levels(graph.levels, graph.parents, children)
+    overlay = BomGraph(graph.item_ids, levels, graph.parents.copy(), children, quantities)
+    return {
+        'graph': overlay,
+        'changed_parents': np.unique(graph.parents[changed]),
+        'edge_count': int(changed.sum()),
+    }
+
+
+def ancestor_mask(graph: BomGraph, item_indexes: np.ndarray, include_self: bool = True) -> np.ndarray:
+    """アイテムの全祖先（逆展開）のマスク。辺の配列上で親方向に1段ずつ広げる"""
+    found = np.zeros(graph.item_count, dtype=bool)
+    frontier = np.zeros(graph.item_count, dtype=bool)
+    frontier[item_indexes] = True
+    if include_self:
+        found |= frontier
+    while frontier.any():
+        parents = np.zeros(graph.item_count, dtype=bool)
+        parents[graph.parents[frontier[graph.children]]] = True
+        frontier = parents & ~found
+        found |= parents
+    return found
+
+
+def _root_demand(graph: BomGraph, affected: np.ndarray) -> Dict[str, float]:
+    """需要の指定がない場合: 影響を受ける最上位アイテム（親を持たないもの）を1単位ずつ"""
+    has_parent = np.zeros(graph.item_count, dtype=bool)
+    has_parent[graph.children] = True
+    return {graph.item_ids[i]: 1.0 for i in np.nonzero(affected & ~has_parent)[0]}
+
+
+def simulate_substitutions(conn: sqlite3.Connection, substitutions: List[Dict[str, Any]],
+                           demand: Optional[Dict[str, float]] = None,
+                           on_hand: Optional[Dict[str, float]] = None,
+                           unit: Optional[str] = None,
+                           as_of: Optional[str] = None) -> Dict[str, Any]:
+    """
+    代替品を適用した場合の所要量・標準原価・逆展開を置き換え前後で比較（DBには書き込まない）
+
+    Args:
+        substitutions: substitute_components と同じ形式
+        demand: {アイテムID: 需要数量}（省略時は影響を受ける最上位アイテムを1単位ずつ）
+        on_hand: {アイテムID: 在庫数量}
+        unit: 所要量の換算先の単位（例: 'KG'）
+        as_of: 置き換え前のBOM構成の基準日（YYYY-MM-DD。省略時は当日）
+
+    Returns:
+        {'demand', 'substituted_edges', 'affected_items', 'requirements', 'costs', 'where_used'}
+        requirements / costs は変化したアイテムのみ（before / after / delta）
+    """
+    if not substitutions:
+        raise ValueError("代替品を指定してください")
+    base = load_bom_graph(conn, as_of)
+    overlay = substitute_components(base, substitutions)
+    graph = overlay['graph']
+
+    affected = ancestor_mask(graph, overlay['changed_parents'])
+    if demand is None:
+        demand = _root_demand(graph, affected)
+
+    before = explode_requirements(base, demand, on_hand)['net']
+    after = explode_requirements(graph, demand, on_hand)['net']
+    if unit:
+        factors = unit_factors(conn, base.item_ids, unit)
+        converted_before = convert_quantities(before, factors)
+        converted_after = convert_quantities(after, factors)
+
+    names = {row[0]: row[1:] for row in conn.execute("SELECT item_id, item_name, unit_of_measure FROM items")}
+    requirements = []
+    delta = after - before
+    delta[np.abs(delta) <= DIFF_TOLERANCE * np.maximum(1.0, np.abs(before))] = 0.0
+    for i in graph.nonzero_items(delta):
+        item_id = graph.item_ids[i]
+        row = {
+            'item_id': item_id,
+            'item_name': names[item_id][0],
+            'unit_of_measure': names[item_id][1],
+            'before': float(before[i]),
+            'after': float(after[i]),
+            'delta': float(delta[i]),
+        }
+        if unit:
+            row['converted_unit'] = unit
+            row['converted_before'] = converted_before[i]
+            row['converted_after'] = converted_after[i]
+        requirements.append(row)
+
+    # 標準原価は置き換えた辺の親とその祖先だけが変わる
+    unit_costs = load_unit_costs(conn, base)
+    costs = []
+    if unit_costs.any():
+        cost_before = compute_standard_costs(base, unit_costs)
+        cost_after = compute_standard_costs(graph, unit_costs)
+        for i in sorted(np.nonzero(affected)[0].tolist(), key=lambda i: (graph.levels[i], graph.item_ids[i])):
+            if abs(cost_after[i] - cost_before[i]) > DIFF_TOLERANCE * max(1.0, abs(cost_before[i])):
+                costs.append({
+                    'item_id': graph.item_ids[i],
+                    'before': float(cost_before[i]),
+                    'after': float(cost_after[i]),
+                    'delta': float(cost_after[i] - cost_before[i]),
+                })
+
+    where_used = {}
+    for substitution in substitutions:
+        for item_id in (substitution['from'], substitution['to']):
+            index = np.array([graph.index[item_id]])
+            where_used[item_id] = {
+                'before': [base.item_ids[i] for i in np.nonzero(ancestor_mask(base, index, include_self=False))[0]],
+                'after': [graph.item_ids[i] for i in np.nonzero(ancestor_mask(graph, index, include_self=False))[0]],
+            }
+
+    return {
+        'demand': demand,
+        'substituted_edges': overlay['edge_count'],
+        'affected_items': [graph.item_ids[i] for i in np.nonzero(affected)[0]],
+        'requirements': requirements,
+        'costs': costs,
+        'where_used': where_used,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='代替品シミュレーション')
+    parser.add_argument('db_path', help='BOMデータベースのパス')
+    parser.add_argument('substitutions', nargs='+', help='代替品（置き換え元=代替品[:数量倍率]）')
+    parser.add_argument('--demand', nargs='*', help='需要（アイテムID=数量。省略時は影響を受ける最上位アイテムを1単位ずつ）')
+    parser.add_argument('--unit', help='所要量の換算先の単位（例: KG）')
+    parser.add_argument('--as-of', help='BOM構成の基準日（YYYY-MM-DD。省略時は当日）')
+    args = parser.parse_args()
+
+    substitutions = []
+    for entry in args.substitutions:
+        source, _, target = entry.partition('=')
+        target, _, ratio = target.partition(':')
+        substitutions.append({'from': source, 'to': target, 'ratio': float(ratio or 1)})
+    demand = None
+    if args.demand:
+        demand = {}
+        for entry in args.demand:
+            item_id, _, quantity = entry.partition('=')
+            demand[item_id] = demand.get(item_id, 0.0) + float(quantity or 1)
+
+    conn = sqlite3.connect(args.db_path)
+    try:
+        started = time.perf_counter()
+        result = simulate_substitutions(conn, substitutions, demand, unit=args.unit, as_of=args.as_of)
+        elapsed = time.perf_counter() - started
+    finally:
+        conn.close()
+
+    print(f"置き換えた構成: {result['substituted_edges']}行 / 影響アイテム: {len(result['affected_items'])}件")
+    for row in result['requirements']:
+        print(f"  {row['item_id']:<20} {row['before']:>14,.3f} → {row['after']:>14,.3f} "
+              f"({row['delta']:+,.3f} {row['unit_of_measure']})")
+    for row in result['costs']:
+        print(f"  原価 {row['item_id']:<20} {row['before']:>14,.2f} → {row['after']:>14,.2f}")
+    print(f"({elapsed:.3f}秒)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+BOMManager・Flaskエンドポイントのベンチマーク
+固定シードの合成BOM（generate_synthetic_bom.py）を規模別に生成し、主要な読み取り・書き込み処理と
+Flaskテストクライアント経由のルートの処理時間を測定して、JSONに出力する
+
+- 規模: small（構成行約1万行）/ medium（約10万行）/ large（約100万行）
+- 測定: 1回目は準備（キャッシュの読み込み）として除外し、予算の秒数に達するまで繰り返して
+        中央値・p95・最小・最大を記録（1回目が予算を超える処理はその1回のみ）
+- 比較: --compare で保存済みの結果（ベースライン）と中央値を比較し、閾値を超えて遅くなった項目を
+        回帰として表示（回帰があれば終了コード1）
+- 要件: 処理時間の上限（TIME_LIMITS_MS）を超えた項目を表示（超過があれば終了コード1）。
+        環境により変わる処理時間の確認は、pytest ではなくここで行う
+
+使い方:
+    python working/benchmark_suite.py --scales small,medium --output benchmark_results.json
+    python working/benchmark_suite.py --scales small --compare benchmark_baseline.json
+    python working/benchmark_suite.py --input benchmark_results.json --compare benchmark_baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from itertools import cycle
+from typing import Any, Callable, Dict, List, Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from bom_graph import load_bom_graph
+from bom_manager import BOMManager
+from generate_synthetic_bom import generate_synthetic_bom
+from mrp import aggregate_orders, explode_requirements
+
+# 規模 → アイテム数（構成行はアイテム数の約3.2倍）
+SCALES = {'small': 3150, 'medium': 31500, 'large': 315000}
+
+# 1項目あたりの測定時間の予算（秒）と最大回数
+DEFAULT_BUDGET_SECONDS = 1.0
+MAX_RUNS = 200
+
+# 比較: 中央値がこの割合を超えて遅くなり、かつ差がこのミリ秒を超えた場合に回帰とする
+DEFAULT_THRESHOLD = 0.25
+MIN_DELTA_MS = 0.1
+
+# 要件の処理時間（規模 → 項目名 → 中央値の上限ミリ秒）
+TIME_LIMITS_MS = {
+    'small': {
+        'simulate_substitutions': 2000,    # 数千品目のBOMで代替品シミュレーションを対話的に
+        'explode_orders': 5000,            # 受注5,000件をBOMの読み込みから一度に展開
+    },
+    'large': {'bulk_insert': 60000},              # 構成行100万行の合成BOMを1分以内に生成
+}
+
+
+def measure(func: Callable[[], Any], budget_seconds: float = DEFAULT_BUDGET_SECONDS,
+            max_runs: int = MAX_RUNS) -> Dict[str, Any]:
+    """func の処理時間（ミリ秒）の統計（1回目は予算以上かかった場合のみ結果に含め、そのまま終了）"""
+    started = time.perf_counter()
+    func()
+    first = time.perf_counter() - started
+    if first >= budget_seconds:
+        return _stats([first])
+
+    samples = []
+    spent = 0.0
+    while not samples or (spent < budget_seconds and len(samples) < max_runs):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        samples.append(elapsed)
+        spent += elapsed
+    return _stats(samples)
+
+
+def _stats(samples: List[float]) -> Dict[str, Any]:
+    samples_ms = sorted(sample * 1000 for sample in samples)
+    return {
+        'runs': len(samples_ms),
+        'median_ms': round(statistics.median(samples_ms), 4),
+        'p95_ms': round(samples_ms[min(len(samples_ms) - 1, int(len(samples_ms) * 0.95))], 4),
+        'min_ms': round(samples_ms[0], 4),
+        'max_ms': round(samples_ms[-1], 4),
+    }
+
+
+def _sample_ids(db_path: str, item_type: str, count: int, rng: random.Random) -> List[str]:
+    with sqlite3.connect(db_path) as conn:
+        item_ids = [row[0] for row in conn.execute(
+            "SELECT item_id FROM items WHERE item_type = ? ORDER BY item_id", (item_type,))]
+    return rng.sample(item_ids, min(count, len(item_ids)))
+
+
+def benchmark_cases(db_path: str, client, seed: int) -> Dict[str, Callable[[], Any]]:
+    """測定する処理（名前 → 引数なしの関数。同じ処理でも呼び出しごとに対象のアイテムを変える）"""
+    rng = random.Random(seed)
+    manager = BOMManager(db_path)
+    products = cycle(_sample_ids(db_path, '完成品', 100, rng))
+    braids = cycle(_sample_ids(db_path, '製紐糸', 100, rng))
+    raw_ids = _sample_ids(db_path, '原糸', 100, rng)
+    raws = cycle(raw_ids)
+    substitutions = cycle([{'from': raw, 'to': substitute} for raw, substitute in zip(raw_ids, raw_ids[1:])])
+    any_items = cycle(_sample_ids(db_path, 'PS糸', 50, rng) + _sample_ids(db_path, '完成品', 50, rng))
+    search = {'item_type': 'PS糸', 'denier': {'min': 100, 'max': 200}}
+    all_products = _sample_ids(db_path, '完成品', 10 ** 6, rng)
+    orders = [(rng.choice(all_products), rng.randint(1, 100)) for _ in range(5000)]
+
+    def explode_orders():
+        with sqlite3.connect(db_path) as conn:
+            graph = load_bom_graph(conn)
+        return explode_requirements(graph, aggregate_orders(orders))
+
+    def ok(response):
+        assert response.status_code == 200, (response.status_code, response.get_data(as_text=True)[:200])
+
+    return {
+        'get_item': lambda: manager.get_item(next(any_items)),
+        'get_direct_components': lambda: manager.get_direct_components(next(braids)),
+        'get_multi_level_bom': lambda: manager.get_multi_level_bom(next(products)),
+        'get_all_descendants': lambda: manager.get_all_descendants(next(products)),
+        'get_where_used': lambda: manager.get_where_used(next(raws)),
+        'get_all_items': manager.get_all_items,
+        'search_items': lambda: manager.search_items(search, limit=100),
+        'calculate_requirements': lambda: manager.calculate_requirements({next(products): 100}),
+        'explode_orders': explode_orders,
+        'simulate_substitutions': lambda: manager.simulate_substitutions([next(substitutions)]),
+        'route_index': lambda: ok(client.get('/')),
+        'route_item_details': lambda: ok(client.get(f'/item_details/{next(products)}')),
+        'route_bom_tree': lambda: ok(client.get(f'/bom_tree/{next(products)}')),
+        'route_api_items': lambda: ok(client.get('/api/items')),
+        'route_api_items_search': lambda: ok(client.get(
+            '/api/items/search?item_type=PS糸&denier_min=100&denier_max=200&limit=100')),
+        'route_api_descendants': lambda: ok(client.get(f'/api/items/{next(products)}/descendants')),
+        'route_api_where_used': lambda: ok(client.get(f'/api/items/{next(raws)}/where_used')),
+        'route_api_mrp': lambda: ok(client.post('/api/mrp', json={'demand': {next(products): 100}})),
+        'route_api_status': lambda: ok(client.get('/api/status')),
+    }
+
+
+def write_cases(db_path: str) -> Dict[str, Callable[[], Any]]:
+    """書き込みの処理（読み取りの測定後に実行。1回ごとに新しいアイテム・構成行を追加）"""
+    manager = BOMManager(db_path)
+    counter = iter(range(1, 10 ** 7))
+    raw = _sample_ids(db_path, '原糸', 1, random.Random(0))[0]
+
+    def add_item():
+        manager.add_item(f'BENCH_ITEM_{next(counter):07d}', 'ベンチマーク用', '原糸', 'KG')
+
+    def add_bom_component():
+        parent = f'BENCH_PS_{next(counter):07d}'
+        manager.add_item(parent, 'ベンチマーク用', 'PS糸', 'KG')
+        manager.add_bom_component(parent, raw, 1.0, 'Main Material')
+
+    return {'add_item': add_item, 'add_bom_component': add_bom_component}
+
+
+def run_scale(scale: str, work_dir: str, seed: int = 42,
+              budget_seconds: float = DEFAULT_BUDGET_SECONDS,
+              only: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    1つの規模のデータを生成して全項目を測定
+
+    Returns:
+        {'dataset': {'items', 'bom_lines', 'generate_seconds'}, 'results': {項目名: 統計}}
+    """
+    from app_unified import create_app
+
+    scale_dir = os.path.join(work_dir, scale)
+    os.makedirs(scale_dir, exist_ok=True)
+    db_path = os.path.join(scale_dir, 'bom_database_dev.db')
+    started = time.perf_counter()
+    generated = generate_synthetic_bom(db_path, SCALES[scale], seed=seed)
+    bulk_seconds = time.perf_counter() - started
+    results = {'bulk_insert': {
+        'runs': 1,
+        'median_ms': round(bulk_seconds * 1000, 1),
+        'lines_per_second': round(generated['bom_lines'] / bulk_seconds),
+    }}
+
+    # 開発環境の設定で、生成したDBを開く（既存のDBのためサンプルデータは作成されない）
+    original_dir = os.getcwd()
+    os.chdir(scale_dir)
+    try:
+        app = create_app('development')
+        app.config['ENABLE_PROFILER'] = False  # 本番と同じく計測なしで測定
+        client = app.test_client()
+        cases = benchmark_cases(db_path, client, seed)
+        cases.update(write_cases(db_path))
+        for name, func in cases.items():
+            if only and not any(pattern in name for pattern in only):
+                continue
+            results[name] = measure(func, budget_seconds)
+            print(f"  {scale:<7} {name:<26} {results[name]['median_ms']:>12,.3f} ms "
+                  f"(p95 {results[name]['p95_ms']:,.3f}, {results[name]['runs']}回)")
+    finally:
+        os.chdir(original_dir)
+
+    return {
+        'dataset': {'items': SCALES[scale], 'bom_lines': generated['bom_lines'],
+                    'generate_seconds': generated['seconds']},
+        'results': results,
+    }
+
+
+def run_suite(scales: List[str], seed: int = 42, budget_seconds: float = DEFAULT_BUDGET_SECONDS,
+              only: Optional[List[str]] = None, work_dir: Optional[str] = None) -> Dict[str, Any]:
+    """指定した規模のベンチマークを実行して結果（JSONに出力する形式）を返す"""
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        raise ValueError(f"規模は {', '.join(SCALES)} から指定してください: {', '.join(unknown)}")
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'seed': seed,
+        'budget_seconds': budget_seconds,
+        'scales': {},
+    }
+    with tempfile.TemporaryDirectory(dir=work_dir) as temp_dir:
+        for scale in scales:
+            report['scales'][scale] = run_scale(scale, temp_dir, seed, budget_seconds, only)
+    return report
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any],
+                    threshold: float = DEFAULT_THRESHOLD, min_delta_ms: float = MIN_DELTA_MS) -> List[Dict[str, Any]]:
+    """
+    両方の結果にある項目の中央値を比較
+
+    Returns:
+        [{'scale', 'name', 'baseline_ms', 'current_ms', 'ratio', 'status'}]
+        status: 'regression'（閾値を超えて遅い）/ 'improved'（閾値を超えて速い）/ 'ok'
+    """
+    comparison = []
+    for scale, scale_result in current.get('scales', {}).items():
+        baseline_results = baseline.get('scales', {}).get(scale, {}).get('results', {})
+        for name, stats in scale_result['results'].items():
+            if name not in baseline_results:
+                continue
+            before, after = baseline_results[name]['median_ms'], stats['median_ms']
+            ratio = after / before if before > 0 else float('inf')
+            status = 'ok'
+            if abs(after - before) > min_delta_ms:
+                if ratio > 1 + threshold:
+                    status = 'regression'
+                elif ratio < 1 / (1 + threshold):
+                    status = 'improved'
+            comparison.append({'scale': scale, 'name': name, 'baseline_ms': before, 'current_ms': after,
+                               'ratio': round(ratio, 3), 'status': status})
+    return comparison
+
+
+def check_time_limits(report: Dict[str, Any],
+                      limits: Optional[Dict[str, Dict[str, float]]] = None) -> List[Dict[str, Any]]:
+    """
+    要件の上限を超えた項目
+
+    Returns:
+        [{'scale', 'name', 'median_ms', 'limit_ms'}]（測定していない規模・項目は対象外）
+    """
+    limits = TIME_LIMITS_MS if limits is None else limits
+    exceeded = []
+    for scale, scale_result in report.get('scales', {}).items():
+        for name, limit_ms in limits.get(scale, {}).items():
+            stats = scale_result['results'].get(name)
+            if stats and stats['median_ms'] > limit_ms:
+                exceeded.append({'scale': scale, 'name': name, 'median_ms': stats['median_ms'],
+                                 'limit_ms': limit_ms})
+    return exceeded
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BOMManager・Flaskエンドポイントのベンチマーク')
+    parser.add_argument('--scales', default='small,medium', help=f"規模（{', '.join(SCALES)} のカンマ区切り）")
+    parser.add_argument('--seed', type=int, default=42, help='合成データの乱数シード')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET_SECONDS, help='1項目あたりの測定秒数')
+    parser.add_argument('--only', help='測定する項目名（部分一致、カンマ区切り）')
+    parser.add_argument('--output', default='benchmark_results.json', help='結果のJSONファイル')
+    parser.add_argument('--input', help='測定せずにこの結果ファイルを比較する')
+    parser.add_argument('--compare', help='比較するベースラインの結果ファイル')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='回帰とする遅延の割合')
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input, encoding='utf-8') as f:
+            report = json.load(f)
+    else:
+        report = run_suite([scale.strip() for scale in args.scales.split(',')], args.seed, args.budget,
+                           args.only.split(',') if args.only else None)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        report['comparison'] = compare_results(baseline, report, args.threshold)
+        print(f"ベースライン: {args.compare}（{baseline.get('created_at')}）")
+        for row in report['comparison']:
+            mark = {'regression': '遅延', 'improved': '改善', 'ok': ''}[row['status']]
+            print(f"  {row['scale']:<7} {row['name']:<26} {row['baseline_ms']:>12,.3f} → "
+                  f"{row['current_ms']:>12,.3f} ms  x{row['ratio']:<7} {mark}")
+        regressions = [row for row in report['comparison'] if row['status'] == 'regression']
+
+    exceeded = check_time_limits(report)
+    for row in exceeded:
+        print(f"  {row['scale']:<7} {row['name']:<26} {row['median_ms']:>12,.3f} ms  上限 {row['limit_ms']:,} ms 超過")
+
+    if not args.input:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"結果: {args.output}")
+    if regressions:
+        print(f"回帰 {len(regressions)}件（閾値 +{args.threshold:.0%}）")
+    if exceeded:
+        print(f"上限超過 {len(exceeded)}件")
+    if regressions or exceeded:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+テスト共通のBOM構築・実行計画の確認用ヘルパー
+複数のテストモジュールで使うランダムBOMの生成、発行したSQLを記録するBOMManager、
+実行計画の全件スキャン・全体ソートの検出をまとめる（テストモジュール同士の import を避けるため）
+"""
+
+import os
+import sqlite3
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from bom_levels import rebuild_low_level_codes
+from bom_manager import BOMManager
+
+PLAN_CHECKED_TABLES = ('items', 'bom_components', 'bc', 'i')
+
+
+def create_random_bom(path, product_count, rng):
+    """完成品→製紐糸→PS糸→原糸 の4階層（共有部品・階層飛ばしあり）"""
+    manager = BOMManager(path)
+    layers = [
+        [f"PRODUCT_{i:04d}" for i in range(product_count)],
+        [f"BRAID_{i:04d}" for i in range(product_count // 2)],
+        [f"PS_{i:04d}" for i in range(product_count // 4)],
+        [f"RAW_{i:04d}" for i in range(product_count // 10)],
+    ]
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO items (item_id, item_name, item_type, unit_of_measure) VALUES (?, ?, '原糸', 'KG')",
+                     [(item_id, item_id) for layer in layers for item_id in layer])
+    lines = set()
+    for depth, layer in enumerate(layers[:-1]):
+        for parent in layer:
+            for _ in range(rng.randint(1, 3)):
+                child_layer = layers[min(depth + rng.choice([1, 1, 1, 2]), len(layers) - 1)]
+                lines.add((parent, rng.choice(child_layer)))
+    conn.executemany("""
+        INSERT INTO bom_components (parent_item_id, component_item_id, quantity, usage_type, loss_ratio)
+        VALUES (?, ?, ?, 'Main Material', ?)
+    """, [(parent, child, rng.choice([0.5, 1, 2, 8]), rng.choice([0, 0, 0.05]))
+          for parent, child in sorted(lines)])
+    conn.commit()
+    rebuild_low_level_codes(conn)
+    conn.close()
+    return manager, layers
+
+
+class TracingBOMManager(BOMManager):
+    """発行したSQL（パラメータ展開済み）を記録するBOMManager"""
+
+    def __init__(self, db_path):
+        self.statements = []
+        super().__init__(db_path)
+
+    def connect(self):
+        conn = super().connect()
+        conn.set_trace_callback(self.statements.append)
+        return conn
+
+
+def plan_problems(conn, sql):
+    """実行計画のうち全件スキャン・全体ソートに該当する行を返す"""
+    problems = []
+    for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}"):
+        detail = row[3]
+        words = [word for word in detail.split() if word != 'TABLE']  # 旧版の "SCAN TABLE x" 形式
+        if words[0] == 'SCAN' and words[1] in PLAN_CHECKED_TABLES and 'USING' not in words:
+            problems.append(detail)
+        # 用途順に並んだ後の品名順（RIGHT PART）は親1件分の小さなソートなので許容
+        if detail.startswith('USE TEMP B-TREE FOR ORDER BY'):
+            problems.append(detail)
+    return problems
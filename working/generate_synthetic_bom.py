@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+大規模BOMの合成データ生成スクリプト（ベンチマーク用）
+釣り糸製造の構成（完成品 → 製紐糸 → PS糸 → 原糸、芯糸・スプール・梱包資材）を
+アイテム数・階層数・構成部品数の分布・共有率を指定して生成する
+
+- 同じシードなら同じデータを生成（アイテムID・構成行・数量・単価）
+- 一括更新モード（db_maintenance.bulk_maintenance）で投入し、終了時に索引・低位レベルコード・標準原価を再構築
+  （変更履歴のトリガーも停止し、生成後の変更履歴は空。索引は投入後にまとめて作成）
+- 100万行（アイテム約31.5万件）を1分以内に生成
+
+構成:
+    完成品   → [巻き取り糸 → 後PS糸 → 染色糸 →] 製紐糸 → PS糸 → 原糸（depth 4〜7）
+    完成品   → 成形品（スプール1個）、梱包資材（1〜3行）
+    製紐糸   → 芯糸（30%）
+
+- 各階層のアイテム数は1つ深い階層ほど半分（原糸が最も少ない）
+- fanout: 主構成（次の階層）の構成部品数の分布 {行数: 重み}
+- sharing: 主構成の参照のうち、その階層の共通部品（先頭2%のアイテム）を選ぶ割合。
+  それ以外は階層内を順に割り当てる（上位アイテムが多い階層では1つの部品を複数の親が使う）
+
+使い方:
+    python working/generate_synthetic_bom.py synthetic_bom.db --items 315000
+    python working/generate_synthetic_bom.py synthetic_bom.db --items 50000 --depth 6 --fanout 1:6,2:3,4:1 --sharing 0.3
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from db_maintenance import bulk_maintenance
+from migrations import apply_migrations
+
+# 主構成の階層（工程の順。depth 4 は CORE_CHAIN、5〜7 は OPTIONAL_CHAIN を順に追加）
+PROCESS_CHAIN = ['完成品', '巻き取り糸', '後PS糸', '染色糸', '製紐糸', 'PS糸', '原糸']
+CORE_CHAIN = ['完成品', '製紐糸', 'PS糸', '原糸']
+OPTIONAL_CHAIN = ['染色糸', '後PS糸', '巻き取り糸']
+
+# アイテムタイプ → (IDの接頭辞, 単位)
+ITEM_TYPE_SPECS = {
+    '完成品': ('PRODUCT', '個'),
+    '巻き取り糸': ('WOUND', 'M'),
+    '後PS糸': ('POSTPS', 'M'),
+    '染色糸': ('DYED', 'M'),
+    '製紐糸': ('BRAID', 'M'),
+    'PS糸': ('PS', 'KG'),
+    '原糸': ('RAW', 'KG'),
+    '芯糸': ('CORE', 'KG'),
+    '成形品': ('SPOOL', '個'),
+    '梱包資材': ('PKG', '枚'),
+}
+
+# 投入する items・bom_components の列（_item_row・generate_bom_lines の行の順）
+ITEM_COLUMNS = ('item_id', 'item_name', 'item_type', 'unit_of_measure', 'material_type', 'denier',
+                'series_name', 'length_m', 'color', 'knit_type', 'low_level_code')
+BOM_LINE_COLUMNS = ('parent_item_id', 'component_item_id', 'quantity', 'usage_type', 'loss_ratio')
+
+# 副資材のアイテム数（全アイテム数に対する割合, 最小件数）
+AUXILIARY_SHARES = {'芯糸': (0.002, 5), '成形品': (0.002, 5), '梱包資材': (0.005, 10)}
+
+DEFAULT_FANOUT = {1: 0.55, 2: 0.3, 3: 0.1, 4: 0.05}
+DEFAULT_SHARING = 0.2
+COMMON_SHARE = 0.02
+CORE_YARN_RATIO = 0.3
+
+SERIES_NAMES = ['X-BRAID UPGRADE', 'X-BRAID FULL DRAG', 'SUPER JIGMAN', 'OD SHOCK LEADER', 'G-SOUL']
+KNIT_TYPES = ['X4', 'X8', 'X9', 'X16']
+COLORS = ['マルチカラー', 'グリーン', 'ホワイト', 'ピンク', 'イエロー', 'ブルー']
+MATERIAL_TYPES = ['PE', 'ナイロン', 'EN', 'SK']
+DENIERS = [50, 75, 100, 150, 200, 300, 400]
+LENGTHS = [100, 150, 200, 300]
+
+
+def chain_types(depth: int) -> List[str]:
+    """主構成の階層のアイテムタイプ（完成品から原糸まで）"""
+    if not len(CORE_CHAIN) <= depth <= len(PROCESS_CHAIN):
+        raise ValueError(f"depth は{len(CORE_CHAIN)}〜{len(PROCESS_CHAIN)}で指定してください: {depth}")
+    included = set(CORE_CHAIN) | set(OPTIONAL_CHAIN[:depth - len(CORE_CHAIN)])
+    return [item_type for item_type in PROCESS_CHAIN if item_type in included]
+
+
+def parse_fanout(spec: str) -> Dict[int, float]:
+    """'1:6,2:3,4:1' → {1: 6.0, 2: 3.0, 4: 1.0}"""
+    try:
+        fanout = {int(count): float(weight)
+                  for count, weight in (part.split(':') for part in spec.split(','))}
+    except ValueError:
+        raise ValueError(f"fanout は 行数:重み をカンマ区切りで指定してください: {spec}") from None
+    if not fanout or min(fanout) < 1 or min(fanout.values()) < 0 or sum(fanout.values()) <= 0:
+        raise ValueError(f"fanout の行数は1以上、重みは0以上で指定してください: {spec}")
+    return fanout
+
+
+def allocate_items(item_count: int, depth: int) -> Dict[str, int]:
+    """アイテムタイプ別の件数（副資材を除いた件数を主構成の階層に 1, 1/2, 1/4, ... で配分）"""
+    counts = {item_type: max(minimum, int(item_count * share))
+              for item_type, (share, minimum) in AUXILIARY_SHARES.items()}
+    chain = chain_types(depth)
+    remaining = item_count - sum(counts.values())
+    if remaining < 2 ** len(chain):
+        raise ValueError(f"アイテム数が少なすぎます: {item_count}")
+    weights = [0.5 ** level for level in range(len(chain))]
+    for item_type, weight in zip(chain, weights):
+        counts[item_type] = max(1, int(remaining * weight / sum(weights)))
+    counts[chain[0]] += item_count - sum(counts.values())
+    return counts
+
+
+def _item_ids(item_type: str, count: int) -> List[str]:
+    prefix = ITEM_TYPE_SPECS[item_type][0]
+    return [f"{prefix}_{n:07d}" for n in range(1, count + 1)]
+
+
+def expected_levels(chain: List[str]) -> Dict[str, int]:
+    """アイテムタイプ別の低位レベルコード（構成の階層。投入時に設定し、終了時の再計算では差分のみ書き込む）"""
+    levels = {item_type: level for level, item_type in enumerate(chain)}
+    levels['芯糸'] = levels['製紐糸'] + 1
+    levels['成形品'] = levels['梱包資材'] = 1
+    return levels
+
+
+def _item_row(rng: random.Random, item_id: str, item_type: str, level: int) -> Tuple:
+    """items の1行（ITEM_COLUMNS の順）"""
+    unit = ITEM_TYPE_SPECS[item_type][1]
+    material = denier = series = length = color = knit = None
+    if item_type == '完成品':
+        series, knit, length, color = (rng.choice(SERIES_NAMES), rng.choice(KNIT_TYPES),
+                                       rng.choice(LENGTHS), rng.choice(COLORS))
+        name = f"{series} {knit} {length}m {color}"
+    elif item_type in ('原糸', 'PS糸', '芯糸'):
+        material, denier = rng.choice(MATERIAL_TYPES), rng.choice(DENIERS)
+        name = f"{item_type} {material} {denier}D"
+    elif item_type in ('成形品', '梱包資材'):
+        name = f"{item_type} {item_id[-7:]}"
+    else:
+        knit, denier, color = rng.choice(KNIT_TYPES), rng.choice(DENIERS), rng.choice(COLORS)
+        name = f"{item_type} {knit} {denier}D {color}"
+    return (item_id, name, item_type, unit, material, denier, series, length, color, knit, level)
+
+
+class _ComponentPicker:
+    """1つの階層から構成部品を選ぶ（共通部品 or 階層内を順に）"""
+
+    def __init__(self, item_ids: List[str], sharing: float, rng: random.Random):
+        self.item_ids = item_ids
+        self.common = max(1, int(len(item_ids) * COMMON_SHARE))
+        self.sharing = sharing
+        self.rng = rng
+        self.cursor = 0
+
+    def pick(self) -> str:
+        if self.rng.random() < self.sharing:
+            return self.item_ids[int(self.rng.random() * self.common)]
+        item_id = self.item_ids[self.cursor]
+        self.cursor = (self.cursor + 1) % len(self.item_ids)
+        return item_id
+
+
+def _main_quantity(rng: random.Random, parent_type: str, child_type: str) -> float:
+    """主構成の親1単位あたりの数量"""
+    if parent_type == '完成品':
+        return float(rng.choice(LENGTHS))                 # 巻き長さ(m)
+    if child_type == 'PS糸':
+        return round(rng.uniform(0.00002, 0.0002), 6)     # 製紐糸1mあたりのPS糸(kg)
+    if child_type == '原糸':
+        return 1.0                                        # PS糸1kgあたりの原糸(kg)
+    return round(rng.uniform(1.0, 1.1), 3)                # 中間工程（m → m）
+
+
+def generate_bom_lines(rng: random.Random, items: Dict[str, List[str]], chain: List[str],
+                       fanout: Dict[int, float], sharing: float) -> List[Tuple]:
+    """構成行（parent_item_id, component_item_id, quantity, usage_type, loss_ratio）を親・用途・構成部品順に生成"""
+    counts, weights = list(fanout), list(fanout.values())
+    auxiliary = {item_type: _ComponentPicker(items[item_type], 1.0, rng)
+                 for item_type in AUXILIARY_SHARES}
+    for picker in auxiliary.values():
+        picker.common = len(picker.item_ids)   # 副資材はどれも共通部品
+
+    lines = []
+    for parent_type, child_type in zip(chain, chain[1:]):
+        picker = _ComponentPicker(items[child_type], sharing, rng)
+        usage_type = 'Main Braid Thread' if parent_type == '製紐糸' else 'Main Material'
+        loss_ratio = 0.05 if child_type == '原糸' else 0.0
+        fanouts = rng.choices(counts, weights, k=len(items[parent_type]))
+        for parent, fanout_count in zip(items[parent_type], fanouts):
+            parent_lines = {}
+            for _ in range(fanout_count):
+                parent_lines[(usage_type, picker.pick())] = _main_quantity(rng, parent_type, child_type)
+            if parent_type == '完成品':
+                parent_lines[('Container', auxiliary['成形品'].pick())] = 1.0
+                for _ in range(rng.randint(1, 3)):
+                    parent_lines[('Packaging', auxiliary['梱包資材'].pick())] = 1.0
+            elif parent_type == '製紐糸' and rng.random() < CORE_YARN_RATIO:
+                parent_lines[('Core Thread', auxiliary['芯糸'].pick())] = round(rng.uniform(0.00001, 0.00005), 6)
+            for (usage, component), quantity in sorted(parent_lines.items()):
+                lines.append((parent, component, quantity, usage,
+                              loss_ratio if usage == usage_type else 0.0))
+    lines.sort(key=lambda line: (line[0], line[3], line[1]))
+    return lines
+
+
+def generate_synthetic_bom(path: str, item_count: int = 315000, depth: int = 4,
+                           fanout: Optional[Dict[int, float]] = None,
+                           sharing: float = DEFAULT_SHARING, seed: int = 42) -> Dict[str, object]:
+    """
+    合成BOMのDBを作成（既存ファイルは置き換え）
+
+    Args:
+        item_count: アイテム数
+        depth: 主構成の階層数（4〜7）
+        fanout: 主構成の構成部品数の分布 {行数: 重み}（省略時は DEFAULT_FANOUT）
+        sharing: 主構成の参照のうち共通部品を選ぶ割合（0〜1）
+        seed: 乱数シード
+
+    Returns:
+        {'items': タイプ別件数, 'bom_lines': 構成行数, 'seconds': 処理時間（生成・投入・再構築）}
+    """
+    if not 0 <= sharing <= 1:
+        raise ValueError(f"sharing は0〜1で指定してください: {sharing}")
+    fanout = fanout or DEFAULT_FANOUT
+    chain = chain_types(depth)
+    counts = allocate_items(item_count, depth)
+    rng = random.Random(seed)
+    seconds = {}
+
+    started = time.perf_counter()
+    items = {item_type: _item_ids(item_type, count) for item_type, count in counts.items()}
+    levels = expected_levels(chain)
+    item_rows = sorted(_item_row(rng, item_id, item_type, levels[item_type])
+                       for item_type, item_ids in items.items() for item_id in item_ids)
+    lines = generate_bom_lines(rng, items, chain, fanout, sharing)
+    purchased = [item_id for item_type in ('原糸', '芯糸', '成形品', '梱包資材') for item_id in items[item_type]]
+    cost_rows = sorted((item_id, round(rng.uniform(10, 5000), 2)) for item_id in purchased)
+    seconds['generate'] = time.perf_counter() - started
+
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    conn = sqlite3.connect(path)
+    try:
+        apply_migrations(conn, schema_file=os.path.join(PROJECT_ROOT, "schema_enhanced.sql"))
+        # 作り直しのきくファイルのため、ジャーナルはメモリ上・同期なし
+        conn.execute("PRAGMA journal_mode = MEMORY")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA cache_size = -262144")
+
+        started = time.perf_counter()
+        with bulk_maintenance(conn, suspend_closure=True, suspend_change_log=True, suspend_indexes=True):
+            # executemany は1行ごとに文を実行し直す（CHECK制約の準備なども毎回）ため、
+            # 制約のない一時テーブルに入れてから INSERT ... SELECT の1文で移す
+            for table, columns, rows in (('items', ITEM_COLUMNS, item_rows),
+                                         ('bom_components', BOM_LINE_COLUMNS, lines),
+                                         ('item_costs', ('item_id', 'unit_cost'), cost_rows)):
+                conn.execute(f"CREATE TEMP TABLE load_{table} ({', '.join(columns)})")
+                conn.executemany(f"INSERT INTO load_{table} VALUES ({', '.join('?' * len(columns))})", rows)
+                conn.execute(f"INSERT INTO {table} ({', '.join(columns)}) SELECT * FROM load_{table}")
+                conn.execute(f"DROP TABLE load_{table}")
+            seconds['insert'] = time.perf_counter() - started
+        # 終了時に索引・低位レベルコード・標準原価を再構築
+        seconds['rebuild'] = time.perf_counter() - started - seconds['insert']
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+
+    return {
+        'items': counts,
+        'bom_lines': len(lines),
+        'seconds': {phase: round(value, 2) for phase, value in seconds.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='大規模BOMの合成データ生成（ベンチマーク用）')
+    parser.add_argument('db_path', help='作成するDBのパス（既存ファイルは置き換え）')
+    parser.add_argument('--items', type=int, default=315000, help="アイテム数（約31.5万件で構成行約100万行）")
+    parser.add_argument('--depth', type=int, default=4, help='主構成の階層数（4〜7）')
+    parser.add_argument('--fanout', default=','.join(f"{count}:{weight}" for count, weight in DEFAULT_FANOUT.items()),
+                        help='主構成の構成部品数の分布（行数:重み のカンマ区切り）')
+    parser.add_argument('--sharing', type=float, default=DEFAULT_SHARING, help='共通部品を選ぶ割合（0〜1）')
+    parser.add_argument('--seed', type=int, default=42, help='乱数シード')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    result = generate_synthetic_bom(args.db_path, args.items, args.depth, parse_fanout(args.fanout),
+                                    args.sharing, args.seed)
+    print(f"{args.db_path}: アイテム {sum(result['items'].values()):,}件 / "
+          f"構成行 {result['bom_lines']:,}行（{time.perf_counter() - started:.1f}秒）")
+    for item_type, count in result['items'].items():
+        print(f"  {item_type:<8} {count:>10,}件")
+    print("  " + ", ".join(f"{phase} {value}秒" for phase, value in result['seconds'].items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+追加属性の生成カラムのテスト
+宣言したJSONキーが生成カラム＋索引になり、絞り込みが索引検索になること、
+宣言の変更（型変更・削除）が反映されること、同期が1つのセーブポイント内で行われ
+失敗時に何も残さないこと、別カラムを対象にした同名の索引を作り直すことを検証する
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from attribute_columns import get_attribute_columns, sync_attribute_columns
+from bom_manager import BOMManager
+
+
+def _create_db(path):
+    manager = BOMManager(path)
+    for i in range(200):
+        manager.add_item(f"ITEM_{i:03d}", f"アイテム{i}", '原糸', 'KG',
+                         strength_lb=str(10 + i % 20), coating=['なし', 'シリコン'][i % 2])
+    return manager
+
+
+def _plan(conn, sql, params=()):
+    return ' / '.join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+
+
+def test_promoted_attribute_uses_index():
+    """昇格したキーは型付きの生成カラムになり、索引で絞り込める"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        manager = _create_db(db_path)
+
+        # 昇格前も json_extract でSQL内で絞り込める
+        before = manager.get_items_by_attribute('coating', 'シリコン')
+        assert len(before) == 100
+
+        conn = sqlite3.connect(db_path)
+        result = sync_attribute_columns(conn, {'strength_lb': 'REAL', 'coating': 'TEXT'})
+        assert result == {'added': ['coating', 'strength_lb'], 'removed': []}
+        assert get_attribute_columns(conn) == {'strength_lb': 'REAL', 'coating': 'TEXT'}
+
+        # JSON上は文字列でも REAL として比較できる
+        assert conn.execute("SELECT COUNT(*) FROM items WHERE attr_strength_lb >= 25").fetchone()[0] == 50
+        plan = _plan(conn, "SELECT * FROM items WHERE attr_coating = ?", ('シリコン',))
+        assert 'USING INDEX idx_items_attr_coating' in plan, plan
+
+        after = manager.get_items_by_attribute('coating', 'シリコン')
+        assert [item['item_id'] for item in after] == [item['item_id'] for item in before]
+        assert after[0]['attr_coating'] == 'シリコン'
+
+        # 追加後に登録したアイテムも対象（書き込み側の変更は不要）
+        manager.add_item('ITEM_900', 'アイテム900', '原糸', 'KG', coating='フッ素')
+        assert [item['item_id'] for item in manager.get_items_by_attribute('coating', 'フッ素')] == ['ITEM_900']
+
+        # 同じ宣言での再同期は何もしない
+        assert sync_attribute_columns(conn, {'strength_lb': 'REAL', 'coating': 'TEXT'}) == \
+            {'added': [], 'removed': []}
+        conn.close()
+
+
+def test_declaration_changes():
+    """型の変更は作り直し、宣言から外したキーは索引ごと削除"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        _create_db(db_path)
+        conn = sqlite3.connect(db_path)
+        sync_attribute_columns(conn, {'strength_lb': 'REAL', 'coating': 'TEXT'})
+
+        result = sync_attribute_columns(conn, {'strength_lb': 'TEXT'})
+        assert result == {'added': ['strength_lb'], 'removed': ['coating', 'strength_lb']}
+        assert get_attribute_columns(conn) == {'strength_lb': 'TEXT'}
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert 'idx_items_attr_coating' not in indexes and 'idx_items_attr_strength_lb' in indexes
+
+        try:
+            sync_attribute_columns(conn, {'strength lb': 'REAL'})
+            assert False, "不正なキーを受け付けました"
+        except ValueError:
+            pass
+        assert get_attribute_columns(conn) == {'strength_lb': 'TEXT'}
+        conn.close()
+
+
+def _index_columns(conn, index_name):
+    return [row[2] for row in conn.execute(f"PRAGMA index_info({index_name})")]
+
+
+def test_sync_is_atomic():
+    """途中で失敗した同期は何も残さず、既存の通常カラムとの衝突は変更前に拒否する"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        _create_db(db_path)
+        conn = sqlite3.connect(db_path)
+        conn.execute("ALTER TABLE items ADD COLUMN attr_zz TEXT")
+        conn.commit()
+        try:
+            sync_attribute_columns(conn, {'aa': 'TEXT', 'zz': 'TEXT'})
+            assert False, "通常カラムとの衝突を受け付けました"
+        except ValueError as e:
+            assert 'attr_zz' in str(e)
+        assert get_attribute_columns(conn) == {}
+
+        # 2つ目のカラム削除がビューの参照で失敗すると、1つ目の削除も元に戻る
+        sync_attribute_columns(conn, {'coating': 'TEXT', 'strength_lb': 'REAL'})
+        conn.execute("CREATE VIEW strong_items AS SELECT item_id FROM items WHERE attr_strength_lb > 20")
+        conn.commit()
+        try:
+            sync_attribute_columns(conn, {})
+            assert False, "ビューが参照するカラムを削除しました"
+        except sqlite3.OperationalError:
+            pass
+        assert not conn.in_transaction
+        conn.close()
+
+        conn = sqlite3.connect(db_path)
+        assert get_attribute_columns(conn) == {'coating': 'TEXT', 'strength_lb': 'REAL'}
+        assert _index_columns(conn, 'idx_items_attr_coating') == ['attr_coating']
+        conn.close()
+
+
+def test_mismatched_index_recreated():
+    """同名の索引が別のカラムを対象にしていれば作り直す"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        _create_db(db_path)
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE INDEX idx_items_attr_coating ON items(item_name)")
+        conn.commit()
+        sync_attribute_columns(conn, {'coating': 'TEXT'})
+        assert _index_columns(conn, 'idx_items_attr_coating') == ['attr_coating']
+
+        # カラムが既にある場合も同様
+        conn.execute("DROP INDEX idx_items_attr_coating")
+        conn.execute("CREATE INDEX idx_items_attr_coating ON items(item_type)")
+        conn.commit()
+        assert sync_attribute_columns(conn, {'coating': 'TEXT'}) == {'added': [], 'removed': []}
+        assert _index_columns(conn, 'idx_items_attr_coating') == ['attr_coating']
+        plan = _plan(conn, "SELECT * FROM items WHERE attr_coating = ?", ('シリコン',))
+        assert 'USING INDEX idx_items_attr_coating' in plan, plan
+        conn.close()
+
+
+if __name__ == "__main__":
+    test_promoted_attribute_uses_index()
+    test_declaration_changes()
+    test_sync_is_atomic()
+    test_mismatched_index_recreated()
+    print("追加属性の生成カラムテスト完了")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+ベンチマーク（benchmark_suite.py）のテスト
+小規模のデータで全項目が測定されて結果がJSONに出力できること、
+ベースラインとの比較で閾値を超えた遅延だけが回帰になること（終了コード）を検証する
+"""
+
+import copy
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from benchmark_suite import TIME_LIMITS_MS, check_time_limits, compare_results, measure, run_suite
+
+BENCHMARK_SCRIPT = os.path.join(PROJECT_ROOT, 'working', 'benchmark_suite.py')
+
+
+def test_run_suite():
+    """小規模のデータで全項目を測定し、JSONに出力できる"""
+    report = run_suite(['small'], budget_seconds=0.02)
+    scale = report['scales']['small']
+    assert scale['dataset']['items'] == 3150 and scale['dataset']['bom_lines'] > 9000
+    results = scale['results']
+    for name in ('bulk_insert', 'get_item', 'get_direct_components', 'get_multi_level_bom', 'get_all_items',
+                 'search_items', 'explode_orders', 'simulate_substitutions', 'route_index', 'route_api_items', 'route_api_mrp', 'add_bom_component'):
+        assert name in results, name
+    for name, stats in results.items():
+        assert stats['runs'] >= 1 and stats['median_ms'] > 0, (name, stats)
+        if name != 'bulk_insert':
+            assert stats['min_ms'] <= stats['median_ms'] <= stats['p95_ms'] <= stats['max_ms'], (name, stats)
+    assert results['bulk_insert']['lines_per_second'] > 0
+    assert report['environment']['sqlite'] and report['seed'] == 42
+    json.loads(json.dumps(report))
+
+    report = run_suite(['small'], budget_seconds=0.02, only=['get_item', 'route_api_status'])
+    assert set(report['scales']['small']['results']) == {'bulk_insert', 'get_item', 'route_api_status'}
+    try:
+        run_suite(['huge'])
+        assert False, "不明な規模を受け付けました"
+    except ValueError:
+        pass
+
+    # 1回目が予算を超える処理はその1回のみ
+    assert measure(lambda: None, budget_seconds=0.01, max_runs=5)['runs'] == 5
+    assert measure(lambda: sum(range(10 ** 6)), budget_seconds=0.0)['runs'] == 1
+    calls = []
+    result = measure(lambda: calls.append(time.sleep(0.3)), budget_seconds=0.2)
+    assert result['runs'] == 1 and len(calls) == 1 and result['min_ms'] >= 300
+
+
+def test_compare_results():
+    """閾値を超えた遅延（かつ差が小さすぎない）だけが回帰、CLIは回帰があれば終了コード1"""
+    baseline = {'created_at': 'base', 'scales': {'small': {'results': {
+        'get_item': {'median_ms': 1.0},
+        'get_all_items': {'median_ms': 40.0},
+        'route_index': {'median_ms': 200.0},
+        'search_items': {'median_ms': 0.02},
+    }}}}
+    current = copy.deepcopy(baseline)
+    rows = compare_results(baseline, current)
+    assert len(rows) == 4 and all(row['status'] == 'ok' for row in rows)
+
+    results = current['scales']['small']['results']
+    results['get_item']['median_ms'] = 1.1          # +10%（閾値内）
+    results['get_all_items']['median_ms'] = 60.0    # +50%（回帰）
+    results['route_index']['median_ms'] = 100.0     # -50%（改善）
+    results['search_items']['median_ms'] = 0.06     # 3倍だが差が小さい（誤差）
+    results['add_item'] = {'median_ms': 1.0}        # ベースラインにない項目は比較しない
+    status = {row['name']: row['status'] for row in compare_results(baseline, current)}
+    assert status == {'get_item': 'ok', 'get_all_items': 'regression', 'route_index': 'improved',
+                      'search_items': 'ok'}, status
+    assert compare_results(baseline, current, threshold=0.6)[1]['status'] == 'ok'
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        paths = {}
+        for name, report in (('baseline', baseline), ('current', current)):
+            paths[name] = os.path.join(work_dir, f"{name}.json")
+            with open(paths[name], 'w', encoding='utf-8') as f:
+                json.dump(report, f)
+        regressed = subprocess.run([sys.executable, BENCHMARK_SCRIPT, '--input', paths['current'],
+                                    '--compare', paths['baseline']], capture_output=True, text=True)
+        print(regressed.stdout)
+        assert regressed.returncode == 1 and '回帰 1件' in regressed.stdout
+        same = subprocess.run([sys.executable, BENCHMARK_SCRIPT, '--input', paths['baseline'],
+                               '--compare', paths['baseline']], capture_output=True, text=True)
+        assert same.returncode == 0, same.stdout + same.stderr
+
+
+def test_time_limits():
+    """要件の上限を超えた項目だけを表示し、CLIは超過があれば終了コード1"""
+    limit_ms = TIME_LIMITS_MS['large']['bulk_insert']
+    report = {'scales': {
+        'small': {'results': {'bulk_insert': {'median_ms': limit_ms * 2}}},   # 上限のない項目
+        'large': {'results': {'bulk_insert': {'median_ms': limit_ms - 1}}},
+    }}
+    assert check_time_limits(report) == []
+    assert check_time_limits(report, {'large': {'bulk_insert': limit_ms / 2, 'get_item': 1}}) == [
+        {'scale': 'large', 'name': 'bulk_insert', 'median_ms': limit_ms - 1, 'limit_ms': limit_ms / 2}]
+
+    report['scales']['large']['results']['bulk_insert']['median_ms'] = limit_ms + 1
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, "report.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f)
+        exceeded = subprocess.run([sys.executable, BENCHMARK_SCRIPT, '--input', path],
+                                  capture_output=True, text=True)
+        print(exceeded.stdout)
+        assert exceeded.returncode == 1 and '上限超過 1件' in exceeded.stdout
+
+
+if __name__ == "__main__":
+    test_run_suite()
+    test_compare_results()
+    test_time_limits()
+    print("ベンチマークテスト完了")
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+BOM閉包テーブルのテスト
+トリガーによる差分反映が全件再構築と一致すること、再帰クエリと同じ結果を返すことを検証する
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from bom_closure import disable_closure, enable_closure, rebuild_closure
+from bom_manager import BOMManager
+
+USAGE_TYPES = ['Main Material', 'Main Braid Thread', 'Core Thread', 'Packaging']
+
+
+def _create_db(path, item_count=60):
+    with open(os.path.join(PROJECT_ROOT, "schema_enhanced.sql"), "r", encoding="utf-8") as f, \
+            sqlite3.connect(path) as conn:
+        conn.executescript(f.read())
+        conn.executemany(
+            "INSERT INTO items (item_id, item_name, item_type, unit_of_measure) VALUES (?, ?, ?, 'KG')",
+            [(f"ITEM_{i:03d}", f"アイテム{i}", '完成品' if i % 10 == 0 else '原糸') for i in range(item_count)]
+        )
+
+
+def _closure_rows(conn):
+    return sorted(conn.execute(
+        "SELECT ancestor, descendant, depth, ROUND(path_qty, 9), path_count FROM bom_closure"
+    ).fetchall())
+
+
+def _summary(rows):
+    return [(r['item_id'], r['min_depth'], r['max_depth'], round(r['total_quantity'], 9), r['path_count'])
+            for r in rows]
+
+
+def test_incremental_matches_rebuild():
+    """追加・削除・数量変更をトリガーで反映した結果が全件再構築と一致する"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        _create_db(db_path)
+        rng = random.Random(7)
+
+        with sqlite3.connect(db_path) as conn:
+            assert enable_closure(conn)
+            assert not enable_closure(conn)
+
+            # 添字の小さい方を親にして非巡回なBOMを作成（共有部品・複数用途を含む）
+            for _ in range(250):
+                parent, component = sorted(rng.sample(range(60), 2))
+                conn.execute("""
+                    INSERT OR IGNORE INTO bom_components (parent_item_id, component_item_id, quantity, usage_type)
+                    VALUES (?, ?, ?, ?)
+                """, (f"ITEM_{parent:03d}", f"ITEM_{component:03d}",
+                      rng.choice([0.5, 1, 2, 3]), rng.choice(USAGE_TYPES)))
+
+            for _ in range(40):
+                conn.execute("""
+                    DELETE FROM bom_components WHERE bom_component_id =
+                        (SELECT bom_component_id FROM bom_components ORDER BY random() LIMIT 1)
+                """)
+                conn.execute("""
+                    UPDATE bom_components SET quantity = quantity * 2 WHERE bom_component_id =
+                        (SELECT bom_component_id FROM bom_components ORDER BY random() LIMIT 1)
+                """)
+
+            incremental = _closure_rows(conn)
+            rows = rebuild_closure(conn)
+            assert rows == len(incremental) > 0
+            assert _closure_rows(conn) == incremental
+
+
+def test_queries_match_recursive_fallback():
+    """閉包テーブル有無で全子孫・逆展開の結果が一致し、循環参照は拒否される"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        _create_db(db_path, item_count=5)
+        manager = BOMManager(db_path)
+
+        # 000 → 001(×2) → 002(×3) と 000 → 002(×1) の菱形構成、002 → 003(×0.5)
+        manager.add_bom_component('ITEM_000', 'ITEM_001', 2, 'Main Material')
+        manager.add_bom_component('ITEM_001', 'ITEM_002', 3, 'Main Braid Thread')
+        manager.add_bom_component('ITEM_000', 'ITEM_002', 1, 'Core Thread')
+        manager.add_bom_component('ITEM_002', 'ITEM_003', 0.5, 'Main Material')
+
+        recursive_descendants = _summary(manager.get_all_descendants('ITEM_000'))
+        recursive_where_used = _summary(manager.get_where_used('ITEM_003'))
+
+        with sqlite3.connect(db_path) as conn:
+            enable_closure(conn)
+
+        assert _summary(manager.get_all_descendants('ITEM_000')) == recursive_descendants
+        assert _summary(manager.get_where_used('ITEM_003')) == recursive_where_used
+
+        descendants = {row[0]: row for row in recursive_descendants}
+        assert descendants['ITEM_002'] == ('ITEM_002', 1, 2, 7.0, 2)      # 2×3 + 1
+        assert descendants['ITEM_003'] == ('ITEM_003', 2, 3, 3.5, 2)      # 7×0.5
+        assert [r['item_id'] for r in manager.get_where_used('ITEM_003', item_type='完成品')] == ['ITEM_000']
+
+        # 循環する構成の追加は拒否
+        assert not manager.add_bom_component('ITEM_003', 'ITEM_000', 1, 'Main Material')
+
+        # 既存の行の付け替えで循環する場合も拒否（閉包は変わらない）
+        with sqlite3.connect(db_path) as conn:
+            before = _closure_rows(conn)
+            for sql in ("UPDATE bom_components SET component_item_id = 'ITEM_000' WHERE parent_item_id = 'ITEM_002'",
+                        "UPDATE bom_components SET parent_item_id = 'ITEM_003' WHERE component_item_id = 'ITEM_001'",
+                        "UPDATE bom_components SET component_item_id = 'ITEM_002' WHERE parent_item_id = 'ITEM_002'"):
+                try:
+                    conn.execute(sql)
+                    assert False, f"循環する付け替えを受け付けました: {sql}"
+                except sqlite3.IntegrityError as e:
+                    assert 'BOM循環参照' in str(e)
+            # 親・構成部品を変えない更新と、循環しない付け替えは通常どおり反映
+            conn.execute("UPDATE bom_components SET quantity = 4, component_item_id = 'ITEM_003' "
+                         "WHERE parent_item_id = 'ITEM_002' AND component_item_id = 'ITEM_003'")
+            conn.execute("UPDATE bom_components SET component_item_id = 'ITEM_004' WHERE parent_item_id = 'ITEM_002'")
+            assert _closure_rows(conn) != before
+            incremental = _closure_rows(conn)
+            rebuild_closure(conn)
+            assert _closure_rows(conn) == incremental
+            conn.execute("UPDATE bom_components SET component_item_id = 'ITEM_003', quantity = 0.5 "
+                         "WHERE parent_item_id = 'ITEM_002'")
+            assert _closure_rows(conn) == before
+
+        with sqlite3.connect(db_path) as conn:
+            disable_closure(conn)
+        assert _summary(manager.get_all_descendants('ITEM_000')) == recursive_descendants
+
+
+if __name__ == "__main__":
+    test_incremental_matches_rebuild()
+    test_queries_match_recursive_fallback()
+    print("BOM閉包テーブルテスト完了")
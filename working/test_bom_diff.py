@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+BOM構成の差分のテスト
+2つのDBの構成行の追加・削除・変更と完成品ごとの積み上げ所要量の差が正しいこと、
+ハッシュが一致する部分木を展開しないこと、アイテム同士の比較、デプロイ時の差分表示を検証する
+"""
+
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from bom_diff import BomStructure, diff_databases, diff_structures
+from bom_manager import BOMManager
+from bom_test_helpers import create_random_bom
+from deploy import BOMDeploymentManager
+
+
+def _rolled_quantities(db_path, product):
+    """参照用: 在庫なしの所要量展開（総所要量 = 1単位あたりの全階層の所要量）"""
+    manager = BOMManager(db_path)
+    return {row['item_id']: row['gross_requirement']
+            for row in manager.calculate_requirements({product: 1.0}) if row['item_id'] != product}
+
+
+def test_diff_two_databases():
+    """変更・追加・削除した構成行と、影響する完成品の積み上げ所要量の差"""
+    rng = random.Random(44)
+    with tempfile.TemporaryDirectory() as work_dir:
+        left_path = os.path.join(work_dir, "left.db")
+        right_path = os.path.join(work_dir, "right.db")
+        _, layers = create_random_bom(left_path, 400, rng)
+        shutil.copyfile(left_path, right_path)
+
+        with sqlite3.connect(right_path) as conn:
+            changed_line = conn.execute("""
+                SELECT parent_item_id, component_item_id, usage_type FROM bom_components
+                WHERE parent_item_id LIKE 'PS_%' ORDER BY parent_item_id LIMIT 1
+            """).fetchone()
+            conn.execute("""
+                UPDATE bom_components SET quantity = quantity * 2
+                WHERE parent_item_id = ? AND component_item_id = ? AND usage_type = ?
+            """, changed_line)
+            removed_line = conn.execute("""
+                SELECT parent_item_id, component_item_id, usage_type FROM bom_components
+                WHERE parent_item_id LIKE 'BRAID_%' ORDER BY parent_item_id DESC LIMIT 1
+            """).fetchone()
+            conn.execute("""
+                DELETE FROM bom_components
+                WHERE parent_item_id = ? AND component_item_id = ? AND usage_type = ?
+            """, removed_line)
+            conn.execute("""
+                INSERT INTO bom_components (parent_item_id, component_item_id, quantity, usage_type)
+                VALUES (?, ?, 3, 'Packaging')
+            """, (layers[0][0], layers[3][-1]))
+
+        diff = diff_databases(left_path, right_path)
+        key = lambda line: (line['parent_item_id'], line['component_item_id'], line['usage_type'])
+        assert [key(line) for line in diff['lines']['changed']] == [changed_line]
+        assert diff['lines']['changed'][0]['quantity_after'] == 2 * diff['lines']['changed'][0]['quantity_before']
+        assert [key(line) for line in diff['lines']['removed']] == [removed_line]
+        assert [key(line) for line in diff['lines']['added']] == [(layers[0][0], layers[3][-1], 'Packaging')]
+
+        # 影響する完成品 = 変更した行の親を含む最上位アイテム
+        left, right = BomStructure.from_path(left_path), BomStructure.from_path(right_path)
+        expected_products = {item_id for item_id in set(left.roots) | set(right.roots)
+                             if left.hashes.get(item_id) != right.hashes.get(item_id)}
+        products = {product['item_id']: product for product in diff['products']}
+        assert set(products) == expected_products and layers[0][0] in products
+        for product in rng.sample(sorted(products), min(10, len(products))):
+            before = _rolled_quantities(left_path, product)
+            after = _rolled_quantities(right_path, product)
+            expected = {item_id for item_id in set(before) | set(after)
+                        if abs(before.get(item_id, 0) - after.get(item_id, 0)) > 1e-9}
+            deltas = {delta['item_id']: delta for delta in products[product]['deltas']}
+            assert set(deltas) == expected, product
+            for item_id, delta in deltas.items():
+                assert abs(delta['after'] - after.get(item_id, 0)) < 1e-9 * max(1, delta['after'])
+
+        # 同一の部分木は展開しない
+        total_items = sum(len(layer) for layer in layers)
+        summary = diff['summary']
+        print(f"アイテム {total_items}件中 比較 {summary['items_compared']}件 "
+              f"(同一の部分木 {summary['identical_subtrees_skipped']}件を省略)")
+        assert summary['identical_subtrees_skipped'] > 0
+        assert summary['items_compared'] - summary['identical_subtrees_skipped'] < total_items / 4
+
+        identical = diff_databases(left_path, left_path)
+        assert identical['products'] == [] and identical['summary']['lines_changed'] == 0
+        assert identical['summary']['items_compared'] == identical['summary']['identical_subtrees_skipped']
+
+
+def test_diff_two_items():
+    """同じDB内の2つの完成品の構成の比較（共通の部分木は展開しない）"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        manager = BOMManager(db_path)
+        for item_id, item_type in (('P1', '完成品'), ('P2', '完成品'), ('B1', '製紐糸'),
+                                   ('R1', '原糸'), ('S1', '成形品'), ('S2', '成形品')):
+            manager.add_item(item_id, item_id, item_type, 'KG')
+        manager.add_bom_component('B1', 'R1', 0.5, 'Main Material')
+        for product, spool, quantity in (('P1', 'S1', 100), ('P2', 'S2', 150)):
+            manager.add_bom_component(product, 'B1', quantity, 'Main Material')
+            manager.add_bom_component(product, spool, 1, 'Container')
+
+        structure = BomStructure.from_path(db_path)
+        diff = diff_structures(structure, structure, roots=[('P1', 'P2')])
+        lines = diff['lines']
+        assert [(line['left_parent_item_id'], line['component_item_id']) for line in lines['removed']] == [('P1', 'S1')]
+        assert [line['component_item_id'] for line in lines['added']] == ['S2']
+        assert [(line['quantity_before'], line['quantity_after']) for line in lines['changed']] == [(100, 150)]
+        assert diff['summary']['identical_subtrees_skipped'] == 3  # B1, S1, S2 は展開しない
+        deltas = {delta['item_id']: delta['delta'] for delta in diff['products'][0]['deltas']}
+        assert deltas == {'B1': 50, 'R1': 25, 'S1': -1, 'S2': 1}
+
+        try:
+            diff_structures(structure, structure, roots=[('UNKNOWN', 'UNKNOWN')])
+            assert False, "存在しないアイテムを受け付けました"
+        except ValueError:
+            pass
+
+        # items にないアイテムを参照する構成行（外部キーを無効にした直接のSQL）
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("INSERT INTO bom_components (parent_item_id, component_item_id, quantity, usage_type) "
+                         "VALUES ('GHOST', 'R1', 1.0, 'Main Material')")
+        try:
+            BomStructure.from_path(db_path)
+            assert False, "存在しないアイテムからの構成行を読み込みました"
+        except ValueError as e:
+            assert 'GHOST→R1' in str(e)
+
+
+def test_deploy_reports_diff():
+    """デプロイ時に移行先の現在のDBとの差分を取得（移行先がなければNone）"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        current_path = os.path.join(work_dir, "current.db")
+        incoming_path = os.path.join(work_dir, "incoming.db")
+        manager = BOMManager(current_path)
+        manager.add_item('P1', 'P1', '完成品', '個')
+        manager.add_item('R1', 'R1', '原糸', 'KG')
+        manager.add_bom_component('P1', 'R1', 1.0, 'Main Material')
+        shutil.copyfile(current_path, incoming_path)
+        with sqlite3.connect(incoming_path) as conn:
+            conn.execute("UPDATE bom_components SET quantity = 1.2")
+
+        deployment = BOMDeploymentManager()
+        diff = deployment.diff_bom(current_path, incoming_path)
+        assert diff['summary']['lines_changed'] == 1 and diff['products'][0]['item_id'] == 'P1'
+        assert deployment.diff_bom(os.path.join(work_dir, "missing.db"), incoming_path) is None
+
+
+if __name__ == "__main__":
+    test_diff_two_databases()
+    test_diff_two_items()
+    test_deploy_reports_diff()
+    print("BOM構成の差分テスト完了")
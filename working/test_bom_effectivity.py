@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+BOM構成の有効期間のテスト
+基準日を指定した展開・逆展開・所要量・原価が、その日に有効な行だけを残したBOMの結果と一致すること、
+改訂と期間の重なりの検証（改訂時の標準原価の再計算と更新日時の1回書き込みを含む）、
+閉包テーブル有効時の切り替え、実行計画、APIを検証する
+"""
+
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+from datetime import date
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from bom_closure import enable_closure
+from bom_effectivity import revise_bom_line
+from bom_manager import BOMManager
+from bom_test_helpers import TracingBOMManager, create_random_bom, plan_problems
+
+DATES = ['2023-01-01', '2024-04-01', '2024-10-01', '2025-04-01']
+
+
+def _create_small_bom(path):
+    """完成品 → 製紐糸 → PS糸 → 原糸。2024-04-01 に編み本数を 8 → 6 に改訂し芯糸を追加"""
+    manager = BOMManager(path)
+    for item_id, item_type, unit in (('PRODUCT', '完成品', '個'), ('BRAID', '製紐糸', 'M'),
+                                     ('PS', 'PS糸', 'M'), ('RAW', '原糸', 'KG'), ('CORE', '芯糸', 'M')):
+        manager.add_item(item_id, item_id, item_type, unit)
+    assert manager.add_bom_component('PRODUCT', 'BRAID', 100, 'Main Material')
+    assert manager.add_bom_component('BRAID', 'PS', 8, 'Main Braid Thread')
+    assert manager.add_bom_component('PS', 'RAW', 0.001, 'Main Material')
+    assert manager.revise_bom_component('BRAID', 'PS', 'Main Braid Thread', 6, '2024-04-01')
+    assert manager.add_bom_component('BRAID', 'CORE', 1, 'Core Thread', effective_from='2024-04-01')
+    return manager
+
+
+def _effective_copy(db_path, copy_path, as_of):
+    """参照用: 基準日に有効な行だけを残し、有効期間を外したBOM"""
+    shutil.copyfile(db_path, copy_path)
+    with sqlite3.connect(copy_path) as conn:
+        conn.execute("""
+            DELETE FROM bom_components
+            WHERE NOT ((effective_from IS NULL OR effective_from <= :as_of)
+                       AND (effective_to IS NULL OR effective_to > :as_of))
+        """, {'as_of': as_of})
+        conn.execute("UPDATE bom_components SET effective_from = NULL, effective_to = NULL")
+    return BOMManager(copy_path)
+
+
+def _rows(rows, *fields):
+    return {row['item_id']: tuple(round(row[field], 9) for field in fields) for row in rows}
+
+
+def _stored_cost(conn, item_id):
+    return conn.execute("SELECT standard_cost FROM item_costs WHERE item_id = ?", (item_id,)).fetchone()[0]
+
+
+def test_point_in_time_explosion():
+    """改訂前後の日付で構成・所要量・原価・逆展開が切り替わる"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        manager = _create_small_bom(os.path.join(work_dir, "bom.db"))
+        manager.set_unit_cost('RAW', 1000)
+        manager.set_unit_cost('CORE', 0.5)
+
+        def braid_lines(as_of):
+            bom = manager.get_multi_level_bom('PRODUCT', as_of=as_of)
+            return {component['item']['item_id']: component['quantity']
+                    for component in bom['components'][0]['components']}
+
+        assert braid_lines('2024-03-31') == {'PS': 8}
+        assert braid_lines('2024-04-01') == {'PS': 6, 'CORE': 1}
+        assert braid_lines(None) == {'PS': 6, 'CORE': 1}  # 省略時は当日
+
+        # 旧ロット（2024-03-15 製造）の使用量を再現
+        old_lot = {row['item_id']: row['gross_requirement']
+                   for row in manager.calculate_requirements({'PRODUCT': 10}, as_of='2024-03-15')}
+        new_lot = {row['item_id']: row['gross_requirement']
+                   for row in manager.calculate_requirements({'PRODUCT': 10}, as_of='2024-04-15')}
+        assert abs(old_lot['RAW'] - 10 * 100 * 8 * 0.001) < 1e-9 and 'CORE' not in old_lot
+        assert abs(new_lot['RAW'] - 10 * 100 * 6 * 0.001) < 1e-9 and new_lot['CORE'] == 1000
+
+        assert [row['item_id'] for row in manager.get_where_used('CORE', as_of='2024-03-31')] == []
+        assert [row['item_id'] for row in manager.get_where_used('CORE', as_of='2024-04-01')] == ['BRAID', 'PRODUCT']
+
+        # 保存済みの標準原価は当日の構成、基準日指定は都度計算
+        assert abs(manager.get_item_cost('PRODUCT')['standard_cost'] - 100 * (6 + 0.5)) < 1e-9
+        old_cost = manager.get_item_cost('BRAID', as_of='2024-03-31')
+        assert abs(old_cost['standard_cost'] - 8) < 1e-9 and old_cost['as_of'] == '2024-03-31'
+        assert [component['component_item_id'] for component in old_cost['components']] == ['PS']
+
+        # 期間の重なり・空の期間は登録しない
+        assert not manager.add_bom_component('BRAID', 'PS', 7, 'Main Braid Thread', effective_from='2024-06-01')
+        assert not manager.add_bom_component('BRAID', 'CORE', 1, 'Core Thread', effective_to='2024-05-01')
+        assert not manager.add_bom_component('PS', 'CORE', 1, 'Core Thread',
+                                             effective_from='2024-05-01', effective_to='2024-05-01')
+        assert manager.add_bom_component('BRAID', 'CORE', 2, 'Core Thread',
+                                         effective_from='2023-01-01', effective_to='2024-04-01')
+        assert not manager.add_bom_component('BRAID', 'CORE', 2, 'Core Thread', effective_from='2024-13-01')
+
+        # 使用中止: 改訂日以降は展開しない
+        assert manager.revise_bom_component('BRAID', 'CORE', 'Core Thread', None, '2025-01-01')
+        assert braid_lines('2024-12-31') == {'PS': 6, 'CORE': 1}
+        assert braid_lines('2025-01-01') == {'PS': 6}
+        assert not manager.revise_bom_component('BRAID', 'CORE', 'Core Thread', None, '2025-06-01')
+
+
+def test_revise_line_updates_costs():
+    """revise_bom_line 単体でも標準原価を再計算し、更新した行は1回だけ書き込む"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        manager = _create_small_bom(db_path)
+        manager.set_unit_cost('RAW', 1000)
+        today = date.today().isoformat()
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("UPDATE bom_components SET updated_at = '2020-01-01 00:00:00'")
+            # 更新日時トリガーによる再書き込みも含めて bom_components の行更新を数える
+            conn.execute("CREATE TEMP TABLE bom_writes (bom_component_id INTEGER)")
+            conn.execute("""
+                CREATE TEMP TRIGGER count_bom_writes AFTER UPDATE ON main.bom_components
+                BEGIN INSERT INTO bom_writes VALUES (NEW.bom_component_id); END
+            """)
+            (old_id,) = conn.execute(
+                "SELECT bom_component_id FROM bom_components WHERE parent_item_id = 'PS'").fetchone()
+
+            new_id = revise_bom_line(conn, 'PS', 'RAW', 'Main Material', 0.002, today)
+            assert conn.execute("SELECT bom_component_id FROM bom_writes").fetchall() == [(old_id,)]
+            assert abs(_stored_cost(conn, 'PRODUCT') - 100 * 6 * 2) < 1e-9
+
+            # 改訂日に始まる行の書き換え（同じ秒の書き換えはトリガーの対象になるため更新日時を戻しておく）
+            conn.execute("UPDATE bom_components SET updated_at = '2020-01-01 00:00:00' WHERE bom_component_id = ?",
+                         (new_id,))
+            conn.execute("DELETE FROM bom_writes")
+            assert revise_bom_line(conn, 'PS', 'RAW', 'Main Material', 0.003, today) == new_id
+            assert conn.execute("SELECT bom_component_id FROM bom_writes").fetchall() == [(new_id,)]
+            assert abs(_stored_cost(conn, 'PRODUCT') - 100 * 6 * 3) < 1e-9
+            stamps = dict(conn.execute("SELECT bom_component_id, updated_at FROM bom_components"
+                                       " WHERE bom_component_id IN (?, ?)", (old_id, new_id)))
+            assert all(stamp > '2020-01-01 00:00:00' for stamp in stamps.values()), stamps
+
+
+def test_matches_filtered_bom():
+    """ランダムな改訂を加えたBOMで、各基準日の結果がその日に有効な行だけのBOMと一致"""
+    rng = random.Random(45)
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        manager, layers = create_random_bom(db_path, 300, rng)
+        with sqlite3.connect(db_path) as conn:
+            lines = conn.execute(
+                "SELECT parent_item_id, component_item_id, usage_type FROM bom_components").fetchall()
+            for parent, component, usage_type in rng.sample(lines, 120):
+                revised_on = rng.choice(DATES[1:])
+                revise_bom_line(conn, parent, component, usage_type,
+                                rng.choice([None, 0.5, 3.0]), revised_on)
+            conn.commit()
+        for item_id in layers[3]:
+            manager.set_unit_cost(item_id, rng.uniform(100, 1000))
+        demand = {item_id: rng.randint(1, 20) for item_id in rng.sample(layers[0], 50)}
+        samples = rng.sample(layers[0], 5) + rng.sample(layers[3], 5)
+
+        for as_of in DATES:
+            reference = _effective_copy(db_path, os.path.join(work_dir, f"ref_{as_of}.db"), as_of)
+            assert _rows(manager.calculate_requirements(demand, as_of=as_of), 'gross_requirement') == \
+                _rows(reference.calculate_requirements(demand), 'gross_requirement'), as_of
+            for item_id in samples:
+                assert _rows(manager.get_all_descendants(item_id, as_of=as_of), 'total_quantity') == \
+                    _rows(reference.get_all_descendants(item_id), 'total_quantity'), (as_of, item_id)
+                assert _rows(manager.get_where_used(item_id, as_of=as_of), 'total_quantity') == \
+                    _rows(reference.get_where_used(item_id), 'total_quantity'), (as_of, item_id)
+            reference.rollup_costs()
+            for item_id in samples[:5]:
+                expected = reference.get_item_cost(item_id)['standard_cost']
+                assert abs(manager.get_item_cost(item_id, as_of=as_of)['standard_cost'] - expected) \
+                    < 1e-6 * max(1.0, expected)
+        print(f"構成 {len(lines)}行中 120行を改訂、基準日 {len(DATES)}件で一致")
+
+
+def test_closure_table_with_dated_lines():
+    """閉包テーブル有効時も、基準日に無効な行がある間は再帰クエリで正しい結果を返す"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        manager = _create_small_bom(db_path)
+        with sqlite3.connect(db_path) as conn:
+            enable_closure(conn)
+
+        descendants = _rows(manager.get_all_descendants('PRODUCT', as_of='2024-03-31'), 'total_quantity')
+        assert descendants == {'BRAID': (100,), 'PS': (800,), 'RAW': (0.8,)}
+        descendants = _rows(manager.get_all_descendants('PRODUCT'), 'total_quantity')
+        assert descendants == {'BRAID': (100,), 'PS': (600,), 'CORE': (100,), 'RAW': (0.6,)}
+
+        # 期間指定のない行だけになれば閉包テーブルを使う（結果は同じ）
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("DELETE FROM bom_components WHERE effective_to IS NOT NULL")
+            conn.execute("UPDATE bom_components SET effective_from = NULL")
+        assert _rows(manager.get_all_descendants('PRODUCT'), 'total_quantity') == descendants
+
+
+def test_dated_query_plans():
+    """基準日を指定した展開も索引で完結する（全件スキャンなし）"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        _create_small_bom(db_path).add_bom_component('PRODUCT', 'PS', 1, 'Packaging', effective_to='2024-01-01')
+        manager = TracingBOMManager(db_path)
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("ANALYZE")
+
+        manager.statements.clear()
+        assert manager.get_multi_level_bom('PRODUCT', as_of='2023-06-01') is not None
+        assert manager.get_all_descendants('PRODUCT', as_of='2023-06-01')
+        assert manager.get_where_used('RAW', as_of='2023-06-01')
+        selects = [sql for sql in manager.statements if sql.lstrip().upper().startswith(('SELECT', 'WITH'))]
+        with sqlite3.connect(db_path) as conn:
+            for sql in selects:
+                # 逆展開・子孫の集計結果の並べ替え（件数は結果の行数）は対象外
+                problems = [problem for problem in plan_problems(conn, sql) if problem.startswith('SCAN')]
+                assert not problems, f"{' '.join(sql.split())}\n  → {problems}"
+            plan = ' '.join(row[3] for row in conn.execute(
+                "EXPLAIN QUERY PLAN " + next(sql for sql in selects if 'bc.effective_from' in sql
+                                               and 'JOIN items' in sql)))
+            assert 'COVERING INDEX idx_bom_parent_usage' in plan, plan
+
+
+def test_effectivity_api():
+    """APIの基準日指定（as_of）"""
+    from app_unified import create_app
+
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        try:
+            app = create_app('development')
+            client = app.test_client()
+            assert BOMManager(app.config['DATABASE_PATH']).revise_bom_component(
+                'BRAID_001', 'PS_001', 'Main Braid Thread', 16, '2024-04-01')
+
+            def raw_requirement(as_of):
+                body = client.post('/api/mrp', json={'demand': {'PRODUCT_001': 1}, 'as_of': as_of}).get_json()
+                return {row['item_id']: row['gross_requirement'] for row in body['requirements']}['RAW_001']
+
+            assert abs(raw_requirement('2024-03-31') - 100 * 8 * 0.8) < 1e-9
+            assert abs(raw_requirement('2024-04-01') - 100 * 16 * 0.8) < 1e-9
+
+            descendants = client.get('/api/items/PRODUCT_001/descendants?as_of=2024-03-31').get_json()
+            assert {row['item_id']: row['total_quantity'] for row in descendants}['PS_001'] == 800
+            assert client.get('/api/items/PRODUCT_001/descendants?as_of=2024/03/31').status_code == 400
+            assert client.get('/api/items/RAW_001/where_used?as_of=2024-03-31').status_code == 200
+            assert client.get('/api/items/PRODUCT_001/cost?as_of=2024-03-31').get_json()['as_of'] == '2024-03-31'
+            assert client.post('/api/mrp', json={'demand': {'PRODUCT_001': 1}, 'as_of': 'x'}).status_code == 400
+            assert client.get('/bom_tree/PRODUCT_001?as_of=2024-03-31').status_code == 200
+        finally:
+            os.chdir(original_dir)
+
+
+if __name__ == "__main__":
+    test_point_in_time_explosion()
+    test_revise_line_updates_costs()
+    test_matches_filtered_bom()
+    test_closure_table_with_dated_lines()
+    test_dated_query_plans()
+    test_effectivity_api()
+    print("BOM構成の有効期間テスト完了")
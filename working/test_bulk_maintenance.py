@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+更新日時トリガーと一括更新モードのテスト
+各行の書き込み回数（total_changes）と、bulk_maintenance のトリガー停止・復元（閉包・変更履歴を含む）と索引の削除・再作成を検証する
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from bom_closure import enable_closure
+from change_log import CHANGE_LOG_TRIGGER_NAMES, get_changes_since
+from db_maintenance import MAINTENANCE_TRIGGER_NAMES, bulk_maintenance
+
+FIXED_TIME = '2030-01-01 00:00:00'
+
+
+def _create_db(path):
+    with open(os.path.join(PROJECT_ROOT, "schema_enhanced.sql"), "r", encoding="utf-8") as f, \
+            sqlite3.connect(path) as conn:
+        conn.executescript(f.read())
+        conn.executemany("""
+            INSERT INTO items (item_id, item_name, item_type, unit_of_measure,
+                               oracle_product_code, oracle_sync_status, updated_at)
+            VALUES (?, ?, ?, 'KG', ?, ?, '2020-01-01 00:00:00')
+        """, [
+            ('PRODUCT_001', '完成品1', '完成品', 'P001', 'synced'),
+            ('YARN_001', '原糸1', '原糸', None, 'manual'),
+            ('YARN_002', '原糸2', '原糸', None, 'manual'),
+        ])
+        conn.executemany("""
+            INSERT INTO bom_components (parent_item_id, component_item_id, quantity, usage_type)
+            VALUES (?, ?, ?, 'Main Material')
+        """, [('PRODUCT_001', 'YARN_001', 2), ('PRODUCT_001', 'YARN_002', 3)])
+
+
+def _change_log_seq(conn):
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+    return row[0] if row else 0
+
+
+def _writes(conn, sql, params=()):
+    """SQL 1文がトリガーを含めて書き込んだ行数（変更履歴 change_log への追記を除く）"""
+    before, before_seq = conn.total_changes, _change_log_seq(conn)
+    conn.execute(sql, params)
+    conn.commit()
+    return conn.total_changes - before - (_change_log_seq(conn) - before_seq)
+
+
+def _trigger_names(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+
+
+def test_timestamp_written_once():
+    """updated_at を設定済みの更新はトリガーで再更新しない"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        _create_db(db_path)
+        conn = sqlite3.connect(db_path)
+
+        # updated_at 未指定 → トリガーが1回だけ補完
+        assert _writes(conn, "UPDATE items SET color = '赤' WHERE item_id = 'YARN_001'") == 2
+        assert conn.execute("SELECT updated_at FROM items WHERE item_id = 'YARN_001'").fetchone()[0] \
+            != '2020-01-01 00:00:00'
+
+        # updated_at 指定済み → 1行1回
+        assert _writes(conn, "UPDATE items SET updated_at = ?", (FIXED_TIME,)) == 3
+        assert _writes(conn, "UPDATE bom_components SET quantity = 4, updated_at = ?", (FIXED_TIME,)) == 2
+
+        # Oracle同期による品名変更（oracle_last_sync を更新）は 'modified' にしない
+        assert _writes(conn, """
+            UPDATE items SET item_name = '完成品1 改', oracle_sync_status = 'synced',
+                             oracle_last_sync = '2030-01-02 00:00:00', updated_at = '2030-01-02 00:00:00'
+            WHERE item_id = 'PRODUCT_001'
+        """) == 1
+        assert conn.execute(
+            "SELECT oracle_sync_status FROM items WHERE item_id = 'PRODUCT_001'"
+        ).fetchone()[0] == 'synced'
+
+        # 手動での品名変更 → 同期ステータスと更新日時を1回の追加書き込みで設定
+        assert _writes(conn, "UPDATE items SET item_name = '完成品1 手動' WHERE item_id = 'PRODUCT_001'") == 2
+        status, updated_at = conn.execute(
+            "SELECT oracle_sync_status, updated_at FROM items WHERE item_id = 'PRODUCT_001'"
+        ).fetchone()
+        assert status == 'modified' and updated_at != '2030-01-02 00:00:00'
+        conn.close()
+
+
+def test_bulk_maintenance_suspends_and_restores():
+    """一括更新モードではトリガーが停止し、終了時・例外時に復元される"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        _create_db(db_path)
+        conn = sqlite3.connect(db_path)
+        triggers = _trigger_names(conn)
+        assert set(MAINTENANCE_TRIGGER_NAMES) <= triggers
+
+        with bulk_maintenance(conn):
+            assert not set(MAINTENANCE_TRIGGER_NAMES) & _trigger_names(conn)
+            before, before_seq = conn.total_changes, _change_log_seq(conn)
+            conn.execute("UPDATE items SET color = '青'")
+            assert conn.total_changes - before - (_change_log_seq(conn) - before_seq) == 3
+
+            # 他の接続からはトリガーが削除されていない状態が見える
+            with sqlite3.connect(db_path) as other:
+                assert _trigger_names(other) == triggers
+
+        assert _trigger_names(conn) == triggers
+        assert not conn.in_transaction
+
+        try:
+            with bulk_maintenance(conn):
+                conn.execute("UPDATE items SET color = '緑'")
+                raise RuntimeError("中断")
+        except RuntimeError:
+            pass
+        assert _trigger_names(conn) == triggers
+        assert conn.execute("SELECT COUNT(*) FROM items WHERE color = '緑'").fetchone()[0] == 0
+        conn.close()
+
+
+def test_bulk_maintenance_rebuilds_closure():
+    """閉包トリガーを停止した場合は終了時に閉包を再構築"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        _create_db(db_path)
+        conn = sqlite3.connect(db_path)
+        enable_closure(conn)
+
+        conn.execute("PRAGMA foreign_keys = OFF")
+        with bulk_maintenance(conn, suspend_closure=True):
+            assert 'bom_closure_after_update' not in _trigger_names(conn)
+            conn.execute("UPDATE items SET item_id = 'PRODUCT_900' WHERE item_id = 'PRODUCT_001'")
+            conn.execute("UPDATE bom_components SET parent_item_id = 'PRODUCT_900'")
+
+        assert 'bom_closure_after_update' in _trigger_names(conn)
+        assert conn.execute(
+            "SELECT DISTINCT ancestor FROM bom_closure"
+        ).fetchall() == [('PRODUCT_900',)]
+        conn.close()
+
+
+def test_bulk_maintenance_suspends_change_log():
+    """変更履歴のトリガーを停止した場合は記録せず、終了時に全件の読み直しを求める"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        _create_db(db_path)
+        conn = sqlite3.connect(db_path)
+        triggers = _trigger_names(conn)
+        seq = _change_log_seq(conn)
+
+        with bulk_maintenance(conn, suspend_change_log=True):
+            assert not set(CHANGE_LOG_TRIGGER_NAMES) & _trigger_names(conn)
+            conn.execute("UPDATE items SET color = '青'")
+
+        assert _trigger_names(conn) == triggers
+        assert _change_log_seq(conn) == seq + 1
+        assert conn.execute("SELECT COUNT(*) FROM change_log").fetchone()[0] == 0
+        assert get_changes_since(conn, seq)['reset_required']
+        assert not get_changes_since(conn, seq + 1)['reset_required']
+        conn.close()
+
+
+def test_bulk_maintenance_suspends_indexes():
+    """索引を削除した場合は終了時に同じ定義で再作成し、一意索引の重複では全体を元に戻す"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        _create_db(db_path)
+        conn = sqlite3.connect(db_path)
+        indexes = _index_definitions(conn)
+        assert 'idx_bom_component' in indexes and 'ux_bom_components_line' in indexes
+
+        with bulk_maintenance(conn, suspend_indexes=True):
+            assert not set(indexes) & set(_index_definitions(conn))
+            conn.execute("UPDATE bom_components SET quantity = quantity * 2")
+        assert _index_definitions(conn) == indexes
+
+        line = conn.execute("""
+            SELECT parent_item_id, component_item_id, quantity, usage_type FROM bom_components LIMIT 1
+        """).fetchone()
+        try:
+            with bulk_maintenance(conn, suspend_indexes=True):
+                conn.execute("""
+                    INSERT INTO bom_components (parent_item_id, component_item_id, quantity, usage_type)
+                    VALUES (?, ?, ?, ?)
+                """, line)
+            assert False, "重複する構成行を受け付けました"
+        except sqlite3.IntegrityError:
+            pass
+        assert _index_definitions(conn) == indexes
+        assert conn.execute("SELECT COUNT(*) FROM bom_components").fetchone()[0] == 2
+        conn.close()
+
+
+def _index_definitions(conn):
+    return dict(conn.execute("""
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ('items', 'bom_components')
+    """))
+
+
+if __name__ == "__main__":
+    test_timestamp_written_once()
+    test_bulk_maintenance_suspends_and_restores()
+    test_bulk_maintenance_rebuilds_closure()
+    test_bulk_maintenance_suspends_change_log()
+    test_bulk_maintenance_suspends_indexes()
+    print("一括更新モードテスト完了")
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+変更履歴（change_log）のテスト
+items・bom_components の追加・更新・削除がトリガーで記録されること、更新日時・低位レベルコードのみの更新は
+記録しないこと、通し番号による分割読み出し・削除済みの範囲の検知、一括更新モード、APIを検証する
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from bom_manager import BOMManager
+from change_log import get_changes_since, latest_change_seq, prune_change_log
+from db_maintenance import bulk_maintenance
+
+
+def _changes(conn, since_seq):
+    return [(change['table_name'], change['item_id'], change['operation'], change['changed_columns'])
+            for change in get_changes_since(conn, since_seq)['changes']]
+
+
+def test_triggers_record_changes():
+    """追加・更新（変更したカラム）・削除・キーの変更の記録"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        manager = BOMManager(db_path)
+        manager.add_item('P1', '完成品1', '完成品', '個')
+        manager.add_item('R1', '原糸1', '原糸', 'KG')
+        manager.add_bom_component('P1', 'R1', 0.5, 'Main Material')
+
+        conn = sqlite3.connect(db_path)
+        assert _changes(conn, 0) == [
+            ('items', 'P1', 'INSERT', None),
+            ('items', 'R1', 'INSERT', None),
+            ('bom_components', 'P1', 'INSERT', None),
+        ]
+
+        # 更新日時・低位レベルコードのみの更新は記録しない
+        seq = latest_change_seq(conn)
+        with conn:
+            conn.execute("UPDATE items SET updated_at = '2030-01-01 00:00:00', low_level_code = 5")
+            conn.execute("UPDATE bom_components SET updated_at = '2030-01-01 00:00:00'")
+            conn.execute("UPDATE items SET color = color")
+        assert latest_change_seq(conn) == seq
+
+        with conn:
+            conn.execute("UPDATE items SET color = '赤', denier = 150 WHERE item_id = 'R1'")
+            conn.execute("UPDATE bom_components SET quantity = 0.6")
+        assert _changes(conn, seq) == [
+            ('items', 'R1', 'UPDATE', ['denier', 'color']),
+            ('bom_components', 'P1', 'UPDATE', ['quantity']),
+        ]
+
+        # アイテムID・親の変更は旧アイテムの削除と新アイテムの追加
+        seq = latest_change_seq(conn)
+        with conn:
+            conn.execute("UPDATE items SET item_id = 'P2' WHERE item_id = 'P1'")
+            conn.execute("UPDATE bom_components SET parent_item_id = 'P2'")
+            conn.execute("DELETE FROM bom_components")
+        assert _changes(conn, seq) == [
+            ('items', 'P1', 'DELETE', None),
+            ('items', 'P2', 'INSERT', None),
+            ('bom_components', 'P1', 'DELETE', None),
+            ('bom_components', 'P2', 'INSERT', None),
+            ('bom_components', 'P2', 'DELETE', None),
+        ]
+        row_keys = {change['row_key'] for change in get_changes_since(conn, seq)['changes']
+                    if change['table_name'] == 'items'}
+        assert row_keys == {'P1', 'P2'}
+
+        # 一括更新モード（更新日時のトリガーを停止）でも記録する
+        seq = latest_change_seq(conn)
+        with bulk_maintenance(conn):
+            conn.execute("UPDATE items SET item_name = item_name || ' 改'")
+        assert [change[2:] for change in _changes(conn, seq)] == [('UPDATE', ['item_name'])] * 2
+        conn.close()
+
+
+def test_batches_and_pruning():
+    """通し番号による分割読み出し、テーブルの絞り込み、削除済みの範囲の検知"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        manager = BOMManager(db_path)
+        for i in range(25):
+            manager.add_item(f'R{i:02d}', f'原糸{i}', '原糸', 'KG')
+        manager.add_item('P1', '完成品1', '完成品', '個')
+        manager.add_bom_component('P1', 'R00', 1.0, 'Main Material')
+
+        conn = sqlite3.connect(db_path)
+        seen, since = [], 0
+        while True:
+            batch = get_changes_since(conn, since, limit=10)
+            assert not batch['reset_required']
+            seen.extend(change['seq'] for change in batch['changes'])
+            since = batch['next_seq']
+            if not batch['has_more']:
+                break
+        assert seen == list(range(1, 28)) and since == batch['latest_seq'] == 27
+
+        # 対象外のテーブルの変更も含めて最新まで進める
+        bom_only = get_changes_since(conn, 0, tables=['bom_components'])
+        assert [change['seq'] for change in bom_only['changes']] == [27] and bom_only['next_seq'] == 27
+        items_only = get_changes_since(conn, 0, tables=['items'])
+        assert len(items_only['changes']) == 26 and items_only['next_seq'] == 27
+
+        assert prune_change_log(conn, before_seq=11) == 10
+        assert get_changes_since(conn, 9)['reset_required']
+        assert not get_changes_since(conn, 10)['reset_required']
+        assert get_changes_since(conn, 28)['reset_required']
+        assert prune_change_log(conn, keep_days=1) == 0
+        assert prune_change_log(conn, before_seq=28) == 17
+        assert latest_change_seq(conn) == 27
+        assert not get_changes_since(conn, 27)['reset_required']
+        assert get_changes_since(conn, 20)['reset_required']
+
+        for since_seq, limit, tables in ((-1, 10, None), (0, 0, None), (0, 10, ['item_costs'])):
+            try:
+                get_changes_since(conn, since_seq, limit, tables)
+                assert False, f"不正な指定を受け付けました: {since_seq}, {limit}, {tables}"
+            except ValueError:
+                pass
+        conn.close()
+
+
+def test_changes_api():
+    """変更履歴API（since・limit・table）"""
+    from app_unified import create_app
+
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        try:
+            app = create_app('development')
+            client = app.test_client()
+            latest = client.get('/api/changes?limit=1').get_json()['latest_seq']
+            assert latest > 0
+
+            BOMManager(app.config['DATABASE_PATH']).revise_bom_component(
+                'BRAID_001', 'PS_001', 'Main Braid Thread', 16, '2024-04-01')
+            body = client.get(f'/api/changes?since={latest}&table=bom_components').get_json()
+            assert body['success'] and not body['has_more']
+            assert [(change['operation'], change['item_id']) for change in body['changes']] == [
+                ('UPDATE', 'BRAID_001'), ('INSERT', 'BRAID_001')]
+            assert body['changes'][0]['changed_columns'] == ['effective_to']
+
+            for query in ('since=x', 'since=-1', 'limit=0', 'limit=100000', 'table=item_costs'):
+                assert client.get(f'/api/changes?{query}').status_code == 400, query
+        finally:
+            os.chdir(original_dir)
+
+
+if __name__ == "__main__":
+    test_triggers_record_changes()
+    test_batches_and_pruning()
+    test_changes_api()
+    print("変更履歴テスト完了")
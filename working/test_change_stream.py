@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+変更のプッシュ配信（SSE）のテスト
+変更があったときだけ変更と件数が全購読者に届くこと、監視が購読者の数によらず1つであること、
+通し番号からの再開・削除済みの範囲での reset、監視のエラーからの復帰、APIを検証する
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from bom_manager import BOMManager
+from change_log import latest_change_seq, prune_change_log
+from change_stream import ChangeBroadcaster
+
+
+def _parse(text):
+    """SSEのテキスト → [(イベント名, id, データ)]（keepalive・retry は除く）"""
+    events = []
+    for block in text.split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines()
+                      if ': ' in line and not line.startswith(':'))
+        if 'event' in fields:
+            events.append((fields['event'], fields.get('id'), json.loads(fields['data'])))
+    return events
+
+
+def _next_event(stream):
+    """次のイベント（keepalive・retry は読み飛ばす）"""
+    while True:
+        events = _parse(next(stream))
+        if events:
+            return events[0]
+
+
+def _create_db(path):
+    manager = BOMManager(path)
+    manager.add_item('P1', '完成品1', '完成品', '個')
+    manager.add_item('R1', '原糸1', '原糸', 'KG')
+    manager.add_bom_component('P1', 'R1', 0.5, 'Main Material')
+    return manager
+
+
+def test_changes_pushed_to_all_subscribers():
+    """変更時だけ全購読者に配信し、監視のクエリは購読者の数によらない"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        manager = _create_db(db_path)
+        statements = []
+
+        def connect():
+            conn = sqlite3.connect(db_path)
+            conn.set_trace_callback(statements.append)
+            return conn
+
+        broadcaster = ChangeBroadcaster(connect, poll_seconds=0.02)
+        streams = [broadcaster.events(heartbeat_seconds=0.05) for _ in range(3)]
+        for stream in streams:
+            event, _, counts = _next_event(stream)
+            assert event == 'counts' and counts['total_items'] == 2 and counts['total_bom_components'] == 1
+        assert broadcaster.subscriber_count == 3
+
+        # 変更がない間は通し番号の確認だけ
+        statements.clear()
+        time.sleep(0.3)
+        assert statements and all('sqlite_sequence' in sql for sql in statements), set(statements)
+
+        manager.add_item('R2', '原糸2', '原糸', 'KG')
+        manager.add_bom_component('P1', 'R2', 0.25, 'Main Material')
+        for stream in streams:
+            received = []
+            while len(received) < 2:
+                event, event_id, data = _next_event(stream)
+                if event == 'changes':
+                    received.extend(data['changes'])
+                    assert int(event_id) == received[-1]['seq']
+            assert [(change['table_name'], change['operation']) for change in received] == [
+                ('items', 'INSERT'), ('bom_components', 'INSERT')]
+            counts = _next_event(stream)[2]
+            assert counts['total_items'] == 3 and counts['items_by_type'] == {'完成品': 1, '原糸': 2}
+        count_queries = [sql for sql in statements if 'GROUP BY item_type' in sql]
+        assert 1 <= len(count_queries) <= 2, count_queries
+
+        for stream in streams:
+            stream.close()
+        assert broadcaster.subscriber_count == 0
+
+
+def test_resume_and_reset():
+    """通し番号からの再開（DBから読み出し）と、削除済みの範囲・DBの置き換えでの reset"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        manager = _create_db(db_path)
+        broadcaster = ChangeBroadcaster(lambda: sqlite3.connect(db_path), poll_seconds=0.02)
+
+        stream = broadcaster.events(since=1, heartbeat_seconds=0.05)
+        event, event_id, data = _next_event(stream)
+        assert event == 'changes' and [change['seq'] for change in data['changes']] == [2, 3]
+        assert event_id == '3' and _next_event(stream)[0] == 'counts'
+        stream.close()
+
+        conn = sqlite3.connect(db_path)
+        prune_change_log(conn, before_seq=3)
+        latest = latest_change_seq(conn)
+        conn.close()
+        for since in (0, latest + 10):
+            stream = broadcaster.events(since=since, heartbeat_seconds=0.05)
+            event, event_id, data = _next_event(stream)
+            assert event == 'reset' and data['latest_seq'] == latest and event_id == str(latest)
+            stream.close()
+
+        # 購読中に保持範囲より前の変更が必要になった場合もDBから読み出す
+        broadcaster.buffer_size = 1
+        stream = broadcaster.events(heartbeat_seconds=0.05)
+        assert _next_event(stream)[0] == 'counts'
+        for i in range(5):
+            manager.add_item(f'R{i + 10}', f'原糸{i}', '原糸', 'KG')
+        seqs = []
+        while len(seqs) < 5:
+            event, _, data = _next_event(stream)
+            if event == 'changes':
+                seqs.extend(change['seq'] for change in data['changes'])
+        assert seqs == list(range(latest + 1, latest + 6))
+        stream.close()
+
+
+def test_watch_recovers_from_errors():
+    """監視のエラーでは購読者を待たせ続けず（keepalive・max_seconds で終了）、接続し直して再開する"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        _create_db(db_path)
+        failures = {'remaining': 3}
+
+        def connect():
+            if failures['remaining']:
+                failures['remaining'] -= 1
+                raise sqlite3.OperationalError('database is locked')
+            return sqlite3.connect(db_path)
+
+        broadcaster = ChangeBroadcaster(connect, poll_seconds=0.05)
+        failures['remaining'] = 10 ** 6
+        started = time.monotonic()
+        chunks = list(broadcaster.events(heartbeat_seconds=0.05, max_seconds=0.3))
+        assert time.monotonic() - started < 2
+        assert chunks and set(chunks) == {": keepalive\n\n"}
+        assert broadcaster.subscriber_count == 0
+
+        # 失敗が止めば同じ監視スレッドで配信を再開する
+        failures['remaining'] = 3
+        stream = broadcaster.events(heartbeat_seconds=0.05)
+        event, _, counts = _next_event(stream)
+        assert event == 'counts' and counts['total_items'] == 2
+        assert failures['remaining'] == 0
+        stream.close()
+
+
+def test_change_stream_api():
+    """SSE API（text/event-stream、since・Last-Event-ID、不正な指定）"""
+    from app_unified import create_app
+
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        try:
+            app = create_app('development')
+            app.config['CHANGE_STREAM_MAX_SECONDS'] = 0.3
+            app.config['CHANGE_STREAM_HEARTBEAT_SECONDS'] = 0.1
+            client = app.test_client()
+            latest = client.get('/api/changes?limit=1').get_json()['latest_seq']
+
+            response = client.get(f'/api/changes/stream?since={latest - 2}')
+            assert response.status_code == 200 and response.mimetype == 'text/event-stream'
+            events = _parse(response.get_data(as_text=True))
+            assert [event for event, _, _ in events] == ['changes', 'counts']
+            assert [change['seq'] for change in events[0][2]['changes']] == [latest - 1, latest]
+            assert events[1][2]['total_items'] > 0
+            assert ': keepalive' in response.get_data(as_text=True)
+
+            response = client.get('/api/changes/stream', headers={'Last-Event-ID': str(latest)})
+            assert [event for event, _, _ in _parse(response.get_data(as_text=True))] == ['counts']
+
+            assert client.get('/api/changes/stream?since=x').status_code == 400
+            assert client.get('/api/changes/stream?since=-1').status_code == 400
+        finally:
+            os.chdir(original_dir)
+
+
+if __name__ == "__main__":
+    test_changes_pushed_to_all_subscribers()
+    test_resume_and_reset()
+    test_watch_recovers_from_errors()
+    test_change_stream_api()
+    print("変更のプッシュ配信テスト完了")
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+標準原価積み上げのテスト
+全件積み上げが構成部品方向の再帰計算と一致すること（ロス率を含む）、
+単価変更・BOM構成追加時の差分再計算が影響範囲（祖先）のみを対象に全件積み上げと同じ結果になること、
+API の応答、アイテムIDの一括変更・削除に原価・単位換算係数が追随することを検証する
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+from functools import lru_cache
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from bom_manager import BOMManager
+from bom_test_helpers import create_random_bom
+from cost_rollup import rollup_all_costs, rollup_costs_for
+from deploy import BOMDeploymentManager
+from tools.update_item_prefix import update_item_prefix
+from tools.update_item_prefix_by_type import update_item_prefix_by_type
+
+
+def _reference_costs(conn):
+    """標準原価 = 単価 + Σ 構成部品の標準原価 × 数量 × (1 + ロス率) を再帰で計算"""
+    unit_costs = dict(conn.execute("SELECT item_id, unit_cost FROM item_costs"))
+    children = {}
+    for parent, component, quantity, loss_ratio in conn.execute(
+            "SELECT parent_item_id, component_item_id, quantity, loss_ratio FROM bom_components"):
+        children.setdefault(parent, []).append((component, quantity * (1 + (loss_ratio or 0))))
+
+    @lru_cache(maxsize=None)
+    def cost(item_id):
+        return unit_costs.get(item_id, 0.0) + sum(cost(component) * quantity
+                                                  for component, quantity in children.get(item_id, []))
+
+    return {row[0]: cost(row[0]) for row in conn.execute("SELECT item_id FROM items")}
+
+
+def _stored_costs(conn):
+    return {item_id: standard_cost or 0.0 for item_id, standard_cost in
+            conn.execute("SELECT item_id, standard_cost FROM item_costs")}
+
+
+def _assert_costs_equal(actual, expected):
+    for item_id, cost in expected.items():
+        assert abs(actual.get(item_id, 0.0) - cost) < 1e-6 * max(1, cost), (item_id, actual.get(item_id), cost)
+
+
+def test_full_rollup_matches_reference():
+    """全件積み上げ（ロス率・階層飛ばし・共有部品を含む）"""
+    rng = random.Random(41)
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        _, layers = create_random_bom(db_path, 200, rng)
+        with sqlite3.connect(db_path) as conn:
+            conn.executemany("INSERT INTO item_costs (item_id, unit_cost) VALUES (?, ?)",
+                             [(item_id, rng.uniform(100, 2000)) for item_id in layers[3]]
+                             + [(item_id, rng.uniform(1, 20)) for item_id in layers[1]])
+            conn.commit()
+            updated = rollup_all_costs(conn)
+            _assert_costs_equal(_stored_costs(conn), _reference_costs(conn))
+            assert updated > len(layers[3])
+            assert rollup_all_costs(conn) == 0  # 変化がなければ書き込まない
+
+
+def test_incremental_matches_full_rollup():
+    """単価変更・構成追加の差分再計算は祖先のみ対象で、全件積み上げと一致"""
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        manager, layers = create_random_bom(db_path, 200, rng)
+        for item_id in layers[3]:
+            manager.set_unit_cost(item_id, rng.uniform(100, 2000))
+
+        with sqlite3.connect(db_path) as conn:
+            _assert_costs_equal(_stored_costs(conn), _reference_costs(conn))
+
+        raw_material = layers[3][0]
+        recalculated = manager.set_unit_cost(raw_material, 9999.0)
+        ancestors = {row['item_id'] for row in manager.get_where_used(raw_material)}
+        print(f"{raw_material} の単価変更: {len(recalculated)}アイテムを再計算（全 "
+              f"{sum(len(layer) for layer in layers)}アイテム）")
+        assert set(recalculated) == ancestors | {raw_material}
+
+        for _ in range(20):
+            manager.set_unit_cost(rng.choice(layers[2] + layers[3]), rng.uniform(0, 500))
+        assert manager.add_bom_component(layers[0][1], layers[3][-1], 0.25, 'Process Material')
+        assert manager.get_item_cost(layers[0][1])['standard_cost'] > 0
+
+        with sqlite3.connect(db_path) as conn:
+            _assert_costs_equal(_stored_costs(conn), _reference_costs(conn))
+            assert rollup_all_costs(conn) == 0
+
+
+def test_stale_low_level_codes():
+    """BOMManager を通さずに追加された構成行でLLCが古い場合も、全件・差分とも正しく積み上げる"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        manager = BOMManager(db_path)
+        for item_id, item_type in (('P', '完成品'), ('B', '製紐糸'), ('R', '原糸')):
+            manager.add_item(item_id, item_id, item_type, 'KG')
+        manager.add_bom_component('P', 'B', 2.0, 'Main Material')
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("INSERT INTO bom_components (parent_item_id, component_item_id, quantity, usage_type) "
+                         "VALUES ('B', 'R', 3.0, 'Main Material')")
+
+        # R のLLCは0のまま（B より浅い）でも、差分再計算は R → B → P の順
+        assert set(manager.set_unit_cost('R', 10.0)) == {'R', 'B', 'P'}
+        assert manager.get_item_cost('P')['standard_cost'] == 60
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("UPDATE item_costs SET standard_cost = 0")
+            conn.commit()
+            assert rollup_all_costs(conn) == 3
+            assert _stored_costs(conn) == {'R': 10.0, 'B': 30.0, 'P': 60.0}
+
+            conn.execute("INSERT INTO bom_components (parent_item_id, component_item_id, quantity, usage_type) "
+                         "VALUES ('R', 'B', 1.0, 'Main Material')")
+            conn.commit()
+            try:
+                rollup_all_costs(conn)
+                assert False, "循環するBOMを積み上げました"
+            except ValueError as e:
+                assert 'BOM循環参照' in str(e)
+        try:
+            with sqlite3.connect(db_path) as conn:
+                rollup_costs_for(conn, ['R'])
+            assert False, "循環するBOMを積み上げました"
+        except ValueError as e:
+            assert 'BOM循環参照' in str(e)
+
+
+def test_cost_api():
+    """原価の取得・単価更新・内訳"""
+    from app_unified import create_app
+
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        try:
+            app = create_app('development')
+            client = app.test_client()
+
+            response = client.put('/api/items/RAW_001/cost', json={'unit_cost': 1000})
+            body = response.get_json()
+            assert response.status_code == 200
+            assert set(body['recalculated']) == {'RAW_001', 'PS_001', 'BRAID_001', 'PRODUCT_001'}
+
+            cost = client.get('/api/items/PRODUCT_001/cost').get_json()
+            assert abs(cost['standard_cost'] - 100 * 8 * 0.8 * 1000) < 1e-6
+            assert [c['component_item_id'] for c in cost['components'] if c['extended_cost']] == ['BRAID_001']
+
+            client.put('/api/items/MOLD_001/cost', json={'unit_cost': 30})
+            costs = {row['item_id']: row for row in client.get('/api/costs').get_json()}
+            assert abs(costs['PRODUCT_001']['standard_cost'] - (100 * 8 * 0.8 * 1000 + 30)) < 1e-6
+            assert costs['PRODUCT_002']['standard_cost'] == 0
+
+            assert client.post('/api/costs/rollup').get_json()['updated'] == 0
+            assert client.put('/api/items/UNKNOWN/cost', json={'unit_cost': 1}).status_code == 404
+            assert client.put('/api/items/RAW_001/cost', json={'unit_cost': 'abc'}).status_code == 400
+            assert client.get('/api/items/UNKNOWN/cost').status_code == 404
+        finally:
+            os.chdir(original_dir)
+
+
+def _create_prefixed_db(path, prefix):
+    """単価・単位換算係数つきの2階層BOM（完成品 ← 原糸×2）"""
+    with open(os.path.join(PROJECT_ROOT, "schema_enhanced.sql"), "r", encoding="utf-8") as f, \
+            sqlite3.connect(path) as conn:
+        conn.executescript(f.read())
+        conn.executemany("INSERT INTO items (item_id, item_name, item_type, unit_of_measure) VALUES (?, ?, ?, 'KG')",
+                         [(f'{prefix}P1', '完成品1', '完成品'), (f'{prefix}Y1', '原糸1', '原糸')])
+        conn.execute("INSERT INTO bom_components (parent_item_id, component_item_id, quantity, usage_type) "
+                     "VALUES (?, ?, 2, 'Main Material')", (f'{prefix}P1', f'{prefix}Y1'))
+        conn.executemany("INSERT INTO item_costs (item_id, unit_cost) VALUES (?, ?)",
+                         [(f'{prefix}P1', 10), (f'{prefix}Y1', 100)])
+        conn.execute("INSERT INTO uom_conversions (item_id, to_unit, factor) VALUES (?, '個', 0.5)", (f'{prefix}Y1',))
+        rollup_all_costs(conn)
+        conn.commit()
+
+
+def test_item_id_changes_follow_costs():
+    """アイテムIDの一括変更で原価・単位換算係数も追随し、テストデータ削除で孤立行を残さない"""
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        try:
+            for rename, old_prefix, new_prefix in ((update_item_prefix, 'ORACLE_', 'XBRAID_'),
+                                                   (update_item_prefix_by_type, 'XBRAID_', None)):
+                if new_prefix is None:
+                    expected = {'XBRAID_P1': 'PRODUCT_P1', 'XBRAID_Y1': 'YARN_Y1'}
+                else:
+                    expected = {f'{old_prefix}P1': f'{new_prefix}P1', f'{old_prefix}Y1': f'{new_prefix}Y1'}
+                if os.path.exists("bom_database_enhanced.db"):
+                    os.remove("bom_database_enhanced.db")
+                _create_prefixed_db("bom_database_enhanced.db", old_prefix)
+                assert rename()
+                with sqlite3.connect("bom_database_enhanced.db") as conn:
+                    costs = dict(conn.execute("SELECT item_id, standard_cost FROM item_costs"))
+                    assert costs == {expected[f'{old_prefix}P1']: 10 + 100 * 2, expected[f'{old_prefix}Y1']: 100}
+                    assert conn.execute("SELECT item_id FROM uom_conversions").fetchall() == \
+                        [(expected[f'{old_prefix}Y1'],)]
+
+            _create_prefixed_db("deploy.db", 'TEST_')
+            BOMDeploymentManager().adjust_database_for_environment("deploy.db", 'production')
+            with sqlite3.connect("deploy.db") as conn:
+                for table in ('items', 'bom_components', 'item_costs', 'uom_conversions'):
+                    assert conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == 0, table
+        finally:
+            os.chdir(original_dir)
+
+
+if __name__ == "__main__":
+    test_full_rollup_matches_reference()
+    test_incremental_matches_full_rollup()
+    test_stale_low_level_codes()
+    test_cost_api()
+    test_item_id_changes_follow_costs()
+    print("標準原価積み上げテスト完了")
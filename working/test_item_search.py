@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+属性検索（search_items・/api/items/search）のテスト
+SQLでの絞り込み結果とファセット件数が全件取得＋Pythonでの絞り込みと一致すること、
+索引で絞り込むこと、API のクエリ文字列の変換を検証する
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+from collections import Counter
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from bom_manager import BOMManager
+
+ITEM_TYPES = ['原糸', 'PS糸', '製紐糸']
+
+
+def _create_db(path):
+    rng = random.Random(39)
+    manager = BOMManager(path)
+    for i in range(400):
+        manager.add_item(
+            f"ITEM_{i:03d}", f"アイテム{i}", ITEM_TYPES[i % 3], 'KG',
+            denier=rng.choice([50, 100, 150, 200, 300]),
+            twist_type=rng.choice(['S', 'Z', None]),
+            material_type=rng.choice(['EN', 'SK', 'PE']),
+            knit_type=rng.choice(['X8', 'X4', None]),
+            series_name=rng.choice(['X-BRAID', 'ODDPORT']),
+            coating=rng.choice(['なし', 'シリコン']),
+        )
+    return manager
+
+
+def test_search_matches_python_filter():
+    """範囲・一致・複数値・追加属性の条件とファセット件数"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        manager = _create_db(os.path.join(work_dir, "bom.db"))
+        all_items = manager.get_all_items()
+
+        # 拡張属性は additional_attributes ではなくカラムに保存される
+        assert all(item['series_name'] for item in all_items)
+        assert all('series_name' not in (item['additional_attributes'] or {}) for item in all_items)
+
+        result = manager.search_items({
+            'item_type': 'PS糸',
+            'denier': {'min': 100, 'max': 200},
+            'twist_type': 'S',
+            'knit_type': ['X8', 'X4'],
+        }, attributes={'coating': 'シリコン'})
+        expected = [item for item in all_items
+                    if item['item_type'] == 'PS糸' and 100 <= item['denier'] <= 200
+                    and item['twist_type'] == 'S' and item['knit_type'] in ('X8', 'X4')
+                    and item['additional_attributes']['coating'] == 'シリコン']
+        print(f"該当 {result['total']}件 / 全 {len(all_items)}件")
+        assert result['total'] == len(expected) > 0
+        assert [item['item_id'] for item in result['items']] == [item['item_id'] for item in expected]
+        assert result['facets']['material_type'] == dict(Counter(item['material_type'] for item in expected))
+        assert result['facets']['item_type'] == {'PS糸': len(expected)}
+
+        page = manager.search_items({'item_type': '原糸'}, facets=(), limit=10, offset=5)
+        assert page['total'] == len([item for item in all_items if item['item_type'] == '原糸'])
+        assert len(page['items']) == 10 and page['facets'] == {}
+
+        for bad_filters in ({'item_name': 'x'}, {'item_type': {'min': 1}}, {'denier': {'from': 1}}):
+            try:
+                manager.search_items(bad_filters)
+                assert False, f"不正な条件を受け付けました: {bad_filters}"
+            except ValueError:
+                pass
+
+
+def test_search_uses_index():
+    """種別+デニール範囲の検索は索引で絞り込む"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        _create_db(db_path)
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("ANALYZE")
+            plan = ' / '.join(row[3] for row in conn.execute("""
+                EXPLAIN QUERY PLAN
+                SELECT * FROM items WHERE item_type = ? AND denier >= ? AND denier <= ? AND twist_type = ?
+            """, ('PS糸', 100, 200, 'S')))
+        assert 'USING INDEX idx_items_type_denier' in plan, plan
+
+
+def test_search_api():
+    """クエリ文字列の条件変換とエラー応答"""
+    from app_unified import create_app
+
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        try:
+            app = create_app('development')
+            client = app.test_client()
+
+            response = client.get('/api/items/search?item_type=PS糸,原糸&facets=item_type')
+            body = response.get_json()
+            assert response.status_code == 200
+            assert body['total'] == 6 and body['facets'] == {'item_type': {'PS糸': 3, '原糸': 3}}
+
+            assert client.get('/api/items/search?item_name=x').status_code == 200  # 未対応の引数は無視
+            assert client.get('/api/items/search?denier_min=abc').status_code == 400
+            assert client.get('/api/items/search?facets=item_name').status_code == 400
+        finally:
+            os.chdir(original_dir)
+
+
+if __name__ == "__main__":
+    test_search_matches_python_filter()
+    test_search_uses_index()
+    test_search_api()
+    print("属性検索テスト完了")
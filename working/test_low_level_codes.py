@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+低位レベルコード（LLC）のテスト
+BOM構成の追加ごとの差分更新が全件計算と一致すること、循環する構成を拒否すること、
+一括更新モードの終了時に再計算されることを検証する
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from bom_levels import compute_low_level_codes, rebuild_low_level_codes
+from bom_manager import BOMManager
+from db_maintenance import bulk_maintenance
+
+
+def _stored_levels(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return dict(conn.execute("SELECT item_id, low_level_code FROM items"))
+
+
+def _computed_levels(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return compute_low_level_codes(conn)
+
+
+def test_incremental_matches_full_computation():
+    """ランダムな順序で構成を追加しても差分更新の結果が全件計算と一致する"""
+    rng = random.Random(36)
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        manager = BOMManager(db_path)
+        item_ids = [f"ITEM_{i:03d}" for i in range(60)]
+        for item_id in item_ids:
+            manager.add_item(item_id, item_id, '原糸', 'KG')
+
+        added = rejected = 0
+        for _ in range(300):
+            parent, component = rng.sample(item_ids, 2)
+            before = _stored_levels(db_path)
+            if manager.add_bom_component(parent, component, 1.0, 'Main Material'):
+                added += 1
+            else:
+                rejected += 1
+                assert _stored_levels(db_path) == before  # 拒否時はLLCも変わらない
+            if added % 20 == 0:
+                assert _stored_levels(db_path) == _computed_levels(db_path)
+
+        print(f"追加 {added}件, 拒否 {rejected}件, 最大LLC {max(_stored_levels(db_path).values())}")
+        assert added > 50 and rejected > 0
+        assert _stored_levels(db_path) == _computed_levels(db_path)
+
+        # 全ての辺で 子のLLC > 親のLLC
+        levels = _stored_levels(db_path)
+        with sqlite3.connect(db_path) as conn:
+            for parent, component in conn.execute(
+                    "SELECT parent_item_id, component_item_id FROM bom_components"):
+                assert levels[component] > levels[parent]
+
+
+def test_cycle_rejected_and_timestamps_kept():
+    """循環する構成の追加を拒否し、LLCの更新では updated_at を変えない"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        manager = BOMManager(db_path)
+        for item_id, item_type in (('PRODUCT_001', '完成品'), ('BRAID_001', '製紐糸'), ('YARN_001', '原糸')):
+            manager.add_item(item_id, item_id, item_type, 'KG')
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("UPDATE items SET updated_at = '2020-01-01 00:00:00'")
+
+        assert manager.add_bom_component('BRAID_001', 'YARN_001', 1.0, 'Main Material')
+        assert manager.add_bom_component('PRODUCT_001', 'BRAID_001', 1.0, 'Main Braid Thread')
+        assert _stored_levels(db_path) == {'PRODUCT_001': 0, 'BRAID_001': 1, 'YARN_001': 2}
+
+        assert not manager.add_bom_component('YARN_001', 'PRODUCT_001', 1.0, 'Main Material')
+        assert len(manager.get_direct_components('YARN_001')) == 0
+
+        with sqlite3.connect(db_path) as conn:
+            assert conn.execute("SELECT DISTINCT updated_at FROM items").fetchall() == \
+                [('2020-01-01 00:00:00',)]
+
+            # 直接のSQLで作られた循環（PRODUCT ↔ BRAID）の下への構成の追加も止まらずに拒否する
+            conn.execute("UPDATE bom_components SET component_item_id = 'PRODUCT_001' WHERE parent_item_id = 'BRAID_001'")
+        before = _stored_levels(db_path)
+        assert not manager.add_bom_component('YARN_001', 'PRODUCT_001', 1.0, 'Main Material')
+        assert manager.get_direct_components('YARN_001') == [] and _stored_levels(db_path) == before
+
+
+def test_rebuild_after_delete_and_bulk_maintenance():
+    """削除後は再計算で最小値に戻り、一括更新モードの終了時にも再計算される"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        manager = BOMManager(db_path)
+        for item_id in ('A', 'B', 'C', 'D'):
+            manager.add_item(item_id, item_id, '原糸', 'KG')
+        for parent, component in (('A', 'B'), ('B', 'C'), ('C', 'D'), ('A', 'D')):
+            manager.add_bom_component(parent, component, 1.0, 'Main Material')
+        assert _stored_levels(db_path)['D'] == 3
+
+        conn = sqlite3.connect(db_path)
+        conn.execute("DELETE FROM bom_components WHERE parent_item_id = 'C'")
+        conn.commit()
+        assert _stored_levels(db_path)['D'] == 3  # 削除では下げない
+        assert rebuild_low_level_codes(conn) == 1
+        assert _stored_levels(db_path)['D'] == 1
+
+        with bulk_maintenance(conn, suspend_closure=True):
+            conn.execute("UPDATE bom_components SET parent_item_id = 'C' WHERE parent_item_id = 'A' "
+                         "AND component_item_id = 'D'")
+        assert _stored_levels(db_path) == {'A': 0, 'B': 1, 'C': 2, 'D': 3}
+        conn.close()
+
+
+if __name__ == "__main__":
+    test_incremental_matches_full_computation()
+    test_cycle_rejected_and_timestamps_kept()
+    test_rebuild_after_delete_and_bulk_maintenance()
+    print("低位レベルコードテスト完了")
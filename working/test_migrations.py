@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+スキーママイグレーションのテスト
+旧バージョン（v0）のDBを最新へ移行した結果が新規作成したDBと一致すること、
+再実行しても変化しないこと、オンライン再構築中の更新が失われないことを検証する
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from bom_manager import BOMManager
+from migrations import apply_migrations, get_schema_version, latest_version, rebuild_table_online
+
+
+def _create_v0_db(path):
+    """Oracle同期の差分検知導入前（バージョン0）のDBを再現"""
+    conn = sqlite3.connect(path)
+    with open(os.path.join(PROJECT_ROOT, "schema_enhanced.sql"), "r", encoding="utf-8") as f:
+        conn.executescript(f.read())
+    conn.executescript("""
+        DROP TRIGGER update_items_timestamp;
+        DROP TRIGGER update_oracle_sync_status;
+        DROP TABLE bom_component_proposals;
+        DROP TABLE item_costs;
+        DROP TABLE uom_conversions;
+        DROP TRIGGER change_log_items_insert;
+        DROP TRIGGER change_log_items_update;
+        DROP TRIGGER change_log_items_delete;
+        DROP TRIGGER change_log_bom_insert;
+        DROP TRIGGER change_log_bom_update;
+        DROP TRIGGER change_log_bom_delete;
+        DROP TABLE change_log;
+        DROP INDEX idx_items_low_level_code;
+        ALTER TABLE items DROP COLUMN oracle_content_hash;
+        ALTER TABLE items DROP COLUMN low_level_code;
+        ALTER TABLE oracle_sync_log DROP COLUMN records_skipped;
+        ALTER TABLE oracle_sync_log DROP COLUMN records_skipped_changed;
+        CREATE INDEX idx_items_type ON items(item_type);
+        DROP TABLE bom_components;
+        CREATE TABLE bom_components (
+            bom_component_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            parent_item_id TEXT NOT NULL,
+            component_item_id TEXT NOT NULL,
+            quantity REAL NOT NULL,
+            usage_type TEXT NOT NULL,
+            process_step INTEGER,
+            loss_ratio REAL DEFAULT 0.0,
+            remarks TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (parent_item_id) REFERENCES items(item_id),
+            FOREIGN KEY (component_item_id) REFERENCES items(item_id),
+            UNIQUE(parent_item_id, component_item_id, usage_type)
+        );
+        CREATE INDEX idx_bom_parent_usage ON bom_components(parent_item_id, usage_type, component_item_id, quantity);
+        CREATE INDEX idx_bom_component ON bom_components(component_item_id);
+        PRAGMA user_version = 0;
+    """)
+    conn.executemany(
+        "INSERT INTO items (item_id, item_name, item_type, unit_of_measure, updated_at) "
+        "VALUES (?, ?, ?, 'KG', '2020-01-01 00:00:00')",
+        [('PRODUCT_001', '完成品1', '完成品'), ('YARN_001', '原糸1', '原糸')]
+    )
+    conn.execute("""
+        INSERT INTO bom_components (parent_item_id, component_item_id, quantity, usage_type)
+        VALUES ('PRODUCT_001', 'YARN_001', 2, 'Main Material')
+    """)
+    conn.commit()
+    return conn
+
+
+def _schema_snapshot(conn):
+    """比較用のスキーマ情報（カラム集合と索引・トリガー定義）"""
+    tables = {}
+    for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"):
+        tables[name] = sorted(row[1] for row in conn.execute(f"PRAGMA table_info({name})"))
+    objects = sorted(conn.execute(
+        "SELECT type, name, sql FROM sqlite_master WHERE type IN ('index', 'trigger')"
+    ))
+    return tables, objects
+
+
+def test_upgrade_matches_fresh_schema():
+    """v0からの移行結果が新規作成と同じスキーマになり、データが保持される"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        conn = _create_v0_db(os.path.join(work_dir, "old.db"))
+        result = apply_migrations(conn)
+        assert not result['created']
+        assert [version for version, _, _ in result['applied']] == list(range(1, latest_version() + 1))
+        assert get_schema_version(conn) == latest_version()
+        assert not conn.in_transaction
+
+        fresh = sqlite3.connect(os.path.join(work_dir, "fresh.db"))
+        assert apply_migrations(fresh)['created']
+        assert get_schema_version(fresh) == latest_version()
+        assert _schema_snapshot(conn) == _schema_snapshot(fresh)
+
+        assert conn.execute("SELECT COUNT(*) FROM bom_components").fetchone()[0] == 1
+        # 表の UNIQUE 制約は一意索引（有効期間の開始日ごと）に置き換わる
+        assert 'UNIQUE' not in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'bom_components'").fetchone()[0]
+        assert dict(conn.execute("SELECT item_id, low_level_code FROM items")) == \
+            {'PRODUCT_001': 0, 'YARN_001': 1}
+        # LLCの計算で更新日時を変えない
+        assert conn.execute("SELECT COUNT(DISTINCT updated_at) FROM items").fetchone()[0] == 1
+
+        # 再実行しても何も適用されない
+        before = _schema_snapshot(conn)
+        assert apply_migrations(conn)['applied'] == []
+        assert _schema_snapshot(conn) == before
+        conn.close()
+        fresh.close()
+
+
+def test_bom_manager_initializes_schema():
+    """BOMManager は作業ディレクトリに依存せずスキーマを作成・移行する"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        manager = BOMManager(db_path)
+        assert manager.add_item('YARN_001', '原糸1', '原糸', 'KG')
+        with sqlite3.connect(db_path) as conn:
+            assert get_schema_version(conn) == latest_version()
+
+        old_path = os.path.join(work_dir, "old.db")
+        _create_v0_db(old_path).close()
+        BOMManager(old_path)
+        with sqlite3.connect(old_path) as conn:
+            assert get_schema_version(conn) == latest_version()
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(items)")]
+            assert 'oracle_content_hash' in columns
+
+
+def test_rebuild_table_online():
+    """バッチコピー中の他接続からの追加・更新・削除が再構築後のテーブルに反映される"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "rebuild.db")
+        conn = sqlite3.connect(db_path)
+        conn.executescript("""
+            CREATE TABLE samples (sample_id INTEGER PRIMARY KEY, name TEXT NOT NULL, qty REAL);
+            CREATE INDEX idx_samples_name ON samples(name);
+            CREATE TABLE sample_log (sample_id INTEGER);
+            CREATE TRIGGER samples_log AFTER INSERT ON samples
+            BEGIN
+                INSERT INTO sample_log VALUES (NEW.sample_id);
+            END;
+        """)
+        conn.executemany("INSERT INTO samples VALUES (?, ?, ?)",
+                         [(i, f"S{i:03d}", float(i)) for i in range(1, 101)])
+        conn.commit()
+
+        other = sqlite3.connect(db_path)
+        batches = []
+
+        def concurrent_writes(copied):
+            # 各バッチのコミット後は他の接続から書き込める
+            batches.append(copied)
+            if len(batches) == 1:
+                other.execute("UPDATE samples SET qty = -1 WHERE sample_id IN (5, 95)")
+                other.execute("DELETE FROM samples WHERE sample_id IN (6, 96)")
+                other.execute("INSERT INTO samples VALUES (200, 'S200', 200)")
+                other.commit()
+
+        copied = rebuild_table_online(conn, 'samples', """
+            CREATE TABLE {table} (
+                sample_id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE,
+                qty REAL
+            )
+        """, ['sample_id', 'name', 'qty'], batch_size=30, on_batch=concurrent_writes)
+
+        # 2バッチ目以降は 96 の削除・200 の追加後の行を走査（200 はトリガーで反映済み）
+        assert batches == [30, 60, 90, 100]
+        assert copied == 100
+        rows = dict(conn.execute("SELECT sample_id, qty FROM samples"))
+        assert len(rows) == 99
+        assert rows[5] == -1 and rows[95] == -1 and rows[200] == 200
+        assert 6 not in rows and 96 not in rows
+
+        # 新しい制約・元の索引とトリガー
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+        assert {'idx_samples_name', 'samples_log'} <= names
+        assert not any('__rebuild' in name for name in names)
+        try:
+            conn.execute("INSERT INTO samples VALUES (300, 'S001', 0)")
+            assert False, "UNIQUE制約が適用されていません"
+        except sqlite3.IntegrityError:
+            pass
+        conn.execute("INSERT INTO samples VALUES (301, 'S301', 0)")
+        assert conn.execute("SELECT COUNT(*) FROM sample_log WHERE sample_id = 301").fetchone()[0] == 1
+        conn.close()
+        other.close()
+
+
+if __name__ == "__main__":
+    test_upgrade_matches_fresh_schema()
+    test_bom_manager_initializes_schema()
+    test_rebuild_table_online()
+    print("マイグレーションテスト完了")
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+所要量展開（MRP）のテスト
+階層ごとのベクトル演算による展開結果が、親方向の再帰で求めた値と一致すること
+（在庫引当・ロス率を含む）、多数の受注をまとめて展開できることを検証する
+（処理時間は benchmark_suite.py で確認する）
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+from functools import lru_cache
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from bom_graph import load_bom_graph
+from bom_manager import BOMManager
+from bom_test_helpers import create_random_bom
+from mrp import aggregate_orders, explode_requirements
+
+
+def _reference_requirements(conn, demand, on_hand):
+    """総所要量 = 独立需要 + Σ 親の正味所要量 × 所要量 を親方向の再帰で計算"""
+    parents = {}
+    for parent, component, quantity, loss_ratio in conn.execute(
+            "SELECT parent_item_id, component_item_id, quantity, loss_ratio FROM bom_components"):
+        parents.setdefault(component, []).append((parent, quantity * (1 + (loss_ratio or 0))))
+
+    @lru_cache(maxsize=None)
+    def gross(item_id):
+        return demand.get(item_id, 0.0) + sum(net(parent) * quantity
+                                              for parent, quantity in parents.get(item_id, []))
+
+    def net(item_id):
+        return max(gross(item_id) - on_hand.get(item_id, 0.0), 0.0)
+
+    item_ids = [row[0] for row in conn.execute("SELECT item_id FROM items")]
+    return {item_id: (gross(item_id), net(item_id)) for item_id in item_ids}
+
+
+def test_matches_recursive_reference():
+    """在庫・ロス率を含めて再帰計算と一致"""
+    rng = random.Random(40)
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        _, layers = create_random_bom(db_path, 200, rng)
+        demand = {item_id: rng.randint(1, 50) for item_id in rng.sample(layers[0], 80)}
+        demand[layers[1][0]] = 10.0  # 中間品への独立需要
+        on_hand = {item_id: rng.randint(0, 300) for item_id in rng.sample(layers[1] + layers[2] + layers[3], 60)}
+
+        with sqlite3.connect(db_path) as conn:
+            graph = load_bom_graph(conn)
+            result = explode_requirements(graph, demand, on_hand)
+            expected = _reference_requirements(conn, demand, on_hand)
+
+        for item_id, (gross, net) in expected.items():
+            i = graph.index[item_id]
+            assert abs(result['gross'][i] - gross) < 1e-6 * max(1, gross), (item_id, result['gross'][i], gross)
+            assert abs(result['net'][i] - net) < 1e-6 * max(1, net), (item_id, result['net'][i], net)
+
+
+def test_shared_component_netting():
+    """共有部品の在庫は全ての親の所要量を合計してから引き当てる"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        manager = BOMManager(os.path.join(work_dir, "bom.db"))
+        for item_id, item_type in (('P1', '完成品'), ('P2', '完成品'), ('B1', '製紐糸'), ('R1', '原糸')):
+            manager.add_item(item_id, item_id, item_type, 'KG')
+        manager.add_bom_component('P1', 'B1', 2.0, 'Main Material')
+        manager.add_bom_component('P2', 'B1', 1.0, 'Main Material')
+        manager.add_bom_component('B1', 'R1', 0.5, 'Main Material')
+        manager.add_bom_component('P2', 'R1', 1.0, 'Main Material')  # 階層飛ばし（R1のLLCは2）
+
+        requirements = {row['item_id']: row for row in manager.calculate_requirements(
+            aggregate_orders([('P1', 10), ('P2', 5), ('P1', 5)]), on_hand={'B1': 20, 'P2': 1})}
+        assert requirements['P2']['net_requirement'] == 4
+        assert requirements['B1']['gross_requirement'] == 15 * 2 + 4
+        assert requirements['B1']['net_requirement'] == 14
+        assert requirements['R1']['gross_requirement'] == 14 * 0.5 + 4
+        assert [row['low_level_code'] for row in requirements.values()] == [0, 0, 1, 2]
+
+        try:
+            manager.calculate_requirements({'UNKNOWN': 1})
+            assert False, "存在しないアイテムを受け付けました"
+        except ValueError:
+            pass
+
+
+def test_stale_low_level_codes():
+    """BOMManager を通さずに追加された構成行でLLCが古い場合も正しく展開し、循環は拒否する"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        manager = BOMManager(db_path)
+        for item_id, item_type in (('P', '完成品'), ('B', '製紐糸'), ('R', '原糸')):
+            manager.add_item(item_id, item_id, item_type, 'KG')
+        manager.add_bom_component('P', 'B', 2.0, 'Main Material')
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("INSERT INTO bom_components (parent_item_id, component_item_id, quantity, usage_type) "
+                         "VALUES ('B', 'R', 3.0, 'Main Material')")
+            assert conn.execute("SELECT low_level_code FROM items WHERE item_id = 'R'").fetchone()[0] == 0
+
+        requirements = {row['item_id']: row for row in manager.calculate_requirements({'P': 1})}
+        assert requirements['R']['net_requirement'] == 6
+        assert [row['low_level_code'] for row in requirements.values()] == [0, 1, 2]
+
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("INSERT INTO bom_components (parent_item_id, component_item_id, quantity, usage_type) "
+                         "VALUES ('R', 'B', 1.0, 'Main Material')")
+        try:
+            manager.calculate_requirements({'P': 1})
+            assert False, "循環するBOMを展開しました"
+        except ValueError as e:
+            assert 'BOM循環参照' in str(e)
+
+
+def test_orphan_lines_rejected():
+    """items にないアイテムを参照する構成行は、その行を示す ValueError（APIは400）"""
+    from app_unified import create_app
+
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        try:
+            app = create_app('development')
+            db_path = app.config['DATABASE_PATH']
+            with sqlite3.connect(db_path) as conn:
+                conn.execute("INSERT INTO bom_components (parent_item_id, component_item_id, quantity, usage_type) "
+                             "VALUES ('BRAID_001', 'GHOST', 1.0, 'Main Material')")
+                try:
+                    load_bom_graph(conn)
+                    assert False, "存在しないアイテムへの構成行を読み込みました"
+                except ValueError as e:
+                    assert 'BRAID_001→GHOST' in str(e) and '1行' in str(e)
+
+            response = app.test_client().post('/api/mrp', json={'demand': {'PRODUCT_001': 1}})
+            assert response.status_code == 400 and 'GHOST' in response.get_json()['message']
+        finally:
+            os.chdir(original_dir)
+
+
+def test_many_orders():
+    """数千件の受注を一度に展開（処理時間は benchmark_suite.py の explode_orders で確認）"""
+    rng = random.Random(41)
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        _, layers = create_random_bom(db_path, 4000, rng)
+        orders = [(rng.choice(layers[0]), rng.randint(1, 100)) for _ in range(5000)]
+
+        with sqlite3.connect(db_path) as conn:
+            graph = load_bom_graph(conn)
+        demand = aggregate_orders(orders)
+        result = explode_requirements(graph, demand)
+        assert sum(demand.values()) == sum(quantity for _, quantity in orders)
+        assert result['gross'][[graph.index[item_id] for item_id in layers[3]]].sum() > 0
+
+
+if __name__ == "__main__":
+    test_matches_recursive_reference()
+    test_shared_component_netting()
+    test_stale_low_level_codes()
+    test_orphan_lines_rejected()
+    test_many_orders()
+    print("所要量展開テスト完了")
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Oracle同期のオフライン回帰テスト
+Oracleスタンドイン（tools/oracle_standin.py）を対象に、実機なしで同期処理を検証する
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import timedelta
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from migrations import apply_migrations
+from tools.oracle_bom_inference import BOMInferencePipeline, approve_proposal
+from tools.oracle_connector import OracleConnector
+from tools.oracle_standin import DEFAULT_END_DATE, OracleStandin, populate_standin, translate_oracle_sql
+
+
+def _create_target_db(path):
+    """アプリケーションと同じくマイグレーションで最新のスキーマにした同期先SQLiteを作成"""
+    conn = sqlite3.connect(path)
+    try:
+        apply_migrations(conn)
+    finally:
+        conn.close()
+
+
+def test_translate_oracle_sql():
+    """Oracle方言の変換"""
+    assert translate_oracle_sql(
+        "SELECT * FROM (SELECT A FROM T) WHERE ROWNUM <= :limit"
+    ) == "SELECT * FROM (SELECT A FROM T) LIMIT :limit"
+    assert "LIMIT 20" in translate_oracle_sql("SELECT A FROM T ORDER BY A FETCH FIRST 20 ROWS ONLY")
+    assert "strftime('%Y-%m', 作業日時)" in translate_oracle_sql(
+        "SELECT TO_CHAR(作業日時, 'YYYY-MM') FROM T"
+    )
+    assert translate_oracle_sql(
+        "SELECT A FROM T WHERE A IS NOT NULL AND ROWNUM <= 10"
+    ) == "SELECT A FROM T WHERE A IS NOT NULL LIMIT 10"
+
+
+def test_standin_product_sync():
+    """製品マスタ同期: 追加 → 変更なし再同期 → 一部変更"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        standin_path = os.path.join(work_dir, "standin.db")
+        target_path = os.path.join(work_dir, "target.db")
+
+        counts = populate_standin(standin_path, scale=10000, seed=1)
+        print(f"スタンドイン生成: {counts}")
+        _create_target_db(target_path)
+
+        connector = OracleConnector(sqlite_path=target_path, driver=OracleStandin(standin_path))
+
+        products = connector.get_products_from_oracle()
+        assert len(products) == counts['PCS_PRODUCT_MST']
+        assert len(connector.get_products_from_oracle(limit=5)) == 5
+
+        added, updated, skipped = connector.sync_products_to_sqlite(products, update_existing=True)
+        assert (added, updated, skipped) == (len(products), 0, 0)
+
+        # 内容が同じなら全件スキップ
+        result = connector.sync_products(update_existing=True)
+        assert result['added'] == 0 and result['updated'] == 0
+        assert result['skip_rate'] == 1.0
+
+        # Oracle側で3件変更
+        with sqlite3.connect(standin_path) as conn:
+            conn.execute("""
+                UPDATE PCS_PRODUCT_MST SET COLOR = 'ブラック'
+                WHERE PRODUCT_CODE IN ('P0000001', 'P0000002', 'P0000003')
+            """)
+
+        result = connector.sync_products(update_existing=True)
+        assert result['updated'] == 3
+        assert result['skipped'] == len(products) - 3
+
+        with sqlite3.connect(target_path) as conn:
+            row = conn.execute("""
+                SELECT records_processed, records_updated, records_skipped
+                FROM oracle_sync_log ORDER BY sync_id DESC LIMIT 1
+            """).fetchone()
+        assert row == (len(products), 3, len(products) - 3)
+
+
+def test_standin_material_sync():
+    """原材料マスタ同期"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        standin_path = os.path.join(work_dir, "standin.db")
+        target_path = os.path.join(work_dir, "target.db")
+
+        counts = populate_standin(standin_path, scale=10000, seed=2)
+        _create_target_db(target_path)
+
+        connector = OracleConnector(sqlite_path=target_path, driver=OracleStandin(standin_path))
+        materials = connector.get_materials_from_oracle()
+        expected = counts['M_品目_原糸_仮'] + counts['M_品目_PS糸_仮'] + counts['M_品目_木管糸_仮']
+        assert len(materials) == expected
+
+        # 同じコードの重複は最後の値のみを1件として数える
+        duplicated = dict(materials[0], winding_length=777)
+        assert connector.sync_materials_to_sqlite(materials + [duplicated]) == (expected, 0, 0, 0)
+        with sqlite3.connect(target_path) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM raw_materials").fetchone()[0] == expected
+            assert conn.execute("SELECT winding_length FROM raw_materials WHERE oracle_item_code = ?",
+                                (duplicated['oracle_item_code'],)).fetchone() == (777,)
+        assert connector.sync_materials_to_sqlite([materials[0], materials[0]], update_existing=True) \
+            == (0, 1, 0, 0)
+
+        # 変更なしの再同期は書き込みなし
+        result = connector.sync_materials(update_existing=True)
+        assert (result['added'], result['updated'], result['skipped']) == (0, 0, expected)
+
+        # Oracle側でPS値・巻きMを変更 → 更新モードでのみ反映
+        with sqlite3.connect(standin_path) as conn:
+            bobbin_code = conn.execute(
+                "SELECT 品目コード FROM M_品目_木管糸_仮 ORDER BY 品目コード LIMIT 1"
+            ).fetchone()[0]
+            conn.execute("UPDATE M_品目_木管糸_仮 SET PS = 99.5, 巻きM = 12345 WHERE 品目コード = ?",
+                         (bobbin_code,))
+
+        # 更新しない設定では変更のあった行を変更なしと区別して数える
+        result = connector.sync_materials(update_existing=False)
+        assert (result['added'], result['updated'], result['skipped'], result['skipped_changed']) == \
+            (0, 0, expected - 1, 1)
+        with sqlite3.connect(target_path) as conn:
+            assert conn.execute("""
+                SELECT records_skipped, records_skipped_changed
+                FROM oracle_sync_log WHERE sync_type = 'materials' ORDER BY sync_id DESC LIMIT 1
+            """).fetchone() == (expected - 1, 1)
+        result = connector.sync_materials(update_existing=True)
+        assert (result['added'], result['updated'], result['skipped'], result['skipped_changed']) == \
+            (0, 1, expected - 1, 0)
+
+        with sqlite3.connect(target_path) as conn:
+            assert conn.execute(
+                "SELECT ps_value, winding_length FROM raw_materials WHERE oracle_item_code = ?",
+                (bobbin_code,)
+            ).fetchone() == (99.5, 12345)
+            assert conn.execute("""
+                SELECT records_processed, records_added, records_updated, records_skipped
+                FROM oracle_sync_log WHERE sync_type = 'materials' ORDER BY sync_id DESC LIMIT 1
+            """).fetchone() == (expected, 0, 1, expected - 1)
+
+
+def test_bom_inference_pipeline():
+    """製造日報からのBOM構成候補推定と承認"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        standin_path = os.path.join(work_dir, "standin.db")
+        target_path = os.path.join(work_dir, "target.db")
+
+        populate_standin(standin_path, scale=20000, seed=4)
+        _create_target_db(target_path)
+
+        connector = OracleConnector(sqlite_path=target_path, driver=OracleStandin(standin_path))
+        connector.sync_products(update_existing=True)
+
+        # スタンドインの日報は DEFAULT_END_DATE までの1年分
+        end_date = DEFAULT_END_DATE.date()
+        summary = BOMInferencePipeline(connector, min_runs=3, min_support=0.8).run(
+            end_date - timedelta(days=365), end_date)
+        print(f"推定結果: {summary}")
+        assert summary['input_records'] == 20000
+        assert summary['proposals'] > 0
+
+        with sqlite3.connect(target_path) as conn:
+            proposal_id, parent_item_id, component_code, quantity, support = conn.execute("""
+                SELECT proposal_id, parent_item_id, component_oracle_code, quantity_per_unit, support_ratio
+                FROM bom_component_proposals ORDER BY run_count DESC LIMIT 1
+            """).fetchone()
+        assert parent_item_id is not None and support >= 0.8
+
+        # スタンドインの投入量は 1本あたり 生産数量 × デニール / 9000 / 1000 （±5%）
+        # → 生産1単位あたりの投入量は 1本分 × 同じ品目を使う本数
+        with sqlite3.connect(standin_path) as conn:
+            denier = conn.execute(
+                "SELECT COALESCE((SELECT PS糸 FROM M_品目_木管糸_仮 WHERE 品目コード = ?),"
+                " (SELECT PS糸 FROM M_品目_PS糸_仮 WHERE 品目コード = ?))",
+                (component_code, component_code)
+            ).fetchone()[0]
+        carriers = quantity / (denier / 9000 / 1000)
+        assert round(carriers) >= 1 and abs(carriers / round(carriers) - 1.0) < 0.05
+
+        # 構成部品が未解決のままでは承認できない
+        assert not approve_proposal(target_path, proposal_id)
+
+        with sqlite3.connect(target_path) as conn:
+            conn.execute("""
+                INSERT INTO items (item_id, item_name, item_type, unit_of_measure)
+                VALUES ('BOBBIN_TEST', 'テスト木管糸', '巻き取り糸', 'KG')
+            """)
+        assert approve_proposal(target_path, proposal_id, component_item_id='BOBBIN_TEST')
+
+        with sqlite3.connect(target_path) as conn:
+            assert conn.execute(
+                "SELECT status FROM bom_component_proposals WHERE proposal_id = ?", (proposal_id,)
+            ).fetchone()[0] == 'approved'
+            assert conn.execute(
+                "SELECT COUNT(*) FROM bom_components WHERE component_item_id = 'BOBBIN_TEST'"
+            ).fetchone()[0] == 1
+
+
+if __name__ == "__main__":
+    test_translate_oracle_sql()
+    test_standin_product_sync()
+    test_standin_material_sync()
+    test_bom_inference_pipeline()
+    print("Oracleスタンドイン同期テスト完了")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+リクエスト単位のプロファイラのテスト
+SQLの文数・行数・接続数とBOMManagerのメソッドの呼び出しの記録、プロファイル中でない場合に通常の接続になること、
+Server-Timing ヘッダー・デバッグパネル・GET /api/profiler、ENABLE_PROFILER が無効な環境で何もしないことを検証する
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from bom_manager import BOMManager
+from profiler import (N_PLUS_ONE_THRESHOLD, ProfiledConnection, connect, finish_profile,
+                      instrument_class, start_profile)
+
+
+def _parse_server_timing(value):
+    """Server-Timing → {名前: {'dur': ..., 'desc': ...}}"""
+    metrics = {}
+    for metric in value.split(', '):
+        name, *params = metric.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+        assert len(params) <= 2, metric
+    return metrics
+
+
+def test_sql_and_method_recording():
+    """文・行・接続・メソッドの記録（プロファイル中でなければ通常の接続）"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        conn = connect(db_path)
+        assert type(conn) is sqlite3.Connection
+        conn.close()
+
+        token = start_profile('GET', '/test')
+        conn = connect(db_path)
+        assert isinstance(conn, ProfiledConnection)
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(5)])
+        assert len(list(conn.execute("SELECT x FROM t"))) == 5
+        assert len(conn.execute("SELECT x FROM t WHERE x < 3").fetchall()) == 3
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 5
+        conn.close()
+        profile = finish_profile(token).to_dict()
+        assert profile['connections'] == 1 and profile['sql_count'] == 5 and profile['rows'] == 9, profile
+        assert connect(db_path).__class__ is sqlite3.Connection
+
+        class Reader:
+            def __init__(self, path):
+                self.path = path
+
+            def one(self, x):
+                with connect(self.path) as conn:
+                    return conn.execute("SELECT x FROM t WHERE x = ?", (x,)).fetchone()
+
+            def many(self):
+                return [self.one(x) for x in range(N_PLUS_ONE_THRESHOLD)]
+
+        assert instrument_class(Reader) is instrument_class(Reader)
+        reader = Reader(db_path)
+        assert len(reader.many()) == N_PLUS_ONE_THRESHOLD and reader.many.__name__ == 'many'
+        token = start_profile()
+        reader.many()
+        profile = finish_profile(token).to_dict()
+        calls = {call['name']: (call['calls'], call['sql_count']) for call in profile['bom_calls']}
+        assert calls == {'Reader.many': (1, N_PLUS_ONE_THRESHOLD), 'Reader.one': (N_PLUS_ONE_THRESHOLD, N_PLUS_ONE_THRESHOLD)}
+        assert [row['sql'] for row in profile['repeated_statements']] == ["SELECT x FROM t WHERE x = ?"]
+
+
+def test_profiler_routes():
+    """Server-Timing・デバッグパネル・直近の計測値、無効な環境では何もしない"""
+    from app_unified import create_app
+    from config import DevelopmentConfig
+
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        try:
+            app = create_app('development')
+            client = app.test_client()
+            manager = BOMManager(app.config['DATABASE_PATH'])
+            manager.add_item('P_WIDE', '構成の多い完成品', '完成品', '個')
+            for i in range(N_PLUS_ONE_THRESHOLD):
+                manager.add_item(f'R_WIDE_{i}', f'原糸{i}', '原糸', 'KG')
+                manager.add_bom_component('P_WIDE', f'R_WIDE_{i}', 0.1, 'Main Material')
+
+            response = client.get('/bom_tree/P_WIDE')
+            assert response.status_code == 200
+            metrics = _parse_server_timing(response.headers['Server-Timing'])
+            print(metrics)
+            assert float(metrics['total']['dur']) >= float(metrics['sql']['dur']) > 0
+            # ルートで1回 + 展開で完成品と構成部品の数
+            assert metrics['BOMManager.get_item']['desc'].startswith(f'"{N_PLUS_ONE_THRESHOLD + 2} calls')
+            assert 'BOMManager.get_multi_level_bom' in metrics
+            body = response.get_data(as_text=True)
+            assert body.count('id="bom-profiler"') == 1 and '繰り返しSQL' in body
+
+            response = client.get('/api/items')
+            assert 'Server-Timing' in response.headers and response.is_json
+
+            profiles = client.get('/api/profiler').get_json()['profiles']
+            assert [profile['path'] for profile in profiles] == ['/api/items', '/bom_tree/P_WIDE']
+            tree = profiles[1]
+            assert tree['status'] == 200 and tree['connections'] > N_PLUS_ONE_THRESHOLD
+            assert 'SELECT * FROM items WHERE item_id = ?' in [row['sql'] for row in tree['repeated_statements']]
+            filtered = client.get(f"/api/profiler?min_sql={tree['sql_count']}").get_json()['profiles']
+            assert [profile['path'] for profile in filtered] == ['/bom_tree/P_WIDE']
+
+            app.config['ENABLE_PROFILER'] = False
+            assert 'Server-Timing' not in client.get('/api/items').headers
+            DevelopmentConfig.ENABLE_PROFILER = False
+            disabled = create_app('development').test_client()
+            response = disabled.get('/api/items')
+            assert response.status_code == 200 and 'Server-Timing' not in response.headers
+            assert disabled.get('/api/profiler').status_code == 404
+            assert 'bom-profiler' not in disabled.get('/bom_tree/P_WIDE').get_data(as_text=True)
+        finally:
+            DevelopmentConfig.ENABLE_PROFILER = True
+            os.chdir(original_dir)
+
+
+if __name__ == "__main__":
+    test_sql_and_method_recording()
+    test_profiler_routes()
+    print("プロファイラテスト完了")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+BOMManager のクエリ実行計画の回帰テスト
+BOMManager が実際に発行したSELECT文を EXPLAIN QUERY PLAN にかけ、
+全件スキャンや結果全体の一時B-treeソートが発生していないことを確認する
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from bom_test_helpers import TracingBOMManager, plan_problems
+
+
+def _create_db(path):
+    with open(os.path.join(PROJECT_ROOT, "schema_enhanced.sql"), "r", encoding="utf-8") as f, \
+            sqlite3.connect(path) as conn:
+        conn.executescript(f.read())
+        conn.executemany(
+            "INSERT INTO items (item_id, item_name, item_type, unit_of_measure) VALUES (?, ?, ?, 'KG')",
+            [(f"ITEM_{i:04d}", f"アイテム{i}", ['完成品', '製紐糸', '原糸'][i % 3]) for i in range(300)]
+        )
+        conn.executemany("""
+            INSERT INTO bom_components (parent_item_id, component_item_id, quantity, usage_type)
+            VALUES (?, ?, 1, ?)
+        """, [(f"ITEM_{i:04d}", f"ITEM_{i + j:04d}", usage)
+              for i in range(0, 200, 3) for j, usage in ((1, 'Main Material'), (2, 'Main Braid Thread'))])
+        conn.execute("ANALYZE")
+
+
+def test_bom_manager_query_plans():
+    """直下構成・一覧・種別一覧・多段階展開の実行計画"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        _create_db(db_path)
+        manager = TracingBOMManager(db_path)
+
+        manager.statements.clear()
+        assert len(manager.get_direct_components('ITEM_0000')) == 2
+        assert len(manager.get_all_items()) == 300
+        assert len(manager.get_all_items_by_type('原糸')) == 100
+        assert manager.get_item('ITEM_0001') is not None
+        assert manager.get_multi_level_bom('ITEM_0000', max_depth=3) is not None
+
+        selects = [sql for sql in manager.statements if sql.lstrip().upper().startswith('SELECT')]
+        assert len(selects) >= 5
+
+        with sqlite3.connect(db_path) as conn:
+            for sql in selects:
+                problems = plan_problems(conn, sql)
+                assert not problems, f"{' '.join(sql.split())}\n  → {problems}"
+
+
+if __name__ == "__main__":
+    test_bom_manager_query_plans()
+    print("クエリ実行計画テスト完了")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+読み取り専用スナップショットのテスト
+スナップショットの作成・置き換え、読み取り専用BOMManager、データバージョンと経過秒数、
+?max_age による読み取り元の切り替えを検証する
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from bom_manager import BOMManager
+from snapshots import connect_read_only, create_snapshot, read_snapshot_info
+
+
+def _create_live_db(path):
+    manager = BOMManager(path, pragmas={'journal_mode': 'WAL'})
+    manager.add_item('PRODUCT_001', '完成品1', '完成品', '個')
+    manager.add_item('YARN_001', '原糸1', '原糸', 'KG')
+    manager.add_bom_component('PRODUCT_001', 'YARN_001', 2.0, 'Main Material')
+    return manager
+
+
+def test_snapshot_read_only_manager():
+    """スナップショットは作成時点の内容を読み取り専用で返す"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        live_path = os.path.join(work_dir, "live.db")
+        snapshot_path = os.path.join(work_dir, "snapshot.db")
+        live = _create_live_db(live_path)
+
+        info = create_snapshot(live_path, snapshot_path)
+        assert info['data_version'] == live.get_data_version()
+        assert 0 <= info['age_seconds'] < 5
+        assert not os.path.exists(f"{snapshot_path}.tmp")
+
+        snapshot = BOMManager(snapshot_path, read_only=True)
+        assert len(snapshot.get_all_items()) == 2
+        assert snapshot.get_all_descendants('PRODUCT_001')[0]['item_id'] == 'YARN_001'
+        assert snapshot.get_data_version() == info['data_version']
+        try:
+            snapshot.add_item('YARN_002', '原糸2', '原糸', 'KG')
+            assert False, "読み取り専用のスナップショットに書き込めました"
+        except sqlite3.OperationalError:
+            pass
+
+        # ライブDBの変更はスナップショットに現れず、データバージョンで判別できる
+        live.add_item('YARN_002', '原糸2', '原糸', 'KG')
+        assert len(snapshot.get_all_items()) == 2
+        assert live.get_data_version() != info['data_version']
+
+        # 置き換え中も既存の接続は置き換え前の内容を読み続ける
+        reader = connect_read_only(snapshot_path)
+        assert reader.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 2
+        time.sleep(1)
+        refreshed = create_snapshot(live_path, snapshot_path)
+        assert reader.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 2
+        reader.close()
+        assert refreshed['data_version'] == live.get_data_version()
+        assert refreshed['created_at'] > info['created_at']
+        assert len(snapshot.get_all_items()) == 3
+
+
+def test_api_max_age_selects_snapshot():
+    """?max_age 以内のスナップショットがあればスナップショットから応答"""
+    from app_unified import create_app
+
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        try:
+            app = create_app('development')
+            client = app.test_client()
+
+            assert client.get('/api/items').headers['X-Data-Source'] == 'live'
+            assert client.get('/api/items?max_age=60').headers['X-Data-Source'] == 'live'  # 未作成
+            assert client.get('/api/snapshot').get_json()['snapshot'] is None
+
+            response = client.post('/api/snapshot')
+            assert response.status_code == 202
+            for _ in range(50):
+                if read_snapshot_info(app.config['SNAPSHOT_PATH']):
+                    break
+                time.sleep(0.1)
+
+            status = client.get('/api/snapshot').get_json()
+            assert status['is_current']
+            response = client.get('/api/items?max_age=60')
+            assert response.headers['X-Data-Source'] == 'snapshot'
+            assert response.headers['X-Data-Version'] == status['live_data_version']
+            assert len(response.get_json()) == len(client.get('/api/items').get_json())
+        finally:
+            os.chdir(original_dir)
+
+
+if __name__ == "__main__":
+    test_snapshot_read_only_manager()
+    test_api_max_age_selects_snapshot()
+    print("スナップショットテスト完了")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+SQLite PRAGMA設定（環境別プロファイル）のテスト
+BOMManagerが設定を適用すること、WALモードのDBを一貫してコピーできることを検証する
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from bom_manager import BOMManager, apply_sqlite_pragmas
+from config import ProductionConfig
+from deploy import copy_database
+
+
+def _create_db(path):
+    with open(os.path.join(PROJECT_ROOT, "schema_enhanced.sql"), "r", encoding="utf-8") as f, \
+            sqlite3.connect(path) as conn:
+        conn.executescript(f.read())
+
+
+def test_pragmas_applied():
+    """本番プロファイルの値が接続に適用される"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        _create_db(db_path)
+
+        manager = BOMManager(db_path, pragmas=ProductionConfig.SQLITE_PRAGMAS)
+        active = manager.get_sqlite_pragmas()
+        print(f"有効なPRAGMA: {active}")
+
+        assert active['journal_mode'] == 'wal'
+        assert active['synchronous'] == 1  # NORMAL
+        assert active['cache_size'] == ProductionConfig.SQLITE_PRAGMAS['cache_size']
+        assert active['busy_timeout'] == ProductionConfig.SQLITE_PRAGMAS['busy_timeout']
+        assert active['temp_store'] == 2  # MEMORY
+
+        # 公開の connect() も同じ設定の接続を返す（ルート・変更配信から使用）
+        conn = manager.connect()
+        try:
+            assert conn.execute("PRAGMA cache_size").fetchone()[0] == ProductionConfig.SQLITE_PRAGMAS['cache_size']
+        finally:
+            conn.close()
+
+        # journal_mode はDBファイルに保存される
+        with sqlite3.connect(db_path) as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+
+
+def test_invalid_pragma_rejected():
+    """未対応のPRAGMA名・不正な値は拒否"""
+    conn = sqlite3.connect(":memory:")
+    for pragmas in ({'writable_schema': 1}, {'synchronous': 'OFF; DROP TABLE items'}):
+        try:
+            apply_sqlite_pragmas(conn, pragmas)
+        except ValueError:
+            continue
+        raise AssertionError(f"拒否されませんでした: {pragmas}")
+
+
+def test_copy_database_includes_wal():
+    """WALに残ったコミット済みデータもコピーされる"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        copy_path = os.path.join(work_dir, "copy.db")
+        _create_db(db_path)
+
+        manager = BOMManager(db_path, pragmas={'journal_mode': 'WAL'})
+        writer = sqlite3.connect(db_path)
+        writer.execute("PRAGMA wal_autocheckpoint = 0")
+        writer.execute("""
+            INSERT INTO items (item_id, item_name, item_type, unit_of_measure)
+            VALUES ('WAL_ITEM', 'WAL内のアイテム', '原糸', 'KG')
+        """)
+        writer.commit()
+
+        copy_database(db_path, copy_path)
+        writer.close()
+        with sqlite3.connect(copy_path) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM items WHERE item_id = 'WAL_ITEM'").fetchone()[0] == 1
+        assert manager.get_item('WAL_ITEM') is not None
+
+
+if __name__ == "__main__":
+    test_pragmas_applied()
+    test_invalid_pragma_rejected()
+    test_copy_database_includes_wal()
+    print("SQLite設定テスト完了")
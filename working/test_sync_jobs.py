@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+バックグラウンド同期ジョブのテスト
+ジョブランナーの同時実行防止・キャンセルと、スタンドインを対象にした同期ジョブを検証する
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from migrations import apply_migrations
+from sync_jobs import SyncJobRunner, run_oracle_sync
+from tools.oracle_connector import OracleConnector
+from tools.oracle_standin import OracleStandin, populate_standin
+
+
+def _wait_until_finished(job, timeout=30.0):
+    deadline = time.time() + timeout
+    while job.is_active and time.time() < deadline:
+        time.sleep(0.01)
+    assert not job.is_active, "ジョブがタイムアウトしました"
+
+
+def test_single_flight_and_cancel():
+    """実行中は新しいジョブを開始せず、キャンセル要求で停止する"""
+    runner = SyncJobRunner()
+    release = threading.Event()
+
+    def slow_job(job, steps):
+        job.update_progress(done=0, total=steps)
+        for step in range(steps):
+            release.wait(1.0)
+            job.check_cancelled()
+            job.update_progress(done=step + 1)
+        return {'steps': steps}
+
+    first, started = runner.submit('slow', slow_job, steps=100)
+    assert started
+    second, started = runner.submit('slow', slow_job, steps=100)
+    assert not started and second.job_id == first.job_id
+
+    assert runner.cancel(first.job_id)
+    release.set()
+    _wait_until_finished(first)
+    assert first.status == 'cancelled'
+    assert not runner.cancel(first.job_id)
+
+    third, started = runner.submit('slow', slow_job, steps=3)
+    assert started
+    _wait_until_finished(third)
+    assert third.status == 'succeeded'
+    assert third.to_dict()['progress']['percent'] == 100.0
+
+
+def test_oracle_sync_job_with_standin():
+    """スタンドインを同期元にした製品・原材料の同期ジョブ"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        standin_path = os.path.join(work_dir, "standin.db")
+        target_path = os.path.join(work_dir, "target.db")
+        counts = populate_standin(standin_path, scale=10000, seed=3)
+
+        conn = sqlite3.connect(target_path)
+        try:
+            apply_migrations(conn)
+        finally:
+            conn.close()
+
+        connector = OracleConnector(sqlite_path=target_path, driver=OracleStandin(standin_path))
+        runner = SyncJobRunner()
+        job, started = runner.submit('oracle_sync', run_oracle_sync, connector=connector,
+                                     sync_type='full', batch_size=300)
+        assert started
+        _wait_until_finished(job)
+
+        assert job.status == 'succeeded', job.error
+        assert job.result['products']['added'] == counts['PCS_PRODUCT_MST']
+        assert job.to_dict()['params'] == {'sync_type': 'full', 'batch_size': 300}
+
+        with sqlite3.connect(target_path) as conn:
+            logged = conn.execute(
+                "SELECT sync_type, sync_status FROM oracle_sync_log ORDER BY sync_id"
+            ).fetchall()
+        assert logged == [('products', 'success'), ('materials', 'success')]
+
+        # 既存製品のハッシュはジョブで1回だけ読み込む（バッチごとに読み直さない）
+        loads = []
+        load_product_hashes = connector.load_product_hashes
+        connector.load_product_hashes = lambda: loads.append(1) or load_product_hashes()
+        job, _ = runner.submit('oracle_sync', run_oracle_sync, connector=connector,
+                               sync_type='products', update_existing=True, batch_size=300)
+        _wait_until_finished(job)
+        assert job.status == 'succeeded', job.error
+        assert len(loads) == 1
+        assert job.result['products']['skipped'] == counts['PCS_PRODUCT_MST']
+
+        # 原材料も既存の値はジョブで1回だけ読み込み、別のバッチに分かれた同じコードは1件として数える
+        material_loads = []
+        load_material_values = connector.load_material_values
+        connector.load_material_values = lambda: material_loads.append(1) or load_material_values()
+        get_materials = connector.get_materials_from_oracle
+        materials = get_materials()
+        changed = dict(materials[0], winding_length=4321)
+        connector.get_materials_from_oracle = lambda: get_materials() + [changed]
+        job, _ = runner.submit('oracle_sync', run_oracle_sync, connector=connector,
+                               sync_type='materials', update_existing=True, batch_size=50)
+        _wait_until_finished(job)
+        assert job.status == 'succeeded', job.error
+        assert len(material_loads) == 1 and len(materials) > 50
+        result = job.result['materials']
+        assert result['processed'] == len(materials)
+        assert (result['added'], result['updated'], result['skipped']) == (0, 1, len(materials) - 1)
+        with sqlite3.connect(target_path) as conn:
+            assert conn.execute("SELECT winding_length FROM raw_materials WHERE oracle_item_code = ?",
+                                (changed['oracle_item_code'],)).fetchone() == (4321,)
+
+        # Oracleからの取得の失敗も同期ログに記録する
+        def fail_fetch(**kwargs):
+            raise RuntimeError('Oracle接続エラー')
+        connector.get_products_from_oracle = fail_fetch
+        job, _ = runner.submit('oracle_sync', run_oracle_sync, connector=connector, sync_type='products')
+        _wait_until_finished(job)
+        assert job.status == 'failed'
+        with sqlite3.connect(target_path) as conn:
+            assert conn.execute("""
+                SELECT sync_type, sync_status, error_message FROM oracle_sync_log
+                ORDER BY sync_id DESC LIMIT 1
+            """).fetchone() == ('products', 'failed', 'Oracle接続エラー')
+
+
+if __name__ == "__main__":
+    test_single_flight_and_cancel()
+    test_oracle_sync_job_with_standin()
+    print("同期ジョブテスト完了")
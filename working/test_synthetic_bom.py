@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+大規模BOMの合成データ生成のテスト
+同じシードで同じデータになること、階層・構成部品数の分布・共有率の指定どおりの構成になること、
+一括投入後の索引・低位レベルコード・標準原価・変更履歴を検証する
+"""
+
+import hashlib
+import os
+import sqlite3
+import sys
+import tempfile
+from collections import Counter
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from bom_levels import rebuild_low_level_codes
+from bom_manager import BOMManager
+from change_log import get_changes_since
+from generate_synthetic_bom import COMMON_SHARE, chain_types, generate_synthetic_bom, parse_fanout
+
+
+def _digest(db_path):
+    with sqlite3.connect(db_path) as conn:
+        digest = hashlib.sha1()
+        for sql in ("SELECT item_id, item_name, item_type, denier, color FROM items ORDER BY item_id",
+                    "SELECT parent_item_id, component_item_id, quantity, usage_type, loss_ratio "
+                    "FROM bom_components ORDER BY parent_item_id, usage_type, component_item_id",
+                    "SELECT item_id, unit_cost, standard_cost FROM item_costs ORDER BY item_id"):
+            for row in conn.execute(sql):
+                digest.update(repr(row).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def test_reproducible():
+    """同じシードなら同じデータ、シードが違えば違うデータ"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        paths = [os.path.join(work_dir, f"bom{i}.db") for i in range(3)]
+        results = [generate_synthetic_bom(path, 3000, seed=seed) for path, seed in zip(paths, (7, 7, 8))]
+        assert results[0]['items'] == results[1]['items'] and results[0]['bom_lines'] == results[1]['bom_lines']
+        assert _digest(paths[0]) == _digest(paths[1]) != _digest(paths[2])
+
+
+def test_structure_follows_parameters():
+    """階層数・構成部品数の分布・共有率・副資材・LLC・標準原価・変更履歴"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        result = generate_synthetic_bom(db_path, 20000, depth=6, fanout=parse_fanout('2:1'), sharing=0)
+        chain = chain_types(6)
+        assert chain == ['完成品', '後PS糸', '染色糸', '製紐糸', 'PS糸', '原糸']
+        assert sum(result['items'].values()) == 20000
+
+        conn = sqlite3.connect(db_path)
+        item_types = dict(conn.execute("SELECT item_id, item_type FROM items"))
+        main_lines = Counter()
+        for parent, component, usage_type in conn.execute(
+                "SELECT parent_item_id, component_item_id, usage_type FROM bom_components"):
+            parent_type, component_type = item_types[parent], item_types[component]
+            if component_type in chain:
+                assert chain.index(component_type) == chain.index(parent_type) + 1, (parent, component)
+                main_lines[parent] += 1
+            else:
+                assert (parent_type, component_type, usage_type) in (
+                    ('完成品', '成形品', 'Container'), ('完成品', '梱包資材', 'Packaging'),
+                    ('製紐糸', '芯糸', 'Core Thread')), (parent, component)
+        assert set(main_lines.values()) == {2}
+        assert len(main_lines) == sum(result['items'][item_type] for item_type in chain[:-1])
+
+        levels = dict(conn.execute("SELECT item_type, MAX(low_level_code) FROM items GROUP BY item_type"))
+        assert [levels[item_type] for item_type in chain] == list(range(6))
+        assert conn.execute("""
+            SELECT COUNT(*) FROM items i JOIN item_costs c ON c.item_id = i.item_id
+            WHERE i.item_type = '完成品' AND c.standard_cost > 0
+        """).fetchone()[0] == result['items']['完成品']
+        assert get_changes_since(conn, 0)['reset_required']
+        conn.close()
+
+        # 共有率: 主構成の参照のうち共通部品（各階層の先頭）を選んだ割合
+        generate_synthetic_bom(db_path, 20000, sharing=0.5)
+        conn = sqlite3.connect(db_path)
+        common = {}
+        for item_type, count in conn.execute("SELECT item_type, COUNT(*) FROM items GROUP BY item_type"):
+            common[item_type] = max(1, int(count * COMMON_SHARE))
+        shared = total = 0
+        for component, item_type in conn.execute("""
+            SELECT bc.component_item_id, i.item_type FROM bom_components bc
+            JOIN items i ON i.item_id = bc.component_item_id
+            WHERE i.item_type IN ('製紐糸', 'PS糸', '原糸')
+        """):
+            total += 1
+            shared += int(component.rsplit('_', 1)[1]) <= common[item_type]
+        print(f"共通部品の参照: {shared:,} / {total:,}")
+        assert 0.45 < shared / total < 0.6
+        conn.close()
+
+        requirements = BOMManager(db_path).calculate_requirements({'PRODUCT_0000001': 10})
+        assert any(row['item_id'].startswith('RAW_') for row in requirements)
+
+        for invalid in ('', '0:1', 'x', '2:-1'):
+            try:
+                parse_fanout(invalid)
+                assert False, f"不正な分布を受け付けました: {invalid}"
+            except ValueError:
+                pass
+        for kwargs in ({'depth': 8}, {'sharing': 1.5}, {'item_count': 10}):
+            try:
+                generate_synthetic_bom(db_path, **{'item_count': 1000, **kwargs})
+                assert False, f"不正な指定を受け付けました: {kwargs}"
+            except ValueError:
+                pass
+
+
+def test_generation_scale():
+    """10万行規模の生成（索引の再作成・LLCの設定。処理時間の要件は benchmark_suite.py の TIME_LIMITS_MS）"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        result = generate_synthetic_bom(db_path, 31500)
+        print(f"構成行 {result['bom_lines']:,}行: {result['seconds']}")
+        assert result['bom_lines'] > 95000
+        assert set(result['seconds']) == {'generate', 'insert', 'rebuild'}
+
+        with open(os.path.join(PROJECT_ROOT, "schema_enhanced.sql"), "r", encoding="utf-8") as f, \
+                sqlite3.connect(":memory:") as fresh:
+            fresh.executescript(f.read())
+            expected = _index_names(fresh)
+        conn = sqlite3.connect(db_path)
+        assert _index_names(conn) >= expected
+        # 投入時に設定したLLCが再計算の結果と一致する（再計算で書き換える行がない）
+        assert rebuild_low_level_codes(conn) == 0
+        conn.close()
+
+
+def _index_names(conn):
+    return {name for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name IN ('items', 'bom_components')")}
+
+
+if __name__ == "__main__":
+    test_reproducible()
+    test_structure_follows_parameters()
+    test_generation_scale()
+    print("合成BOM生成テスト完了")
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+数量単位の換算のテスト
+デニール（9000mあたりのグラム数）・アイテム別の係数による換算係数、
+所要量展開・原材料集計のKG換算、API の応答を検証する
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from bom_manager import BOMManager
+from uom import unit_factors
+
+
+def _create_db(path):
+    """完成品(個) → 製紐糸(M) → PS糸(M) → 原糸(KG)、芯糸(M)・スプール(個)・撚糸(本)"""
+    manager = BOMManager(path)
+    manager.add_item('PRODUCT', '完成品 150m', '完成品', '個')
+    manager.add_item('BRAID', 'X8編み糸', '製紐糸', 'M', denier=1200)
+    manager.add_item('PS', 'PS糸', 'PS糸', 'M', denier=150)
+    manager.add_item('RAW', 'ナイロン原糸', '原糸', 'KG', denier=150)
+    manager.add_item('CORE', '芯糸', '芯糸', 'M', denier=90)
+    manager.add_item('CORE_NODENIER', '芯糸（デニール未登録）', '芯糸', 'M')
+    manager.add_item('SPOOL', 'スプール', '成形品', '個')
+    manager.add_item('TWIST', '撚糸ボビン', '原糸', '本', denier=300)
+    manager.add_bom_component('PRODUCT', 'BRAID', 150.0, 'Main Material')
+    manager.add_bom_component('PRODUCT', 'SPOOL', 1.0, 'Container')
+    manager.add_bom_component('BRAID', 'PS', 8.0, 'Main Braid Thread')
+    manager.add_bom_component('BRAID', 'CORE', 1.0, 'Core Thread')
+    manager.add_bom_component('BRAID', 'CORE_NODENIER', 0.5, 'Core Thread')
+    manager.add_bom_component('BRAID', 'TWIST', 0.001, 'Process Material')
+    manager.add_bom_component('PS', 'RAW', 150 / 9000 / 1000 * 1.02, 'Main Material')
+    assert manager.set_unit_conversion('SPOOL', 'KG', 0.012)
+    assert manager.set_unit_conversion('TWIST', 'M', 5000)  # 1本 = 5000m
+    assert not manager.set_unit_conversion('SPOOL', 'KG', 0)
+    return manager
+
+
+def test_unit_factors():
+    """同一単位・アイテム別係数・デニール・係数とデニールの組み合わせ"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        _create_db(db_path)
+        item_ids = ['RAW', 'PS', 'CORE_NODENIER', 'SPOOL', 'TWIST', 'PRODUCT']
+        with sqlite3.connect(db_path) as conn:
+            kg = unit_factors(conn, item_ids, 'KG')
+            meters = unit_factors(conn, item_ids, 'M')
+
+        assert kg[0] == 1.0
+        assert abs(kg[1] - 150 / 9000 / 1000) < 1e-15
+        assert np.isnan(kg[2]) and np.isnan(kg[5])
+        assert kg[3] == 0.012
+        assert abs(kg[4] - 5000 * 300 / 9000 / 1000) < 1e-12
+        assert abs(meters[0] - 9000 * 1000 / 150) < 1e-6 and meters[1] == 1.0 and meters[4] == 5000
+        assert np.isnan(meters[3])
+
+
+def test_material_summary_in_kg():
+    """原材料の正味所要量をKGで合計（換算できないアイテムは別に報告）"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        manager = _create_db(os.path.join(work_dir, "bom.db"))
+        summary = manager.get_material_summary({'PRODUCT': 10})
+        materials = {row['item_id']: row for row in summary['materials']}
+
+        braid_m = 10 * 150
+        raw_kg = braid_m * 8 * 150 / 9000 / 1000 * 1.02
+        core_kg = braid_m * 90 / 9000 / 1000
+        twist_kg = braid_m * 0.001 * 5000 * 300 / 9000 / 1000
+        assert set(materials) == {'RAW', 'CORE', 'CORE_NODENIER', 'SPOOL', 'TWIST'}
+        assert abs(materials['RAW']['converted_net_requirement'] - raw_kg) < 1e-9
+        assert abs(materials['CORE']['converted_net_requirement'] - core_kg) < 1e-9
+        assert summary['unconvertible'] == ['CORE_NODENIER']
+        assert abs(summary['total'] - (raw_kg + core_kg + twist_kg + 10 * 0.012)) < 1e-9
+        print(f"原材料 {len(materials)}件: 合計 {summary['total']:.4f} KG")
+
+        requirements = {row['item_id']: row for row in manager.calculate_requirements({'PRODUCT': 10}, unit='KG')}
+        assert requirements['PS']['converted_unit'] == 'KG'
+        assert abs(requirements['BRAID']['converted_gross_requirement'] - braid_m * 1200 / 9000 / 1000) < 1e-9
+        assert requirements['PRODUCT']['converted_net_requirement'] is None
+        assert 'converted_unit' not in manager.calculate_requirements({'PRODUCT': 1})[0]
+
+
+def test_material_summary_api():
+    """原材料集計API・所要量展開APIの単位指定"""
+    from app_unified import create_app
+
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        try:
+            app = create_app('development')
+            client = app.test_client()
+
+            body = client.post('/api/mrp/materials', json={'demand': {'PRODUCT_001': 10}}).get_json()
+            assert body['success'] and body['unit'] == 'KG'
+            assert abs(body['total'] - 10 * 100 * 8 * 0.8) < 1e-9  # 原糸（KG）のみ換算可能
+            assert set(body['unconvertible']) == {'CORE_001', 'MOLD_001', 'PKG_001'}
+
+            body = client.post('/api/mrp', json={'demand': {'PRODUCT_001': 1}, 'unit': 'KG'}).get_json()
+            converted = {row['item_id']: row['converted_net_requirement'] for row in body['requirements']}
+            assert abs(converted['RAW_001'] - 100 * 8 * 0.8) < 1e-9 and converted['PS_001'] is None
+            assert client.post('/api/mrp', json={'demand': {'PRODUCT_001': 1}, 'unit': 'LB'}).status_code == 400
+            assert client.post('/api/mrp/materials', json={}).status_code == 400
+        finally:
+            os.chdir(original_dir)
+
+
+if __name__ == "__main__":
+    test_unit_factors()
+    test_material_summary_in_kg()
+    test_material_summary_api()
+    print("数量単位の換算テスト完了")
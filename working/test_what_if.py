@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+代替品シミュレーション（What-if）のテスト
+オーバーレイで求めた所要量・標準原価が、実際にBOMを書き換えて計算した結果と一致すること、
+bom_components に書き込まないこと、循環・親の限定・数千品目のBOM・APIを検証する
+（応答時間は benchmark_suite.py で確認する）
+"""
+
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from bom_levels import rebuild_low_level_codes
+from bom_manager import BOMManager
+from bom_test_helpers import create_random_bom
+from cost_rollup import rollup_all_costs
+from mrp import calculate_requirements
+
+
+def _apply_substitution(db_path, source, target, ratio):
+    """参照用: BOMを実際に書き換える（同じ親・用途の行は数量を合算）"""
+    with sqlite3.connect(db_path) as conn:
+        edges = {}
+        for parent, component, quantity, usage_type, loss_ratio in conn.execute(
+                "SELECT parent_item_id, component_item_id, quantity, usage_type, loss_ratio FROM bom_components"):
+            quantity *= 1 + (loss_ratio or 0)
+            if component == source:
+                component, quantity = target, quantity * ratio
+            key = (parent, component, usage_type)
+            edges[key] = edges.get(key, 0.0) + quantity
+        conn.execute("DELETE FROM bom_components")
+        conn.executemany("""
+            INSERT INTO bom_components (parent_item_id, component_item_id, usage_type, quantity, loss_ratio)
+            VALUES (?, ?, ?, ?, 0)
+        """, [(*key, quantity) for key, quantity in edges.items()])
+        conn.commit()
+        rebuild_low_level_codes(conn)
+        rollup_all_costs(conn)
+
+
+def _bom_checksum(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute("""
+            SELECT COUNT(*), TOTAL(quantity), GROUP_CONCAT(parent_item_id || component_item_id)
+            FROM bom_components
+        """).fetchone(), conn.execute("SELECT TOTAL(low_level_code) FROM items").fetchone()
+
+
+def test_overlay_matches_rewritten_bom():
+    """原糸→PS糸（階層が深くなる置き換え）でも、書き換えたBOMの計算結果と一致"""
+    rng = random.Random(43)
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        manager, layers = create_random_bom(db_path, 300, rng)
+        for item_id in layers[3] + layers[2][:10]:
+            manager.set_unit_cost(item_id, rng.uniform(10, 1000))
+        demand = {item_id: rng.randint(1, 20) for item_id in rng.sample(layers[0], 100)}
+        on_hand = {item_id: rng.randint(0, 50) for item_id in rng.sample(layers[2], 10)}
+
+        for source, target, ratio in ((layers[3][0], layers[3][1], 1.0),
+                                      (layers[3][2], layers[2][-1], 1.1)):
+            checksum = _bom_checksum(db_path)
+            result = manager.simulate_substitutions(
+                [{'from': source, 'to': target, 'ratio': ratio}], demand, on_hand)
+            assert _bom_checksum(db_path) == checksum  # 書き込まない
+
+            reference_path = os.path.join(work_dir, "reference.db")
+            shutil.copyfile(db_path, reference_path)
+            before = {row['item_id']: row['net_requirement'] for row in manager.calculate_requirements(demand, on_hand)}
+            _apply_substitution(reference_path, source, target, ratio)
+            with sqlite3.connect(reference_path) as conn:
+                after = {row['item_id']: row['net_requirement'] for row in calculate_requirements(conn, demand, on_hand)}
+                reference_costs = dict(conn.execute("SELECT item_id, standard_cost FROM item_costs"))
+
+            expected = {item_id for item_id in set(before) | set(after)
+                        if abs(after.get(item_id, 0) - before.get(item_id, 0)) > 1e-9 * max(1, before.get(item_id, 0))}
+            diff = {row['item_id']: row for row in result['requirements']}
+            assert set(diff) == expected, (source, target, set(diff) ^ expected)
+            for item_id, row in diff.items():
+                assert abs(row['after'] - after.get(item_id, 0)) < 1e-6 * max(1, row['after'])
+            assert diff[source]['after'] == 0
+            for row in result['costs']:
+                assert abs(row['after'] - reference_costs[row['item_id']]) < 1e-6 * max(1, row['after'])
+            assert result['costs'] and set(row['item_id'] for row in result['costs']) <= set(result['affected_items'])
+            assert result['where_used'][source]['after'] == []
+            print(f"{source} → {target}: 置き換え {result['substituted_edges']}行, "
+                  f"影響 {len(result['affected_items'])}アイテム, 所要量の変化 {len(diff)}件")
+
+
+def test_scoped_and_invalid_substitutions():
+    """親の限定・需要省略時の既定需要・循環と不正な指定"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        manager = BOMManager(os.path.join(work_dir, "bom.db"))
+        for item_id, item_type in (('P1', '完成品'), ('P2', '完成品'), ('B1', '製紐糸'),
+                                   ('R1', '原糸'), ('R2', '原糸')):
+            manager.add_item(item_id, item_id, item_type, 'KG')
+        manager.add_bom_component('P1', 'B1', 2.0, 'Main Material')
+        manager.add_bom_component('P2', 'R1', 3.0, 'Main Material')
+        manager.add_bom_component('B1', 'R1', 0.5, 'Main Material')
+
+        result = manager.simulate_substitutions([{'from': 'R1', 'to': 'R2', 'parents': ['P2']}])
+        assert result['demand'] == {'P2': 1.0}
+        assert {row['item_id']: row['delta'] for row in result['requirements']} == {'R1': -3.0, 'R2': 3.0}
+        assert result['where_used']['R1']['after'] == ['B1', 'P1']
+        assert result['where_used']['R2'] == {'before': [], 'after': ['P2']}
+
+        for substitutions in ([{'from': 'R1', 'to': 'P1'}],        # P1 → B1 → P1 の循環
+                              [{'from': 'R1', 'to': 'R1'}],
+                              [{'from': 'R1', 'to': 'UNKNOWN'}],
+                              [{'from': 'R1', 'to': 'R2', 'ratio': 0}],
+                              []):
+            try:
+                manager.simulate_substitutions(substitutions)
+                assert False, f"不正な指定を受け付けました: {substitutions}"
+            except ValueError:
+                pass
+
+
+def test_large_bom_substitution():
+    """数千品目のBOMでの代替品シミュレーション（応答時間は benchmark_suite.py の simulate_substitutions で確認）"""
+    rng = random.Random(44)
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bom.db")
+        manager, layers = create_random_bom(db_path, 4000, rng)
+        result = manager.simulate_substitutions([{'from': layers[3][0], 'to': layers[3][1]}])
+        assert result['substituted_edges'] > 0 and result['affected_items']
+        assert {row['item_id'] for row in result['requirements']} <= {layers[3][0], layers[3][1]}
+        assert result['where_used'][layers[3][1]]['after']
+
+
+def test_what_if_api():
+    """代替品シミュレーションAPI"""
+    from app_unified import create_app
+
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        try:
+            app = create_app('development')
+            client = app.test_client()
+
+            response = client.post('/api/what_if', json={
+                'substitutions': [{'from': 'RAW_001', 'to': 'RAW_002'}],
+                'demand': {'PRODUCT_001': 10}, 'unit': 'KG',
+            })
+            body = response.get_json()
+            assert response.status_code == 200 and body['success']
+            deltas = {row['item_id']: row['delta'] for row in body['requirements']}
+            assert set(deltas) == {'RAW_001', 'RAW_002'} and abs(deltas['RAW_002'] - 6400) < 1e-6
+            assert body['where_used']['RAW_002']['after'] == ['BRAID_001', 'BRAID_002', 'PRODUCT_001',
+                                                            'PRODUCT_002', 'PS_001', 'PS_002']
+
+            assert client.post('/api/what_if', json={'substitutions': [{'from': 'RAW_001'}]}).status_code == 400
+            assert client.post('/api/what_if', json={'substitutions': 'RAW_001'}).status_code == 400
+            assert client.post('/api/what_if', json={}).status_code == 400
+        finally:
+            os.chdir(original_dir)
+
+
+if __name__ == "__main__":
+    test_overlay_matches_rewritten_bom()
+    test_scoped_and_invalid_substitutions()
+    test_large_bom_substitution()
+    test_what_if_api()
+    print("代替品シミュレーションテスト完了")